@@ -36,7 +36,7 @@ def cmd_encrypt(args):
     elif args.in_file:       pt = Path(args.in_file).read_bytes()
     else: print("入力がありません。--text か --in-file を指定してください。", file=sys.stderr); sys.exit(2)
     aad = args.aad.encode("utf-8") if args.aad else b""
-    n,c,t = bmsc_v6_encrypt(pt, K, IV, aad=aad)
+    n,c,t = bmsc_v6_encrypt(pt, K, IV, aad=aad, workers=args.workers)
     print("KEY(HEX):", K.hex())
     print("IV(text):", args.iv)
     print("NONCE(Base64):", b64e(n))
@@ -52,7 +52,7 @@ def cmd_decrypt(args):
         print("Base64 の入力が不正です:", e, file=sys.stderr); sys.exit(2)
     aad = args.aad.encode("utf-8") if args.aad else b""
     try:
-        pt = bmsc_v6_decrypt(n, c, t, K, IV, aad=aad)
+        pt = bmsc_v6_decrypt(n, c, t, K, IV, aad=aad, workers=args.workers)
     except ValueError:
         print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr); sys.exit(1)
     try:    print("PLAINTEXT(utf-8):", pt.decode("utf-8"))
@@ -67,6 +67,7 @@ def build():
         sp.add_argument("--aad", default="",         help="追加認証データ")
         sp.add_argument("--key-hex",  help="32B鍵のHEX")
         sp.add_argument("--key-file", help="鍵ファイル（32B）")
+        sp.add_argument("--workers", type=int, default=None, help="キーストリーム生成のプロセス数（64KiB 以上の入力で有効）")
     s = sub.add_parser("selftest", help="自己診断"); common(s); s.set_defaults(func=cmd_selftest)
     s = sub.add_parser("encrypt",  help="暗号化");   common(s)
     g = s.add_mutually_exclusive_group(required=True)
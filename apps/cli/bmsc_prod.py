@@ -1,20 +1,33 @@
 ﻿# apps/cli/bmsc_prod.py
-import argparse, os, base64, sys, struct
+import argparse, os, base64, sys, mmap, json, time, asyncio, signal
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, OUT_EXTRA, PhaseStats, set_probe, phase, AuthFailed
+from bmsc_v6_tree import encrypt_tree, decrypt_tree, MANIFEST_NAME
+from bmsc_v6_verify import verify_paths, iter_paths
+from bmsc_v6_index import HeaderIndex
+from bmsc_v6_rotate import rotate_paths
+from bmsc_v6_dedup import ChunkStore, backup_tree, restore_tree, list_snapshots
+from bmsc_v6_client import Bmsc6Client, DaemonError
+from bmsc_v6_keyring import Keyring, UnknownKid, fingerprint
+from bmsc_v6_envelope import Recipients, NoRecipientEntry, KEEP, table_kids
+from bmsc_v6_container import (
+    MAGIC, NONCE_LEN, TAG_LEN, VER_V2, VER_V3, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, FLAG_RCPT,
+    Bmsc6Reader, Bmsc6Header, encrypt_stream, open_bmsc6, map_file, unpack_blob, open_v2_into, open_v2, ext_kid,
+    comp_info, _read_exact,
+)
+from bmsc_v6_compress import ALGORITHMS
+
+COMPRESS_CHOICES = ("auto", *ALGORITHMS)
+COMP_NAMES = {v: k for k, v in ALGORITHMS.items()}
 
 def b64e(b: bytes) -> str: return base64.b64encode(b).decode("ascii")
 def b64d(s: str) -> bytes: return base64.b64decode(s.encode("ascii"))
 
-MAGIC = b"BMSC6\x00"  # 6 bytes
-NONCE_LEN = 24
-TAG_LEN   = 16
-
 def read_key(key_hex: str|None, key_file: str|None):
     """戻り値: (K: bytes, source: str)"""
     if key_hex:
@@ -24,6 +37,29 @@ def read_key(key_hex: str|None, key_file: str|None):
     k = os.urandom(32)
     return k, "random"
 
+def _load_keyring(args):
+    """--keyring の鍵束（未指定なら None）"""
+    path = getattr(args, "keyring", None)
+    if not path:
+        return None
+    try:
+        return Keyring.load(path)
+    except (OSError, ValueError) as e:
+        print("鍵束を読み込めません:", e, file=sys.stderr); sys.exit(2)
+
+def _ring_key(ring, kid):
+    try:
+        return ring.key_for(kid)
+    except ValueError as e:
+        print("鍵束:", e, file=sys.stderr); sys.exit(2)
+
+def _read_key_args(args):
+    """--keyring があれば --kid（省略時は既定）の鍵、無ければ read_key。戻り値: (K, source)"""
+    ring = _load_keyring(args)
+    if ring is not None:
+        return _ring_key(ring, args.kid), "keyring"
+    return read_key(args.key_hex, args.key_file)
+
 def load_aad(args) -> bytes:
     """--aad-file があればそれを優先。無ければ --aad（文字列）"""
     if getattr(args, "aad_file", None):
@@ -44,22 +80,43 @@ def cmd_selftest(args):
         print("✅ tamper detected")
     print("✅ selftest OK (prod)")
 
+def _daemon_call(args, method: str, *a, **kw):
+    """--via-daemon: デーモンに要求を送る。認証失敗は ValueError のまま返し、接続失敗・拒否はここで終了する"""
+    try:
+        with Bmsc6Client(args.via_daemon) as c:
+            return getattr(c, method)(*a, key_id=args.key_id, **kw)
+    except DaemonError as e:
+        print("デーモンが要求を拒否しました:", e, file=sys.stderr); sys.exit(2)
+    except OSError as e:
+        print("デーモンに接続できません:", e, file=sys.stderr); sys.exit(2)
+
 def cmd_encrypt(args):
-    K, source = read_key(args.key_hex, args.key_file)
+    if args.via_daemon:
+        K, source = None, "daemon"  # 鍵はデーモン側
+    else:
+        with phase("key"): K, source = _read_key_args(args)
     IV = args.iv.encode("utf-8")  # ※ nonce ではありません
 
-    if args.text is not None:
-        pt = args.text.encode("utf-8")
-    elif args.in_file:
-        pt = Path(args.in_file).read_bytes()
-    else:
-        print("入力がありません。--text か --in-file を指定してください。", file=sys.stderr)
-        sys.exit(2)
+    with phase("io.read") as p:
+        if args.text is not None:
+            pt = args.text.encode("utf-8")
+        elif args.in_file:
+            pt = Path(args.in_file).read_bytes()
+        else:
+            print("入力がありません。--text か --in-file を指定してください。", file=sys.stderr)
+            sys.exit(2)
+        p.add(len(pt))
 
     aad = load_aad(args)
-    n,c,t = bmsc_v6_encrypt(pt, K, IV, aad=aad)
+    if args.via_daemon:
+        n,c,t = _daemon_call(args, "encrypt", pt, IV, aad)
+    else:
+        n,c,t = bmsc_v6_encrypt(pt, K, IV, aad=aad)
+    with phase("format", len(c)):
+        _print_encrypted(args, K, source, n, c, t)
 
-    show_key = bool(args.show_key or source == "hex")
+def _print_encrypted(args, K, source, n, c, t):
+    show_key = bool(args.show_key or source == "hex") and K is not None
     if source == "random":
         if show_key:
             print("※ 鍵が未指定なので 32B ランダム鍵を生成しました（HEX 下に出力）")
@@ -75,11 +132,15 @@ def cmd_encrypt(args):
     print("TAG(Base64):", b64e(t))
 
 def cmd_decrypt(args):
-    K, source = read_key(args.key_hex, args.key_file)
+    if args.via_daemon:
+        K, source = None, "daemon"
+    else:
+        with phase("key"): K, source = _read_key_args(args)
     IV = args.iv.encode("utf-8")  # ※ nonce ではありません
 
     try:
-        n = b64d(args.nonce_b64); c = b64d(args.ct_b64); t = b64d(args.tag_b64)
+        with phase("decode", len(args.ct_b64)):
+            n = b64d(args.nonce_b64); c = b64d(args.ct_b64); t = b64d(args.tag_b64)
     except Exception as e:
         print("Base64 の入力が不正です:", e, file=sys.stderr)
         sys.exit(2)
@@ -87,91 +148,676 @@ def cmd_decrypt(args):
     aad = load_aad(args)
 
     try:
-        pt = bmsc_v6_decrypt(n, c, t, K, IV, aad=aad)
+        if args.via_daemon:
+            pt = _daemon_call(args, "decrypt", n, c, t, IV, aad)
+        else:
+            pt = bmsc_v6_decrypt(n, c, t, K, IV, aad=aad)
     except ValueError:
         print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr)
         sys.exit(1)
 
-    show_key = bool(args.show_key or source == "hex")
+    show_key = bool(args.show_key or source == "hex") and K is not None
     if source == "random" and not show_key:
         print("※ 鍵が未指定なので 32B ランダム鍵を生成しました（HEX 非表示。--show-key で表示可）")
     if show_key:
         print("KEY(HEX):", K.hex())
 
-    try:
-        print("PLAINTEXT(utf-8):", pt.decode("utf-8"))
-    except UnicodeDecodeError:
-        print("PLAINTEXT(hex):", pt.hex())
+    with phase("format", len(pt)):
+        try:
+            print("PLAINTEXT(utf-8):", pt.decode("utf-8"))
+        except UnicodeDecodeError:
+            print("PLAINTEXT(hex):", pt.hex())
 
 def _parse_encrypted_blob(blob: bytes):
     """
-    bmsc6(v1/v2) or raw を判定して分解する。
-    返り値: (nonce, tag, ct, embedded_ctx_bytes|None, embedded_aad_bytes|None, ver|0)
-      ver=0 は raw、ver=1/2 は bmsc6
-    """
-    if len(blob) >= 8 and blob[:6] == MAGIC:
-        ver   = blob[6]
-        flags = blob[7]
-        off = 8
-        if ver == 1:
-            n = blob[off:off+NONCE_LEN]; off += NONCE_LEN
-            t = blob[off:off+TAG_LEN];   off += TAG_LEN
-            c = blob[off:]
-            return n, t, c, None, None, 1
-        elif ver >= 2:
-            if len(blob) < off + 2 + 4:
-                raise ValueError("bmsc6 v2 header too short")
-            ctx_len = struct.unpack(">H", blob[off:off+2])[0]; off += 2
-            aad_len = struct.unpack(">I", blob[off:off+4])[0]; off += 4
-            if len(blob) < off + ctx_len + aad_len + NONCE_LEN + TAG_LEN:
-                raise ValueError("bmsc6 v2 payload too short")
-            ctx = blob[off:off+ctx_len]; off += ctx_len
-            aad = blob[off:off+aad_len]; off += aad_len
-            n = blob[off:off+NONCE_LEN]; off += NONCE_LEN
-            t = blob[off:off+TAG_LEN];   off += TAG_LEN
-            c = blob[off:]
-            return n, t, c, ctx, aad, ver
+    bmsc6(v1/v2) or raw を判定して分解する（bmsc_v6_container.unpack_blob）。
+    返り値: (nonce, tag, ct, embedded_ctx_bytes|None, embedded_aad_bytes|None, ver|0, ext)
+    """
+    return unpack_blob(blob)
+
+IO_BUFFER = 1 << 20  # ファイル入出力のバッファ（v3 の既定チャンクと同じ）
+
+def _info_stream(args):
+    """状態表示の出力先。平文/暗号文を stdout に流すとき（--out -）は stderr"""
+    return sys.stderr if getattr(args, "out", None) == "-" else sys.stdout
+
+def _open_in(path: str):
+    return sys.stdin.buffer if path == "-" else open(path, "rb", buffering=IO_BUFFER)
+
+def _open_out(path: str):
+    return sys.stdout.buffer if path == "-" else open(path, "wb", buffering=IO_BUFFER)
+
+def _is_v3(head: bytes) -> bool:
+    return len(head) == 8 and head[:6] == MAGIC and head[6] == VER_V3
+
+class _Prefixed:
+    """先読み済みの head を先に返すファイル風ラッパ（stdin は seek で戻せないため）"""
+    def __init__(self, head: bytes, fp):
+        self._head = head; self._fp = fp
+
+    def read(self, n: int=-1) -> bytes:
+        if not self._head:
+            return self._fp.read(n)
+        if n < 0:
+            b, self._head = self._head, b""
+            return b + self._fp.read()
+        b, self._head = self._head[:n], self._head[n:]
+        return b  # 短い read は呼び出し側（_read_exact）が続きを読む
+
+def cmd_encrypt_file(args):
+    """入力（ファイル/stdin）を bmsc6 v3 としてストリーム暗号化し、--out（ファイル/stdout）に書く（定常メモリ）"""
+    K = _require_key(args)
+    info = _info_stream(args)
+    IV = args.iv.encode("utf-8")
+    aad = load_aad(args)
+    if not 0 < args.chunk_size <= MAX_CHUNK_SIZE:
+        print("--chunk-size が不正です。", file=sys.stderr); sys.exit(2)
+    try:
+        src = _open_in(args.in_path)
+    except OSError as e:
+        print("入力を開けません:", e, file=sys.stderr); sys.exit(2)
+    dst = _open_out(args.out)
+    try:
+        n = encrypt_stream(src, dst, K, IV, aad, chunk_size=args.chunk_size, kid=args.kid, compress=args.compress)
+        dst.flush()
+    except BaseException:
+        # 書きかけの出力ファイルは残さない（最終チャンクが無いので復号側でも切り詰めとして弾かれる）
+        if args.out != "-":
+            dst.close(); Path(args.out).unlink(missing_ok=True)
+        raise
+    finally:
+        if args.in_path != "-": src.close()
+        if args.out != "-": dst.close()
+    print("CONTEXT:", args.iv, file=info)
+    if args.out != "-":
+        print("Wrote:", args.out, f"({n} bytes plaintext, bmsc6 v3)", file=info)
+
+def _decrypt_file_v3(args, K, fp):
+    """bmsc6 v3 をチャンク単位で復号し、--out（ファイルまたは - = stdout）へ逐次書き出す（定常メモリ）"""
+    info = _info_stream(args)
+    arg_aad = load_aad(args)
+    try:
+        r = Bmsc6Reader(fp, K, aad=arg_aad or None)
+    except NoRecipientEntry:
+        # 受信者表にこの鍵の項目が無い = 鍵違い
+        print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print("bmsc6 v3 ヘッダが不正です:", e, file=sys.stderr)
+        sys.exit(2)
+    print("CONTEXT(from file):", r.ctx.decode("utf-8", errors="replace"), file=info)
+    if FLAG_RCPT in r.ext:
+        kids = table_kids(r.ext[FLAG_RCPT])
+        print("RECIPIENTS(from file):", len(kids), ", ".join(k or "-" for k in kids), file=info)
+    if r.kid is not None:
+        print("KID(from file):", r.kid, file=info)
+    if r.compression:
+        print("COMPRESSION:", COMP_NAMES[r.compression], file=info)
+    print("AAD: from args/file (used)" if arg_aad else "AAD: embedded (used)", file=info)
+
+    out = _open_out(args.out) if args.out else None
+    try:
+        if out is None:
+            print("PLAINTEXT(hex): ", end="")
+        for pt in r:
+            if out is not None:
+                with phase("io.write", len(pt)): out.write(pt)
+            else:
+                with phase("format", len(pt)): print(pt.hex(), end="")
+        if out is not None:
+            out.flush()
+    except ValueError:
+        # 途中まで書いた平文は残さない（stdout に流した分は取り消せないので終了コードで知らせる）
+        if out is not None and args.out != "-":
+            out.close(); Path(args.out).unlink(missing_ok=True)
+        elif out is None:
+            print()
+        print("復号失敗（鍵/IV/nonce/TAG/AAD を確認。ファイルの切り詰め・改ざんの可能性）。", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if out is not None and args.out != "-": out.close()
+
+    if out is None:
+        print()
+    elif args.out != "-":
+        print("Wrote:", args.out, file=info)
+
+def _decrypt_file_range(args, K):
+    """bmsc6 v3 の平文 [--offset, --offset+--length) だけを復号する（範囲にかかるチャンクのみ読む）"""
+    info = _info_stream(args)
+    arg_aad = load_aad(args)
+    offset = args.offset or 0
+    if offset < 0 or (args.length is not None and args.length < 0):
+        print("--offset/--length は 0 以上で指定してください。", file=sys.stderr)
+        sys.exit(2)
+    try:
+        # 開くときに最終チャンクを認証する（切り詰めはここで検出）
+        f = open_bmsc6(args.in_enc_file, K, aad=arg_aad or None)
+    except UnknownKid as e:
+        print("鍵束:", e, file=sys.stderr); sys.exit(2)
+    except (AuthFailed, NoRecipientEntry):
+        print("復号失敗（鍵/IV/nonce/TAG/AAD を確認。ファイルの切り詰め・改ざんの可能性）。", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print("bmsc6 v3 ヘッダが不正です:", e, file=sys.stderr)
+        sys.exit(2)
+    with f:
+        print("CONTEXT(from file):", f.ctx.decode("utf-8", errors="replace"), file=info)
+        if f.kid is not None:
+            print("KID(from file):", f.kid, file=info)
+        length = max(0, f.size - offset) if args.length is None else args.length
+        print(f"RANGE: {offset}+{length} of {f.size} bytes", file=info)
+        try:
+            pt = f.pread(offset, length)
+        except ValueError:
+            print("復号失敗（鍵/IV/nonce/TAG/AAD を確認。ファイルの切り詰め・改ざんの可能性）。", file=sys.stderr)
+            sys.exit(1)
+    if args.out == "-":
+        with phase("io.write", len(pt)):
+            sys.stdout.buffer.write(pt); sys.stdout.buffer.flush()
+    elif args.out:
+        with phase("io.write", len(pt)): Path(args.out).write_bytes(pt)
+        print("Wrote:", args.out, f"({len(pt)} bytes)", file=info)
+    else:
+        with phase("format", len(pt)): print("PLAINTEXT(hex):", pt.hex())
+
+def _decrypt_to_file(path: str, size: int, decrypt) -> int:
+    """
+    出力ファイルを確保して書き込み可能 mmap にし、decrypt(buf) に平文を直接書かせる。
+    認証に失敗したら出力ファイルを消して ValueError。返り値: 平文長
+    """
+    room = size + OUT_EXTRA
+    with open(path, "w+b") as f:
+        n = None
+        if room == 0:
+            try: n = decrypt(bytearray(0))
+            except ValueError: pass
         else:
-            raise ValueError(f"unsupported bmsc6 version: {ver}")
-    # raw: nonce|tag|ct
-    n = blob[:NONCE_LEN]
-    t = blob[NONCE_LEN:NONCE_LEN+TAG_LEN]
-    c = blob[NONCE_LEN+TAG_LEN:]
-    return n, t, c, None, None, 0
+            f.truncate(room)
+            mm = mmap.mmap(f.fileno(), room)
+            try:
+                n = decrypt(mm)
+            except ValueError:
+                pass
+            mm.close()
+            if n is not None:
+                f.truncate(n)
+    if n is None:
+        Path(path).unlink(missing_ok=True)
+        raise AuthFailed("auth failed")
+    return n
+
+def _decrypt_file_via_daemon(args):
+    """--via-daemon: 復号はデーモンが行う（--out がファイルならデーモンが直接書く）"""
+    info = _info_stream(args)
+    if args.in_enc_file == "-" or args.offset is not None or args.length is not None:
+        print("--via-daemon ではファイル入力の全体復号のみ使えます（stdin / --offset / --length は不可）。", file=sys.stderr)
+        sys.exit(2)
+    to_file = bool(args.out) and args.out != "-"
+    try:
+        r = _daemon_call(args, "decrypt_file", os.path.abspath(args.in_enc_file),
+                         os.path.abspath(args.out) if to_file else None, args.iv.encode("utf-8"), load_aad(args))
+    except ValueError:
+        print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr)
+        sys.exit(1)
+    print("CONTEXT:", r["ctx"].decode("utf-8", errors="replace"), file=info)
+    if to_file:
+        print("Wrote:", args.out, file=info)
+    elif args.out == "-":
+        sys.stdout.buffer.write(r["plaintext"]); sys.stdout.buffer.flush()
+    else:
+        print("PLAINTEXT(hex):", r["plaintext"].hex())
+
+def _decrypt_key(args):
+    """
+    復号に使う鍵。--keyring なら鍵束ごと返し、ヘッダの KID で鍵を選ばせる（KID の無いファイルは既定の鍵）。
+    --kid を付けるとその鍵に固定する。
+    """
+    ring = _load_keyring(args)
+    if ring is None:
+        return read_key(args.key_hex, args.key_file)[0]
+    return ring if args.kid is None else _ring_key(ring, args.kid)
 
 def cmd_decrypt_file(args):
-    K, _ = read_key(args.key_hex, args.key_file)
-    blob = Path(args.in_enc_file).read_bytes()
-    n, t, c, ctx_b, aad_b, ver = _parse_encrypted_blob(blob)
+    if args.via_daemon:
+        return _decrypt_file_via_daemon(args)
+    with phase("key"): K = _decrypt_key(args)
+    info = _info_stream(args)
+    if args.offset is not None or args.length is not None:
+        if args.in_enc_file == "-":
+            print("--offset/--length はファイル入力（bmsc6 v3）でのみ使えます。", file=sys.stderr)
+            sys.exit(2)
+        with open(args.in_enc_file, "rb") as fp:
+            is_v3 = _is_v3(fp.read(8))
+        if not is_v3:
+            print("--offset/--length は bmsc6 v3 でのみ使えます（v1/v2 は全体で 1 タグのため）。", file=sys.stderr)
+            sys.exit(2)
+        return _decrypt_file_range(args, K)
+    if args.in_enc_file == "-":
+        # stdin は seek できないので、先読みしたヘッダを前置して渡す
+        fp = sys.stdin.buffer
+        with phase("io.read", 8): head = _read_exact(fp, 8)
+        if _is_v3(head):
+            return _decrypt_file_v3(args, K, _Prefixed(head, fp))
+        # v1/v2/raw は 1 タグの一括形式なので全体を読む
+        with phase("io.read") as p:
+            blob = memoryview(head + fp.read()); p.add(len(blob))
+    else:
+        with open(args.in_enc_file, "rb", buffering=IO_BUFFER) as fp:
+            with phase("io.read", 8): head = fp.read(8)
+            if _is_v3(head):
+                fp.seek(0)
+                return _decrypt_file_v3(args, K, fp)
+        # 入力は mmap、各フィールドは memoryview のまま扱う（全体コピーをしない）
+        with phase("io.map") as p:
+            blob = map_file(args.in_enc_file); p.add(len(blob))
+    with phase("container.parse"):
+        n, t, c, ctx_b, aad_b, ver, ext = _parse_encrypted_blob(blob)
 
     # CONTEXT の決定（v2 なら内包を優先）
     if ctx_b is not None:
-        IV = ctx_b
-        print("CONTEXT(from file):", IV.decode("utf-8", errors="replace"))
+        IV = bytes(ctx_b)
+        print("CONTEXT(from file):", IV.decode("utf-8", errors="replace"), file=info)
     else:
         IV = args.iv.encode("utf-8")
-        print("CONTEXT(from args):", args.iv)
+        print("CONTEXT(from args):", args.iv, file=info)
 
     # AAD の決定（v2 なら内包を優先。引数が明示されていればそれを使う）
     arg_aad = load_aad(args)
     if aad_b is not None and not arg_aad:
-        aad = aad_b
-        print("AAD: embedded (used)")
+        aad = bytes(aad_b)
+        print("AAD: embedded (used)", file=info)
     else:
         aad = arg_aad
-        print("AAD: from args/file (used)" if aad else "AAD: empty")
-
+        print("AAD: from args/file (used)" if aad else "AAD: empty", file=info)
+
+    algo, _ = comp_info(ext)
+    if algo:
+        print("COMPRESSION:", COMP_NAMES[algo], file=info)
+    if FLAG_RCPT in ext:
+        kids = table_kids(ext[FLAG_RCPT])
+        print("RECIPIENTS(from file):", len(kids), ", ".join(k or "-" for k in kids), file=info)
+    kid = ext_kid(ext)
+    if kid is not None:
+        print("KID(from file):", kid, file=info)
+        if isinstance(K, Keyring) and kid not in K:
+            print("鍵束: unknown kid:", kid, file=sys.stderr); sys.exit(2)
+
+    if len(n) != NONCE_LEN or len(t) != TAG_LEN:
+        print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr)
+        sys.exit(1)
+    # 鍵束ならヘッダの KID で鍵を選ぶ（KID の無い v1/v2/raw は既定の鍵）
     try:
-        pt = bmsc_v6_decrypt(n, c, t, K, IV, aad=aad)
+        if args.out and args.out != "-" and not algo:
+            # 平文は出力ファイルの mmap に直接書く（出力サイズのヒープ確保なし）
+            with phase("io.write", len(c)):
+                _decrypt_to_file(args.out, len(c), lambda buf: open_v2_into(buf, K, IV, aad, n, c, t, ext))
+        else:
+            # 圧縮付きは認証してから展開する（認証前のヘッダの平文長で出力を確保しない）
+            pt = open_v2(K, IV, aad, n, c, t, ext)
     except ValueError:
         print("復号失敗（鍵/IV/nonce/TAG/AAD を確認）。", file=sys.stderr)
         sys.exit(1)
 
-    if args.out:
-        Path(args.out).write_bytes(pt)
-        print("Wrote:", args.out)
+    if args.out == "-":
+        with phase("io.write", len(pt)):
+            sys.stdout.buffer.write(pt); sys.stdout.buffer.flush()
+    elif args.out:
+        if algo:
+            with phase("io.write", len(pt)), open(args.out, "wb") as f: f.write(pt)
+        print("Wrote:", args.out, file=info)
+    else:
+        with phase("format", len(pt)): print("PLAINTEXT(hex):", pt.hex())
+
+def _dir_progress(enabled: bool):
+    """encrypt-dir/decrypt-dir の進捗表示（stderr、0.5 秒ごと）"""
+    if not enabled:
+        return None
+    t0 = time.perf_counter(); last = [0.0]
+    def progress(done, total, done_bytes, total_bytes):
+        now = time.perf_counter()
+        if now - last[0] < 0.5 and done < total:
+            return
+        last[0] = now
+        mib = done_bytes / (1 << 20); dt = max(now - t0, 1e-9)
+        print(f"\r[{done}/{total}] {mib:.1f}/{total_bytes / (1 << 20):.1f} MiB  {done / dt:.1f} files/s  {mib / dt:.1f} MiB/s",
+              end="", file=sys.stderr, flush=True)
+    return progress
+
+def _dir_summary(res: dict, progress):
+    if progress is not None:
+        print(file=sys.stderr)
+    dt = max(res["seconds"], 1e-9); mib = res["bytes"] / (1 << 20)
+    print(f"Done: {res['files']} files, {mib:.1f} MiB in {res['seconds']:.2f} s "
+          f"({res['files'] / dt:.1f} files/s, {mib / dt:.1f} MiB/s)"
+          f"; skipped {res['skipped']} (manifest), failed {len(res['failed'])}")
+    print("Manifest:", res["manifest"])
+    for rel, msg in res["failed"]:
+        print(f"  失敗: {rel}: {msg}", file=sys.stderr)
+    if res["failed"]:
+        sys.exit(1)
+
+def _recipients(args, ring):
+    """
+    --recipient の列 → Recipients。各値は KID=PATH（KID 付きの鍵ファイル）、
+    --keyring にある KID、または PATH（KID 無しの鍵ファイル）
+    """
+    items = []
+    for spec in args.recipient:
+        kid, sep, path = spec.partition("=")
+        if not sep:
+            kid, path = (spec, None) if ring is not None and spec in ring else (None, spec)
+        try:
+            K = ring.key_for(kid) if path is None else Path(path).read_bytes()
+        except OSError as e:
+            print("受信者の鍵を読み込めません:", e, file=sys.stderr); sys.exit(2)
+        items.append((kid or None, K))
+    try:
+        return Recipients(items)
+    except ValueError as e:
+        print("--recipient:", e, file=sys.stderr); sys.exit(2)
+
+def _require_key(args, *, decrypt: bool=False):
+    """
+    明示された鍵（ランダム生成はしない）。--keyring なら鍵束を返す
+    （暗号化は --kid/既定の KID をヘッダに入れ、復号はヘッダの KID で鍵を選ぶ。復号で --kid を付けるとその鍵に固定）。
+    暗号化で --recipient があれば宛先（ファイルごとの DEK を受信者ごとの鍵で包む）を返す。
+    """
+    ring = _load_keyring(args)
+    if not decrypt and getattr(args, "recipient", None):
+        if args.kid is not None:
+            print("--kid と --recipient は併用できません（受信者の KID は --recipient KID=PATH で指定）。", file=sys.stderr); sys.exit(2)
+        return _recipients(args, ring)
+    if ring is not None:
+        if args.kid is None:
+            return ring
+        K = _ring_key(ring, args.kid)
+        return K if decrypt else ring
+    if not (args.key_hex or args.key_file):
+        print("鍵を指定してください（--key-file か --key-hex、または --keyring）。", file=sys.stderr)
+        sys.exit(2)
+    K, _ = read_key(args.key_hex, args.key_file)
+    if len(K) != 32:
+        print("鍵は 32 バイトである必要があります。", file=sys.stderr)
+        sys.exit(2)
+    return K
+
+def cmd_encrypt_dir(args):
+    K = _require_key(args)
+    progress = _dir_progress(not args.no_progress)
+    try:
+        res = encrypt_tree(args.in_dir, args.out_dir, K, args.iv.encode("utf-8"), workers=args.workers,
+                           manifest=args.manifest, progress=progress, kid=args.kid, compress=args.compress)
+    except ValueError as e:
+        print("encrypt-dir:", e, file=sys.stderr); sys.exit(2)
+    _dir_summary(res, progress)
+
+def cmd_decrypt_dir(args):
+    K = _require_key(args, decrypt=True)
+    progress = _dir_progress(not args.no_progress)
+    try:
+        res = decrypt_tree(args.in_dir, args.out_dir, K, workers=args.workers, manifest=args.manifest,
+                           check_names=not args.no_name_check, progress=progress)
+    except ValueError as e:
+        print("decrypt-dir:", e, file=sys.stderr); sys.exit(2)
+    _dir_summary(res, progress)
+
+def _path_list(args):
+    """verify/inspect の対象パス（引数の列と --from-file の行。ディレクトリは再帰的に .bmsc6）"""
+    def lines():
+        f = sys.stdin if args.from_file == "-" else open(args.from_file, encoding="utf-8")
+        with f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if line:
+                    yield line
+    def paths():
+        yield from args.paths
+        if args.from_file:
+            yield from lines()
+    return iter_paths(paths())
+
+def cmd_verify(args):
+    """平文を出力せずに AEAD タグまで検証し、結果を 1 行の JSON で stdout に出す（失敗があれば終了コード 1）"""
+    if not args.paths and not args.from_file:
+        print("検証するパスを指定してください（パス/ディレクトリ、または --from-file）。", file=sys.stderr); sys.exit(2)
+    K = _require_key(args, decrypt=True)
+    progress = None
+    if not args.no_progress:
+        t0 = time.perf_counter(); last = [0.0]
+        def progress(done, failed, done_bytes):
+            now = time.perf_counter()
+            if now - last[0] < 0.5:
+                return
+            last[0] = now
+            mib = done_bytes / (1 << 20); dt = max(now - t0, 1e-9)
+            print(f"\r[{done} files, {failed} failed] {mib:.1f} MiB  {done / dt:.1f} files/s  {mib / dt:.1f} MiB/s",
+                  end="", file=sys.stderr, flush=True)
+    res = verify_paths(_path_list(args), K, ctx=args.iv.encode("utf-8"), aad=load_aad(args) or None,
+                       workers=args.workers, progress=progress)
+    if progress is not None:
+        print(file=sys.stderr)
+    print(json.dumps(res, ensure_ascii=False, separators=(",", ":")))
+    if res["failed"]:
+        sys.exit(1)
+
+def cmd_inspect(args):
+    """
+    ヘッダだけを読んでメタデータを 1 ファイル 1 行の JSON で出す（鍵は不要。平文・暗号文は読まない）。
+    --index を付けると SQLite の索引に記録し、パスを指定しなければ索引から --name/--sha256/--kid で検索する
+    """
+    dump = lambda d: print(json.dumps(d, ensure_ascii=False, separators=(",", ":")))
+    has_paths = bool(args.paths or args.from_file)
+    if not args.index:
+        if not has_paths:
+            print("パスを指定してください（パス/ディレクトリ、--from-file、または --index で検索）。", file=sys.stderr); sys.exit(2)
+        failed = 0
+        for p in _path_list(args):
+            try:
+                dump(Bmsc6Header.read(p).as_dict())
+            except (ValueError, OSError) as e:
+                failed += 1; dump({"path": str(p), "error": str(e) or type(e).__name__})
+        if failed:
+            sys.exit(1)
+        return
+    with HeaderIndex(args.index) as idx:
+        if has_paths:
+            res = idx.update(_path_list(args))
+            if args.prune:
+                res["pruned"] = idx.prune()
+            res["total"] = len(idx)
+            dump(res)
+            if res["failures"]:
+                sys.exit(1)
+            return
+        if args.prune:
+            dump({"pruned": idx.prune(), "total": len(idx)}); return
+        rows = idx.find(name=args.name, sha256=args.sha256, kid=args.kid)
+    for d in rows:
+        dump(d)
+    if not rows:
+        sys.exit(1)
+
+def cmd_rotate(args):
+    """
+    封筒（--recipient で作ったファイル）の受信者表だけを新しい鍵で包み直す（ct は読まない・書かない）。
+    旧鍵は --key-file/--key-hex（または --keyring と --kid）、新しい鍵は --new-key-file/--new-key-hex
+    （または --keyring にある --new-kid）。結果は 1 行の JSON（失敗があれば終了コード 1）
+    """
+    if not args.paths and not args.from_file:
+        print("対象のパスを指定してください（パス/ディレクトリ、または --from-file）。", file=sys.stderr); sys.exit(2)
+    ring = _load_keyring(args)
+    if ring is not None and args.kid is None:
+        print("--keyring では旧鍵の --kid を指定してください。", file=sys.stderr); sys.exit(2)
+    K_old = _require_key(args, decrypt=True)
+    if args.new_key_hex or args.new_key_file:
+        K_new, _ = read_key(args.new_key_hex, args.new_key_file)
+    elif ring is not None and args.new_kid:
+        K_new = _ring_key(ring, args.new_kid)
     else:
-        print("PLAINTEXT(hex):", pt.hex())
+        print("新しい鍵を指定してください（--new-key-file か --new-key-hex、または --keyring と --new-kid）。", file=sys.stderr); sys.exit(2)
+    if len(K_new) != 32:
+        print("鍵は 32 バイトである必要があります。", file=sys.stderr); sys.exit(2)
+    if K_new == K_old:
+        print("新しい鍵が旧鍵と同じです。", file=sys.stderr); sys.exit(2)
+    progress = None
+    if not args.no_progress:
+        t0 = time.perf_counter(); last = [0.0]
+        def progress(done, failed):
+            now = time.perf_counter()
+            if now - last[0] < 0.5:
+                return
+            last[0] = now
+            print(f"\r[{done} files, {failed} failed]  {done / max(now - t0, 1e-9):.1f} files/s", end="", file=sys.stderr, flush=True)
+    try:
+        res = rotate_paths(_path_list(args), K_old, K_new, new_kid=args.new_kid if args.new_kid else KEEP,
+                           log=args.log, workers=args.workers, progress=progress)
+    except ValueError as e:
+        print("rotate:", e, file=sys.stderr); sys.exit(2)
+    if progress is not None:
+        print(file=sys.stderr)
+    print(json.dumps(res, ensure_ascii=False, separators=(",", ":")))
+    if res["failures"]:
+        sys.exit(1)
+
+def _open_store(args) -> ChunkStore:
+    """--store の重複排除ストア（鍵は明示が必要。--keyring なら --kid/既定の鍵）"""
+    if not (args.key_hex or args.key_file or args.keyring):
+        print("鍵を指定してください（--key-file か --key-hex、または --keyring）。", file=sys.stderr); sys.exit(2)
+    K, _ = _read_key_args(args)
+    if len(K) != 32:
+        print("鍵は 32 バイトである必要があります。", file=sys.stderr); sys.exit(2)
+    try:
+        return ChunkStore(args.store, K, args.iv.encode("utf-8"))
+    except ValueError as e:
+        print(f"{args.cmd}:", e, file=sys.stderr); sys.exit(2)
+
+def cmd_backup(args):
+    """
+    重複排除付きバックアップ: --in-dir をチャンクに分け、ストアに無いチャンクだけを暗号化して追記し、
+    ファイルごとの暗号化マニフェストを <store>/snapshots/<snapshot>/ に書く。結果は 1 行の JSON（失敗があれば終了コード 1）
+    """
+    progress = _dir_progress(not args.no_progress)
+    with _open_store(args) as store:
+        try:
+            res = backup_tree(args.in_dir, store, snapshot=args.snapshot, parent=args.parent, rehash=args.rehash,
+                              progress=progress)
+        except ValueError as e:
+            print("backup:", e, file=sys.stderr); sys.exit(2)
+        res["store"] = store.stats()
+    if progress is not None:
+        print(file=sys.stderr)
+    print(json.dumps(res, ensure_ascii=False, separators=(",", ":")))
+    if res["failures"]:
+        sys.exit(1)
+
+def cmd_restore(args):
+    """スナップショット（省略時は最新）を --out-dir に復元する。--list でスナップショットの一覧"""
+    if not (Path(args.store) / "index.sqlite").exists():
+        print("チャンクストアがありません:", args.store, file=sys.stderr); sys.exit(2)
+    with _open_store(args) as store:
+        snaps = list_snapshots(store)
+        if args.list:
+            for name in snaps:
+                print(name)
+            return
+        if not args.out_dir:
+            print("--out-dir を指定してください。", file=sys.stderr); sys.exit(2)
+        snapshot = args.snapshot or (snaps[-1] if snaps else None)
+        if snapshot is None:
+            print("スナップショットがありません。", file=sys.stderr); sys.exit(2)
+        progress = _dir_progress(not args.no_progress)
+        try:
+            res = restore_tree(store, snapshot, args.out_dir, progress=progress)
+        except ValueError as e:
+            print("restore:", e, file=sys.stderr); sys.exit(2)
+    if progress is not None:
+        print(file=sys.stderr)
+    print(json.dumps(res, ensure_ascii=False, separators=(",", ":")))
+    if res["failures"]:
+        sys.exit(1)
+
+def _load_daemon_keys(specs) -> dict:
+    """--key-file [NAME=]PATH の列 → {key_id: K}（NAME 省略時はファイル名の stem）"""
+    keys = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep or not name or "/" in name or "\\" in name:
+            name, path = Path(spec).stem, spec
+        K = Path(path).read_bytes()
+        if len(K) != 32:
+            raise ValueError(f"key file must be 32 bytes: {path}")
+        if name in keys:
+            raise ValueError(f"duplicate key_id: {name}")
+        keys[name] = K
+    return keys
+
+def cmd_serve(args):
+    from bmsc_v6_daemon import Bmsc6Daemon
+    if not args.key_file and not args.keyring:
+        print("鍵を指定してください（--key-file か --keyring）。", file=sys.stderr); sys.exit(2)
+    ring = _load_keyring(args) or Keyring()
+    try:
+        # --key-file は鍵束に追加する（鍵束が無ければ最初の --key-file が既定）
+        for name, K in _load_daemon_keys(args.key_file or []).items():
+            ring.add(name, K)
+    except (OSError, ValueError) as e:
+        print("鍵を読み込めません:", e, file=sys.stderr); sys.exit(2)
+    daemon = Bmsc6Daemon(ring)
+    ready = lambda: print(f"Listening: {args.socket} (keys: {', '.join(ring)}; default: {ring.default_kid})", flush=True)
+
+    async def run():
+        # SIGTERM でも Ctrl+C と同じく待ち受けを止めて片付ける（ソケットファイルを消す）
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await daemon.serve(args.socket, ready=ready)
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    print(f"Stopped: {daemon.requests} requests, {daemon.connections} connections", flush=True)
+
+def cmd_keyring(args):
+    """鍵束ファイルの作成・一覧・追加（鍵そのものは表示しない。list は指紋のみ）"""
+    path = Path(args.keyring)
+    if args.action == "list":
+        ring = _load_keyring(args)
+        for kid in ring:
+            mark = " (default)" if kid == ring.default_kid else ""
+            print(f"{kid}\t{fingerprint(ring.key_for(kid))}{mark}")
+        return
+    if not args.kid:
+        print("--kid を指定してください。", file=sys.stderr); sys.exit(2)
+    ring = _load_keyring(args) if path.exists() else Keyring()
+    try:
+        if args.action == "generate":
+            ring.add(args.kid, os.urandom(32), default=args.default)
+        elif args.action == "add":
+            if not (args.key_hex or args.key_file):
+                print("追加する鍵を指定してください（--key-file か --key-hex）。", file=sys.stderr); sys.exit(2)
+            K, _ = read_key(args.key_hex, args.key_file)
+            ring.add(args.kid, K, default=args.default)
+        else:  # default
+            ring.set_default(args.kid)
+    except ValueError as e:
+        print("鍵束:", e, file=sys.stderr); sys.exit(2)
+    ring.save(path)
+    print(f"Saved: {path} ({len(ring)} keys; default: {ring.default_kid})")
+
+STATS_HELP = "フェーズ別の所要時間/バイト数/確保ブロック数を JSON で stderr に出力"
+
+def _print_stats(cmd: str, stats: PhaseStats, wall: float):
+    d = stats.as_dict()
+    phases = {k: dict(v, seconds=round(v["seconds"], 6)) for k, v in d["phases"].items()}
+    print(json.dumps({
+        "command": cmd,
+        "wall_seconds": round(wall, 6),
+        "phases": phases,
+        "other_seconds": round(wall - d["seconds"], 6),  # 起動後の引数処理など、フェーズ外の時間
+    }, ensure_ascii=False), file=sys.stderr)
 
 def build():
     p = argparse.ArgumentParser(prog="bmsc_prod", description="BMSC v6 CLI (prod/AEAD)")
@@ -190,9 +836,22 @@ def build():
                         help="32B鍵のHEX")
         sp.add_argument("--key-file",
                         help="鍵ファイル（32B）")
+        sp.add_argument("--keyring",
+                        help="鍵束ファイル（KID → 鍵）。暗号化は KID をヘッダに入れ、復号はヘッダの KID で鍵を選ぶ")
+        sp.add_argument("--kid", default=None,
+                        help="使う鍵の KID（--keyring の既定を上書き。--key-* と併用すると KID をヘッダに入れる）")
         sp.add_argument("--show-key", action="store_true",
                         help="キーを表示する（検証・デバッグ用。本番運用では通常は使用しない想定）")
 
+    def via_daemon(sp):
+        sp.add_argument("--via-daemon", metavar="SOCKET",
+                        help="serve で起動したデーモンに処理を任せる（鍵はデーモン側。--key-* は不要）")
+        sp.add_argument("--key-id", default="", help="--via-daemon で使う鍵の ID（既定: デーモンの既定鍵）")
+
+    def recipient(sp):
+        sp.add_argument("--recipient", action="append", metavar="[KID=]PATH|KID",
+                        help="複数受信者の封筒: 本文を 1 回だけ暗号化し、データ鍵を各受信者の鍵で包む（複数指定可。KID は --keyring から）")
+
     s = sub.add_parser("selftest", help="自己診断")
     common(s); s.set_defaults(func=cmd_selftest)
 
@@ -201,6 +860,8 @@ def build():
     g = s.add_mutually_exclusive_group(required=True)
     g.add_argument("--text",    help="平文テキスト（UTF-8）")
     g.add_argument("--in-file", help="平文バイナリのパス")
+    s.add_argument("--stats", action="store_true", help=STATS_HELP)
+    via_daemon(s)
     s.set_defaults(func=cmd_encrypt)
 
     s = sub.add_parser("decrypt",  help="復号")
@@ -208,19 +869,132 @@ def build():
     s.add_argument("--nonce-b64", required=True)
     s.add_argument("--ct-b64",    required=True)
     s.add_argument("--tag-b64",   required=True)
+    s.add_argument("--stats", action="store_true", help=STATS_HELP)
+    via_daemon(s)
     s.set_defaults(func=cmd_decrypt)
 
-    s = sub.add_parser("decrypt-file", help="ファイル復号（.bmsc6 v1/v2 または raw .bin 自動判別）")
+    s = sub.add_parser("encrypt-file", help="ファイル/stdin を bmsc6 v3 にストリーム暗号化（入力長は不要・定常メモリ）")
+    common(s)
+    s.add_argument("--in", dest="in_path", required=True, help="平文の入力パス（- で stdin）")
+    s.add_argument("--out", required=True, help="bmsc6 の出力パス（- で stdout。状態表示は stderr へ）")
+    s.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="v3 のチャンク長（既定 1 MiB）")
+    s.add_argument("--compress", choices=COMPRESS_CHOICES,
+                   help="暗号化前にチャンクごとに圧縮（auto: 先頭の標本で判断し zlib / 圧縮済みの入力はそのまま）")
+    recipient(s)
+    s.set_defaults(func=cmd_encrypt_file)
+
+    s = sub.add_parser("decrypt-file", help="ファイル復号（.bmsc6 v1/v2/v3 または raw .bin 自動判別）")
     common(s)
-    s.add_argument("--in-enc-file", required=True, help="暗号ファイル（.bmsc6 / .bin）")
-    s.add_argument("--out", help="復号した平文の出力パス（未指定ならhex表示）")
+    s.add_argument("--in-enc-file", "--in", dest="in_enc_file", required=True,
+                   help="暗号ファイル（.bmsc6 / .bin。- で stdin）")
+    s.add_argument("--out", help="復号した平文の出力パス（- で stdout、未指定ならhex表示）")
+    s.add_argument("--offset", type=int, default=None, help="v3 のみ: 平文のこの位置から復号する")
+    s.add_argument("--length", type=int, default=None, help="v3 のみ: 復号するバイト数（既定: 末尾まで）")
+    s.add_argument("--stats", action="store_true", help=STATS_HELP)
+    via_daemon(s)
     s.set_defaults(func=cmd_decrypt_file)
 
+    def dir_common(sp):
+        sp.add_argument("--in-dir",  required=True, help="入力ディレクトリ")
+        sp.add_argument("--out-dir", required=True, help="出力ディレクトリ（相対パス構成を保って書き出す）")
+        sp.add_argument("--workers", type=int, default=None, help="AEAD ワーカー数（既定: CPU 数）")
+        sp.add_argument("--manifest", help=f"再開用マニフェスト（既定: <out-dir>/{MANIFEST_NAME}）")
+        sp.add_argument("--no-progress", action="store_true", help="進捗表示をしない")
+
+    s = sub.add_parser("encrypt-dir", help="ディレクトリ以下を 1 ファイル 1 つの .bmsc6 v2 に暗号化（AAD: name/size/sha256）")
+    common(s); dir_common(s)
+    s.add_argument("--compress", choices=COMPRESS_CHOICES,
+                   help="暗号化前に圧縮（エントロピーが高い・縮まないファイルはそのまま。auto は zlib）")
+    recipient(s)
+    s.set_defaults(func=cmd_encrypt_dir)
+
+    s = sub.add_parser("decrypt-dir", help="ディレクトリ以下の .bmsc6 v2 を復号")
+    common(s); dir_common(s)
+    s.add_argument("--no-name-check", action="store_true",
+                   help="AAD の name と相対パスの一致を確認しない（他ツールで作ったファイル向け）")
+    s.set_defaults(func=cmd_decrypt_dir)
+
+    s = sub.add_parser("verify", help="bmsc6 ファイルを並行に検証（形式と AEAD タグ。平文は出力しない）。結果は JSON")
+    common(s)
+    s.add_argument("paths", nargs="*", help="検証するファイル/ディレクトリ（ディレクトリは再帰的に .bmsc6）")
+    s.add_argument("--from-file", metavar="LIST", help="検証するパスの一覧（1 行 1 パス。- で stdin）")
+    s.add_argument("--workers", type=int, default=None, help="ワーカー数（既定: CPU 数）")
+    s.add_argument("--no-progress", action="store_true", help="進捗表示をしない")
+    s.set_defaults(func=cmd_verify)
+
+    s = sub.add_parser("inspect", help="ヘッダだけを読んでメタデータを JSON Lines で表示（鍵不要）。--index で SQLite 索引の作成/検索")
+    s.add_argument("paths", nargs="*", help="対象のファイル/ディレクトリ（ディレクトリは再帰的に .bmsc6）")
+    s.add_argument("--from-file", metavar="LIST", help="対象パスの一覧（1 行 1 パス。- で stdin）")
+    s.add_argument("--index", metavar="DB", help="SQLite 索引。パス指定時は記録（変更のないファイルは読まない）、無指定時は検索")
+    s.add_argument("--name", help="--index の検索: AAD の name")
+    s.add_argument("--sha256", help="--index の検索: AAD の sha256")
+    s.add_argument("--kid", help="--index の検索: KID")
+    s.add_argument("--prune", action="store_true", help="--index: 存在しないファイルの行を消す")
+    s.set_defaults(func=cmd_inspect)
+
+    s = sub.add_parser("rotate", help="鍵のローテーション: 封筒の受信者表だけを新しい鍵で包み直す（本文は再暗号化しない）")
+    common(s)
+    s.add_argument("paths", nargs="*", help="対象のファイル/ディレクトリ（ディレクトリは再帰的に .bmsc6）")
+    s.add_argument("--from-file", metavar="LIST", help="対象パスの一覧（1 行 1 パス。- で stdin）")
+    s.add_argument("--new-key-hex", help="新しい 32B 鍵の HEX")
+    s.add_argument("--new-key-file", help="新しい鍵ファイル（32B）")
+    s.add_argument("--new-kid", help="包み直した項目の KID（省略時は元の KID。--keyring なら新しい鍵もここから）")
+    s.add_argument("--log", required=True, help="進捗ログ（JSON Lines）。同じログで再実行すると続きから")
+    s.add_argument("--workers", type=int, default=None, help="ワーカー数（既定: CPU 数）")
+    s.add_argument("--no-progress", action="store_true", help="進捗表示をしない")
+    s.set_defaults(func=cmd_rotate)
+
+    s = sub.add_parser("backup", help="重複排除付きバックアップ（内容で区切ったチャンクを 1 回だけ暗号化して保存。ファイルは暗号化マニフェスト）")
+    common(s)
+    s.add_argument("--in-dir", required=True, help="バックアップするディレクトリ")
+    s.add_argument("--store", required=True, help="チャンクストアのディレクトリ（無ければ作成）")
+    s.add_argument("--snapshot", help="スナップショット名（既定: 開始時刻 YYYYmmddTHHMMSS）")
+    s.add_argument("--parent", help="比較する前回のスナップショット（既定: 名前順で最後）。size/mtime が同じファイルは読まない")
+    s.add_argument("--rehash", action="store_true", help="前回のスナップショットを使わず全ファイルを分割・ハッシュし直す")
+    s.add_argument("--no-progress", action="store_true", help="進捗表示をしない")
+    s.set_defaults(func=cmd_backup)
+
+    s = sub.add_parser("restore", help="backup のスナップショットを復元")
+    common(s)
+    s.add_argument("--store", required=True, help="チャンクストアのディレクトリ")
+    s.add_argument("--snapshot", help="復元するスナップショット（既定: 最新）")
+    s.add_argument("--out-dir", help="復元先のディレクトリ")
+    s.add_argument("--list", action="store_true", help="スナップショットの一覧を表示する")
+    s.add_argument("--no-progress", action="store_true", help="進捗表示をしない")
+    s.set_defaults(func=cmd_restore)
+
+    s = sub.add_parser("serve", help="鍵を読み込んだまま Unix ソケットで暗号化/復号を受け付けるデーモン")
+    s.add_argument("--socket", required=True, help="待ち受ける Unix ドメインソケットのパス（0600 で作成）")
+    s.add_argument("--key-file", action="append", metavar="[NAME=]PATH",
+                   help="鍵ファイル（32B）。複数指定可。NAME 省略時はファイル名の stem、最初の鍵が既定")
+    s.add_argument("--keyring", help="鍵束ファイル（その既定の鍵が既定。--key-file はこれに追加される）")
+    s.set_defaults(func=cmd_serve)
+
+    s = sub.add_parser("keyring", help="鍵束ファイル（KID → 鍵）の管理")
+    s.add_argument("action", choices=("list", "generate", "add", "default"),
+                   help="list: 一覧（指紋）/ generate: 鍵を生成して追加 / add: 既存の鍵を追加 / default: 既定の KID を変更")
+    s.add_argument("--keyring", required=True, help="鍵束ファイル（無ければ作成。0600 で保存）")
+    s.add_argument("--kid", help="対象の KID")
+    s.add_argument("--key-hex", help="add: 追加する 32B 鍵の HEX")
+    s.add_argument("--key-file", help="add: 追加する鍵ファイル（32B）")
+    s.add_argument("--default", action="store_true", help="generate/add: 追加した鍵を既定にする")
+    s.set_defaults(func=cmd_keyring)
+
     return p
 
 def main(argv=None):
     args = build().parse_args(argv)
-    args.func(args)
+    if not getattr(args, "stats", False):
+        return args.func(args)
+    stats = PhaseStats()
+    old = set_probe(stats)
+    t0 = time.perf_counter()
+    try:
+        args.func(args)
+    finally:
+        # 失敗（sys.exit）時も計測結果は出す
+        set_probe(old)
+        _print_stats(args.cmd, stats, time.perf_counter() - t0)
 
 if __name__ == "__main__":
     main()
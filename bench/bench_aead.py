@@ -1,6 +1,6 @@
 # bench/bench_aead.py
 
-import time, secrets
+import time, secrets, io, os
 from pathlib import Path
 import sys
 
@@ -10,6 +10,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt  # AEAD core
+from bmsc_v6_parallel import encrypt_parallel, decrypt_parallel  # v3 chunk-parallel
 
 def bench_once(size_bytes: int, rounds: int = 5):
     """Return (enc_ms, dec_ms) average for random plaintext of size_bytes."""
@@ -39,6 +40,28 @@ def bench_once(size_bytes: int, rounds: int = 5):
     dec_ms = (t3 - t2) * 1000 / rounds
     return enc_ms, dec_ms
 
+def bench_parallel(pt: bytes, key: bytes, workers: int, rounds: int = 3, chunk_size: int = 1 << 20):
+    """Return (enc_ms, dec_ms, container_bytes) for the chunk-parallel v3 engine."""
+    ctx = b"BMSCv6-IV00"
+    nonce = bytes(24)  # fixed so output can be compared across worker counts
+
+    enc = dec = float("inf")
+    for _ in range(rounds):
+        dst = io.BytesIO()
+        t0 = time.perf_counter()
+        encrypt_parallel(io.BytesIO(pt), dst, key, ctx, chunk_size=chunk_size,
+                         workers=workers, nonce=nonce)
+        t1 = time.perf_counter()
+        blob = dst.getvalue()
+        out = io.BytesIO()
+        t2 = time.perf_counter()
+        decrypt_parallel(io.BytesIO(blob), out, key, workers=workers)
+        t3 = time.perf_counter()
+        assert out.getvalue() == pt
+        enc = min(enc, (t1 - t0) * 1000)
+        dec = min(dec, (t3 - t2) * 1000)
+    return enc, dec, blob
+
 def human_mib_per_s(size_bytes: int, ms: float) -> float:
     mib = size_bytes / (1024 * 1024)
     sec = ms / 1000.0
@@ -58,5 +81,23 @@ def main():
             f"dec {dec_ms:.2f} ms ({dec_spd:.1f} MiB/s)"
         )
 
+    # Chunk-parallel v3 engine: scaling by worker count (output must be identical)
+    psize = 64 * 1024 * 1024
+    cpus = os.cpu_count() or 1
+    workers_list = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1))) or [1]
+    print(f"Parallel v3 (64 MiB, 1 MiB chunks, cpus={cpus}, best of 3)")
+    ppt, pkey = secrets.token_bytes(psize), secrets.token_bytes(32)
+    ref = None
+    for w in workers_list:
+        enc_ms, dec_ms, blob = bench_parallel(ppt, pkey, w)
+        if ref is None:
+            ref = blob
+        assert blob == ref, "output differs across worker counts"
+        print(
+            f"- workers={w}: "
+            f"enc {enc_ms:.1f} ms ({human_mib_per_s(psize, enc_ms):.1f} MiB/s), "
+            f"dec {dec_ms:.1f} ms ({human_mib_per_s(psize, dec_ms):.1f} MiB/s)"
+        )
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,50 @@
+# bench/bench_aio.py
+
+import asyncio, time, secrets
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import bmsc_v6_encrypt
+import bmsc_v6_aio as aio
+
+async def ticker(stop: asyncio.Event, lags: list, period: float = 0.001):
+    """Record how late a 1 ms sleep wakes up (= how long the loop was blocked)."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(period)
+        lags.append(time.perf_counter() - t0 - period)
+
+async def run(mode: str, pt: bytes, key: bytes, count: int):
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    for _ in range(count):
+        if mode == "sync":
+            bmsc_v6_encrypt(pt, key, b"BMSCv6-IV00")
+            await asyncio.sleep(0)
+        else:
+            await aio.encrypt(pt, key, b"BMSCv6-IV00")
+    dt = time.perf_counter() - t0
+    stop.set(); await tick
+    lags.sort()
+    return dt, lags[len(lags) // 2], lags[-1]
+
+async def main():
+    key = secrets.token_bytes(32)
+    count = 50
+    print(f"Event-loop lag while encrypting (n={count}, 1 ms ticker)")
+    for size in (16 * 1024, 1 << 20, 8 << 20):
+        pt = secrets.token_bytes(size)
+        for mode in ("sync", "aio"):
+            dt, p50, worst = await run(mode, pt, key, count)
+            print(f"- {size // 1024} KiB {mode:>4}: {count * size / (1 << 20) / dt:7.1f} MiB/s, "
+                  f"loop lag p50 {p50 * 1000:.2f} ms, max {worst * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
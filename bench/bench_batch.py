@@ -0,0 +1,56 @@
+# bench/bench_batch.py
+
+import time, secrets
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, encrypt_many, decrypt_many
+
+def records_per_s(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float('inf')
+
+def bench_records(size_bytes: int, count: int):
+    """Return records/sec for (loop enc, batch enc, loop dec, batch dec)."""
+    key = secrets.token_bytes(32)
+    ctx = b"BMSCv6-IV00"
+    rows = [secrets.token_bytes(size_bytes) for _ in range(count)]
+    aads = [b"row:%d" % i for i in range(count)]
+
+    t0 = time.perf_counter()
+    triples = [bmsc_v6_encrypt(pt, key, ctx, aad=a) for pt, a in zip(rows, aads)]
+    t1 = time.perf_counter()
+    batch = encrypt_many(rows, key, ctx, aads)
+    t2 = time.perf_counter()
+    for (n, c, t), a in zip(triples, aads):
+        bmsc_v6_decrypt(n, c, t, key, ctx, aad=a)
+    t3 = time.perf_counter()
+    out = decrypt_many(batch, key, ctx, aads)
+    t4 = time.perf_counter()
+    assert not out.failed and out[count - 1] == rows[-1]
+
+    return (
+        records_per_s(count, t1 - t0),
+        records_per_s(count, t2 - t1),
+        records_per_s(count, t3 - t2),
+        records_per_s(count, t4 - t3),
+    )
+
+def main():
+    sizes = [32, 128, 512]
+    count = 100000
+    print(f"Batch benchmark: per-call loop vs encrypt_many/decrypt_many (records/s, n={count})")
+    for sz in sizes:
+        le, be, ld, bd = bench_records(sz, count)
+        print(
+            f"- {sz} B: "
+            f"enc {le:,.0f} -> {be:,.0f} rec/s ({be / le:.2f}x), "
+            f"dec {ld:,.0f} -> {bd:,.0f} rec/s ({bd / ld:.2f}x)"
+        )
+
+if __name__ == "__main__":
+    main()
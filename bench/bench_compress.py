@@ -0,0 +1,91 @@
+# bench/bench_compress.py
+
+import io, os, json, time, zlib, secrets, tempfile, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_container import seal_v2_into, open_v2, unpack_v2, map_file, encrypt_stream, decrypt_stream
+
+CTX = b"BMSCv6-IV00"
+
+def corpus_json(size: int) -> bytes:
+    """JSON Lines logs (compressible)."""
+    out = bytearray(); i = 0
+    while len(out) < size:
+        out += json.dumps({"ts": 1700000000 + i, "level": ("INFO", "WARN", "ERROR")[i % 3], "user": f"u{i % 977}",
+                           "path": f"/api/v1/items/{i % 5003}", "ms": (i * 37) % 1000}).encode() + b"\n"
+        i += 1
+    return bytes(out[:size])
+
+def corpus_csv(size: int) -> bytes:
+    """CSV export with numeric columns (compressible)."""
+    out = bytearray(b"id,date,amount,category,note\n"); i = 0
+    while len(out) < size:
+        out += f"{i},2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},{(i * 7919) % 100000 / 100:.2f},cat{i % 17},ok\n".encode()
+        i += 1
+    return bytes(out[:size])
+
+def corpus_random(size: int) -> bytes:
+    """Already-compressed / encrypted data (incompressible)."""
+    return secrets.token_bytes(size)
+
+def corpus_zlib(size: int) -> bytes:
+    """A zlib stream of compressible data (e.g. PDF content streams, zip members)."""
+    out = bytearray()
+    while len(out) < size:
+        out += zlib.compress(corpus_json(size) + secrets.token_bytes(1024), 9)
+    return bytes(out[:size])
+
+def v2_roundtrip(pt: bytes, key: bytes, path: Path, compress):
+    t0 = time.perf_counter()
+    buf = bytearray(pt)
+    header, nonce, tag, n = seal_v2_into(buf, buf, key, CTX, compress=compress)
+    with open(path, "wb") as f:
+        f.write(header); f.write(nonce); f.write(tag); f.write(memoryview(buf)[:n])
+    t1 = time.perf_counter()
+    blob = map_file(path)
+    ctx, aad, nonce, tag, ct, ext = unpack_v2(blob)
+    out = open_v2(key, bytes(ctx), bytes(aad), nonce, ct, tag, ext)
+    t2 = time.perf_counter()
+    assert out == pt
+    del ctx, aad, nonce, tag, ct, blob
+    return t1 - t0, t2 - t1, path.stat().st_size
+
+def v3_roundtrip(pt: bytes, key: bytes, path: Path, compress):
+    t0 = time.perf_counter()
+    with open(path, "wb") as f:
+        encrypt_stream(io.BytesIO(pt), f, key, CTX, compress=compress)
+    t1 = time.perf_counter()
+    out = io.BytesIO()
+    with open(path, "rb") as f:
+        decrypt_stream(f, out, key)
+    t2 = time.perf_counter()
+    assert out.getvalue() == pt
+    return t1 - t0, t2 - t1, path.stat().st_size
+
+def main():
+    ap = argparse.ArgumentParser(description="Compression before encryption: end-to-end time and bytes on disk")
+    ap.add_argument("--size-mib", type=int, default=32)
+    a = ap.parse_args()
+    size = a.size_mib << 20
+    key = secrets.token_bytes(32)
+    corpora = (("json-logs", corpus_json), ("csv", corpus_csv), ("random", corpus_random), ("zlib-stream", corpus_zlib))
+    print(f"Compression benchmark: {a.size_mib} MiB per corpus (encrypt = compress + AEAD + write, decrypt = read + AEAD + decompress)")
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "out.bmsc6"
+        for name, make in corpora:
+            pt = make(size)
+            for fmt, fn in (("v2", v2_roundtrip), ("v3", v3_roundtrip)):
+                for compress in (None, "auto", "zlib", "lzma"):
+                    enc, dec, disk = fn(pt, key, path, compress)
+                    print(f"- {name:>11} {fmt} {compress or 'none':>4}: enc {enc * 1000:7.1f} ms, dec {dec * 1000:6.1f} ms, "
+                          f"on disk {disk / (1 << 20):6.2f} MiB ({disk / len(pt) * 100:5.1f}%)")
+                    os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench/bench_daemon.py
+
+import os, time, secrets, subprocess, tempfile, threading
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_client import Bmsc6Client
+
+CLI = [sys.executable, "-m", "apps.cli.bmsc_prod"]
+
+def spawn_rate(args, count: int) -> float:
+    """ops/s when every operation starts a new CLI process."""
+    t0 = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(CLI + args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return count / (time.perf_counter() - t0)
+
+def client_rate(sock: str, size: int, threads: int, seconds: float = 1.0) -> float:
+    """ops/s of encrypt+decrypt round trips through persistent client connections."""
+    pt = secrets.token_bytes(size)
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+    def run(i):
+        with Bmsc6Client(sock) as c:
+            while time.perf_counter() < stop:
+                n, ct, t = c.encrypt(pt, b"BMSCv6-IV00")
+                c.decrypt(n, ct, t, b"BMSCv6-IV00")
+                counts[i] += 2
+    ts = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return sum(counts) / (time.perf_counter() - t0)
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        kf = Path(d) / "key.bin"; kf.write_bytes(secrets.token_bytes(32))
+        sock = str(Path(d) / "bmsc6.sock")
+        srv = subprocess.Popen(CLI + ["serve", "--socket", sock, "--key-file", str(kf)], cwd=ROOT,
+                               stdout=subprocess.PIPE, text=True)
+        try:
+            srv.stdout.readline()  # "Listening: ..."
+            print(f"Daemon vs. per-invocation CLI (cpus={os.cpu_count()})")
+            r = spawn_rate(["encrypt", "--key-file", str(kf), "--text", "hello"], 20)
+            print(f"- spawn CLI per op:               {r:8.1f} ops/s")
+            r = spawn_rate(["encrypt", "--via-daemon", sock, "--text", "hello"], 20)
+            print(f"- spawn CLI per op (--via-daemon): {r:8.1f} ops/s")
+            for size in (64, 64 * 1024):
+                for threads in (1, 4):
+                    r = client_rate(sock, size, threads)
+                    print(f"- client library, {size:>6} B, {threads} conn:  {r:8.0f} ops/s")
+        finally:
+            srv.terminate(); srv.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench/bench_demo.py
+
+import time, secrets, hmac, hashlib, os
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6 import _keystream, _xor  # demo HMAC-stream keystream / XOR (current engine)
+from bmsc_v6 import bmsc_v6_encrypt, bmsc_v6_decrypt
+
+def legacy_keystream(K_stream: bytes, IV: bytes, nonce: bytes, n: int) -> bytes:
+    """The original per-byte engine (one full hmac.new per byte), kept for comparison."""
+    ks = bytearray(n); cs = [(i+1)*(n-i) for i in range(n)]
+    for i, c in enumerate(cs):
+        data = IV + nonce + str(n).encode() + str(i).encode() + str(c).encode()
+        ks[i] = hmac.new(K_stream, data, hashlib.sha256).digest()[0]
+    return bytes(ks)
+
+def legacy_xor(data: bytes, ks: bytes) -> bytes:
+    return bytes(p ^ s for p, s in zip(data, ks))
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+def kib_per_s(size_bytes: int, sec: float) -> float:
+    return size_bytes / 1024 / sec if sec > 0 else float('inf')
+
+def main():
+    sizes = [4 * 1024, 64 * 1024, 256 * 1024]
+    key = secrets.token_bytes(32)
+    iv = b"20251029"
+    print("Demo keystream + XOR: legacy vs current (output must be identical)")
+    for sz in sizes:
+        nonce = secrets.token_bytes(16)
+        pt = secrets.token_bytes(sz)
+        ks_old, t_ks_old = timed(legacy_keystream, key, iv, nonce, sz)
+        ks_new, t_ks_new = timed(_keystream, key, iv, nonce, sz)
+        assert ks_old == ks_new, "keystream mismatch"
+        ct_old, t_x_old = timed(legacy_xor, pt, ks_old)
+        ct_new, t_x_new = timed(_xor, pt, ks_new)
+        assert ct_old == ct_new, "xor mismatch"
+        old, new = t_ks_old + t_x_old, t_ks_new + t_x_new
+        print(
+            f"- {sz // 1024} KiB: "
+            f"legacy {kib_per_s(sz, old):.0f} KiB/s, current {kib_per_s(sz, new):.0f} KiB/s "
+            f"({old / new:.2f}x; xor {t_x_old * 1000:.1f} -> {t_x_new * 1000:.2f} ms)"
+        )
+
+    # process-pool keystream: decrypt is deterministic, so every worker count must give pt back
+    sz = 1024 * 1024
+    pt = secrets.token_bytes(sz)
+    n, ct, tag = bmsc_v6_encrypt(pt, key, iv)
+    cpu = os.cpu_count() or 1
+    print(f"Demo decrypt, process-pool keystream ({sz // 1024} KiB, cpu={cpu})")
+    base = None
+    for w in sorted({1, 2, 4, cpu}):
+        out, sec = timed(lambda: bmsc_v6_decrypt(n, ct, tag, key, iv, workers=w))
+        assert out == pt, "parallel output mismatch"
+        base = base or sec
+        print(f"- workers={w}: {kib_per_s(sz, sec):.0f} KiB/s ({base / sec:.2f}x)")
+
+if __name__ == "__main__":
+    main()
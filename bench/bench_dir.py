@@ -0,0 +1,51 @@
+# bench/bench_dir.py
+
+import time, secrets, subprocess, tempfile, os
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_tree import encrypt_tree, decrypt_tree
+
+def make_tree(root: Path, count: int, size: int):
+    for i in range(count):
+        p = root / f"d{i % 16}" / f"f{i}.bin"
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(secrets.token_bytes(size))
+
+def per_process(root: Path, key_file: Path, limit: int) -> float:
+    """files/s of the old nightly pattern: one CLI process per file (first `limit` files)."""
+    files = sorted(root.rglob("*.bin"))[:limit]
+    t0 = time.perf_counter()
+    for f in files:
+        subprocess.run([sys.executable, "-m", "apps.cli.bmsc_prod", "encrypt", "--key-file", str(key_file),
+                        "--in-file", str(f)], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return len(files) / (time.perf_counter() - t0)
+
+def main():
+    count, size = 5000, 16 * 1024
+    workers = os.cpu_count() or 1
+    print(f"Directory benchmark: {count} files x {size // 1024} KiB, workers={workers}")
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        src, enc, dec = d / "src", d / "enc", d / "dec"
+        make_tree(src, count, size)
+        key = secrets.token_bytes(32)
+        kf = d / "key.bin"; kf.write_bytes(key)
+
+        fps = per_process(src, kf, 50)
+        print(f"- one CLI process per file: {fps:.1f} files/s ({fps * size / (1 << 20):.2f} MiB/s)")
+
+        for name, fn, a, b in (("encrypt-dir", encrypt_tree, src, enc), ("decrypt-dir", decrypt_tree, enc, dec)):
+            args = (a, b, key, b"BMSCv6-IV00") if fn is encrypt_tree else (a, b, key)
+            r = fn(*args, workers=workers)
+            assert r["files"] == count and not r["failed"]
+            print(f"- {name}: {r['files'] / r['seconds']:.0f} files/s ({r['bytes'] / (1 << 20) / r['seconds']:.1f} MiB/s)")
+        assert (dec / "d3" / "f3.bin").read_bytes() == (src / "d3" / "f3.bin").read_bytes()
+
+if __name__ == "__main__":
+    main()
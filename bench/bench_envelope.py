@@ -0,0 +1,42 @@
+# bench/bench_envelope.py
+
+import io, time, secrets, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_container import encrypt_stream, Bmsc6Reader
+from bmsc_v6_envelope import Recipients
+
+CTX = b"BMSCv6-IV00"
+
+def main():
+    ap = argparse.ArgumentParser(description="Sharing with N recipients: N full encryptions vs. one multi-recipient envelope (bmsc6 v3)")
+    ap.add_argument("--size-mib", type=int, default=32)
+    ap.add_argument("--recipients", default="1,4,16,64", help="comma-separated recipient counts")
+    a = ap.parse_args()
+    pt = secrets.token_bytes(a.size_mib << 20)
+    print(f"Envelope benchmark: {a.size_mib} MiB payload")
+    for n in map(int, a.recipients.split(",")):
+        keys = {f"team-{i:02d}": secrets.token_bytes(32) for i in range(n)}
+        t0 = time.perf_counter(); copies = 0
+        for K in keys.values():
+            out = io.BytesIO(); encrypt_stream(io.BytesIO(pt), out, K, CTX); copies += len(out.getvalue())
+        dt_copies = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        out = io.BytesIO(); encrypt_stream(io.BytesIO(pt), out, Recipients(keys), CTX)
+        dt_env = time.perf_counter() - t0
+        blob = out.getvalue()
+        last = list(keys.values())[-1]
+        t0 = time.perf_counter(); r = Bmsc6Reader(io.BytesIO(blob), last); dt_open = time.perf_counter() - t0
+        assert r.kid is None
+        print(f"- {n:>3} recipients: per-recipient copies {dt_copies:6.2f} s / {copies / (1 << 20):8.1f} MiB, "
+              f"envelope {dt_env:5.2f} s / {len(blob) / (1 << 20):7.2f} MiB (+{len(blob) - len(pt)} B), "
+              f"open with last key (entries tried in order) {dt_open * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
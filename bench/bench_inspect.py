@@ -0,0 +1,58 @@
+# bench/bench_inspect.py
+
+import os, time, hashlib, secrets, tempfile, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_tree import encrypt_tree
+from bmsc_v6_container import Bmsc6Header, unpack_blob
+from bmsc_v6_index import HeaderIndex
+from bmsc_v6_verify import iter_paths
+
+def main():
+    ap = argparse.ArgumentParser(description="Metadata listing: whole-file parse vs. header-only read vs. SQLite index lookup")
+    ap.add_argument("--count", type=int, default=2000)
+    ap.add_argument("--size-kib", type=int, default=256)
+    ap.add_argument("--lookups", type=int, default=1000)
+    a = ap.parse_args()
+    print(f"Inspect benchmark: {a.count} v2 files x {a.size_kib} KiB")
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d); src, enc = d / "src", d / "enc"
+        digests = []
+        for i in range(a.count):
+            p = src / f"d{i % 16}" / f"f{i}.bin"
+            p.parent.mkdir(parents=True, exist_ok=True)
+            data = secrets.token_bytes(a.size_kib * 1024); p.write_bytes(data)
+            digests.append(hashlib.sha256(data).hexdigest())
+        encrypt_tree(src, enc, secrets.token_bytes(32), b"BMSCv6-IV00")
+        files = list(iter_paths([enc]))
+
+        t0 = time.perf_counter()
+        for p in files:
+            _, _, _, ctx, aad, _, _ = unpack_blob(p.read_bytes())  # the old way: whole file in memory
+        dt_full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for p in files:
+            Bmsc6Header.read(p).meta
+        dt_head = time.perf_counter() - t0
+        print(f"- whole-file parse: {len(files) / dt_full:8.0f} files/s")
+        print(f"- header only:      {len(files) / dt_head:8.0f} files/s  -> {dt_full / dt_head:.1f}x")
+
+        with HeaderIndex(d / "index.sqlite") as idx:
+            t0 = time.perf_counter(); idx.update(files); dt_build = time.perf_counter() - t0
+            t0 = time.perf_counter(); idx.update(files); dt_again = time.perf_counter() - t0
+            queries = [digests[i % len(digests)] for i in range(a.lookups)]
+            t0 = time.perf_counter()
+            for q in queries:
+                assert len(idx.find(sha256=q)) == 1
+            dt_find = time.perf_counter() - t0
+        print(f"- index build: {len(files) / dt_build:8.0f} files/s, re-run (unchanged): {len(files) / dt_again:8.0f} files/s")
+        print(f"- index lookup by sha256: {a.lookups / dt_find:8.0f} lookups/s (no file access)")
+
+if __name__ == "__main__":
+    main()
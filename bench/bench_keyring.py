@@ -0,0 +1,75 @@
+# bench/bench_keyring.py
+
+import time, secrets, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import OUT_EXTRA
+from bmsc_v6_container import seal_v2_into, open_v2_into, unpack_v2
+from bmsc_v6_keyring import Keyring
+
+CTX = b"BMSCv6-IV00"
+
+def make_blobs(ring: Keyring, count: int, size: int, with_kid: bool):
+    """count containers spread evenly over all keys (same payload, different nonce/key)."""
+    kids = list(ring); out = []
+    pt = secrets.token_bytes(size)
+    for i in range(count):
+        kid = kids[i % len(kids)]
+        buf = bytearray(pt)
+        if with_kid:
+            header, nonce, tag, _ = seal_v2_into(buf, buf, ring, CTX, kid=kid)
+        else:
+            header, nonce, tag, _ = seal_v2_into(buf, buf, ring.key_for(kid), CTX)
+        out.append(bytes(header + nonce + tag + buf))
+    return out
+
+def trial(blobs, keys):
+    """The old tooling: no key identifier in the container, try every key until AEAD succeeds."""
+    tries = 0
+    for blob in blobs:
+        ctx, aad, nonce, tag, ct, ext = unpack_v2(blob)
+        out = bytearray(len(ct) + OUT_EXTRA)
+        for K in keys:
+            tries += 1
+            try:
+                open_v2_into(out, K, bytes(ctx), bytes(aad), nonce, ct, tag, ext)
+                break
+            except ValueError:
+                continue
+        else:
+            raise SystemExit("no key matched")
+    return tries
+
+def by_kid(blobs, ring):
+    for blob in blobs:
+        ctx, aad, nonce, tag, ct, ext = unpack_v2(blob)
+        open_v2_into(bytearray(len(ct) + OUT_EXTRA), ring, bytes(ctx), bytes(aad), nonce, ct, tag, ext)
+    return len(blobs)
+
+def main():
+    ap = argparse.ArgumentParser(description="Key selection: trial decryption over a keyring vs. header KID lookup (bmsc6 v2)")
+    ap.add_argument("--keys", type=int, default=12)
+    ap.add_argument("--count", type=int, default=1200)
+    ap.add_argument("--sizes", default="1024,65536,1048576", help="comma-separated payload sizes in bytes")
+    a = ap.parse_args()
+    ring = Keyring()
+    for i in range(a.keys):
+        ring.generate(f"k{i:02d}")
+    keys = [ring.key_for(k) for k in ring]
+    print(f"Key selection over {a.keys} keys (containers spread evenly over all keys)")
+    for size in map(int, a.sizes.split(",")):
+        count = max(1, a.count * 1024 // max(size, 1024) // a.keys) * a.keys  # every key equally often
+        plain, tagged = make_blobs(ring, count, size, False), make_blobs(ring, count, size, True)
+        t0 = time.perf_counter(); tries = trial(plain, keys); dt_trial = time.perf_counter() - t0
+        t0 = time.perf_counter(); by_kid(tagged, ring); dt_kid = time.perf_counter() - t0
+        print(f"- {size:>8} B x {count:>5}: trial {count / dt_trial:8.0f} files/s ({tries / count:.1f} tries/file), "
+              f"KID {count / dt_kid:8.0f} files/s  -> {dt_trial / dt_kid:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench/bench_pack.py
+
+import os, io, json, time, random, secrets, tempfile, argparse, base64
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import BmscCipher, OUT_EXTRA
+from bmsc_v6_container import seal_v2_into
+from bmsc_v6_pack import Bmsc6PackWriter, Bmsc6PackReader
+
+CTX = b"BMSCv6-IV00"
+
+def rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:10,.0f} rec/s" if seconds > 0 else "       inf rec/s"
+
+def main():
+    ap = argparse.ArgumentParser(description="Many small records: .bmsc6 v2 per record / Base64 JSON lines / bmsc6 pack")
+    ap.add_argument("--count", type=int, default=200000)
+    ap.add_argument("--files", type=int, default=5000, help="records for the one-file-per-record baseline")
+    ap.add_argument("--lookups", type=int, default=20000)
+    a = ap.parse_args()
+    K = secrets.token_bytes(32)
+    rnd = random.Random(25)
+    msgs = [rnd.randbytes(rnd.randint(32, 512)) for _ in range(a.count)]
+    aads = [b'{"from":"u%d"}' % (i % 97) for i in range(a.count)]
+    logical = sum(map(len, msgs))
+    picks = [rnd.randrange(a.count) for _ in range(a.lookups)]
+    print(f"Pack benchmark: {a.count} records of 32-512 B ({logical / (1 << 20):.1f} MiB), {a.lookups} random reads")
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        # one .bmsc6 v2 file per record
+        n = min(a.files, a.count); out = bytearray(512 + OUT_EXTRA)
+        t0 = time.perf_counter()
+        for i in range(n):
+            header, nonce, tag, m = seal_v2_into(out, msgs[i], K, CTX, aads[i])
+            (d / f"m{i}.bmsc6").write_bytes(header + nonce + tag + out[:m])
+        dt = time.perf_counter() - t0
+        per_file = sum(-(-(d / f"m{i}.bmsc6").stat().st_size // 4096) * 4096 for i in range(n)) / n
+        print(f"- one .bmsc6 per record: append {rate(n, dt)}, {per_file:6.0f} B/record on disk (4 KiB blocks)")
+
+        # Base64 JSON lines (the CLI's output format)
+        c = BmscCipher(K, CTX); jl = d / "msgs.jsonl"
+        t0 = time.perf_counter()
+        with open(jl, "w", encoding="utf-8") as f:
+            for m, aad in zip(msgs, aads):
+                nonce, ct, tag = c.encrypt(m, aad)
+                f.write(json.dumps({"NONCE": base64.b64encode(nonce).decode(), "CT": base64.b64encode(ct).decode(),
+                                    "TAG": base64.b64encode(tag).decode(), "AAD": aad.decode()}) + "\n")
+        dt = time.perf_counter() - t0
+        print(f"- Base64 JSON lines:     append {rate(a.count, dt)}, {jl.stat().st_size / a.count:6.0f} B/record")
+        t0 = time.perf_counter(); k = 0
+        for want in picks[:20]:
+            with open(jl, encoding="utf-8") as f:  # no index: scan to line k
+                for i, line in enumerate(f):
+                    if i == want:
+                        e = json.loads(line)
+                        c.decrypt(base64.b64decode(e["NONCE"]), base64.b64decode(e["CT"]), base64.b64decode(e["TAG"]),
+                                  e["AAD"].encode()); k += 1
+                        break
+        dt = time.perf_counter() - t0
+        print(f"                         random read {rate(k, dt)} (line scan)")
+
+        # pack
+        p = d / "msgs.bmsc6p"
+        t0 = time.perf_counter()
+        with Bmsc6PackWriter(p, K, CTX) as w:
+            for m, aad in zip(msgs[:a.count // 2], aads):
+                w.append(m, aad)
+        dt1 = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with Bmsc6PackWriter(p, K, CTX) as w:
+            w.append_many(msgs[a.count // 2:], aads[a.count // 2:])
+        dt2 = time.perf_counter() - t0
+        print(f"- pack:                  append {rate(a.count // 2, dt1)} (append), {rate(a.count - a.count // 2, dt2)} (append_many), "
+              f"{p.stat().st_size / a.count:6.0f} B/record")
+        t0 = time.perf_counter()
+        with Bmsc6PackReader(p, K) as r:
+            dt_open = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for k in picks:
+                assert r[k] == msgs[k]
+            dt = time.perf_counter() - t0
+            print(f"                         random read {rate(len(picks), dt)} (open {dt_open * 1000:.1f} ms)")
+            t0 = time.perf_counter(); n = sum(1 for _ in r); dt = time.perf_counter() - t0
+            t0 = time.perf_counter(); b = r.decrypt_range(); dt2 = time.perf_counter() - t0
+            assert n == len(b) == a.count and not b.failed
+            print(f"                         sequential {rate(n, dt)} (iterate), {rate(len(b), dt2)} (decrypt_range)")
+
+if __name__ == "__main__":
+    main()
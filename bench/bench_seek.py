@@ -0,0 +1,57 @@
+# bench/bench_seek.py
+
+import time, secrets, random, tempfile, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_container import Bmsc6Writer, open_bmsc6, decrypt_stream
+
+class _Null:
+    def write(self, b): return len(b)
+
+def make_file(path: Path, key: bytes, size: int):
+    block = secrets.token_bytes(1 << 20)
+    with open(path, "wb") as f, Bmsc6Writer(f, key, b"BMSCv6-IV00") as w:
+        for _ in range(size >> 20):
+            w.write(block)
+
+def p50(xs):
+    xs = sorted(xs); return xs[len(xs) // 2]
+
+def main():
+    ap = argparse.ArgumentParser(description="Random-access (range) decryption latency vs. file size (bmsc6 v3)")
+    ap.add_argument("--sizes-mib", default="64,512,2048", help="comma-separated file sizes in MiB")
+    ap.add_argument("--reads", type=int, default=50)
+    a = ap.parse_args()
+    key = secrets.token_bytes(32)
+    rnd = random.Random(1)
+    print(f"Range reads on bmsc6 v3 (chunk 1 MiB, {a.reads} random offsets per size, p50)")
+    with tempfile.TemporaryDirectory() as d:
+        for mib in (int(x) for x in a.sizes_mib.split(",")):
+            path = Path(d) / f"{mib}.bmsc6"
+            make_file(path, key, mib << 20)
+            t0 = time.perf_counter()
+            f = open_bmsc6(path, key)
+            t_open = time.perf_counter() - t0
+            row = []
+            for length in (4096, 1 << 20, 10 << 20):
+                ts = []
+                for _ in range(a.reads):
+                    off = rnd.randrange(0, f.size - length)
+                    t0 = time.perf_counter(); f.pread(off, length); ts.append(time.perf_counter() - t0)
+                    f._cached = (-1, b"")  # cold chunk every time
+                row.append(f"{length >> 10} KiB {p50(ts) * 1000:.2f} ms")
+            f.close()
+            t0 = time.perf_counter()
+            with open(path, "rb") as src: decrypt_stream(src, _Null(), key)
+            t_full = time.perf_counter() - t0
+            print(f"- {mib:>5} MiB: open {t_open * 1000:.2f} ms | " + " | ".join(row) + f" | full decrypt {t_full * 1000:.0f} ms")
+            path.unlink()
+
+if __name__ == "__main__":
+    main()
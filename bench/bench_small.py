@@ -0,0 +1,52 @@
+# bench/bench_small.py
+
+import time, secrets
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, BmscCipher
+
+def ops_per_s(fn, count: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(count):
+        fn()
+    dt = time.perf_counter() - t0
+    return count / dt if dt > 0 else float('inf')
+
+def bench_size(size_bytes: int, count: int):
+    """Return ops/sec for (func enc, ctx enc, func dec, ctx dec) at size_bytes."""
+    key = secrets.token_bytes(32)
+    ctx = b"BMSCv6-IV00"
+    aad = b'{"room":"general"}'
+    pt = secrets.token_bytes(size_bytes)
+    cipher = BmscCipher(key, ctx)
+
+    n, c, t = bmsc_v6_encrypt(pt, key, ctx, aad=aad)
+    assert cipher.decrypt(n, c, t, aad) == pt  # bit-compatible
+
+    return (
+        ops_per_s(lambda: bmsc_v6_encrypt(pt, key, ctx, aad=aad), count),
+        ops_per_s(lambda: cipher.encrypt(pt, aad), count),
+        ops_per_s(lambda: bmsc_v6_decrypt(n, c, t, key, ctx, aad=aad), count),
+        ops_per_s(lambda: cipher.decrypt(n, c, t, aad), count),
+    )
+
+def main():
+    sizes = [64, 256, 1024, 4096]
+    count = 20000
+    print(f"Small-message benchmark: bmsc_v6_encrypt/decrypt vs BmscCipher (ops/s, n={count})")
+    for sz in sizes:
+        fe, ce, fd, cd = bench_size(sz, count)
+        print(
+            f"- {sz} B: "
+            f"enc {fe:,.0f} -> {ce:,.0f} ops/s ({ce / fe:.2f}x), "
+            f"dec {fd:,.0f} -> {cd:,.0f} ops/s ({cd / fd:.2f}x)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# bench/bench_suite.py
+"""
+Benchmark suite with JSON results and baseline regression gates.
+
+    python bench/bench_suite.py                          # quick profile (16 B .. 16 MiB)
+    python bench/bench_suite.py --profile full           # 16 B .. 1 GiB
+    python bench/bench_suite.py --json out.json          # machine-readable results
+    python bench/bench_suite.py --baseline base.json     # exit 1 if a metric regressed
+
+Each case is timed sample by sample (perf_counter_ns). Very fast operations are looped
+`inner` times per sample and the sample is the per-call mean. Peak memory comes from two
+extra calls: VmHWM above the starting RSS (reset via /proc/self/clear_refs on Linux; skipped
+elsewhere) and the tracemalloc peak. The larger one is reported as peak_bytes and gated.
+CLI cases run `bmsc_prod decrypt-file` in a child interpreter and report that child's VmHWM.
+"""
+
+import argparse, io, json, os, platform, secrets, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, hkdf_sha256, _aad_pack, _derive_key
+from bmsc_v6_container import VER_V2, pack_header, pack_v3_header, read_header, encrypt_stream, decrypt_stream
+import bmsc_v6 as demo
+
+KiB, MiB, GiB = 1 << 10, 1 << 20, 1 << 30
+PROFILES = {
+    "quick": [16, 256, 4 * KiB, 64 * KiB, 1 * MiB, 16 * MiB],
+    "full":  [16, 256, 4 * KiB, 64 * KiB, 1 * MiB, 16 * MiB, 256 * MiB, 1 * GiB],
+}
+DEMO_MAX = 256 * KiB     # demo cipher runs at a few hundred KiB/s; larger sizes only waste time
+CLI_MIN = 64 * KiB       # below this the CLI case is pure interpreter start-up
+SAMPLE_NS = 200_000      # calls faster than this are looped so one sample takes ~0.2 ms
+MEM_SLACK = 1 * MiB      # ignore memory growth smaller than this when comparing
+
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"bench.bin"}'
+
+def fmt_size(n: int) -> str:
+    for unit, div in (("GiB", GiB), ("MiB", MiB), ("KiB", KiB)):
+        if n >= div and n % div == 0:
+            return f"{n // div} {unit}"
+    return f"{n} B"
+
+def random_bytes(n: int) -> bytes:
+    # content does not affect speed; tile one random MiB for large inputs so setup stays fast
+    if n <= 64 * MiB:
+        return secrets.token_bytes(n)
+    block = secrets.token_bytes(MiB)
+    return (block * (n // MiB + 1))[:n]
+
+# ---- memory -------------------------------------------------------------
+
+def _proc_status(field: str) -> int|None:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak RSS counter (Linux >= 4.0)
+        return True
+    except OSError:
+        return False
+
+def peak_memory(fn) -> dict:
+    """
+    Run fn twice: once for the RSS high-water mark above the starting RSS (sees native buffers,
+    but under-reports when freed pages are reused), once under tracemalloc (Python heap only).
+    peak_bytes is the larger of the two.
+    """
+    import tracemalloc
+    rss = None
+    if _reset_hwm():
+        base = _proc_status("VmRSS")
+        fn()
+        hwm = _proc_status("VmHWM")
+        if base is not None and hwm is not None:
+            rss = max(0, hwm - base)
+    tracemalloc.start()
+    try:
+        fn()
+        heap = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"peak_rss_bytes": rss, "heap_peak_bytes": heap, "peak_bytes": max(rss or 0, heap)}
+
+# ---- timing -------------------------------------------------------------
+
+def measure(fn, min_time: float, min_samples: int, max_samples: int) -> dict:
+    t0 = time.perf_counter_ns(); fn(); first = time.perf_counter_ns() - t0  # warmup
+    inner = max(1, SAMPLE_NS // max(first, 1)) if first < SAMPLE_NS else 1
+    samples = []
+    deadline = time.perf_counter_ns() + int(min_time * 1e9)
+    while len(samples) < max_samples and (len(samples) < min_samples or time.perf_counter_ns() < deadline):
+        t0 = time.perf_counter_ns()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter_ns() - t0) / inner)
+    return summarize(samples, inner)
+
+def percentile(sorted_ns: list, q: float) -> float:
+    # linear interpolation between closest ranks
+    if len(sorted_ns) == 1:
+        return sorted_ns[0]
+    pos = (len(sorted_ns) - 1) * q
+    lo = int(pos); hi = min(lo + 1, len(sorted_ns) - 1)
+    return sorted_ns[lo] + (sorted_ns[hi] - sorted_ns[lo]) * (pos - lo)
+
+def summarize(samples_ns: list, inner: int) -> dict:
+    s = sorted(samples_ns)
+    us = lambda ns: round(ns / 1000, 3)
+    return {
+        "samples": len(s), "inner": inner,
+        "min_us": us(s[0]), "mean_us": us(statistics.fmean(s)),
+        "p50_us": us(percentile(s, 0.50)), "p90_us": us(percentile(s, 0.90)),
+        "p99_us": us(percentile(s, 0.99)), "max_us": us(s[-1]),
+    }
+
+# ---- cases --------------------------------------------------------------
+# Each generator yields (name, size, fn). Large buffers are dropped right after the
+# yield so only one case's data is alive at a time.
+
+def cases_prod(sizes, tmp):
+    key = secrets.token_bytes(32)
+    for sz in sizes:
+        pt = random_bytes(sz)
+        yield "prod.encrypt", sz, lambda: bmsc_v6_encrypt(pt, key, CTX, aad=AAD)
+        n, c, t = bmsc_v6_encrypt(pt, key, CTX, aad=AAD)
+        del pt
+        yield "prod.decrypt", sz, lambda: bmsc_v6_decrypt(n, c, t, key, CTX, aad=AAD)
+        del n, c, t
+
+def cases_demo(sizes, tmp):
+    key = secrets.token_bytes(32)
+    for sz in (s for s in sizes if s <= DEMO_MAX):
+        pt = random_bytes(sz)
+        yield "demo.encrypt", sz, lambda: demo.bmsc_v6_encrypt(pt, key, CTX, aad=AAD)
+        n, c, t = demo.bmsc_v6_encrypt(pt, key, CTX, aad=AAD)
+        yield "demo.decrypt", sz, lambda: demo.bmsc_v6_decrypt(n, c, t, key, CTX, aad=AAD)
+
+def cases_kdf(sizes, tmp):
+    key, nonce = secrets.token_bytes(32), secrets.token_bytes(24)
+    yield "kdf.hkdf_sha256", 32, lambda: hkdf_sha256(key, nonce, b"BMSCv6-prod:" + CTX, 32)
+    yield "kdf.derive_key", 32, lambda: _derive_key(key, nonce, CTX)
+    yield "aad.pack", len(CTX) + len(AAD), lambda: _aad_pack(CTX, AAD)
+
+def cases_container(sizes, tmp):
+    key = secrets.token_bytes(32)
+    hdr = pack_v3_header(CTX, AAD, secrets.token_bytes(24), MiB)
+    yield "container.header-write", len(hdr), lambda: pack_v3_header(CTX, AAD, hdr[-28:-4], MiB)
+    yield "container.header-parse", len(hdr), lambda: read_header(io.BytesIO(hdr))
+    src, enc, out = tmp / "c.pt", tmp / "c.bmsc6", tmp / "c.out"
+    for sz in sizes:
+        src.write_bytes(random_bytes(sz))
+        def write():
+            with open(src, "rb") as fi, open(enc, "wb") as fo:
+                encrypt_stream(fi, fo, key, CTX, AAD)
+        def read():
+            with open(enc, "rb") as fi, open(out, "wb") as fo:
+                decrypt_stream(fi, fo, key)
+        yield "container.v3-write", sz, write
+        yield "container.v3-read", sz, read
+    for p in (src, enc, out):
+        p.unlink(missing_ok=True)
+
+def cases_cli(sizes, tmp):
+    K = secrets.token_bytes(32)
+    kf, out = tmp / "key.bin", tmp / "cli.out"
+    kf.write_bytes(K)
+    for sz in (s for s in sizes if s >= CLI_MIN):
+        pt = random_bytes(sz)
+        v2 = tmp / "cli.v2.bmsc6"
+        n, c, t = bmsc_v6_encrypt(pt, K, CTX, aad=AAD)
+        with open(v2, "wb") as f:
+            f.write(pack_header(VER_V2, 0, CTX, AAD) + n + t); f.write(c)
+        del n, c, t
+        v3 = tmp / "cli.v3.bmsc6"
+        with open(v3, "wb") as f:
+            encrypt_stream(io.BytesIO(pt), f, K, CTX, AAD)
+        del pt
+        for name, enc in (("cli.decrypt-file.v2", v2), ("cli.decrypt-file.v3", v3)):
+            yield name, sz, _cli_runner(enc, kf, out)
+        for p in (v2, v3, out):
+            p.unlink(missing_ok=True)
+
+def _cli_runner(enc: Path, kf: Path, out: Path):
+    def run():
+        r = subprocess.run([sys.executable, __file__, "--cli-child", str(enc), str(kf), str(out)],
+                           capture_output=True, text=True, cwd=ROOT)
+        if r.returncode != 0:
+            raise RuntimeError(f"decrypt-file failed: {r.stderr.strip()}")
+        run.hwm = int(r.stdout.split("HWM ")[-1])
+    run.hwm = 0
+    return run
+
+def cli_child(enc: str, key: str, out: str):
+    from apps.cli import bmsc_prod
+    bmsc_prod.main(["decrypt-file", "--key-file", key, "--in-enc-file", enc, "--out", out])
+    print(f"HWM {_proc_status('VmHWM') or 0}")
+
+GROUPS = {"prod": cases_prod, "demo": cases_demo, "kdf": cases_kdf,
+          "container": cases_container, "cli": cases_cli}
+
+# ---- run / report / compare ---------------------------------------------
+
+def run_suite(args) -> dict:
+    sizes = args.sizes or PROFILES[args.profile]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bmsc-bench-") as d:
+        for group in args.groups:
+            for name, size, fn in GROUPS[group](sizes, Path(d)):
+                case_id = f"{name}/{fmt_size(size)}"
+                if args.filter and args.filter not in case_id:
+                    continue
+                # memory first, while the allocator has not yet been warmed up by the timing loop
+                mem = None if hasattr(fn, "hwm") else peak_memory(fn)
+                # one call already takes seconds at 256 MiB+; keep the sample count bounded there
+                big = size >= 256 * MiB
+                r = measure(fn, 0 if big else args.min_time, 3 if big else args.min_samples, args.max_samples)
+                if mem is None:  # CLI: absolute VmHWM of the child interpreter
+                    mem = {"peak_rss_bytes": fn.hwm, "heap_peak_bytes": None, "peak_bytes": fn.hwm}
+                r.update(id=case_id, name=name, size=size, **mem)
+                p50 = r["p50_us"] / 1e6
+                r["mib_per_s"] = round(size / MiB / p50, 2) if p50 > 0 else None
+                r["ops_per_s"] = round(1 / p50, 1) if p50 > 0 else None
+                results.append(r)
+                print(fmt_row(r), flush=True)
+                del fn
+    return {"meta": meta(args, sizes), "results": results}
+
+def meta(args, sizes) -> dict:
+    import nacl
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(), "implementation": platform.python_implementation(),
+        "platform": platform.platform(), "machine": platform.machine(),
+        "cpu_count": os.cpu_count(), "pynacl": getattr(nacl, "__version__", "?"),
+        "profile": args.profile, "sizes": sizes, "groups": args.groups,
+    }
+
+def fmt_row(r: dict) -> str:
+    tput = f"{r['mib_per_s']:>10.1f} MiB/s" if r["size"] >= KiB else f"{r['ops_per_s']:>10,.0f} op/s "
+    return (f"{r['id']:<34} p50 {r['p50_us']:>12.2f} us  p90 {r['p90_us']:>12.2f}  p99 {r['p99_us']:>12.2f}"
+            f"  {tput}  peak {r['peak_bytes'] / MiB:8.1f} MiB")
+
+def compare(current: dict, baseline: dict, threshold: float, mem_threshold: float) -> list:
+    """Return a list of regression messages (empty = pass)."""
+    base = {r["id"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        b = base.get(r["id"])
+        if b is None:
+            print(f"  (new) {r['id']}")
+            continue
+        ratio = r["p50_us"] / b["p50_us"] if b["p50_us"] > 0 else 1.0
+        mark = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"  {r['id']:<34} p50 {b['p50_us']:>12.2f} -> {r['p50_us']:>12.2f} us ({ratio:5.2f}x) {mark}")
+        if mark != "ok":
+            regressions.append(f"{r['id']}: p50 {ratio:.2f}x of baseline (limit {1 + threshold:.2f}x)")
+        grow = r["peak_bytes"] - b.get("peak_bytes", 0)
+        if grow > MEM_SLACK and r["peak_bytes"] > b["peak_bytes"] * (1 + mem_threshold):
+            regressions.append(f"{r['id']}: peak memory {b['peak_bytes'] / MiB:.1f} -> {r['peak_bytes'] / MiB:.1f} MiB")
+    skipped = base.keys() - {r["id"] for r in current["results"]}
+    if skipped:
+        print(f"  ({len(skipped)} baseline case(s) not run)")
+    return regressions
+
+def to_markdown(data: dict) -> str:
+    m = data["meta"]
+    lines = [
+        "# Benchmark results", "",
+        f"`python bench/bench_suite.py --profile {m['profile']}` — {m['timestamp']}, "
+        f"Python {m['python']}, {m['platform']}, cpus={m['cpu_count']}, PyNaCl {m['pynacl']}", "",
+        "| case | p50 (us) | p90 (us) | p99 (us) | throughput | peak mem |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for r in data["results"]:
+        tput = f"{r['mib_per_s']:.1f} MiB/s" if r["size"] >= KiB else f"{r['ops_per_s']:,.0f} op/s"
+        lines.append(f"| {r['id']} | {r['p50_us']:.2f} | {r['p90_us']:.2f} | {r['p99_us']:.2f} | {tput} "
+                     f"| {r['peak_bytes'] / MiB:.1f} MiB |")
+    return "\n".join(lines) + "\n"
+
+def parse_size(s: str) -> int:
+    s = s.strip().upper().removesuffix("B")
+    for suffix, mult in (("KI", KiB), ("MI", MiB), ("GI", GiB), ("K", KiB), ("M", MiB), ("G", GiB)):
+        if s.endswith(suffix):
+            return int(s[:-len(suffix)]) * mult
+    return int(s)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="BMSC v6 benchmark suite")
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    ap.add_argument("--sizes", type=lambda v: [parse_size(x) for x in v.split(",")],
+                    help="comma-separated sizes, e.g. 16,4KiB,1MiB (overrides --profile)")
+    ap.add_argument("--groups", type=lambda v: v.split(","), default=list(GROUPS),
+                    help=f"comma-separated subset of {','.join(GROUPS)}")
+    ap.add_argument("--filter", help="only run cases whose id contains this string")
+    ap.add_argument("--min-time", type=float, default=0.5, help="seconds per case (default 0.5)")
+    ap.add_argument("--min-samples", type=int, default=5)
+    ap.add_argument("--max-samples", type=int, default=10000)
+    ap.add_argument("--json", help="write results to this JSON file")
+    ap.add_argument("--markdown", help="write a results table (UTF-8) to this file")
+    ap.add_argument("--baseline", help="compare against a previous --json output")
+    ap.add_argument("--threshold", type=float, default=0.20, help="allowed p50 slowdown (default 0.20 = +20%%)")
+    ap.add_argument("--mem-threshold", type=float, default=0.20, help="allowed peak memory growth (default 0.20)")
+    ap.add_argument("--cli-child", nargs=3, metavar=("ENC", "KEY", "OUT"), help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.cli_child:
+        return cli_child(*args.cli_child)
+    unknown = set(args.groups) - set(GROUPS)
+    if unknown:
+        ap.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+
+    data = run_suite(args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    if args.markdown:
+        Path(args.markdown).write_text(to_markdown(data), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        bm = baseline.get("meta", {})
+        if (bm.get("python"), bm.get("machine"), bm.get("cpu_count")) != (data["meta"]["python"], data["meta"]["machine"], data["meta"]["cpu_count"]):
+            print("note: baseline was recorded on a different interpreter/machine")
+        print(f"Compare with {args.baseline} (p50 threshold +{args.threshold:.0%}, memory +{args.mem_threshold:.0%}):")
+        regressions = compare(data, baseline, args.threshold, args.mem_threshold)
+        if regressions:
+            print("❌ regressions:")
+            for msg in regressions:
+                print("  -", msg)
+            sys.exit(1)
+        print("✅ no regressions")
+
+if __name__ == "__main__":
+    main()
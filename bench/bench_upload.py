@@ -0,0 +1,76 @@
+# bench/bench_upload.py
+
+import os, time, secrets, tempfile, hashlib, json, struct, base64, tracemalloc
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_prod import bmsc_v6_encrypt
+from bmsc_v6_upload import encrypt_upload, encrypt_uploads
+
+CTX = b"BMSCv6-IV00"
+
+def legacy(src: Path, out_dir: Path, key: bytes):
+    """What demos/google/drive_encrypt.py used to do: read, hash, encrypt, concatenate, write twice (+ sidecar)."""
+    data = src.read_bytes()
+    sha = hashlib.sha256(data).hexdigest()
+    aad = json.dumps({"name": src.name, "size": len(data), "sha256": sha},
+                     ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    nonce, ct, tag = bmsc_v6_encrypt(data, key, CTX, aad=aad)
+    (out_dir / (src.name + ".bin")).write_bytes(nonce + tag + ct)
+    header = b"BMSC6\x00" + bytes([2, 0]) + struct.pack(">HI", len(CTX), len(aad))
+    (out_dir / (src.name + ".bmsc6")).write_bytes(header + CTX + aad + nonce + tag + ct)
+    (out_dir / (src.name + ".aad.json")).write_bytes(aad)
+    meta = {"ver": "bmsc6", "kid": "local:drive", "ctx": CTX.decode(), "nonce_b64": base64.b64encode(nonce).decode(),
+            "tag_b64": base64.b64encode(tag).decode(), "created_at": int(time.time()), "bmsc6_version": 2}
+    (out_dir / (src.name + ".meta.json")).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+def timed(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dt, peak
+
+def main():
+    key = secrets.token_bytes(32)
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d); out = d / "out"; out.mkdir()
+        size = 64 << 20
+        src = d / "doc.pdf"; src.write_bytes(secrets.token_bytes(size))
+        print(f"Single file ({size >> 20} MiB): time, peak Python heap (tracemalloc)")
+        cases = (
+            ("legacy drive_encrypt (raw+v2+sidecars)", lambda: legacy(src, out, key)),
+            ("encrypt_upload, raw+sidecars", lambda: encrypt_upload(src, out / "a.bmsc6", key, CTX, raw_out=out / "a.bin",
+                                                                    aad_out=out / "a.aad.json", meta_out=out / "a.meta.json")),
+            ("encrypt_upload, v2 only", lambda: encrypt_upload(src, out / "b.bmsc6", key, CTX)),
+        )
+        for name, fn in cases:
+            fn()  # warm page cache / first-call costs
+            dt, peak = timed(fn)
+            print(f"- {name:<48} {dt * 1000:7.1f} ms  {size / (1 << 20) / dt:6.1f} MiB/s  peak {peak / size:.2f}x size")
+
+        count, small = 2000, 64 * 1024
+        srcs = d / "many"; srcs.mkdir()
+        paths = []
+        for i in range(count):
+            p = srcs / f"doc{i}.pdf"; p.write_bytes(secrets.token_bytes(small)); paths.append(p)
+        print(f"Batch ({count} files x {small >> 10} KiB)")
+        legacy_out = d / "legacy"; legacy_out.mkdir()
+        t0 = time.perf_counter()
+        for p in paths: legacy(p, legacy_out, key)
+        dt = time.perf_counter() - t0
+        print(f"- legacy loop (raw+v2+sidecars):     {count / dt:7.0f} files/s")
+        for label, kw in (("raw+v2+sidecars", dict(raw=True, sidecars=True)), ("v2 only", {})):
+            r = encrypt_uploads(paths, d / label, key, CTX, **kw)
+            assert r["files"] == count and not r["failed"]
+            print(f"- encrypt_uploads ({label}): {count / r['seconds']:7.0f} files/s (workers={os.cpu_count()})")
+
+if __name__ == "__main__":
+    main()
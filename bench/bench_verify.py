@@ -0,0 +1,70 @@
+# bench/bench_verify.py
+
+import io, os, time, secrets, subprocess, tempfile, argparse
+from pathlib import Path
+import sys
+
+# Import path setup (project root = one level up from this file)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bmsc_v6_tree import encrypt_tree, decrypt_tree
+from bmsc_v6_container import encrypt_stream
+from bmsc_v6_verify import verify_paths, iter_paths
+
+CTX = b"BMSCv6-IV00"
+
+def make_tree(root: Path, count: int, size: int):
+    for i in range(count):
+        p = root / f"d{i % 16}" / f"f{i}.bin"
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(secrets.token_bytes(size))
+
+def per_process(enc: Path, key_file: Path, out: Path, limit: int) -> float:
+    """files/s of the old audit pattern: one decrypt-file process per file into a scratch file (first `limit` files)."""
+    files = sorted(enc.rglob("*.bmsc6"))[:limit]
+    t0 = time.perf_counter()
+    for f in files:
+        subprocess.run([sys.executable, "-m", "apps.cli.bmsc_prod", "decrypt-file", "--key-file", str(key_file),
+                        "--in", str(f), "--out", str(out)], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return len(files) / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk verification: per-file decrypt processes vs. decrypt-dir vs. verify")
+    ap.add_argument("--count", type=int, default=5000)
+    ap.add_argument("--size-kib", type=int, default=16)
+    ap.add_argument("--large-mib", type=int, default=64, help="size of each of the 4 large v3 files")
+    a = ap.parse_args()
+    size = a.size_kib * 1024
+    workers = os.cpu_count() or 1
+    print(f"Verify benchmark: {a.count} x {a.size_kib} KiB v2 + 4 x {a.large_mib} MiB v3, workers={workers}")
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        src, enc, dec = d / "src", d / "enc", d / "dec"
+        make_tree(src, a.count, size)
+        key = secrets.token_bytes(32)
+        kf = d / "key.bin"; kf.write_bytes(key)
+        encrypt_tree(src, enc, key, CTX, workers=workers)
+
+        fps = per_process(enc, kf, d / "scratch.bin", 50)
+        print(f"- small, one decrypt-file process per file: {fps:.1f} files/s")
+        r = decrypt_tree(enc, dec, key, workers=workers)
+        print(f"- small, decrypt-dir (writes plaintext): {r['files'] / r['seconds']:.0f} files/s "
+              f"({r['bytes'] / (1 << 20) / r['seconds']:.1f} MiB/s)")
+        for w in sorted({1, workers}):
+            r = verify_paths(iter_paths([enc]), key, workers=w)
+            assert r["files"] == a.count and not r["failed"]
+            print(f"- small, verify workers={w}: {r['files_per_s']:.0f} files/s ({r['mib_per_s']:.1f} MiB/s)")
+
+        big = d / "big"; big.mkdir()
+        for i in range(4):
+            with open(big / f"b{i}.bmsc6", "wb") as f:
+                encrypt_stream(io.BytesIO(secrets.token_bytes(a.large_mib << 20)), f, key, CTX)
+        for w in sorted({1, workers}):
+            r = verify_paths(iter_paths([big]), key, workers=w)
+            assert r["files"] == 4 and not r["failed"]
+            print(f"- large v3, verify workers={w}: {r['mib_per_s']:.0f} MiB/s")
+
+if __name__ == "__main__":
+    main()
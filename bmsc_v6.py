@@ -8,17 +8,69 @@ def hkdf_sha256(ikm: bytes, salt: bytes, info: bytes, length: int) -> bytes:
         okm += t; c += 1
     return okm[:length]
 
-def _coeffs(n: int):
-    return [(i+1)*(n-i) for i in range(n)]
+_IPAD = bytes(x ^ 0x36 for x in range(256))  # HMAC 用 translate テーブル
+_OPAD = bytes(x ^ 0x5C for x in range(256))
+
+def _keystream_range(K_stream: bytes, IV: bytes, nonce: bytes, n: int, start: int, stop: int) -> bytes:
+    # ks[i] = HMAC(K_stream, IV||nonce||str(n)||str(i)||str(c_i))[0],  c_i = (i+1)*(n-i)
+    # 共通接頭辞まで吸収した SHA-256 状態を .copy() で使い回し、係数はその場で計算する（出力は従来と同一）
+    key = bytes(K_stream)
+    if len(key) > 64: key = hashlib.sha256(key).digest()
+    key = key.ljust(64, b"\0")
+    icopy = hashlib.sha256(key.translate(_IPAD) + IV + nonce + str(n).encode()).copy
+    ocopy = hashlib.sha256(key.translate(_OPAD)).copy
+    def ks_byte(i):
+        h = icopy(); h.update(b"%d%d" % (i, (i+1)*(n-i)))
+        o = ocopy(); o.update(h.digest())
+        return o.digest()[0]
+    return bytes(map(ks_byte, range(start, stop)))
 
 def _keystream(K_stream: bytes, IV: bytes, nonce: bytes, n: int) -> bytes:
-    ks = bytearray(n); cs = _coeffs(n)
-    for i, c in enumerate(cs):
-        data = IV + nonce + str(n).encode() + str(i).encode() + str(c).encode()
-        ks[i] = hmac.new(K_stream, data, hashlib.sha256).digest()[0]
-    return bytes(ks)
+    return _keystream_range(K_stream, IV, nonce, n, 0, n)
+
+# 並列化の下限（これより短い入力はプロセス起動/転送の方が高くつくので直列）
+PARALLEL_MIN_BYTES = 64 * 1024
+
+def _keystream_to_shm(shm_name: str, K_stream: bytes, IV: bytes, nonce: bytes, n: int, start: int, stop: int):
+    # ワーカー側: 担当範囲を共有メモリに直接書く（結果を pickle で返さない）
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shm.buf[start:stop] = _keystream_range(K_stream, IV, nonce, n, start, stop)
+    finally:
+        shm.close()
+
+def _with_keystream(K_stream: bytes, IV: bytes, nonce: bytes, n: int, fn, workers: int|None, executor):
+    """
+    キーストリームを fn(ks) に渡して結果を返す。workers/executor 指定かつ十分長い入力なら
+    インデックス範囲をプロセスに分配し、共有メモリ上に生成する（出力は直列と同一）。
+    """
+    if (workers in (None, 1) and executor is None) or n < PARALLEL_MIN_BYTES:
+        return fn(_keystream(K_stream, IV, nonce, n))
+    from multiprocessing import shared_memory
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    shm = shared_memory.SharedMemory(create=True, size=n)
+    try:
+        ex = executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            step = -(-n // (workers * 4))  # 負荷の偏りを均すため workers の 4 倍に分割
+            futs = [ex.submit(_keystream_to_shm, shm.name, bytes(K_stream), bytes(IV), bytes(nonce), n, a, min(a + step, n))
+                    for a in range(0, n, step)]
+            for f in futs: f.result()
+        finally:
+            if executor is None: ex.shutdown()
+        return fn(shm.buf[:n])
+    finally:
+        shm.close(); shm.unlink()
+
+def _xor(data: bytes, ks: bytes) -> bytes:
+    # 1 バイトずつの generator ではなく整数演算でまとめて XOR
+    n = len(data)
+    return (int.from_bytes(data, "little") ^ int.from_bytes(ks, "little")).to_bytes(n, "little")
 
-def bmsc_v6_encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b""):
+def bmsc_v6_encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b"", *, workers: int|None=None, executor=None):
+    """workers/executor を指定すると大きな入力のキーストリームをプロセス並列で生成する（出力は同一）"""
     if not isinstance(plaintext, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
     if not isinstance(K_master, (bytes, bytearray)) or len(K_master) != 32: raise ValueError("K_master must be 32 bytes")
     if not isinstance(IV, (bytes, bytearray)): raise TypeError("IV must be bytes")
@@ -26,13 +78,12 @@ def bmsc_v6_encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b""
     nonce = os.urandom(16)
     K_stream = hkdf_sha256(K_master, nonce, b"stream", 32)
     K_mac    = hkdf_sha256(K_master, nonce, b"mac", 32)
-    ks = _keystream(K_stream, IV, nonce, n)
-    ciphertext = bytes(p ^ s for p, s in zip(plaintext, ks))
+    ciphertext = _with_keystream(K_stream, IV, nonce, n, lambda ks: _xor(plaintext, ks), workers, executor)
     header = IV + nonce + n.to_bytes(4, "big") + aad
     tag = hmac.new(K_mac, header + ciphertext, hashlib.sha256).digest()[:16]
     return (nonce, ciphertext, tag)
 
-def bmsc_v6_decrypt(nonce: bytes, ciphertext: bytes, tag: bytes, K_master: bytes, IV: bytes, aad: bytes=b"") -> bytes:
+def bmsc_v6_decrypt(nonce: bytes, ciphertext: bytes, tag: bytes, K_master: bytes, IV: bytes, aad: bytes=b"", *, workers: int|None=None, executor=None) -> bytes:
     if not isinstance(nonce, (bytes, bytearray)) or len(nonce) != 16: raise ValueError("nonce must be 16 bytes")
     if not isinstance(K_master, (bytes, bytearray)) or len(K_master) != 32: raise ValueError("K_master must be 32 bytes")
     if not isinstance(IV, (bytes, bytearray)): raise TypeError("IV must be bytes")
@@ -43,5 +94,4 @@ def bmsc_v6_decrypt(nonce: bytes, ciphertext: bytes, tag: bytes, K_master: bytes
     expect = hmac.new(K_mac, header + ciphertext, hashlib.sha256).digest()[:16]
     if not hmac.compare_digest(expect, tag):
         raise ValueError("auth failed")
-    ks = _keystream(K_stream, IV, nonce, n)
-    return bytes(c ^ s for c, s in zip(ciphertext, ks))
+    return _with_keystream(K_stream, IV, nonce, n, lambda ks: _xor(ciphertext, ks), workers, executor)
@@ -0,0 +1,251 @@
+# bmsc_v6_aio.py
+"""
+asyncio 向け API（イベントループを止めない暗号化/復号）
+
+- encrypt / decrypt: inline_max 以下はその場で、超えるものは有界のスレッドプールで処理する
+  （libsodium 呼び出し中は GIL が解放されるので、ループは他のタスクを進められる）
+- AsyncBmsc6Writer / AsyncBmsc6Reader: asyncio.StreamWriter / StreamReader 上の bmsc6 v3。
+  書き込みは 1 チャンクごとに drain()、読み込みは消費した分だけ readexactly() するので背圧がかかる。
+  キャンセル・例外時は最終チャンクを書かない（読み手側で切り詰めとして検出される）。
+出力は同期版（bmsc_v6_encrypt / Bmsc6Writer）とバイト互換。
+"""
+import os, struct, asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, NPUBBYTES
+from bmsc_v6_container import (
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, HEAD_LEN, TAG_LEN, pack_v3_header, seal_key, resolve_key, stream_keys, ext_kid,
+    comp_info, _check_master, _comp_algo, _stream_comp, _head_len, _parse_head, _parse_rest, _seal_record, _open_record,
+)
+
+# これ以下の入力はループ上でそのまま処理する（executor への受け渡しの方が高くつく）
+INLINE_MAX = 64 * 1024
+
+_executor = None
+
+def _default_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="bmsc6-aio")
+    return _executor
+
+def set_executor(executor):
+    """既定の executor を差し替え、以前のものを返す（None で次回使用時に既定を生成）"""
+    global _executor
+    old, _executor = _executor, executor
+    return old
+
+async def _call(nbytes: int, executor, inline_max: int, fn, *args):
+    if nbytes <= inline_max:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    # キャンセル時は待機だけを打ち切る（実行中のジョブは完了し、結果は捨てられる）
+    return await loop.run_in_executor(executor or _default_executor(), fn, *args)
+
+async def encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b"",
+                  *, executor=None, inline_max: int=INLINE_MAX):
+    """bmsc_v6_encrypt の async 版。返り値: (nonce, ciphertext, tag)"""
+    return await _call(len(plaintext), executor, inline_max, bmsc_v6_encrypt, plaintext, K_master, IV, aad)
+
+async def decrypt(nonce: bytes, ciphertext: bytes, tag: bytes, K_master: bytes, IV: bytes, aad: bytes=b"",
+                  *, executor=None, inline_max: int=INLINE_MAX) -> bytes:
+    """bmsc_v6_decrypt の async 版（認証失敗は ValueError）"""
+    return await _call(len(ciphertext), executor, inline_max, bmsc_v6_decrypt, nonce, ciphertext, tag, K_master, IV, aad)
+
+# ---- bmsc6 v3 ストリーム ---------------------------------------------------
+
+async def _read_upto(reader: asyncio.StreamReader, n: int) -> bytes:
+    """n バイト読む。EOF の場合のみ短く返す"""
+    try:
+        return await reader.readexactly(n)
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+
+async def _read_record(reader: asyncio.StreamReader, chunk_size: int):
+    """圧縮付き v3 のレコード（長さ前置を除いた ct||tag）。EOF なら None（bmsc_v6_container._read_record の async 版）"""
+    head = await _read_upto(reader, 4)
+    if not head:
+        return None
+    if len(head) < 4:
+        raise ValueError("bmsc6 v3 truncated")
+    n = struct.unpack(">I", head)[0]
+    if n > chunk_size + 1:
+        raise ValueError("bmsc6 v3 malformed chunk")
+    rec = await _read_upto(reader, n + TAG_LEN)
+    if len(rec) < n + TAG_LEN:
+        raise ValueError("bmsc6 v3 truncated")
+    return rec
+
+class AsyncBmsc6Writer:
+    """
+    asyncio.StreamWriter に bmsc6 v3 を書く。
+        async with AsyncBmsc6Writer(writer, K, ctx) as w:
+            await w.write(data)
+    close() で最終チャンクを書く（writer 自体は閉じない）。
+    compress は Bmsc6Writer と同じ（"auto" はヘッダを最初のチャンクと一緒に書く）。
+    """
+    def __init__(self, writer: asyncio.StreamWriter, K_master: bytes, ctx: bytes, aad: bytes=b"",
+                 chunk_size: int=DEFAULT_CHUNK_SIZE, *, nonce: bytes|None=None, kid: str|None=None,
+                 compress: str|None=None, executor=None, inline_max: int=INLINE_MAX):
+        K_master, ext = seal_key(K_master, kid)
+        _comp_algo(compress)  # 名前の検査
+        if not isinstance(ctx, (bytes, bytearray)): raise TypeError("ctx must be bytes")
+        if not isinstance(aad, (bytes, bytearray)): raise TypeError("aad must be bytes")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE: raise ValueError("invalid chunk_size")
+        if nonce is None:
+            nonce = os.urandom(NPUBBYTES)
+        elif len(nonce) != NPUBBYTES:
+            raise ValueError("nonce must be 24 bytes")
+        ctx = bytes(ctx); aad = bytes(aad); nonce = bytes(nonce)
+        self._w = writer
+        self._nonce = nonce
+        self._chunk = chunk_size
+        self._executor = executor; self._inline_max = inline_max
+        self._buf = bytearray()
+        self._index = 0
+        self._state = "new"  # new → open → closed / broken
+        self.bytes_in = 0
+        self._pending = (K_master, ext, ctx, aad, compress)
+        if compress != "auto":
+            self._setup(None)
+
+    def _setup(self, first):
+        K_master, ext, ctx, aad, compress = self._pending
+        ext, self._algo = _stream_comp(ext, compress, first)
+        self._key, self._ad = stream_keys(K_master, self._nonce, ctx, aad, ext)
+        self._header = pack_v3_header(ctx, aad, self._nonce, self._chunk, ext)
+        self._pending = None
+
+    async def _start(self):
+        if self._state == "new":
+            if self._pending is None:
+                self._w.write(self._header)
+            self._state = "open"
+        elif self._state != "open":
+            raise ValueError(f"write to {self._state} AsyncBmsc6Writer")
+
+    async def _emit(self, pt: bytes, final: bool):
+        try:
+            if self._pending is not None:
+                # compress="auto": 最初のチャンクを見てからヘッダを書く
+                self._setup(pt)
+                self._w.write(self._header)
+            rec = await _call(len(pt), self._executor, self._inline_max,
+                              _seal_record, self._key, self._nonce, self._ad, self._index, final, pt, self._algo)
+            self._index += 1
+            self._w.write(rec)
+            await self._w.drain()  # 背圧: 相手が読むまでここで待つ
+        except BaseException:
+            # 途中で止まった writer は以後使えない（最終チャンクも書かない）
+            self._state = "broken"
+            raise
+
+    async def write(self, data) -> int:
+        await self._start()
+        mv = memoryview(data).cast("B")
+        cs = self._chunk
+        # Bmsc6Writer と同じく chunk_size を「超えた」時点で 1 チャンク出力する
+        for pos in range(0, len(mv), cs):
+            self._buf += mv[pos:pos+cs]
+            if len(self._buf) > cs:
+                pt = bytes(self._buf[:cs]); del self._buf[:cs]
+                await self._emit(pt, False)
+        self.bytes_in += len(mv)
+        return len(mv)
+
+    async def close(self):
+        if self._state == "closed": return
+        await self._start()
+        pt = bytes(self._buf); self._buf = bytearray()
+        await self._emit(pt, True)
+        self._state = "closed"
+
+    async def __aenter__(self):
+        await self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 例外・キャンセル時は最終チャンクを書かない → 読み手側で切り詰めとして検出される
+        if exc_type is None:
+            await self.close()
+        else:
+            self._state = "broken"
+        return False
+
+class AsyncBmsc6Reader:
+    """
+    asyncio.StreamReader から bmsc6 v3 を読む。
+        r = await AsyncBmsc6Reader.open(reader, K)
+        async for pt in r: ...
+    aad を指定すると内包 AAD の代わりに使う（未指定なら内包を使用）。鍵束を渡すとヘッダの KID で鍵を選ぶ。
+    """
+    def __init__(self, reader: asyncio.StreamReader, K_master: bytes, aad: bytes|None=None,
+                 *, executor=None, inline_max: int=INLINE_MAX):
+        self._r = reader
+        self._K = _check_master(K_master)
+        self._aad_arg = aad
+        self._executor = executor; self._inline_max = inline_max
+        self.ctx = None
+
+    @classmethod
+    async def open(cls, reader: asyncio.StreamReader, K_master: bytes, aad: bytes|None=None, **kw) -> "AsyncBmsc6Reader":
+        self = cls(reader, K_master, aad, **kw)
+        await self.read_header()
+        return self
+
+    async def read_header(self):
+        head = await _read_upto(self._r, HEAD_LEN)
+        if _head_len(head) > HEAD_LEN:
+            head += await _read_upto(self._r, 2)
+        _, self.flags, rest_len, lens = _parse_head(head)
+        self.ctx, self.embedded_aad, self.nonce, self.chunk_size, self.ext = \
+            _parse_rest(await _read_upto(self._r, rest_len), self.flags, lens)
+        self.kid = ext_kid(self.ext)
+        self.compression = comp_info(self.ext)[0]
+        self.aad = self.embedded_aad if self._aad_arg is None else bytes(self._aad_arg)
+        self._key, self._ad = stream_keys(resolve_key(self._K, self.ext), self.nonce, self.ctx, self.aad, self.ext)
+
+    async def __aiter__(self):
+        if self.ctx is None:
+            await self.read_header()
+        algo, cs = self.compression, self.chunk_size
+        rec_len = cs + TAG_LEN
+        if algo:
+            cur = await _read_record(self._r, cs)
+            if cur is None: raise ValueError("bmsc6 v3 truncated")
+        else:
+            cur = await _read_upto(self._r, rec_len)
+        index = 0
+        while True:
+            if algo:
+                nxt = await _read_record(self._r, cs)
+                final = nxt is None
+            elif len(cur) < rec_len:
+                nxt, final = b"", True
+            else:
+                nxt = await _read_upto(self._r, rec_len)
+                final = not nxt
+            yield await _call(len(cur), self._executor, self._inline_max,
+                              _open_record, self._key, self.nonce, self._ad, index, final, cur, algo, cs)
+            if final:
+                return
+            cur = nxt; index += 1
+
+async def encrypt_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, K_master: bytes,
+                         ctx: bytes, aad: bytes=b"", chunk_size: int=DEFAULT_CHUNK_SIZE, **kw) -> int:
+    """reader の平文を EOF まで v3 として writer に書く。返り値: 平文バイト数"""
+    async with AsyncBmsc6Writer(writer, K_master, ctx, aad, chunk_size, **kw) as w:
+        while True:
+            b = await reader.read(chunk_size)
+            if not b: break
+            await w.write(b)
+    return w.bytes_in
+
+async def decrypt_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, K_master: bytes,
+                         aad: bytes|None=None, **kw) -> int:
+    """reader の v3 を復号して writer に書く（チャンクごとに drain）。返り値: 平文バイト数"""
+    total = 0
+    async for pt in await AsyncBmsc6Reader.open(reader, K_master, aad, **kw):
+        writer.write(pt); total += len(pt)
+        await writer.drain()
+    return total
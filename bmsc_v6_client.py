@@ -0,0 +1,159 @@
+# bmsc_v6_client.py
+"""
+bmsc6 ローカルデーモン（`bmsc_prod serve`）のプロトコルとクライアント
+
+標準ライブラリのみで実装している（PyNaCl の読み込み・鍵ファイルの読み込みはデーモン側で 1 回だけ）。
+
+フレーム（整数はすべて BE）:
+    len(4) + code(1) + { field_len(4) + field }*      len は code 以降のバイト数
+    要求の code は OP_*、応答の code は ST_*。
+    要求 field:
+        OP_ENCRYPT      key_id, ctx, aad, plaintext          → nonce, ct, tag
+        OP_DECRYPT      key_id, ctx, aad, nonce, ct, tag     → plaintext
+        OP_DECRYPT_FILE key_id, path, out, ctx, aad          → ctx, aad, plaintext（out 指定時は空）, size(8)
+        OP_PING         （なし）                              → （なし）
+    key_id が空ならデーモンの既定鍵。ST_AUTH は認証失敗、ST_ERROR は fields[0] にメッセージ（UTF-8）。
+1 接続で要求を続けて送ってよい（応答は要求順）。
+"""
+import socket, struct, threading
+
+OP_PING         = 0
+OP_ENCRYPT      = 1
+OP_DECRYPT      = 2
+OP_DECRYPT_FILE = 3
+
+ST_OK    = 0
+ST_AUTH  = 1
+ST_ERROR = 2
+
+MAX_FRAME = 256 << 20  # 1 フレームの上限（これを超える平文は decrypt_file の out を使う）
+
+_LEN = struct.Struct(">I")
+
+def pack_frame(code: int, fields) -> list:
+    """フレームを writev/sendmsg 用の断片リストにする（フィールド本体はコピーしない）。フィールドは bytes 系のみ"""
+    parts = [b""]
+    total = 1
+    for i, f in enumerate(fields):
+        try:
+            f = memoryview(f).cast("B")  # 長さはバイト数で数える（array などの要素数ではなく）
+        except TypeError:
+            raise TypeError(f"field {i} must be bytes-like, not {type(f).__name__}") from None
+        parts.append(_LEN.pack(len(f))); parts.append(f)
+        total += 4 + len(f)
+    if total > MAX_FRAME:
+        raise ValueError("frame too large")
+    parts[0] = _LEN.pack(total) + bytes([code])
+    return parts
+
+def unpack_fields(body) -> list:
+    """code 以降（フィールド列）を分解する。body に memoryview を渡すと各要素も view"""
+    out = []; off = 0; n = len(body)
+    while off < n:
+        if off + 4 > n:
+            raise ValueError("malformed frame")
+        m = _LEN.unpack_from(body, off)[0]; off += 4
+        if off + m > n:
+            raise ValueError("malformed frame")
+        out.append(body[off:off+m]); off += m
+    return out
+
+def send_parts(sock, parts):
+    """断片リストを連結せずに送る（sendmsg が途中までしか送らなかった分は続きから送り直す）"""
+    views = [memoryview(p).cast("B") for p in parts if len(p)]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0]); views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
+class DaemonError(ValueError):
+    """デーモンが要求を拒否した（不正な要求・未知の key_id・入出力エラーなど）"""
+
+class Bmsc6Client:
+    """
+    デーモンへの同期クライアント（接続は使い回す。スレッド間で共有可）。
+        with Bmsc6Client("/run/user/1000/bmsc6.sock") as c:
+            nonce, ct, tag = c.encrypt(b"hello", b"BMSCv6-IV00")
+    認証失敗は ValueError("auth failed")、それ以外の拒否は DaemonError（ValueError の派生）。
+    """
+    def __init__(self, path: str, *, timeout: float|None=None):
+        self.path = str(path)
+        self._timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self._timeout)
+        try:
+            s.connect(self.path)
+        except BaseException:
+            s.close(); raise
+        self._sock = s
+
+    def _recv_exact(self, n: int) -> bytearray:
+        buf = bytearray(n); mv = memoryview(buf); got = 0
+        while got < n:
+            k = self._sock.recv_into(mv[got:])
+            if not k:
+                raise ConnectionError("bmsc6 daemon closed the connection")
+            got += k
+        return buf
+
+    def call(self, op: int, *fields) -> list:
+        """要求を 1 つ送り、応答フィールドを返す"""
+        parts = pack_frame(op, fields)
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                send_parts(self._sock, parts)
+                n = _LEN.unpack(self._recv_exact(4))[0]
+                body = self._recv_exact(n)
+            except BaseException:
+                # 途中で失敗した接続は応答の境界が分からないので捨てる
+                self.close()
+                raise
+        st = body[0]
+        fields = unpack_fields(memoryview(body)[1:])
+        if st == ST_OK:
+            return fields
+        if st == ST_AUTH:
+            raise ValueError("auth failed")
+        raise DaemonError(bytes(fields[0]).decode("utf-8", errors="replace") if fields else "daemon error")
+
+    def ping(self):
+        self.call(OP_PING)
+
+    def encrypt(self, plaintext: bytes, ctx: bytes, aad: bytes=b"", *, key_id: str=""):
+        """返り値: (nonce, ciphertext, tag)"""
+        n, c, t = self.call(OP_ENCRYPT, key_id.encode("utf-8"), ctx, aad, plaintext)
+        return bytes(n), bytes(c), bytes(t)
+
+    def decrypt(self, nonce: bytes, ciphertext: bytes, tag: bytes, ctx: bytes, aad: bytes=b"",
+                *, key_id: str="") -> bytes:
+        (pt,) = self.call(OP_DECRYPT, key_id.encode("utf-8"), ctx, aad, nonce, ciphertext, tag)
+        return bytes(pt)
+
+    def decrypt_file(self, path, out=None, ctx: bytes=b"", aad: bytes=b"", *, key_id: str="") -> dict:
+        """
+        デーモン側でファイルを復号する（パスはデーモンから見たもの）。ctx/aad は v2/v3 では内包が優先（aad は指定時のみ上書き）。
+        out を指定するとデーモンがそこへ書き、plaintext は None。返り値: {"ctx", "aad", "plaintext", "size"}
+        """
+        ctx_b, aad_b, pt, size = self.call(OP_DECRYPT_FILE, key_id.encode("utf-8"), str(path).encode("utf-8"),
+                                           str(out or "").encode("utf-8"), ctx, aad)
+        return {"ctx": bytes(ctx_b), "aad": bytes(aad_b), "plaintext": None if out else bytes(pt),
+                "size": struct.unpack(">Q", size)[0]}
+
+    def close(self):
+        if self._sock is not None:
+            try: self._sock.close()
+            finally: self._sock = None
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
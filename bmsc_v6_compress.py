@@ -0,0 +1,74 @@
+# bmsc_v6_compress.py
+"""
+暗号化前の圧縮（標準ライブラリの zlib / lzma）
+
+- looks_compressible: 入力から最大 8 か所 × 4 KiB を抜き出し、バイト分布のエントロピー（bit/byte）で圧縮する価値を推定する。
+  圧縮済み（PDF のストリーム・画像・zip・暗号文）はほぼ 8 bit/byte なので圧縮を試さずに飛ばす
+- compress / decompress: アルゴリズム ID（コンテナのヘッダ拡張に入る値）で切り替える。
+  decompress は展開後の長さの上限を取り、それを超える入力（展開爆弾）は展開途中で止める
+コンテナ上の表現は bmsc_v6_container（FLAG_COMP、SPEC.md §3.4）を参照。
+"""
+import zlib, lzma, math
+from collections import Counter
+
+ALG_ZLIB = 1
+ALG_LZMA = 2
+ALGORITHMS = {"zlib": ALG_ZLIB, "lzma": ALG_LZMA}
+
+ZLIB_LEVEL = 6
+LZMA_PRESET = 1  # 6（xz の既定）はここでは 10 倍以上遅い
+SAMPLE_BLOCK = 4096
+SAMPLE_COUNT = 8
+MAX_ENTROPY = 7.5  # これを超える（bit/byte）入力は圧縮しない
+
+def algorithm(name: str) -> int:
+    """"zlib" / "lzma" → アルゴリズム ID"""
+    try:
+        return ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"unknown compression: {name}") from None
+
+def entropy(data) -> float:
+    """バイト分布のシャノンエントロピー（bit/byte）"""
+    n = len(data)
+    if not n:
+        return 0.0
+    return -sum(c / n * math.log2(c / n) for c in Counter(bytes(data)).values())
+
+def _sample(data) -> bytes:
+    mv = memoryview(data).cast("B")
+    n = len(mv)
+    if n <= SAMPLE_BLOCK * SAMPLE_COUNT:
+        return bytes(mv)
+    step = (n - SAMPLE_BLOCK) // (SAMPLE_COUNT - 1)
+    return b"".join(mv[i * step:i * step + SAMPLE_BLOCK] for i in range(SAMPLE_COUNT))
+
+def looks_compressible(data) -> bool:
+    """標本のエントロピーが MAX_ENTROPY 以下なら True（空・極小の入力は False）"""
+    if len(data) < 64:
+        return False
+    return entropy(_sample(data)) <= MAX_ENTROPY
+
+def compress(algo: int, data) -> bytes:
+    if algo == ALG_ZLIB:
+        return zlib.compress(data, ZLIB_LEVEL)
+    if algo == ALG_LZMA:
+        # 完全性は AEAD が保証するので xz のチェックサムは付けない
+        return lzma.compress(data, format=lzma.FORMAT_XZ, check=lzma.CHECK_NONE, preset=LZMA_PRESET)
+    raise ValueError(f"unknown compression: {algo}")
+
+def decompress(algo: int, data, max_len: int) -> bytes:
+    """展開する。max_len を超える・途中で終わる・後ろに余りがある入力は ValueError"""
+    if algo == ALG_ZLIB:
+        d = zlib.decompressobj()
+    elif algo == ALG_LZMA:
+        d = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    else:
+        raise ValueError(f"unknown compression: {algo}")
+    try:
+        out = d.decompress(data, max_len + 1)
+    except (zlib.error, lzma.LZMAError):
+        raise ValueError("bmsc6 compressed data corrupt") from None
+    if len(out) > max_len or not d.eof or d.unused_data:
+        raise ValueError("bmsc6 compressed data corrupt")
+    return out
@@ -0,0 +1,865 @@
+# bmsc_v6_container.py
+"""
+BMSC6 コンテナ（SPEC.md 参照）
+
+- v1/v2: 1 つの AEAD タグで ct 全体を保護（メモリ上で一括処理）
+- v3   : 固定長チャンクごとに AEAD（ストリーミング・定常メモリ・ランダムアクセス）
+"""
+import os, mmap, json, struct
+
+import bmsc_v6_compress as comp
+import bmsc_v6_envelope as env
+
+from bmsc_v6_prod import (
+    aead_encrypt, aead_decrypt, bmsc_v6_encrypt_into, bmsc_v6_decrypt_into, NPUBBYTES, ABYTES, OUT_EXTRA,
+    _aad_pack, _derive_key, _seal_into, _open_into, _check_key_iv, phase, AuthFailed,
+)
+
+MAGIC = b"BMSC6\x00"  # 6 bytes
+NONCE_LEN = 24
+TAG_LEN   = 16
+
+VER_V1 = 1
+VER_V2 = 2
+VER_V3 = 3
+
+# v3: MAGIC(6) + ver(1)=3 + flags(1)
+#     + ctx_len(2 BE) + aad_len(4 BE) + ctx + aad + nonce(24) + chunk_size(4 BE)
+#     + { ct_i(chunk_size, 最終チャンクのみ 0..chunk_size) + tag_i(16) } ...
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB
+MAX_CHUNK_SIZE     = 1 << 30
+STREAM_LABEL = b"BMSCv6-stream:"
+
+# ---- ヘッダ拡張（flags != 0。SPEC.md §3.4）----------------------------------
+# 固定部 14B の直後に ext_len(2 BE) + ext を置く。ext は TLV（type(1) + len(2 BE) + value）を type 昇順に並べたもの。
+# type はそれを示す flags のビットそのもの。未知のビットを含むコンテナは読まない。
+# 拡張付きは鍵導出ラベルを変え、flags と ext も AD に含める（拡張を外して flags=0 に見せかけても認証に通らない）。
+HEAD_LEN = 14
+FLAG_KID  = 0x01  # 鍵 ID（UTF-8, 1..255B）
+FLAG_COMP = 0x02  # 暗号化前に圧縮（v2: algo(1) + 平文長(8 BE)、v3: algo(1)。レコードは長さ前置）
+FLAG_RCPT = 0x04  # 複数受信者の封筒（受信者表。bmsc_v6_envelope）。表の中身は AD に含めない
+KNOWN_FLAGS = FLAG_KID | FLAG_COMP | FLAG_RCPT
+MAX_KID_LEN = 255
+EXT_LABEL        = b"BMSCv6-ext:"
+STREAM_EXT_LABEL = b"BMSCv6-stream-ext:"
+
+def pack_ext(ext: dict) -> tuple:
+    """{type: value} → (flags, ext バイト列)"""
+    flags = 0; out = []
+    for t in sorted(ext):
+        if t & ~KNOWN_FLAGS or t & (t - 1):
+            raise ValueError(f"unknown bmsc6 header extension: {t:#04x}")
+        v = bytes(ext[t])
+        if len(v) > 0xFFFF: raise ValueError("bmsc6 header extension too long")
+        flags |= t
+        out.append(bytes([t]) + struct.pack(">H", len(v)) + v)
+    return flags, b"".join(out)
+
+def parse_ext(flags: int, buf) -> dict:
+    """ext バイト列 → {type: value}。flags と一致しない・未知・重複・順序違いは ValueError"""
+    if flags & ~KNOWN_FLAGS:
+        raise ValueError(f"unsupported bmsc6 flags: {flags:#04x}")
+    ext = {}; off = 0; n = len(buf); seen = 0
+    while off < n:
+        if off + 3 > n:
+            raise ValueError("malformed bmsc6 header extension")
+        t = buf[off]; m = struct.unpack(">H", buf[off+1:off+3])[0]; off += 3
+        if not t & flags or t & (t - 1) or t <= max(ext, default=0) or off + m > n:
+            raise ValueError("malformed bmsc6 header extension")
+        ext[t] = bytes(buf[off:off+m]); off += m; seen |= t
+    if seen != flags:
+        raise ValueError("malformed bmsc6 header extension")
+    return ext
+
+def ext_ad(ctx: bytes, aad: bytes, ext: dict) -> bytes:
+    """
+    拡張付きの AD: flags(1) + ext_len(2 BE) + ext + len(ctx)(2 BE) + ctx + aad。
+    受信者表（FLAG_RCPT）は flags のビットだけを含め、ext からは除く（項目はそれぞれ AEAD で守られ、rewrap で書き換わる）
+    """
+    flags, _ = pack_ext(ext)
+    _, e = pack_ext({t: v for t, v in ext.items() if t != FLAG_RCPT})
+    return bytes([flags]) + struct.pack(">H", len(e)) + e + _aad_pack(ctx, aad)
+
+def kid_ext(kid: str|None) -> dict:
+    if kid is None:
+        return {}
+    b = kid.encode("utf-8")
+    if not 0 < len(b) <= MAX_KID_LEN: raise ValueError("kid must be 1..255 bytes (UTF-8)")
+    return {FLAG_KID: b}
+
+def ext_kid(ext: dict) -> str|None:
+    """ヘッダ拡張の KID（無ければ None）"""
+    b = ext.get(FLAG_KID)
+    return None if b is None else b.decode("utf-8", errors="replace")
+
+def comp_info(ext: dict) -> tuple:
+    """FLAG_COMP の (algo, v2 の平文長|None)。圧縮なしは (0, None)"""
+    v = ext.get(FLAG_COMP)
+    if v is None:
+        return 0, None
+    if len(v) not in (1, 9) or v[0] not in comp.ALGORITHMS.values():
+        raise ValueError("malformed bmsc6 compression extension")
+    return v[0], (struct.unpack(">Q", v[1:])[0] if len(v) == 9 else None)
+
+def _comp_algo(compress: str|None) -> int:
+    """compress 引数（None / "auto" / "zlib" / "lzma"）→ 試すアルゴリズム（auto は zlib）"""
+    if compress is None:
+        return 0
+    return comp.ALG_ZLIB if compress == "auto" else comp.algorithm(compress)
+
+def v2_plain_len(ct_len: int, ext: dict) -> int:
+    """
+    v2 の平文長（圧縮付きはヘッダの値、それ以外は ct と同じ）。open_v2_into の out はこれ + OUT_EXTRA 以上。
+    圧縮付きの値は認証前には信用できないので、検証前のバッファ確保には使わず open_v2 を使う
+    """
+    algo, n = comp_info(ext)
+    return ct_len if not algo else n
+
+def _check_master(K_master):
+    """
+    32B 鍵か、key_for(kid) を持つ鍵束（bmsc_v6_keyring.Keyring）、
+    data_key() を持つ宛先（bmsc_v6_envelope.Recipients。暗号化のみ）を受け付ける
+    """
+    if hasattr(K_master, "key_for") or hasattr(K_master, "data_key"):
+        return K_master
+    if not isinstance(K_master, (bytes, bytearray)) or len(K_master) != 32: raise ValueError("K_master must be 32 bytes")
+    return bytes(K_master)
+
+def seal_key(K_master, kid: str|None=None) -> tuple:
+    """
+    暗号化に使う (鍵, ext)。鍵束なら kid（省略時は既定の KID）の鍵を使い、KID を埋め込む。
+    宛先（Recipients）ならファイルごとの DEK を作り、受信者表を埋め込む
+    """
+    K_master = _check_master(K_master)
+    if hasattr(K_master, "data_key"):
+        if kid is not None: raise ValueError("kid cannot be combined with recipients")
+        dek, table = K_master.data_key()
+        return dek, {FLAG_RCPT: table}
+    if hasattr(K_master, "key_for"):
+        kid = K_master.default_kid if kid is None else kid
+        return K_master.key_for(kid), kid_ext(kid)
+    return K_master, kid_ext(kid)
+
+def resolve_key(K_master, ext: dict) -> bytes:
+    """
+    復号に使う鍵。鍵束ならヘッダの KID で直接引く（KID が無ければ既定の鍵）。32B 鍵はそのまま使う。
+    封筒（FLAG_RCPT）は受信者表から DEK を取り出す（ct は読まない）
+    """
+    K_master = _check_master(K_master)
+    if hasattr(K_master, "data_key"): raise TypeError("recipients can only be used for encryption")
+    if FLAG_RCPT in ext:
+        return env.unwrap(ext[FLAG_RCPT], K_master)
+    if hasattr(K_master, "key_for"):
+        return K_master.key_for(ext_kid(ext))
+    return K_master
+
+def pack_header(ver: int, flags: int, ctx: bytes, aad: bytes, ext: bytes=b"") -> bytes:
+    """MAGIC + ver + flags + ctx_len + aad_len (+ ext_len + ext) + ctx + aad（v2/v3 共通部）"""
+    head = MAGIC + bytes([ver, flags]) + struct.pack(">HI", len(ctx), len(aad))
+    if flags:
+        head += struct.pack(">H", len(ext)) + ext
+    elif ext:
+        raise ValueError("header extension requires flags")
+    return head + ctx + aad
+
+def pack_v3_header(ctx: bytes, aad: bytes, nonce: bytes, chunk_size: int, ext: dict|None=None) -> bytes:
+    """v3 ヘッダ（レコード列の直前まで）"""
+    flags, e = pack_ext(ext or {})
+    return pack_header(VER_V3, flags, ctx, aad, e) + nonce + struct.pack(">I", chunk_size)
+
+def seal_v2_into(out, plaintext, K_master, ctx: bytes, aad: bytes=b"", *,
+                 kid: str|None=None, compress: str|None=None) -> tuple:
+    """
+    bmsc6 v2 として暗号化し、ct を out の先頭に書く（in-place 可。ct は len(plaintext) 以下）。
+    K_master に鍵束を渡すか kid を指定すると KID をヘッダ拡張に入れる。
+    compress（"auto"=zlib / "zlib" / "lzma"）を指定すると、標本のエントロピーが低く、実際に縮む場合だけ圧縮してから暗号化する。
+    返り値: (header, nonce, tag, ct_len)
+    """
+    K, ext = seal_key(K_master, kid)
+    algo = _comp_algo(compress)
+    if algo and comp.looks_compressible(plaintext):
+        with phase("compress", len(plaintext)): z = comp.compress(algo, plaintext)
+        if len(z) < len(plaintext):
+            ext[FLAG_COMP] = bytes([algo]) + struct.pack(">Q", len(plaintext))
+            plaintext = z
+    if not ext:
+        nonce, tag = bmsc_v6_encrypt_into(out, plaintext, K, ctx, aad)
+        return pack_header(VER_V2, 0, ctx, aad), nonce, tag, len(plaintext)
+    _check_key_iv(K, ctx)
+    flags, e = pack_ext(ext)
+    nonce = os.urandom(NPUBBYTES)
+    with phase("kdf", 32): K_enc = _derive_key(K, nonce, ctx, EXT_LABEL)
+    with phase("aad", len(ctx) + len(aad)): ad = ext_ad(ctx, aad, ext)
+    with phase("aead", len(plaintext)): tag = _seal_into(out, plaintext, ad, nonce, K_enc)
+    return pack_header(VER_V2, flags, ctx, aad, e), nonce, tag, len(plaintext)
+
+def open_v2_into(out, K_master, ctx: bytes, aad: bytes, nonce, ct, tag, ext: dict|None=None) -> int:
+    """
+    unpack_v2 の結果を out に復号する（鍵束なら KID で鍵を選ぶ。圧縮付きは展開して書く）。
+    out は v2_plain_len(len(ct), ext) + OUT_EXTRA 以上。返り値: 平文長
+    """
+    ext = ext or {}
+    K = resolve_key(K_master, ext)
+    if not ext:
+        return bmsc_v6_decrypt_into(out, nonce, ct, tag, K, ctx, aad)
+    if comp_info(ext)[0]:
+        pt = _inflate(K, ctx, aad, nonce, ct, tag, ext)
+        out[:len(pt)] = pt
+        return len(pt)
+    K_enc, ad, nonce = _ext_keys(K, ctx, aad, nonce, ext)
+    with phase("aead", len(ct)): return _open_into(out, ct, bytes(tag), ad, nonce, K_enc)
+
+def open_v2(K_master, ctx: bytes, aad: bytes, nonce, ct, tag, ext: dict|None=None, out=None) -> memoryview:
+    """
+    unpack_v2 の結果を復号し、平文の memoryview を返す。
+    圧縮なしは out（len(ct) + OUT_EXTRA 以上。in-place 可、省略時は確保する）に復号する。
+    圧縮付きは ct と同じ大きさの一時バッファで認証してから、ヘッダの平文長を上限に新しいバッファへ展開する
+    （認証前のヘッダの値で確保しない）
+    """
+    ext = ext or {}
+    if comp_info(ext)[0]:
+        return memoryview(_inflate(resolve_key(K_master, ext), ctx, aad, nonce, ct, tag, ext))
+    if out is None:
+        out = bytearray(len(ct) + OUT_EXTRA)
+    return memoryview(out)[:open_v2_into(out, K_master, ctx, aad, nonce, ct, tag, ext)]
+
+def _ext_keys(K: bytes, ctx: bytes, aad: bytes, nonce, ext: dict) -> tuple:
+    """拡張付き v2 の (K_enc, AD, nonce)"""
+    _check_key_iv(K, ctx)
+    if len(nonce) != NPUBBYTES: raise ValueError("nonce must be 24 bytes")
+    nonce = bytes(nonce)
+    with phase("kdf", 32): K_enc = _derive_key(K, nonce, ctx, EXT_LABEL)
+    with phase("aad", len(ctx) + len(aad)): ad = ext_ad(ctx, aad, ext)
+    return K_enc, ad, nonce
+
+def _inflate(K: bytes, ctx: bytes, aad: bytes, nonce, ct, tag, ext: dict) -> bytes:
+    """圧縮付き v2: 一時バッファに復号（認証）してから、認証済みの平文長を上限に展開する"""
+    K_enc, ad, nonce = _ext_keys(K, ctx, aad, nonce, ext)
+    algo, plain_len = comp_info(ext)
+    tmp = bytearray(len(ct) + ABYTES)
+    with phase("aead", len(ct)): n = _open_into(tmp, ct, bytes(tag), ad, nonce, K_enc)
+    with phase("decompress", plain_len):
+        pt = comp.decompress(algo, memoryview(tmp)[:n], plain_len)
+    if len(pt) != plain_len:
+        raise ValueError("bmsc6 compressed data corrupt")
+    return pt
+
+def stream_keys(K: bytes, nonce: bytes, ctx: bytes, aad: bytes, ext: dict) -> tuple:
+    """v3 のストリーム鍵と AD 接頭辞（拡張付きはラベルと AD が変わる）"""
+    if not ext:
+        return _derive_key(K, nonce, ctx, STREAM_LABEL), _aad_pack(ctx, aad)
+    return _derive_key(K, nonce, ctx, STREAM_EXT_LABEL), ext_ad(ctx, aad, ext)
+
+def unpack_v2(blob):
+    """
+    bmsc6 v2 を分解する。blob に memoryview（mmap 等）を渡すと各要素もコピーなしの view になる。
+    返り値: (ctx, aad, nonce, tag, ct, ext)  ext はヘッダ拡張 {type: value}（flags=0 なら空）
+    """
+    if len(blob) < 8 or blob[:6] != MAGIC:
+        raise ValueError("not a bmsc6 container")
+    if blob[6] != VER_V2:
+        raise ValueError(f"unsupported bmsc6 version: {blob[6]}")
+    flags = blob[7]
+    off = 8
+    if len(blob) < off + 2 + 4 + (2 if flags else 0):
+        raise ValueError("bmsc6 v2 header too short")
+    ctx_len, aad_len = struct.unpack(">HI", blob[off:off+6]); off += 6
+    ext = {}
+    if flags:
+        ext_len = struct.unpack(">H", blob[off:off+2])[0]; off += 2
+        if len(blob) < off + ext_len:
+            raise ValueError("bmsc6 v2 header too short")
+        ext = parse_ext(flags, blob[off:off+ext_len]); off += ext_len
+    if len(blob) < off + ctx_len + aad_len + NONCE_LEN + TAG_LEN:
+        raise ValueError("bmsc6 v2 payload too short")
+    ctx = blob[off:off+ctx_len];     off += ctx_len
+    aad = blob[off:off+aad_len];     off += aad_len
+    nonce = blob[off:off+NONCE_LEN]; off += NONCE_LEN
+    tag = blob[off:off+TAG_LEN];     off += TAG_LEN
+    return ctx, aad, nonce, tag, blob[off:], ext
+
+def unpack_blob(blob):
+    """
+    bmsc6(v1/v2) or raw を判定して分解する。blob に memoryview（mmap）を渡すと各要素もコピーなしの view になる。
+    返り値: (nonce, tag, ct, embedded_ctx_bytes|None, embedded_aad_bytes|None, ver|0, ext)
+      ver=0 は raw、ver=1/2 は bmsc6（v3 はチャンク形式なので Bmsc6Reader を使う）。ext はヘッダ拡張（v2 のみ）
+    """
+    if len(blob) >= 8 and blob[:6] == MAGIC:
+        ver   = blob[6]
+        flags = blob[7]
+        off = 8
+        if ver == 1:
+            n = blob[off:off+NONCE_LEN]; off += NONCE_LEN
+            t = blob[off:off+TAG_LEN];   off += TAG_LEN
+            c = blob[off:]
+            return n, t, c, None, None, 1, {}
+        elif ver == VER_V2:
+            ctx, aad, n, t, c, ext = unpack_v2(blob)
+            return n, t, c, ctx, aad, ver, ext
+        elif ver == VER_V3:
+            raise ValueError("bmsc6 v3 is chunked; use Bmsc6Reader")
+        else:
+            raise ValueError(f"unsupported bmsc6 version: {ver}")
+    # raw: nonce|tag|ct
+    n = blob[:NONCE_LEN]
+    t = blob[NONCE_LEN:NONCE_LEN+TAG_LEN]
+    c = blob[NONCE_LEN+TAG_LEN:]
+    return n, t, c, None, None, 0, {}
+
+def map_file(path) -> memoryview:
+    """読み取り専用で mmap した memoryview を返す（コピーなし。空ファイルは空の memoryview）"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+def _read_exact(fp, n: int) -> bytes:
+    """n バイト読む。EOF の場合のみ短く返す（パイプの短い read に対応）"""
+    buf = fp.read(n)
+    if buf is None: buf = b""
+    if len(buf) == n or not buf:
+        return buf
+    parts = [buf]; got = len(buf)
+    while got < n:
+        b = fp.read(n - got)
+        if not b: break
+        parts.append(b); got += len(b)
+    return b"".join(parts)
+
+def _chunk_nonce(nonce: bytes, index: int) -> bytes:
+    # ヘッダ nonce の末尾 8B にチャンク番号を XOR（並べ替え検出）
+    ctr = int.from_bytes(nonce[16:], "big") ^ index
+    return nonce[:16] + ctr.to_bytes(8, "big")
+
+def _chunk_ad(ad_prefix: bytes, final: bool) -> bytes:
+    # 最終チャンク印を AAD にバインド（切り詰め検出）
+    return ad_prefix + (b"\x01" if final else b"\x00")
+
+def _seal_chunk(key: bytes, nonce: bytes, ad_prefix: bytes, index: int, final: bool, pt: bytes) -> bytes:
+    """v3 の 1 チャンクを暗号化（返り値: ct||tag）。並列実行のためモジュール関数にしている"""
+    return aead_encrypt(pt, _chunk_ad(ad_prefix, final), _chunk_nonce(nonce, index), key)
+
+def _open_chunk(key: bytes, nonce: bytes, ad_prefix: bytes, index: int, final: bool, rec: bytes) -> bytes:
+    """v3 の 1 レコード（ct||tag）を認証・復号"""
+    if len(rec) < ABYTES:
+        raise ValueError("bmsc6 v3 truncated")
+    try:
+        return aead_decrypt(rec, _chunk_ad(ad_prefix, final), _chunk_nonce(nonce, index), key)
+    except Exception:
+        raise AuthFailed("auth failed")
+
+def _seal_record(key: bytes, nonce: bytes, ad_prefix: bytes, index: int, final: bool, pt: bytes, algo: int) -> bytes:
+    """
+    v3 の 1 レコード。algo=0 は _seal_chunk と同じ ct||tag。
+    algo>0（圧縮付き）は len(ct)(4 BE) || ct||tag で、暗号化する中身は mode(1)（0=そのまま / 1=圧縮）+ 本体。
+    エントロピーが高いチャンク・縮まないチャンクはそのまま入れる。
+    """
+    if not algo:
+        return _seal_chunk(key, nonce, ad_prefix, index, final, pt)
+    body = None
+    if comp.looks_compressible(pt):
+        z = comp.compress(algo, pt)
+        if len(z) < len(pt):
+            body = b"\x01" + z
+    if body is None:
+        body = b"\x00" + bytes(pt)
+    return struct.pack(">I", len(body)) + _seal_chunk(key, nonce, ad_prefix, index, final, body)
+
+def _open_record(key: bytes, nonce: bytes, ad_prefix: bytes, index: int, final: bool, rec: bytes,
+                 algo: int, chunk_size: int) -> bytes:
+    """_seal_record の逆（rec は長さ前置を除いた ct||tag）。最終以外は展開後ちょうど chunk_size"""
+    pt = _open_chunk(key, nonce, ad_prefix, index, final, rec)
+    if not algo:
+        return pt
+    if not pt or pt[0] > 1:
+        raise ValueError("bmsc6 v3 malformed chunk")
+    body = comp.decompress(algo, memoryview(pt)[1:], chunk_size) if pt[0] else pt[1:]
+    if len(body) > chunk_size or (not final and len(body) != chunk_size):
+        raise ValueError("bmsc6 v3 malformed chunk")
+    return body
+
+def _read_record(fp, chunk_size: int):
+    """圧縮付き v3 のレコードを 1 つ読む（長さ前置を除いた ct||tag）。EOF なら None"""
+    head = _read_exact(fp, 4)
+    if not head:
+        return None
+    if len(head) < 4:
+        raise ValueError("bmsc6 v3 truncated")
+    n = struct.unpack(">I", head)[0]
+    if n > chunk_size + 1:
+        raise ValueError("bmsc6 v3 malformed chunk")
+    rec = _read_exact(fp, n + TAG_LEN)
+    if len(rec) < n + TAG_LEN:
+        raise ValueError("bmsc6 v3 truncated")
+    return rec
+
+def _stream_comp(ext: dict, compress: str|None, first) -> tuple:
+    """v3 の圧縮設定。"auto" は最初のチャンク first の標本で決める。返り値: (ext, algo)"""
+    algo = _comp_algo(compress)
+    if compress == "auto" and not comp.looks_compressible(first):
+        algo = 0
+    if algo:
+        ext = dict(ext); ext[FLAG_COMP] = bytes([algo])
+    return ext, algo
+
+def _head_len(head: bytes) -> int:
+    """固定部の長さ（先頭 14B を読んだ後、拡張付きなら ext_len の 2B を追加で読む）"""
+    return HEAD_LEN + 2 if len(head) >= 8 and head[7] else HEAD_LEN
+
+def _parse_head(head: bytes):
+    """
+    ヘッダ固定部（MAGIC..aad_len、拡張付きは ext_len まで）を検査する。
+    返り値: (ver, flags, 残りヘッダ長, (ext_len, ctx_len, aad_len))
+    """
+    if len(head) < 8 or head[:6] != MAGIC:
+        raise ValueError("not a bmsc6 container")
+    ver, flags = head[6], head[7]
+    if ver != VER_V3:
+        raise ValueError(f"unsupported bmsc6 stream version: {ver}")
+    if len(head) < _head_len(head):
+        raise ValueError("bmsc6 v3 header too short")
+    ctx_len, aad_len = struct.unpack(">HI", head[8:14])
+    ext_len = struct.unpack(">H", head[14:16])[0] if flags else 0
+    return ver, flags, ext_len + ctx_len + aad_len + NONCE_LEN + 4, (ext_len, ctx_len, aad_len)
+
+def _parse_rest(rest: bytes, flags: int, lens: tuple):
+    """ヘッダ後半（ext..chunk_size）を分解する。返り値: (ctx, aad, nonce, chunk_size, ext)"""
+    ext_len, ctx_len, aad_len = lens
+    if len(rest) < ext_len + ctx_len + aad_len + NONCE_LEN + 4:
+        raise ValueError("bmsc6 v3 header too short")
+    ext = parse_ext(flags, rest[:ext_len]) if flags else {}
+    off = ext_len
+    ctx = rest[off:off+ctx_len];   off += ctx_len
+    aad = rest[off:off+aad_len];   off += aad_len
+    nonce = rest[off:off+NONCE_LEN]; off += NONCE_LEN
+    chunk_size = struct.unpack(">I", rest[off:off+4])[0]
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"invalid bmsc6 v3 chunk_size: {chunk_size}")
+    return ctx, aad, nonce, chunk_size, ext
+
+def read_header(fp):
+    """
+    v3 ヘッダを読む。
+    返り値: (ver, flags, ctx, aad, nonce, chunk_size, ext)
+    """
+    head = _read_exact(fp, HEAD_LEN)
+    if _head_len(head) > HEAD_LEN:
+        head += _read_exact(fp, 2)
+    ver, flags, rest_len, lens = _parse_head(head)
+    return (ver, flags) + _parse_rest(_read_exact(fp, rest_len), flags, lens)
+
+_UNPARSED = object()
+
+class Bmsc6Header:
+    """
+    ヘッダだけを読んだメタデータ（鍵は不要。ct は読まない）。
+        h = Bmsc6Header.read("doc.pdf.bmsc6")
+        h.ver, h.ctx, h.aad, h.kid, h.compression, h.file_size, h.plain_len, h.meta["sha256"]
+    読むのは v1: 48B、v2: 14 + ext + ctx_len + aad_len + 40B、v3: 14 + ext + ctx_len + aad_len + 28B。
+    AAD の JSON（name/size/sha256）は meta を初めて参照したときに解析する。
+    値は認証前のもの（改ざんの検出は verify か復号で行う）。
+    """
+    __slots__ = ("path", "ver", "flags", "ctx", "aad", "nonce", "tag", "chunk_size", "ext", "header_len", "file_size", "_meta")
+
+    def __init__(self, ver: int, flags: int, ctx, aad, nonce: bytes, tag, chunk_size, ext: dict,
+                 header_len: int, file_size: int|None=None, path=None):
+        self.path = path
+        self.ver, self.flags, self.ext = ver, flags, ext
+        self.ctx, self.aad = ctx, aad            # v1 は None（ctx/AAD を内包しない）
+        self.nonce, self.tag = nonce, tag        # v3 の tag は None（チャンクごと）
+        self.chunk_size = chunk_size             # v1/v2 は None
+        self.header_len, self.file_size = header_len, file_size
+        self._meta = _UNPARSED
+
+    @classmethod
+    def read(cls, src) -> "Bmsc6Header":
+        """src（パスか、先頭に位置したバイナリのファイルオブジェクト）からヘッダだけを読む"""
+        if not hasattr(src, "read"):
+            with open(src, "rb", buffering=0) as fp:
+                h = cls.read(fp)
+            h.path = src
+            return h
+        try:
+            size = os.fstat(src.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            size = None  # パイプ・BytesIO など
+        head = _read_exact(src, 8)
+        if len(head) < 8 or head[:6] != MAGIC:
+            raise ValueError("not a bmsc6 container")
+        ver, flags = head[6], head[7]
+        if ver == VER_V1:
+            rest = _read_exact(src, NONCE_LEN + TAG_LEN)
+            if len(rest) < NONCE_LEN + TAG_LEN:
+                raise ValueError("bmsc6 v1 too short")
+            return cls(ver, 0, None, None, rest[:NONCE_LEN], rest[NONCE_LEN:], None, {}, len(head) + len(rest), size)
+        if ver not in (VER_V2, VER_V3):
+            raise ValueError(f"unsupported bmsc6 version: {ver}")
+        head += _read_exact(src, HEAD_LEN - 8 + (2 if flags else 0))
+        if len(head) < _head_len(head):
+            raise ValueError(f"bmsc6 v{ver} header too short")
+        ctx_len, aad_len = struct.unpack(">HI", head[8:14])
+        ext_len = struct.unpack(">H", head[14:16])[0] if flags else 0
+        if ver == VER_V2:
+            # ct の手前まで読んで unpack_v2 に渡す（ct は空として分解される）
+            blob = head + _read_exact(src, ext_len + ctx_len + aad_len + NONCE_LEN + TAG_LEN)
+            ctx, aad, nonce, tag, _, ext = unpack_v2(blob)
+            return cls(ver, flags, ctx, aad, nonce, tag, None, ext, len(blob), size)
+        _, flags, rest_len, lens = _parse_head(head)
+        rest = _read_exact(src, rest_len)
+        ctx, aad, nonce, chunk_size, ext = _parse_rest(rest, flags, lens)
+        return cls(ver, flags, ctx, aad, nonce, None, chunk_size, ext, len(head) + len(rest), size)
+
+    @property
+    def kid(self) -> str|None:
+        return ext_kid(self.ext)
+
+    @property
+    def recipients(self) -> list|None:
+        """封筒の受信者表の KID の列（KID の無い項目は None）。封筒でなければ None"""
+        t = self.ext.get(FLAG_RCPT)
+        return None if t is None else env.table_kids(t)
+
+    @property
+    def compression(self) -> str|None:
+        algo = comp_info(self.ext)[0]
+        return next((k for k, v in comp.ALGORITHMS.items() if v == algo), None) if algo else None
+
+    @property
+    def ct_len(self) -> int|None:
+        """v1/v2 の ct 長（v3 はレコード列の長さ）。ファイルサイズが分からなければ None"""
+        return None if self.file_size is None else self.file_size - self.header_len
+
+    @property
+    def plain_len(self) -> int|None:
+        """
+        平文長。v2 の圧縮付きはヘッダの値、v3 はファイルサイズから計算する。
+        求まらない（サイズ不明・圧縮付き v3・長さが不正）ときは None
+        """
+        algo, n = comp_info(self.ext)
+        if algo:
+            return n
+        body = self.ct_len
+        if body is None or self.chunk_size is None:
+            return body
+        rec = self.chunk_size + TAG_LEN
+        r = body % rec
+        if not body or 0 < r < TAG_LEN:
+            return None
+        return body - TAG_LEN * (body // rec + (1 if r else 0))
+
+    @property
+    def meta(self) -> dict|None:
+        """AAD が JSON オブジェクト（drive_encrypt / encrypt-dir の name/size/sha256）ならその dict、違えば None"""
+        if self._meta is _UNPARSED:
+            try:
+                m = json.loads(bytes(self.aad)) if self.aad else None
+            except ValueError:
+                m = None
+            self._meta = m if isinstance(m, dict) else None
+        return self._meta
+
+    def as_dict(self) -> dict:
+        """inspect / 索引用の JSON 化できる dict（AAD は JSON ならその中身、違えば hex）"""
+        meta = self.meta
+        d = {"path": None if self.path is None else str(self.path), "ver": self.ver,
+             "ctx": None if self.ctx is None else bytes(self.ctx).decode("utf-8", errors="replace"),
+             "kid": self.kid, "recipients": self.recipients, "compression": self.compression, "chunk_size": self.chunk_size,
+             "header_len": self.header_len, "file_size": self.file_size, "plain_len": self.plain_len}
+        if meta is not None:
+            d["meta"] = meta
+        elif self.aad:
+            d["aad_hex"] = bytes(self.aad).hex()
+        return d
+
+class Bmsc6Writer:
+    """
+    bmsc6 v3 をストリーム書き出しする。入力長は事前に不要。
+    close() で最終チャンクを書く（fp 自体は閉じない）。
+    K_master に鍵束を渡すか kid を指定すると KID をヘッダ拡張に入れる。
+    compress（"zlib" / "lzma"）はチャンクごとに圧縮する（エントロピーの高いチャンクはそのまま）。
+    "auto" は最初のチャンクで決め、圧縮しないなら従来の v3 を書く（ヘッダは最初のチャンクと一緒に書く）。
+    """
+    def __init__(self, fp, K_master: bytes, ctx: bytes, aad: bytes=b"",
+                 chunk_size: int=DEFAULT_CHUNK_SIZE, *, nonce: bytes|None=None, kid: str|None=None,
+                 compress: str|None=None):
+        K_master, ext = seal_key(K_master, kid)
+        _comp_algo(compress)  # 名前の検査
+        if not isinstance(ctx, (bytes, bytearray)): raise TypeError("ctx must be bytes")
+        if not isinstance(aad, (bytes, bytearray)): raise TypeError("aad must be bytes")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE: raise ValueError("invalid chunk_size")
+        if nonce is None:
+            nonce = os.urandom(NPUBBYTES)
+        elif len(nonce) != NPUBBYTES:
+            raise ValueError("nonce must be 24 bytes")
+        ctx = bytes(ctx); aad = bytes(aad); nonce = bytes(nonce)
+        self._fp = fp
+        self._nonce = nonce
+        self._chunk = chunk_size
+        self._buf = bytearray()
+        self._index = 0
+        self._closed = False
+        self.bytes_in = 0
+        self._pending = (K_master, ext, ctx, aad, compress)
+        if compress != "auto":
+            self._start(None)
+
+    def _start(self, first):
+        K_master, ext, ctx, aad, compress = self._pending
+        ext, self._algo = _stream_comp(ext, compress, first)
+        self._key, self._ad = stream_keys(K_master, self._nonce, ctx, aad, ext)
+        self._fp.write(pack_v3_header(ctx, aad, self._nonce, self._chunk, ext))
+        self._pending = None
+
+    def _emit(self, pt: bytes, final: bool):
+        if self._pending is not None:
+            self._start(pt)  # compress="auto": 最初のチャンクを見てからヘッダを書く
+        self._fp.write(_seal_record(self._key, self._nonce, self._ad, self._index, final, pt, self._algo))
+        self._index += 1
+
+    def write(self, data) -> int:
+        if self._closed: raise ValueError("write to closed Bmsc6Writer")
+        mv = memoryview(data).cast("B")
+        cs = self._chunk
+        # 最終チャンク判定のため、chunk_size を「超えた」時点で 1 チャンク出力する
+        # （大きな write でもバッファは 2*chunk_size 未満に収まる）
+        for pos in range(0, len(mv), cs):
+            self._buf += mv[pos:pos+cs]
+            if len(self._buf) > cs:
+                self._emit(bytes(self._buf[:cs]), False)
+                del self._buf[:cs]
+        self.bytes_in += len(mv)
+        return len(mv)
+
+    def write_from(self, fp) -> int:
+        """
+        fp（バイナリ読み込み。stdin/パイプ可）を EOF まで暗号化して close() する。返り値: fp から読んだバイト数
+        chunk_size ずつ 1 つ先読みして最終チャンクを判定する（write() の内部バッファを経由しない）。
+        """
+        if self._closed: raise ValueError("write to closed Bmsc6Writer")
+        cs = self._chunk
+        first = _read_exact(fp, cs - len(self._buf))
+        cur = bytes(self._buf) + first if self._buf else first
+        self._buf = bytearray(); n = len(first)
+        while len(cur) == cs:
+            nxt = _read_exact(fp, cs)
+            if not nxt: break
+            self._emit(cur, False)
+            cur = nxt; n += len(nxt)
+        self._emit(cur, True)
+        self.bytes_in += n
+        self._closed = True
+        return n
+
+    def close(self):
+        if self._closed: return
+        self._emit(bytes(self._buf), True)
+        self._buf = bytearray()
+        self._closed = True
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 例外時は最終チャンクを書かない → 読み手側で切り詰めとして検出される
+        if exc_type is None:
+            self.close()
+        return False
+
+class Bmsc6Reader:
+    """
+    bmsc6 v3 をストリーム復号する。for pt in reader: ... で認証済みチャンクを順に返す。
+    aad を指定すると内包 AAD の代わりに使う（未指定なら内包を使用）。
+    K_master に鍵束を渡すとヘッダの KID で鍵を選ぶ。
+    """
+    def __init__(self, fp, K_master: bytes, aad: bytes|None=None):
+        K_master = _check_master(K_master)
+        with phase("container.parse"):
+            _, self.flags, self.ctx, self.embedded_aad, self.nonce, self.chunk_size, self.ext = read_header(fp)
+        self.kid = ext_kid(self.ext)
+        self.compression = comp_info(self.ext)[0]
+        self.aad = self.embedded_aad if aad is None else bytes(aad)
+        self._fp = fp
+        K = resolve_key(K_master, self.ext)
+        with phase("kdf", 32): self._key, self._ad = stream_keys(K, self.nonce, self.ctx, self.aad, self.ext)
+
+    def _iter_records(self):
+        """圧縮付き: 長さ前置のレコードを読み、次が EOF なら最終として扱う"""
+        algo, cs = self.compression, self.chunk_size
+        with phase("io.read"):
+            cur = _read_record(self._fp, cs)
+        if cur is None:
+            raise ValueError("bmsc6 v3 truncated")
+        index = 0
+        while True:
+            with phase("io.read"):
+                nxt = _read_record(self._fp, cs)
+            final = nxt is None
+            with phase("aead", len(cur)):
+                pt = _open_record(self._key, self.nonce, self._ad, index, final, cur, algo, cs)
+            yield pt
+            if final:
+                return
+            cur = nxt; index += 1
+
+    def __iter__(self):
+        if self.compression:
+            yield from self._iter_records()
+            return
+        rec_len = self.chunk_size + TAG_LEN
+        with phase("io.read") as p:
+            cur = _read_exact(self._fp, rec_len); p.add(len(cur))
+        index = 0
+        while True:
+            if len(cur) < rec_len:
+                nxt, final = b"", True
+            else:
+                with phase("io.read") as p:
+                    nxt = _read_exact(self._fp, rec_len); p.add(len(nxt))
+                final = not nxt
+            with phase("aead", len(cur)):
+                pt = _open_chunk(self._key, self.nonce, self._ad, index, final, cur)
+            yield pt
+            if final:
+                return
+            cur = nxt; index += 1
+
+class Bmsc6File:
+    """
+    bmsc6 v3 のランダムアクセス読み出し（read/seek/tell と pread(offset, length)）。
+    レコードは固定長なので「平文位置 → チャンク番号 → ファイル位置」は計算で求まり、索引は不要。
+    開くときに最終レコードを認証して平文長を確定し（切り詰め検出）、以後は範囲にかかるチャンクだけを読んで認証・復号する。
+    1 回の読み出しのコストはファイル全体の大きさに依存しない。
+    圧縮付き（レコード長が可変）は開くときに長さ前置を辿ってレコード位置の表を作る（チャンクあたり 4B の読み出し）。
+    """
+    def __init__(self, fp, K_master: bytes, aad: bytes|None=None):
+        K_master = _check_master(K_master)
+        with phase("container.parse"):
+            fp.seek(0)
+            _, self.flags, self.ctx, self.embedded_aad, self.nonce, self.chunk_size, self.ext = read_header(fp)
+            self._base = fp.tell()
+            end = fp.seek(0, os.SEEK_END)
+            body = end - self._base
+            self.compression = comp_info(self.ext)[0]
+            self._recs = self._scan(fp, end) if self.compression else None
+        self._rec_len = self.chunk_size + TAG_LEN
+        if self._recs is not None:
+            self.chunks = len(self._recs)
+        else:
+            self.chunks = max(1, -(-body // self._rec_len))
+            self._last_len = body - (self.chunks - 1) * self._rec_len
+            if self._last_len < TAG_LEN:
+                raise ValueError("bmsc6 v3 truncated")
+            self.size = (self.chunks - 1) * self.chunk_size + self._last_len - TAG_LEN
+        self.kid = ext_kid(self.ext)
+        self.aad = self.embedded_aad if aad is None else bytes(aad)
+        self._fp = fp
+        K = resolve_key(K_master, self.ext)
+        with phase("kdf", 32): self._key, self._ad = stream_keys(K, self.nonce, self.ctx, self.aad, self.ext)
+        self._cached = (-1, b"")
+        self._pos = 0
+        # 最終印付きのレコードが末尾にあることを確認する（size を信用できるのはこの後）
+        last = self._chunk(self.chunks - 1)
+        if self._recs is not None:
+            self.size = (self.chunks - 1) * self.chunk_size + len(last)
+
+    def _scan(self, fp, end: int) -> list:
+        """圧縮付き v3 のレコード位置 [(ct の位置, ct||tag の長さ)]"""
+        recs = []; pos = self._base
+        while pos < end:
+            fp.seek(pos)
+            head = _read_exact(fp, 4)
+            if len(head) < 4:
+                raise ValueError("bmsc6 v3 truncated")
+            n = struct.unpack(">I", head)[0]
+            if n > self.chunk_size + 1:
+                raise ValueError("bmsc6 v3 malformed chunk")
+            recs.append((pos + 4, n + TAG_LEN))
+            pos += 4 + n + TAG_LEN
+        if pos != end or not recs:
+            raise ValueError("bmsc6 v3 truncated")
+        return recs
+
+    def _chunk(self, index: int) -> bytes:
+        """index 番目のチャンクを認証・復号する（直前に使ったチャンクは再利用）"""
+        if self._cached[0] == index:
+            return self._cached[1]
+        final = index == self.chunks - 1
+        if self._recs is not None:
+            pos, n = self._recs[index]
+        else:
+            pos, n = self._base + index * self._rec_len, (self._last_len if final else self._rec_len)
+        with phase("io.read", n):
+            self._fp.seek(pos)
+            rec = _read_exact(self._fp, n)
+        with phase("aead", n):
+            pt = _open_record(self._key, self.nonce, self._ad, index, final, rec, self.compression, self.chunk_size)
+        self._cached = (index, pt)
+        return pt
+
+    def pread(self, offset: int, length: int) -> bytes:
+        """平文の [offset, offset+length) を返す（末尾で短くなる）。現在位置は変えない"""
+        if offset < 0 or length < 0: raise ValueError("offset/length must be >= 0")
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        cs = self.chunk_size
+        first, last = offset // cs, (end - 1) // cs
+        if first == last:
+            return self._chunk(first)[offset - first * cs:end - first * cs]
+        parts = [self._chunk(first)[offset - first * cs:]]
+        for i in range(first + 1, last):
+            parts.append(self._chunk(i))
+        parts.append(self._chunk(last)[:end - last * cs])
+        return b"".join(parts)
+
+    def read(self, size: int=-1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self._pos
+        out = self.pread(self._pos, size)
+        self._pos += len(out)
+        return out
+
+    def seek(self, offset: int, whence: int=os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR: offset += self._pos
+        elif whence == os.SEEK_END: offset += self.size
+        elif whence != os.SEEK_SET: raise ValueError(f"invalid whence: {whence}")
+        if offset < 0: raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._fp.close()
+        self._cached = (-1, b"")
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def open_bmsc6(path, K_master: bytes, aad: bytes|None=None) -> Bmsc6File:
+    """
+    bmsc6 v3 ファイルをランダムアクセス用に開く。
+        with open_bmsc6("video.bmsc6", K) as f:
+            part = f.pread(offset, length)   # または f.seek(offset); f.read(length)
+    """
+    fp = open(path, "rb", buffering=0)
+    try:
+        return Bmsc6File(fp, K_master, aad)
+    except BaseException:
+        fp.close()
+        raise
+
+def encrypt_stream(src, dst, K_master: bytes, ctx: bytes, aad: bytes=b"",
+                   chunk_size: int=DEFAULT_CHUNK_SIZE, *, kid: str|None=None, compress: str|None=None) -> int:
+    """src（バイナリ読み込み。stdin/パイプ可）→ dst に bmsc6 v3 を書く。入力長は事前に不要。返り値: 平文バイト数"""
+    return Bmsc6Writer(dst, K_master, ctx, aad, chunk_size, kid=kid, compress=compress).write_from(src)
+
+def decrypt_stream(src, dst, K_master: bytes, aad: bytes|None=None) -> int:
+    """src の bmsc6 v3 を復号して dst に書く。返り値: 平文バイト数"""
+    total = 0
+    for pt in Bmsc6Reader(src, K_master, aad=aad):
+        dst.write(pt); total += len(pt)
+    return total
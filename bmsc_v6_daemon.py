@@ -0,0 +1,177 @@
+# bmsc_v6_daemon.py
+"""
+ローカル暗号化デーモン（`bmsc_prod serve` の本体）
+
+鍵は起動時に 1 回だけ読み込んでメモリに保持し、Unix ドメインソケットで要求を受ける（プロトコルは bmsc_v6_client 参照）。
+asyncio で多数の接続を並行に受け、inline_max を超える AEAD とファイル復号はスレッドプールで実行する（bmsc_v6_aio）。
+ソケットは 0600 で作る（同じユーザーのプロセスだけが鍵を使える）。
+鍵は Keyring（bmsc_v6_keyring）で持ち、key_id 空の decrypt_file はファイルのヘッダの KID で鍵を選ぶ。
+"""
+import os, socket, stat, struct, asyncio
+from pathlib import Path
+
+import bmsc_v6_aio as aio
+from bmsc_v6_prod import bmsc_v6_encrypt_into, bmsc_v6_decrypt_into, OUT_EXTRA, NPUBBYTES, ABYTES, AuthFailed
+from bmsc_v6_container import MAGIC, VER_V3, Bmsc6Reader, map_file, unpack_blob, open_v2
+from bmsc_v6_keyring import Keyring, UnknownKid
+from bmsc_v6_envelope import NoRecipientEntry
+from bmsc_v6_client import (
+    OP_PING, OP_ENCRYPT, OP_DECRYPT, OP_DECRYPT_FILE, ST_OK, ST_AUTH, ST_ERROR,
+    MAX_FRAME, pack_frame, unpack_fields,
+)
+
+def _encrypt(K: bytes, ctx: bytes, aad: bytes, pt):
+    buf = bytearray(len(pt) + OUT_EXTRA)
+    nonce, tag = bmsc_v6_encrypt_into(buf, pt, K, ctx, aad)
+    return [nonce, memoryview(buf)[:len(pt)], tag]
+
+def _decrypt(K: bytes, ctx: bytes, aad: bytes, nonce, ct, tag):
+    if len(tag) != ABYTES: raise AuthFailed("auth failed")
+    buf = bytearray(len(ct) + OUT_EXTRA)
+    n = bmsc_v6_decrypt_into(buf, nonce, ct, tag, K, ctx, aad)
+    return [memoryview(buf)[:n]]
+
+def _write_atomic(path: str, chunks) -> int:
+    tmp = path + ".part"; total = 0
+    try:
+        with open(tmp, "wb") as f:
+            for c in chunks:
+                f.write(c); total += len(c)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return total
+
+def _decrypt_file(K, path: str, out: str, ctx: bytes, aad: bytes):
+    """
+    decrypt-file と同じ判定（v3 / v1・v2 / raw）。out が空なら平文を返す（MAX_FRAME まで）。
+    K に Keyring を渡すとヘッダの KID で鍵を選ぶ（KID の無いファイルは既定の鍵）。
+    """
+    with open(path, "rb") as f:
+        head = f.read(8)
+        if len(head) == 8 and head[:6] == MAGIC and head[6] == VER_V3:
+            if not out and os.fstat(f.fileno()).st_size > MAX_FRAME - 64:
+                raise ValueError("plaintext too large for one frame; pass out")
+            f.seek(0)
+            r = Bmsc6Reader(f, K, aad=aad or None)
+            if out:
+                size = _write_atomic(out, r); pt = b""
+            else:
+                pt = b"".join(r); size = len(pt)
+            return [r.ctx, r.aad, pt, struct.pack(">Q", size)]
+    blob = map_file(path)
+    if not out and len(blob) > MAX_FRAME - 64:
+        raise ValueError("plaintext too large for one frame; pass out")
+    n, t, c, ctx_b, aad_b, _, ext = unpack_blob(blob)
+    # ctx は内包を優先、aad は引数があればそれを使う（CLI の decrypt-file と同じ）
+    ctx = bytes(ctx_b) if ctx_b is not None else ctx
+    if not aad and aad_b is not None: aad = bytes(aad_b)
+    if len(n) != NPUBBYTES or len(t) != ABYTES: raise AuthFailed("auth failed")
+    # 圧縮付きは認証してから展開する（認証前のヘッダの平文長で確保しない）
+    pt = open_v2(K, ctx, aad, n, c, t, ext)
+    if not out and len(pt) > MAX_FRAME - 64:
+        raise ValueError("plaintext too large for one frame; pass out")
+    if out:
+        size = _write_atomic(out, (pt,)); pt = b""
+    else:
+        size = len(pt)
+    return [ctx, aad, pt, struct.pack(">Q", size)]
+
+class Bmsc6Daemon:
+    """
+    鍵 {key_id: K}（または Keyring）を保持して要求を処理する。
+        asyncio.run(Bmsc6Daemon({"default": K}).serve("/run/user/1000/bmsc6.sock"))
+    dict なら最初の鍵、Keyring ならその既定の鍵が既定（key_id 空の要求に使う）。
+    """
+    def __init__(self, keys, *, executor=None, inline_max: int=aio.INLINE_MAX):
+        if not keys: raise ValueError("no keys")
+        self.keyring = keys if isinstance(keys, Keyring) else Keyring(keys)
+        self._executor = executor; self._inline_max = inline_max
+        self.requests = 0
+        self.connections = 0
+
+    def _key(self, kid) -> bytes:
+        name = bytes(kid).decode("utf-8") or self.keyring.default_kid
+        if name not in self.keyring:
+            raise UnknownKid(f"unknown key_id: {name}")
+        return self.keyring.key_for(name)
+
+    async def handle(self, op: int, f: list) -> list:
+        """1 要求を処理して応答フィールドを返す（認証失敗は AuthFailed / NoRecipientEntry）"""
+        call = lambda n, fn, *a: aio._call(n, self._executor, self._inline_max, fn, *a)
+        if op == OP_PING and not f:
+            return []
+        if op == OP_ENCRYPT and len(f) == 4:
+            kid, ctx, aad, pt = f
+            return await call(len(pt), _encrypt, self._key(kid), bytes(ctx), bytes(aad), pt)
+        if op == OP_DECRYPT and len(f) == 6:
+            kid, ctx, aad, nonce, ct, tag = f
+            return await call(len(ct), _decrypt, self._key(kid), bytes(ctx), bytes(aad), nonce, ct, tag)
+        if op == OP_DECRYPT_FILE and len(f) == 5:
+            kid, path, out, ctx, aad = f
+            # key_id 空ならファイルのヘッダの KID で選ぶ。ファイル入出力を伴うので大きさによらずスレッドで実行する
+            K = self._key(kid) if len(kid) else self.keyring
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor or aio._default_executor(), _decrypt_file, K,
+                                              bytes(path).decode("utf-8"), bytes(out).decode("utf-8"), bytes(ctx), bytes(aad))
+        raise ValueError(f"bad request: op={op} fields={len(f)}")
+
+    async def _dispatch(self, body) -> list:
+        self.requests += 1
+        try:
+            return pack_frame(ST_OK, await self.handle(body[0], unpack_fields(memoryview(body)[1:])))
+        except (AuthFailed, NoRecipientEntry):
+            return pack_frame(ST_AUTH, [])
+        except ValueError as e:
+            return pack_frame(ST_ERROR, [str(e).encode("utf-8")])
+        except (OSError, MemoryError) as e:
+            return pack_frame(ST_ERROR, [f"{type(e).__name__}: {e}".encode("utf-8")])
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    n = struct.unpack(">I", await reader.readexactly(4))[0]
+                except asyncio.IncompleteReadError:
+                    break  # 相手が閉じた
+                if not 0 < n <= MAX_FRAME:
+                    break  # フレーム境界が信用できないので切断
+                body = await reader.readexactly(n)
+                writer.writelines(await self._dispatch(body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # 停止時。接続タスクは最上位なので取り消しをここで終える（3.11 の streams はそのまま例外として報告する）
+        finally:
+            writer.close()
+
+    async def serve(self, path, *, ready=None):
+        """path で待ち受ける（キャンセルされるまで戻らない）。ready() は待ち受け開始後に呼ばれる"""
+        path = str(path)
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)  # 前回の残骸
+        except FileNotFoundError:
+            pass
+        # bind → chmod → listen の順にする（listen 前は接続できないので 0600 にする前に繋がれることはない。
+        # umask はプロセス全体に効き、他のスレッドが作るファイルにも掛かるので変えない）
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+        except BaseException:
+            sock.close(); raise
+        try:
+            os.chmod(path, 0o600)
+            server = await asyncio.start_unix_server(self._connection, sock=sock, limit=1 << 20)
+        except BaseException:
+            sock.close(); Path(path).unlink(missing_ok=True)
+            raise
+        try:
+            async with server:
+                if ready is not None: ready()
+                await server.serve_forever()
+        finally:
+            Path(path).unlink(missing_ok=True)
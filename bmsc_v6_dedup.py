@@ -0,0 +1,402 @@
+# bmsc_v6_dedup.py
+"""
+重複排除付きの暗号化バックアップ（チャンクストア + ファイルごとの暗号化マニフェスト）
+
+毎回 bmsc_v6_encrypt でファイル全体を暗号化すると、変わっていないデータも毎回暗号化・保存される。ここでは
+- 入力を内容で決まる境界（content-defined chunking）で平均 14 KiB 程度のチャンクに分け、
+- チャンク ID = HMAC-SHA256(id_key, チャンク)（鍵付きなので ID から内容を推測できない）とし、
+- ストアに無いチャンクだけを AEAD で暗号化してパックファイルに追記し、
+- ファイルはチャンク ID の列（マニフェスト）を bmsc6 v2 で暗号化した小さなファイルにする。
+2 回目以降、変わっていないデータはチャンク分割と HMAC だけで済む（暗号化も書き込みもしない）。
+backup_tree は前回のスナップショットで (size, mtime_ns) が同じファイルのマニフェストをそのまま使うので、
+変わっていないファイルは読みもしない（rehash=True で全ファイルを分割し直す）。
+
+チャンク分割: Gear ハッシュ h = (h << 1) + G[b] を 1 ビットの鍵付き表 G（256 値の半分が 1）で回し、
+直近のビット列が PATTERN（13 ビット）に一致した位置で切る。FastCDC と同じく NORMAL_CHUNK を超えたら
+短い PATTERN_LOOSE（10 ビット）に切り替えるので、文字の種類が少ないデータでも MAX_CHUNK で切られることは少ない
+（MAX_CHUNK での切断は挿入・削除のあとで境界がずれたままになる）。
+G を 0/1 のバイトにする translate と find だけで境界を探すので、バイトごとの Python ループが無い。
+境界は直前 13 バイトだけで決まるので、挿入・削除があっても境界はすぐ元の位置に戻る。
+G は鍵から導出するので、チャンク長の列から内容を推測することもできない。
+
+鍵（ストアごと。ctx を含めて導出）:
+    HKDF-SHA256(ikm=K_master, salt="", info="BMSCv6-dedup:" || len(ctx)(2) || ctx)
+        → id_key(32) || chunk_key(32) || 照合値(32) || G の並べ替え用(256)
+チャンク: XChaCha20-Poly1305(chunk_key, nonce=乱数 24B, ad=チャンク ID, チャンク)
+
+ストアの構成（root/）:
+    index.sqlite              チャンク ID → (パック番号, 位置, 平文長)、ストアの照合値
+    packs/00000001.pack       レコード id(32) || nonce(24) || ct || tag(16) の列（追記のみ。ストアを開くごとに新しいパック）
+    snapshots/<名前>/<相対パス>.bmsc6d   マニフェスト（bmsc6 v2。平文は {id(32) || 長さ(4 BE)} の列、
+                              AAD は {"name","size","mtime_ns","chunks"}）
+パックは索引を commit する前に fsync し、マニフェストは索引の commit 後に書くので、中断してもマニフェストが
+存在しないチャンクを指すことはない（中断時の書きかけはパックの末尾に参照されないまま残るだけ）。
+参照されなくなったチャンクの削除（GC）は行わない。
+"""
+import os, json, hmac, sqlite3, struct, time
+from pathlib import Path
+
+from bmsc_v6_prod import hkdf_sha256, _seal, _open, _aad_pack, _check_key_iv, OUT_EXTRA, NPUBBYTES, ABYTES
+from bmsc_v6_container import seal_v2_into, open_v2, unpack_v2
+from bmsc_v6_tree import _walk, _write_atomic, _tmp_path
+
+DEDUP_LABEL = b"BMSCv6-dedup:"
+ID_LEN = 32
+ENTRY = struct.Struct(">32sI")  # マニフェストの 1 項目: id + 平文長
+PATTERN = bytes([1, 0, 0, 1, 1, 0, 1, 0, 1, 1, 1, 0, 0])  # 0/1 がほぼ半々（偏ったデータでも出現率が落ちにくい）
+PATTERN_LOOSE = bytes([1, 0, 1, 1, 0, 0, 1, 0, 1, 0])
+MIN_CHUNK = 8 << 10  # 先頭 MIN_CHUNK は境界を探さない（分割の時間の大半は find）
+NORMAL_CHUNK = 16 << 10
+MAX_CHUNK = 64 << 10
+READ_BLOCK = 4 << 20
+PACK_SIZE = 64 << 20     # これを超えたら次のパックに切り替える
+FLUSH_BYTES = 256 << 20  # backup_tree はこの量の新規チャンクごとに fsync + commit してからマニフェストを書く
+MANIFEST_SUFFIX = ".bmsc6d"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (
+    id     BLOB PRIMARY KEY,
+    pack   INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+def _keys(K: bytes, ctx: bytes) -> tuple:
+    """(id_key, chunk_key, 照合値, Gear 表)"""
+    okm = hkdf_sha256(K, b"", DEDUP_LABEL + _aad_pack(ctx, b""), 96 + 256)
+    order = sorted(range(256), key=lambda v: (okm[96 + v], v))
+    ones = set(order[:128])
+    return okm[:32], okm[32:64], okm[64:96], bytes(1 if v in ones else 0 for v in range(256))
+
+class Chunker:
+    """内容で決まる境界でのチャンク分割（鍵付き Gear 表。境界の決まり方は冒頭の説明を参照）"""
+    def __init__(self, gear: bytes, min_size: int=MIN_CHUNK, normal_size: int=NORMAL_CHUNK, max_size: int=MAX_CHUNK):
+        if len(gear) != 256: raise ValueError("gear table must be 256 bytes")
+        if not len(PATTERN) <= min_size <= normal_size <= max_size: raise ValueError("invalid chunk size limits")
+        self._gear = gear
+        self.min_size, self.normal_size, self.max_size = min_size, normal_size, max_size
+
+    def _cut(self, bits: bytes, start: int, n: int) -> int:
+        """start から始まるチャンクの終端"""
+        i = bits.find(PATTERN, start + self.min_size - len(PATTERN), start + self.normal_size)
+        if i >= 0:
+            return i + len(PATTERN)
+        i = bits.find(PATTERN_LOOSE, start + self.normal_size - len(PATTERN_LOOSE), start + self.max_size)
+        return i + len(PATTERN_LOOSE) if i >= 0 else min(start + self.max_size, n)
+
+    def split(self, fp, block: int=READ_BLOCK):
+        """fp を読んでチャンク（memoryview）を順に返す。各 view は次のチャンクを取り出すまでの間だけ有効"""
+        buf = b""
+        while True:
+            data = fp.read(block)
+            eof = not data
+            buf = buf + data if buf else data
+            bits = buf.translate(self._gear)
+            mv = memoryview(buf)
+            start, n = 0, len(buf)
+            while n - start >= self.max_size or (eof and start < n):
+                end = self._cut(bits, start, n)
+                yield mv[start:end]
+                start = end
+            if eof:
+                return
+            buf = buf[start:]
+
+class ChunkStore:
+    """
+    with ChunkStore("backup/", K, b"BMSCv6-IV00") as store:
+        backup_tree("docs/", store)                      # → snapshots/<日時>/
+        restore_tree(store, "20260101T000000", "restored/")
+    同じストアは同じ (K_master, ctx) でしか開けない。1 つのストアへの書き込みは同時に 1 プロセスまで。
+    """
+    def __init__(self, root, K_master: bytes, ctx: bytes):
+        _check_key_iv(K_master, ctx)
+        self.root = Path(root)
+        self.ctx = bytes(ctx)
+        self._K = bytes(K_master)
+        self._id_key, self._chunk_key, check, gear = _keys(self._K, self.ctx)
+        self.chunker = Chunker(gear)
+        (self.root / "packs").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.root / "index.sqlite")
+        self._db.executescript(SCHEMA)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'check'").fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO meta VALUES ('check', ?)", (check,)); self._db.commit()
+        elif not hmac.compare_digest(row[0], check):
+            self._db.close()
+            raise ValueError("dedup store does not match this key/ctx")
+        self._pack = None      # 追記中のパック（開いたファイル）
+        self._pack_no = 0
+        self._readers = {}     # パック番号 → 読み出し用 fd
+        self.unflushed = 0     # 最後の flush 以降に書いたバイト数
+
+    # ---- チャンク -------------------------------------------------------------
+    def chunk_id(self, data) -> bytes:
+        return hmac.digest(self._id_key, data, "sha256")
+
+    def has(self, cid: bytes) -> bool:
+        return self._db.execute("SELECT 1 FROM chunks WHERE id = ?", (cid,)).fetchone() is not None
+
+    def put(self, cid: bytes, data) -> int:
+        """ストアに無ければ暗号化して追記する。返り値: 書いたバイト数（既にあれば 0）"""
+        if self.has(cid):
+            return 0
+        if self._pack is None or self._pack.tell() >= PACK_SIZE:
+            self._next_pack()
+        nonce = os.urandom(NPUBBYTES)
+        sealed = _seal(bytes(data), cid, nonce, self._chunk_key)
+        off = self._pack.tell()
+        self._pack.write(cid); self._pack.write(nonce); self._pack.write(sealed)
+        self._db.execute("INSERT INTO chunks VALUES (?, ?, ?, ?)", (cid, self._pack_no, off, len(data)))
+        n = ID_LEN + NPUBBYTES + len(sealed)
+        self.unflushed += n
+        return n
+
+    def get(self, cid: bytes) -> bytes:
+        """チャンクを復号して返す。無い・改ざんは ValueError"""
+        row = self._db.execute("SELECT pack, offset, length FROM chunks WHERE id = ?", (cid,)).fetchone()
+        if row is None:
+            raise ValueError(f"missing chunk: {cid.hex()}")
+        pack, off, length = row
+        if self._pack is not None and pack == self._pack_no:
+            self._pack.flush()  # 追記中のパックは書き込みバッファを出してから読む
+        fd = self._readers.get(pack)
+        if fd is None:
+            fd = self._readers[pack] = os.open(self._pack_path(pack), os.O_RDONLY)
+        rec = os.pread(fd, ID_LEN + NPUBBYTES + length + ABYTES, off)
+        if len(rec) != ID_LEN + NPUBBYTES + length + ABYTES or rec[:ID_LEN] != cid:
+            raise ValueError(f"chunk record corrupt: {cid.hex()}")
+        return _open(rec[ID_LEN + NPUBBYTES:], cid, rec[ID_LEN:ID_LEN + NPUBBYTES], self._chunk_key)
+
+    def _pack_path(self, no: int) -> Path:
+        return self.root / "packs" / f"{no:08d}.pack"
+
+    def _next_pack(self):
+        self._close_pack()
+        if not self._pack_no:
+            nums = [int(p.stem) for p in (self.root / "packs").glob("*.pack") if p.stem.isdigit()]
+            self._pack_no = max(nums, default=0)
+        self._pack_no += 1
+        self._pack = open(self._pack_path(self._pack_no), "xb")
+
+    def _close_pack(self):
+        if self._pack is not None:
+            self._pack.flush(); os.fsync(self._pack.fileno()); self._pack.close()
+            self._pack = None
+
+    def flush(self):
+        """パックを fsync してから索引を commit する（この後に書いたマニフェストは中断しても壊れない）"""
+        if self._pack is not None:
+            self._pack.flush(); os.fsync(self._pack.fileno())
+        self._db.commit()
+        self.unflushed = 0
+
+    def stats(self) -> dict:
+        """{"chunks", "bytes"（チャンクの平文の合計）, "stored_bytes"（パックの合計）, "packs"}"""
+        n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+        packs = list((self.root / "packs").glob("*.pack"))
+        return {"chunks": n, "bytes": total, "stored_bytes": sum(p.stat().st_size for p in packs), "packs": len(packs)}
+
+    def close(self):
+        self.flush()
+        self._close_pack()
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers.clear()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- ファイル -------------------------------------------------------------
+    def backup_file(self, src, name: str, mtime_ns: int|None=None) -> tuple:
+        """
+        src（パスかバイナリのファイルオブジェクト）をチャンクに分けてストアに入れる。mtime_ns は AAD に記録する（次回の比較用）。
+        返り値: (マニフェスト（bmsc6 v2 のバイト列）, {"size", "chunks", "new_chunks", "new_bytes", "written"})
+        マニフェストは flush() の後に保存すること（backup_tree はそうする）
+        """
+        if isinstance(src, (str, os.PathLike)):
+            with open(src, "rb") as f:
+                return self.backup_file(f, name, mtime_ns)
+        entries = []; size = new_chunks = new_bytes = written = 0
+        for chunk in self.chunker.split(src):
+            cid = self.chunk_id(chunk)
+            n = self.put(cid, chunk)
+            if n:
+                new_chunks += 1; new_bytes += len(chunk); written += n
+            entries.append(ENTRY.pack(cid, len(chunk)))
+            size += len(chunk)
+        body = b"".join(entries)
+        aad = json.dumps({"name": name, "size": size, "mtime_ns": mtime_ns, "chunks": len(entries)},
+                         ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        out = bytearray(len(body) + OUT_EXTRA)
+        header, nonce, tag, n = seal_v2_into(out, body, self._K, self.ctx, aad)
+        info = {"size": size, "chunks": len(entries), "new_chunks": new_chunks, "new_bytes": new_bytes, "written": written}
+        return bytes(header + nonce + tag + out[:n]), info
+
+    def read_manifest(self, blob) -> tuple:
+        """マニフェストを復号する。返り値: (AAD の dict, [(id, 長さ)])"""
+        ctx, aad, nonce, tag, ct, ext = unpack_v2(memoryview(blob))
+        if bytes(ctx) != self.ctx:
+            raise ValueError("manifest ctx does not match the store")
+        pt = open_v2(self._K, bytes(ctx), bytes(aad), bytes(nonce), ct, tag, ext)
+        if len(pt) % ENTRY.size:
+            raise ValueError("dedup manifest corrupt")
+        meta = json.loads(bytes(aad))
+        entries = list(ENTRY.iter_unpack(pt))
+        if not isinstance(meta, dict) or meta.get("chunks") != len(entries) or meta.get("size") != sum(l for _, l in entries):
+            raise ValueError("dedup manifest corrupt")
+        return meta, entries
+
+    def restore_file(self, blob, dst, *, name: str|None=None) -> int:
+        """
+        マニフェストのファイルを dst（パスかバイナリのファイルオブジェクト）に復元する。返り値: バイト数
+        name を渡すと、マニフェストの AAD の name と一致することも確認する
+        """
+        meta, entries = self.read_manifest(blob)
+        if name is not None and meta.get("name") != name:
+            raise ValueError("manifest name does not match its path")
+        if isinstance(dst, (str, os.PathLike)):
+            dst = Path(dst)
+            tmp = _tmp_path(dst)
+            try:
+                with open(tmp, "xb") as f:
+                    n = self._write_chunks(entries, f)
+                os.replace(tmp, dst)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+            return n
+        return self._write_chunks(entries, dst)
+
+    def _write_chunks(self, entries, f) -> int:
+        total = 0
+        for cid, length in entries:
+            data = self.get(cid)
+            if len(data) != length:
+                raise ValueError(f"chunk length mismatch: {cid.hex()}")
+            f.write(data); total += length
+        return total
+
+# ---- ディレクトリ ---------------------------------------------------------
+
+def _manifest_meta(blob) -> dict:
+    """マニフェストの AAD（認証前の値）"""
+    meta = json.loads(bytes(unpack_v2(blob)[1]))
+    return meta if isinstance(meta, dict) else {}
+
+def backup_tree(src_dir, store: ChunkStore, *, snapshot: str|None=None, parent: str|None=None,
+                rehash: bool=False, progress=None) -> dict:
+    """
+    src_dir 以下の全ファイルを store に入れ、マニフェストを snapshots/<snapshot>/<相対パス>.bmsc6d に書く。
+    snapshot の既定は開始時刻（YYYYmmddTHHMMSS）。parent（既定: 名前順で最後のスナップショット）で
+    (size, mtime_ns) が同じファイルはマニフェストをそのまま使う（rehash=True なら使わずに分割し直す）。
+    progress(done_files, total_files, done_bytes, total_bytes)。
+    返り値: {"snapshot", "parent", "files", "reused", "bytes", "chunks", "new_chunks", "new_bytes", "written",
+             "seconds", "gib_per_s", "failures"}
+    """
+    src = Path(src_dir).resolve()
+    if not src.is_dir():
+        raise ValueError(f"not a directory: {src_dir}")
+    snapshot = snapshot or time.strftime("%Y%m%dT%H%M%S")
+    if not snapshot or "/" in snapshot or "\\" in snapshot or snapshot in (".", ".."):
+        raise ValueError(f"invalid snapshot name: {snapshot}")
+    snap = store.root / "snapshots" / snapshot
+    if snap.exists():
+        raise ValueError(f"snapshot already exists: {snapshot}")
+    if parent is None:
+        parent = (list_snapshots(store) or [None])[-1]
+    elif not (store.root / "snapshots" / parent).is_dir():
+        raise ValueError(f"no such snapshot: {parent}")
+    prev = None if parent is None or rehash else store.root / "snapshots" / parent
+    t0 = time.perf_counter()
+    items = _walk(src, store.root.resolve(), lambda name: True)
+    total_bytes = sum(i[2] for i in items)
+    res = {"snapshot": snapshot, "parent": parent, "files": 0, "reused": 0, "bytes": 0,
+           "chunks": 0, "new_chunks": 0, "new_bytes": 0, "written": 0}
+    failures, pending = [], []
+
+    def flush():
+        store.flush()
+        for rel, blob in pending:
+            _write_atomic(snap / (rel + MANIFEST_SUFFIX), [blob])
+        pending.clear()
+
+    def reuse(rel, size, mtime):
+        """前回のマニフェスト（同じ size と mtime_ns のとき）"""
+        try:
+            blob = (prev / (rel + MANIFEST_SUFFIX)).read_bytes()
+            meta = _manifest_meta(blob)
+        except (ValueError, OSError):
+            return None
+        if meta.get("size") != size or meta.get("mtime_ns") != mtime or meta.get("name") != rel:
+            return None
+        return blob, meta
+
+    snap.mkdir(parents=True)
+    for p, rel, size, mtime in items:
+        hit = reuse(rel, size, mtime) if prev is not None else None
+        if hit is not None:
+            blob, meta = hit
+            res["reused"] += 1; res["chunks"] += meta.get("chunks", 0)
+        else:
+            try:
+                blob, info = store.backup_file(p, rel, mtime)
+            except OSError as e:
+                failures.append({"path": rel, "error": str(e) or type(e).__name__})
+                continue
+            size = info["size"]
+            for k in ("chunks", "new_chunks", "new_bytes", "written"):
+                res[k] += info[k]
+        pending.append((rel, blob))
+        res["files"] += 1; res["bytes"] += size
+        if store.unflushed >= FLUSH_BYTES:
+            flush()
+        if progress is not None:
+            progress(res["files"], len(items), res["bytes"], total_bytes)
+    flush()
+    dt = max(time.perf_counter() - t0, 1e-9)
+    return dict(res, seconds=round(dt, 3), gib_per_s=round(res["bytes"] / dt / (1 << 30), 3), failures=failures)
+
+def list_snapshots(store: ChunkStore) -> list:
+    d = store.root / "snapshots"
+    return sorted(p.name for p in d.iterdir() if p.is_dir()) if d.is_dir() else []
+
+def restore_tree(store: ChunkStore, snapshot: str, dst_dir, *, progress=None) -> dict:
+    """
+    スナップショットを dst_dir/<相対パス> に復元する（マニフェストの AAD の name が相対パスと一致することも確認する）。
+    progress(done_files, total_files, done_bytes, total_bytes)。返り値: {"snapshot", "files", "bytes", "seconds", "gib_per_s", "failures"}
+    """
+    snap = store.root / "snapshots" / snapshot
+    if not snap.is_dir():
+        raise ValueError(f"no such snapshot: {snapshot}")
+    dst = Path(dst_dir)
+    t0 = time.perf_counter()
+    items, failures = [], []
+    for p, rel, _, _ in _walk(snap.resolve(), dst.resolve(), lambda name: name.endswith(MANIFEST_SUFFIX), own=True):
+        rel = rel[:-len(MANIFEST_SUFFIX)]
+        try:
+            blob = p.read_bytes()
+            size = _manifest_meta(blob).get("size")  # 進捗の総量用（認証前の値）
+        except (ValueError, OSError) as e:
+            failures.append({"path": rel, "error": str(e) or type(e).__name__}); continue
+        items.append((rel, blob, size if isinstance(size, int) else 0))
+    total_bytes = sum(i[2] for i in items)
+    files = total = 0
+    for rel, blob, _ in items:
+        try:
+            out = dst / rel
+            out.parent.mkdir(parents=True, exist_ok=True)
+            total += store.restore_file(blob, out, name=rel); files += 1
+        except (ValueError, OSError) as e:
+            failures.append({"path": rel, "error": str(e) or type(e).__name__})
+        if progress is not None:
+            progress(files, len(items), total, total_bytes)
+    dt = max(time.perf_counter() - t0, 1e-9)
+    return {"snapshot": snapshot, "files": files, "bytes": total, "seconds": round(dt, 3),
+            "gib_per_s": round(total / dt / (1 << 30), 3), "failures": failures}
@@ -0,0 +1,158 @@
+# bmsc_v6_envelope.py
+"""
+複数受信者向けの封筒（ヘッダ拡張 FLAG_RCPT、SPEC.md §3.4）
+
+本文はランダムなデータ鍵（DEK）で 1 回だけ暗号化し、DEK を受信者ごとの鍵で包んだ受信者表をヘッダに置く。
+受信者は表の自分の項目から DEK を取り出して復号する（ct は読まない。KID 付きの項目は直接選び、KID の無い項目は順に試す）。
+N 受信者のコストは O(本文 + N × (49 + KID 長) バイト)。
+
+受信者表: env_nonce(24) + { kid_len(1) + kid + wrapped(48) } × N
+    wrap_key_i = HKDF-SHA256(ikm=K_i, salt=env_nonce, info="BMSCv6-wrap:" || kid, 32)
+    wrapped_i  = XChaCha20-Poly1305(wrap_key_i, nonce=env_nonce, ad="BMSCv6-wrap:" || kid_len || kid, DEK)  # 32 + 16
+wrap_key は (K_i, env_nonce, kid) ごとに異なるので、nonce を共有しても (鍵, nonce) は再利用されない。
+受信者表は本文の AD に含めない（flags のビットは含む）ので、本文を再暗号化せずに表だけを書き換えられる（rewrap）。
+"""
+import os
+
+from bmsc_v6_prod import hkdf_sha256, _seal, _open, NPUBBYTES, ABYTES, KEYBYTES
+
+WRAP_LABEL = b"BMSCv6-wrap:"
+WRAPPED_LEN = KEYBYTES + ABYTES  # 48
+MAX_KID_LEN = 255
+
+class NoRecipientEntry(ValueError):
+    """受信者表にこの鍵で開ける項目が無い（鍵違い。復号側では認証失敗として扱う）"""
+
+def _kid_bytes(kid: str|None) -> bytes:
+    if kid is None:
+        return b""
+    b = kid.encode("utf-8")
+    if not 0 < len(b) <= MAX_KID_LEN: raise ValueError("kid must be 1..255 bytes (UTF-8)")
+    return b
+
+def _wrap_key(K: bytes, env_nonce: bytes, kid: bytes) -> bytes:
+    return hkdf_sha256(K, env_nonce, WRAP_LABEL + kid, KEYBYTES)
+
+def wrap_entry(dek: bytes, K: bytes, env_nonce: bytes, kid: str|None) -> bytes:
+    """1 受信者分の項目（kid_len + kid + wrapped）"""
+    if not isinstance(K, (bytes, bytearray)) or len(K) != 32: raise ValueError("K_master must be 32 bytes")
+    kb = _kid_bytes(kid)
+    wrapped = _seal(dek, WRAP_LABEL + bytes([len(kb)]) + kb, env_nonce, _wrap_key(bytes(K), env_nonce, kb))
+    return bytes([len(kb)]) + kb + wrapped
+
+def pack_table(dek: bytes, recipients, env_nonce: bytes|None=None) -> bytes:
+    """recipients: [(kid|None, K)] → 受信者表"""
+    env_nonce = os.urandom(NPUBBYTES) if env_nonce is None else env_nonce
+    return env_nonce + b"".join(wrap_entry(dek, K, env_nonce, kid) for kid, K in recipients)
+
+def _spans(buf: bytes) -> list:
+    """各項目の (開始, 終了) 位置"""
+    if len(buf) < NPUBBYTES:
+        raise ValueError("malformed bmsc6 recipient table")
+    off, spans = NPUBBYTES, []
+    while off < len(buf):
+        end = off + 1 + buf[off] + WRAPPED_LEN
+        if end > len(buf):
+            raise ValueError("malformed bmsc6 recipient table")
+        spans.append((off, end)); off = end
+    if not spans:
+        raise ValueError("malformed bmsc6 recipient table")
+    return spans
+
+def parse_table(buf) -> tuple:
+    """受信者表 → (env_nonce, [(kid|None, wrapped)])。形式が不正なら ValueError"""
+    buf = bytes(buf)
+    entries = []
+    for off, end in _spans(buf):
+        n = buf[off]
+        kid = buf[off+1:off+1+n].decode("utf-8", errors="replace") if n else None
+        entries.append((kid, buf[off+1+n:end]))
+    return buf[:NPUBBYTES], entries
+
+def _unwrap_one(K: bytes, env_nonce: bytes, kid: str|None, wrapped: bytes) -> bytes:
+    kb = _kid_bytes(kid)
+    return _open(wrapped, WRAP_LABEL + bytes([len(kb)]) + kb, env_nonce, _wrap_key(K, env_nonce, kb))
+
+def _candidates(entries, K_master):
+    """(項目番号, 鍵, kid, wrapped) の試す順の列"""
+    if hasattr(K_master, "key_for"):
+        out = [(i, K_master.key_for(kid), kid, w) for i, (kid, w) in enumerate(entries) if kid is not None and kid in K_master]
+        return out + [(i, K_master.key_for(k), None, w) for i, (kid, w) in enumerate(entries) if kid is None for k in K_master]
+    return [(i, bytes(K_master), kid, w) for i, (kid, w) in enumerate(entries)]
+
+def unwrap(table, K_master) -> bytes:
+    """
+    受信者表から DEK を取り出す。K_master は 32B 鍵か鍵束（key_for / __contains__ / __iter__）。
+    鍵束は KID の一致する項目だけを開き、KID の無い項目は鍵束の全鍵で試す。32B 鍵は全項目を試す（項目は 48B なので安い）。
+    """
+    env_nonce, entries = parse_table(table)
+    for _, K, kid, wrapped in _candidates(entries, K_master):
+        try:
+            return _unwrap_one(K, env_nonce, kid, wrapped)
+        except ValueError:
+            continue
+    raise NoRecipientEntry("no recipient entry for this key")
+
+KEEP = object()
+
+def rewrap(table, K_old, K_new: bytes, new_kid=KEEP) -> tuple:
+    """
+    K_old（32B 鍵か鍵束）で開ける項目を K_new で包み直す（鍵のローテーション）。
+    env_nonce と他の受信者の項目はそのまま。new_kid を省略すると項目の KID を引き継ぐ。
+    返り値: (新しい表, 置き換えた項目数)。開ける項目が無ければ ValueError
+    """
+    table = bytes(table)
+    env_nonce, entries = parse_table(table)
+    new = {}
+    for i, K, kid, wrapped in _candidates(entries, K_old):
+        if i in new:
+            continue
+        try:
+            dek = _unwrap_one(K, env_nonce, kid, wrapped)
+        except ValueError:
+            continue
+        new[i] = wrap_entry(dek, K_new, env_nonce, entries[i][0] if new_kid is KEEP else new_kid)
+    if not new:
+        raise NoRecipientEntry("no recipient entry for this key")
+    parts = [new.get(i) or table[off:end] for i, (off, end) in enumerate(_spans(table))]
+    return env_nonce + b"".join(parts), len(new)
+
+def table_kids(table) -> list:
+    """受信者表の KID の列（KID の無い項目は None）"""
+    return [kid for kid, _ in parse_table(table)[1]]
+
+class Recipients:
+    """
+    暗号化の宛先。K_master の代わりに seal_v2_into / Bmsc6Writer / encrypt_stream / encrypt_parallel /
+    encrypt_tree / encrypt_upload 等へそのまま渡すと、ファイルごとに DEK を作って受信者表をヘッダに入れる。
+        Recipients({"team-a": Ka, "team-b": Kb})        # KID 付き（受信者は鍵束の KID で項目を直接選ぶ）
+        Recipients([Ka, Kb])                            # KID 無し（受信者は各項目を試す）
+        Recipients.from_keyring(ring, ["team-a", "team-b"])
+    """
+    def __init__(self, recipients):
+        if isinstance(recipients, dict):
+            recipients = recipients.items()
+        items = []
+        for r in recipients:
+            kid, K = r if isinstance(r, tuple) else (None, r)
+            _kid_bytes(kid)
+            if not isinstance(K, (bytes, bytearray)) or len(K) != 32: raise ValueError("K_master must be 32 bytes")
+            if kid is not None and any(kid == k for k, _ in items): raise ValueError(f"duplicate kid: {kid}")
+            items.append((kid, bytes(K)))
+        if not items: raise ValueError("no recipients")
+        self._items = items
+
+    @classmethod
+    def from_keyring(cls, ring, kids) -> "Recipients":
+        return cls([(kid, ring.key_for(kid)) for kid in kids])
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def data_key(self) -> tuple:
+        """新しい (DEK, 受信者表)"""
+        dek = os.urandom(KEYBYTES)
+        return dek, pack_table(dek, self._items)
@@ -0,0 +1,106 @@
+# bmsc_v6_index.py
+"""
+bmsc6 アーカイブのヘッダ索引（SQLite、標準ライブラリのみ）
+
+各ファイルのヘッダ（Bmsc6Header）だけを読み、パス・版・KID・ctx と AAD の name/size/sha256 を 1 行ずつ記録する。
+一度作れば、name や sha256 からのファイル検索はファイルに触れずに索引だけで済む。
+update は (mtime_ns, ファイルサイズ) が変わっていないファイルを読み直さないので、定期的に再実行しても安い。
+索引の値は認証前のヘッダの内容（改ざんの検出は verify か復号で行う）。
+"""
+import os, json, sqlite3
+
+from bmsc_v6_container import Bmsc6Header
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    file_size   INTEGER NOT NULL,
+    ver         INTEGER NOT NULL,
+    kid         TEXT,
+    compression TEXT,
+    ctx         TEXT,
+    name        TEXT,
+    size        INTEGER,
+    sha256      TEXT,
+    plain_len   INTEGER,
+    header      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_name   ON files(name);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+"""
+COMMIT_EVERY = 1000
+
+class HeaderIndex:
+    """
+    with HeaderIndex("archive.sqlite") as idx:
+        idx.update(iter_paths(["archive/"]))
+        idx.find(sha256="…")            # → [Bmsc6Header.as_dict() の dict, ...]
+    """
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def add(self, h: Bmsc6Header, mtime_ns: int):
+        """1 件を記録する（同じパスは置き換え）。h.path と h.file_size が必要。sha256 は小文字で記録（find と同じ）"""
+        meta = h.meta or {}
+        pick = lambda k, t: meta.get(k) if isinstance(meta.get(k), t) else None
+        sha256 = pick("sha256", str)
+        d = h.as_dict()
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (d["path"], mtime_ns, h.file_size, h.ver, d["kid"], d["compression"], d["ctx"],
+             pick("name", str), pick("size", int), sha256 and sha256.lower(), d["plain_len"],
+             json.dumps(d, ensure_ascii=False, separators=(",", ":"))))
+
+    def update(self, paths, progress=None) -> dict:
+        """
+        paths のヘッダを読んで記録する（変わっていないファイルは読まない）。
+        progress(done, indexed) は 1 件ごとに呼ばれる。返り値: {"files", "indexed", "unchanged", "failures": [{"path", "error"}]}
+        """
+        done = indexed = 0; failures = []
+        for p in paths:
+            p = os.path.abspath(p); done += 1
+            try:
+                st = os.stat(p)
+                row = self._db.execute("SELECT mtime_ns, file_size FROM files WHERE path = ?", (p,)).fetchone()
+                if row != (st.st_mtime_ns, st.st_size):
+                    self.add(Bmsc6Header.read(p), st.st_mtime_ns)
+                    indexed += 1
+                    if indexed % COMMIT_EVERY == 0:
+                        self._db.commit()
+            except (ValueError, OSError) as e:
+                failures.append({"path": p, "error": str(e) or type(e).__name__})
+            if progress is not None:
+                progress(done, indexed)
+        self._db.commit()
+        return {"files": done, "indexed": indexed, "unchanged": done - indexed - len(failures), "failures": failures}
+
+    def prune(self) -> int:
+        """存在しなくなったファイルの行を消す。返り値: 消した件数"""
+        gone = [(p,) for (p,) in self._db.execute("SELECT path FROM files") if not os.path.exists(p)]
+        self._db.executemany("DELETE FROM files WHERE path = ?", gone)
+        self._db.commit()
+        return len(gone)
+
+    def find(self, *, name: str|None=None, sha256: str|None=None, kid: str|None=None) -> list:
+        """条件（AND）に合う行の dict のリスト（パス順）。条件が無ければ全件"""
+        where, args = [], []
+        for col, v in (("name", name), ("sha256", sha256 and sha256.lower()), ("kid", kid)):
+            if v is not None:
+                where.append(f"{col} = ?"); args.append(v)
+        sql = "SELECT header FROM files" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY path"
+        return [json.loads(h) for (h,) in self._db.execute(sql, args)]
@@ -0,0 +1,109 @@
+# bmsc_v6_keyring.py
+"""
+鍵束（KID → 32B 鍵）
+
+ファイル形式（JSON、0600 で保存）:
+    {"version": 1, "default": "2024-q3", "keys": {"2024-q1": "<64桁 HEX>", "2024-q3": "..."}}
+起動時に 1 回読み込んで dict で保持し、key_for(kid) で O(1) に引く。
+暗号化は既定の KID（または指定の KID）の鍵を使い、KID をコンテナのヘッダ拡張に認証付きで埋め込む（SPEC.md §3.4）。
+復号はヘッダの KID で鍵を直接選ぶので、鍵を順に試す必要がない。
+Keyring は K_master の代わりに Bmsc6Writer / Bmsc6Reader / open_bmsc6 / encrypt_tree / decrypt_tree 等へそのまま渡せる。
+"""
+import os, json, hashlib
+from pathlib import Path
+
+from bmsc_v6_container import kid_ext
+
+VERSION = 1
+
+class UnknownKid(ValueError):
+    """鍵束に無い KID（ファイルのヘッダの KID・指定の KID）"""
+
+def fingerprint(K: bytes) -> str:
+    """鍵の識別用指紋（鍵そのものは表示しない）"""
+    return hashlib.sha256(b"BMSCv6-keyring-fp:" + K).hexdigest()[:16]
+
+class Keyring:
+    """
+    KID → 鍵。
+        ring = Keyring.load("keys.json")
+        encrypt_stream(src, dst, ring, ctx)      # 既定の KID で暗号化し、KID をヘッダに入れる
+        Bmsc6Reader(fp, ring)                    # ヘッダの KID で鍵を選ぶ
+    KID の無い（flags=0 の）コンテナには既定の鍵を使う。
+    """
+    def __init__(self, keys: dict|None=None, default: str|None=None):
+        self._keys = {}
+        self._default = None
+        for kid, K in (keys or {}).items():
+            self.add(kid, K)
+        if default is not None:
+            self.set_default(default)
+
+    @classmethod
+    def load(cls, path) -> "Keyring":
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        if not isinstance(d, dict) or d.get("version") != VERSION or not isinstance(d.get("keys"), dict):
+            raise ValueError(f"not a bmsc6 keyring: {path}")
+        try:
+            keys = {kid: bytes.fromhex(h) for kid, h in d["keys"].items()}
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid key in keyring: {path}") from None
+        return cls(keys, d.get("default"))
+
+    def save(self, path):
+        """0600 で書き出す（一時ファイル経由で置き換え）"""
+        path = Path(path)
+        d = {"version": VERSION, "default": self._default,
+             "keys": {kid: K.hex() for kid, K in self._keys.items()}}
+        tmp = path.with_name(path.name + ".part")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(d, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def add(self, kid: str, K: bytes, *, default: bool=False):
+        if not isinstance(kid, str): raise TypeError("kid must be str")
+        kid_ext(kid)  # 長さの検査（UTF-8 で 1..255B）
+        if not isinstance(K, (bytes, bytearray)) or len(K) != 32: raise ValueError(f"K_master must be 32 bytes: {kid}")
+        if kid in self._keys: raise ValueError(f"duplicate kid: {kid}")
+        self._keys[kid] = bytes(K)
+        if default or self._default is None:
+            self._default = kid
+
+    def generate(self, kid: str, *, default: bool=False) -> bytes:
+        K = os.urandom(32)
+        self.add(kid, K, default=default)
+        return K
+
+    def set_default(self, kid: str):
+        if kid not in self._keys: raise UnknownKid(f"unknown kid: {kid}")
+        self._default = kid
+
+    @property
+    def default_kid(self) -> str:
+        if self._default is None: raise ValueError("keyring is empty")
+        return self._default
+
+    def key_for(self, kid: str|None) -> bytes:
+        """kid の鍵（None なら既定の鍵）。未知の KID は UnknownKid"""
+        if kid is None:
+            kid = self.default_kid
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise UnknownKid(f"unknown kid: {kid}") from None
+
+    def __contains__(self, kid) -> bool:
+        return kid in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
@@ -0,0 +1,306 @@
+# bmsc_v6_pack.py
+"""
+多数の小さな暗号化レコード（チャットのメッセージ・ログの行など）を 1 ファイルに詰める pack 形式
+
+1 件 1 ファイルの .bmsc6 v2 は inode とヘッダを浪費し、CLI の JSON（Base64 の NONCE/CT/TAG）は 33% 膨らんで
+検索が O(n) になる。pack は ctx を共有するヘッダ 1 つの後ろにレコードをバイナリのまま並べ、末尾の索引
+（レコードの開始位置の表）で k 件目を mmap 上の 1 回の参照で取り出す。
+
+ファイル:
+    header : MAGIC "BMSC6P"(6) || ver(1)=1 || flags(1)=0 || ctx_len(2 BE) || pack_id(16) || ctx
+    record : aad_len(4 BE) || ct_len(4 BE) || nonce(24) || aad || ct || tag(16)      （× n、追記のみ）
+    index  : 各レコードの開始位置(8 BE) × n
+    footer : index_off(8 BE) || n(8 BE) || "BMSC6PIX"(8)
+各レコードは bmsc_v6_encrypt（BmscCipher）と同じ暗号化で、AAD に pack_id とレコード番号を加える:
+    bmsc_v6_encrypt(pt, K_master, ctx, aad=pack_id || k(8 BE) || aad)
+索引は認証しないが、索引を書き換えて別のレコード・別の pack のレコードを指させても認証で失敗する。
+末尾のレコードをまとめて切り落とすこと（索引ごと作り直した場合）は検出できない。
+
+追記: Bmsc6PackWriter は索引を外してレコードを追記し、flush()/close() で索引とフッタを書き直す。
+フッタが無いファイル（追記中の異常終了）はレコードを先頭から辿って索引を作り直す（末尾の書きかけと、
+認証に失敗する末尾のレコードは捨てる）。
+"""
+import os, sys, mmap, struct
+from array import array
+
+from bmsc_v6_prod import BmscCipher, DecryptedBatch, _check_key_iv, NPUBBYTES, ABYTES
+
+PACK_MAGIC = b"BMSC6P"
+PACK_VERSION = 1
+PACK_ID_LEN = 16
+FOOTER_MAGIC = b"BMSC6PIX"
+SUFFIX = ".bmsc6p"
+_HEAD = struct.Struct(">6sBBH16s")
+_REC = struct.Struct(">II24s")
+_FOOTER = struct.Struct(">QQ8s")
+
+def _record_aad(pack_id: bytes, k: int, aad: bytes) -> bytes:
+    return pack_id + k.to_bytes(8, "big") + aad
+
+def _parse_head(buf) -> tuple:
+    """→ (pack_id, ctx, ヘッダ長)"""
+    if len(buf) < _HEAD.size:
+        raise ValueError("not a bmsc6 pack")
+    magic, ver, flags, ctx_len, pack_id = _HEAD.unpack_from(buf)
+    if magic != PACK_MAGIC:
+        raise ValueError("not a bmsc6 pack")
+    if ver != PACK_VERSION or flags:
+        raise ValueError(f"unsupported bmsc6 pack version: {ver}")
+    end = _HEAD.size + ctx_len
+    if len(buf) < end:
+        raise ValueError("bmsc6 pack header too short")
+    return pack_id, bytes(buf[_HEAD.size:end]), end
+
+def _load_index(mm, start: int) -> tuple:
+    """フッタから索引を読む。→ (開始位置の array, index_off)。フッタが無い・合わなければ None"""
+    size = len(mm)
+    if size < start + _FOOTER.size:
+        return None
+    index_off, n, magic = _FOOTER.unpack_from(mm, size - _FOOTER.size)
+    if magic != FOOTER_MAGIC or index_off < start or index_off + 8 * n + _FOOTER.size != size:
+        return None
+    offsets = array("Q", mm[index_off:index_off + 8 * n])
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    if n and (offsets[0] != start or offsets[-1] >= index_off):
+        return None
+    return offsets, index_off
+
+def _scan(mm, start: int, end: int) -> tuple:
+    """レコードを先頭から辿る（フッタが無いとき）。→ (開始位置の array, 最後の完全なレコードの終端)"""
+    offsets = array("Q")
+    off = start
+    while off + _REC.size + ABYTES <= end:
+        aad_len, ct_len, _ = _REC.unpack_from(mm, off)
+        nxt = off + _REC.size + aad_len + ct_len + ABYTES
+        if nxt > end:
+            break
+        offsets.append(off); off = nxt
+    return offsets, off
+
+class _PackBase:
+    """Writer/Reader 共通: レコード k の分解と復号"""
+    def _parts(self, mm, k: int, end: int) -> tuple:
+        """→ (nonce, aad, ct, tag)。end はレコード k の終端"""
+        off = self._offsets[k]
+        aad_len, ct_len, nonce = _REC.unpack_from(mm, off)
+        a = off + _REC.size; c = a + aad_len; t = c + ct_len
+        if t + ABYTES != end:
+            raise ValueError("bmsc6 pack record corrupt")
+        return nonce, mm[a:c], mm[c:t], mm[t:end]
+
+    def _open(self, k: int, nonce: bytes, aad: bytes, ct: bytes, tag: bytes) -> bytes:
+        return self._cipher.decrypt(nonce, ct, tag, _record_aad(self.pack_id, k, aad))
+
+class Bmsc6PackReader(_PackBase):
+    """
+    pack の読み出し（mmap）。k 件目の取り出しは索引の参照 1 回とレコード 1 件の認証・復号だけ。
+        with Bmsc6PackReader("chat.bmsc6p", K) as r:
+            r[123]              # 平文
+            r.record(123)       # (平文, aad)
+            for pt, aad in r:   # 先頭から順に
+    ctx を渡すとヘッダの ctx と一致することも確認する。認証失敗は ValueError("auth failed")
+    """
+    def __init__(self, path, K_master: bytes, ctx: bytes|None=None):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            self.pack_id, self.ctx, start = _parse_head(self._mm)
+            if ctx is not None and bytes(ctx) != self.ctx:
+                raise ValueError("bmsc6 pack ctx mismatch")
+            _check_key_iv(K_master, self.ctx)
+            self._cipher = BmscCipher(K_master, self.ctx)
+            found = _load_index(self._mm, start)
+            if found is not None:
+                self._offsets, self._end = found
+                self.recovered = False
+            else:
+                self._offsets, self._end = _scan(self._mm, start, len(self._mm))
+                self.recovered = True
+                # 索引の書きかけがレコードに見えることがあるので、末尾は認証できるものまで戻る
+                while len(self._offsets) and not self._ok(len(self._offsets) - 1):
+                    self._end = self._offsets.pop()
+        except BaseException:
+            self.close()
+            raise
+
+    def _ok(self, k: int) -> bool:
+        try:
+            self.record(k); return True
+        except ValueError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _bounds(self, k: int) -> int:
+        n = len(self._offsets)
+        if k < 0: k += n
+        if not 0 <= k < n: raise IndexError("pack index out of range")
+        return k
+
+    def _next(self, k: int) -> int:
+        return self._offsets[k + 1] if k + 1 < len(self._offsets) else self._end
+
+    def aad(self, k: int) -> bytes:
+        """k 件目の AAD（復号しない。認証前の値）"""
+        k = self._bounds(k)
+        return self._parts(self._mm, k, self._next(k))[1]
+
+    def record(self, k: int) -> tuple:
+        """k 件目の (平文, aad)"""
+        k = self._bounds(k)
+        nonce, aad, ct, tag = self._parts(self._mm, k, self._next(k))
+        return self._open(k, nonce, aad, ct, tag), aad
+
+    def __getitem__(self, k: int) -> bytes:
+        return self.record(k)[0]
+
+    def __iter__(self):
+        """先頭から順に (平文, aad)。認証に失敗したレコードで ValueError"""
+        for k in range(len(self._offsets)):
+            nonce, aad, ct, tag = self._parts(self._mm, k, self._next(k))
+            yield self._open(k, nonce, aad, ct, tag), aad
+
+    def decrypt_range(self, start: int=0, stop: int|None=None) -> DecryptedBatch:
+        """[start, stop) をまとめて復号する。認証失敗は例外にせず .failed に記録（番号は start からの相対）"""
+        stop = len(self._offsets) if stop is None else min(stop, len(self._offsets))
+        items, aads = [], []
+        for k in range(start, stop):
+            nonce, aad, ct, tag = self._parts(self._mm, k, self._next(k))
+            items.append((nonce, ct, tag)); aads.append(_record_aad(self.pack_id, k, aad))
+        return self._cipher.decrypt_many(items, aads)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Bmsc6PackWriter(_PackBase):
+    """
+    pack への追記（無ければ作成）。1 つの pack への書き込みは同時に 1 つまで。
+        with Bmsc6PackWriter("chat.bmsc6p", K, b"BMSCv6-IV00") as w:
+            k = w.append(b"hello", aad=b'{"from":"alice"}')     # → レコード番号
+            w.append_many(messages, aads)                       # → range
+    flush()/close() で索引を書き、fsync する（それまでの追記は異常終了すると先頭から辿り直して復元する）。
+    """
+    def __init__(self, path, K_master: bytes, ctx: bytes):
+        _check_key_iv(K_master, ctx)
+        ctx = bytes(ctx)
+        self.path = path
+        self._cipher = BmscCipher(K_master, ctx)
+        try:
+            self._f = open(path, "xb+")
+        except FileExistsError:
+            self._f = open(path, "rb+")
+        try:
+            self._open_existing(ctx) if os.fstat(self._f.fileno()).st_size else self._create(ctx)
+        except BaseException:
+            self._f.close()
+            raise
+
+    def _create(self, ctx: bytes):
+        self.pack_id, self.ctx = os.urandom(PACK_ID_LEN), ctx
+        head = _HEAD.pack(PACK_MAGIC, PACK_VERSION, 0, len(ctx), self.pack_id) + ctx
+        self._f.write(head)
+        self._offsets = array("Q")
+        self._end = len(head)
+        self._indexed = False
+        self.flush()
+
+    def _open_existing(self, ctx: bytes):
+        with mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self.pack_id, self.ctx, start = _parse_head(mm)
+            if self.ctx != ctx:
+                raise ValueError("bmsc6 pack ctx mismatch")
+            found = _load_index(mm, start)
+            if found is not None:
+                self._offsets, self._end = found
+            else:
+                self._offsets, self._end = _scan(mm, start, len(mm))
+            # 最後のレコードで鍵を確かめる（フッタが無いときは認証できないものを末尾から捨てる）
+            while len(self._offsets):
+                k = len(self._offsets) - 1
+                try:
+                    self._open(k, *self._parts(mm, k, self._end))
+                    break
+                except ValueError:
+                    if found is not None:
+                        raise ValueError("bmsc6 pack does not match this key") from None
+                    self._end = self._offsets.pop()
+        self._indexed = True
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _begin(self):
+        """索引を外して追記位置に移る"""
+        if self._indexed:
+            self._f.truncate(self._end)
+            self._indexed = False
+        self._f.seek(self._end)
+
+    def _write(self, nonce: bytes, aad: bytes, ct, tag) -> int:
+        k = len(self._offsets)
+        self._f.write(_REC.pack(len(aad), len(ct), nonce)); self._f.write(aad); self._f.write(ct); self._f.write(tag)
+        self._offsets.append(self._end)
+        self._end += _REC.size + len(aad) + len(ct) + ABYTES
+        return k
+
+    def append(self, plaintext: bytes, aad: bytes=b"") -> int:
+        """1 件追記する。返り値: レコード番号"""
+        self._begin()
+        aad = bytes(aad)
+        nonce, ct, tag = self._cipher.encrypt(plaintext, _record_aad(self.pack_id, len(self._offsets), aad))
+        return self._write(nonce, aad, ct, tag)
+
+    def append_many(self, plaintexts, aads=None) -> range:
+        """
+        まとめて追記する（BmscCipher.encrypt_many。nonce の乱数もまとめて取る）。
+        aads: None（全件 b""）/ bytes（全件共通）/ 平文と同じ長さのシーケンス。返り値: 追加したレコード番号の range
+        """
+        plaintexts = list(plaintexts)
+        if aads is None or isinstance(aads, (bytes, bytearray)):
+            aads = [bytes(aads or b"")] * len(plaintexts)
+        else:
+            aads = [bytes(a) for a in aads]
+            if len(aads) != len(plaintexts): raise ValueError("aads must match plaintexts")
+        self._begin()
+        first = len(self._offsets)
+        batch = self._cipher.encrypt_many(plaintexts, [_record_aad(self.pack_id, first + i, a) for i, a in enumerate(aads)])
+        for (nonce, ct, tag), aad in zip(batch._views(), aads):
+            self._write(bytes(nonce), aad, ct, tag)
+        return range(first, len(self._offsets))
+
+    def flush(self):
+        """索引とフッタを書いて fsync する"""
+        if not self._indexed:
+            self._f.seek(self._end)
+            idx = array("Q", self._offsets)
+            if sys.byteorder == "little":
+                idx.byteswap()
+            self._f.write(idx.tobytes())
+            self._f.write(_FOOTER.pack(self._end, len(self._offsets), FOOTER_MAGIC))
+            self._indexed = True
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
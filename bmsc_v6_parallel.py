@@ -0,0 +1,117 @@
+# bmsc_v6_parallel.py
+"""
+bmsc6 v3 の並列暗号化/復号（チャンク単位）
+
+v3 の各チャンクは (K_enc, nonce_i, AD_i) だけで独立に処理できるので、
+スレッドプール（libsodium 呼び出し中は GIL が解放される）かプロセスプールに分配し、
+結果はチャンク順に書き出す。nonce が同じなら workers 数によらず Bmsc6Writer と同一のバイト列になる。
+圧縮付き（compress=）はチャンクごとの圧縮もワーカーで行う。
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bmsc_v6_prod import NPUBBYTES
+from bmsc_v6_container import (
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, TAG_LEN, pack_v3_header, read_header,
+    seal_key, resolve_key, stream_keys, comp_info, _check_master, _comp_algo, _stream_comp, _read_exact,
+    _read_record, _seal_record, _open_record,
+)
+
+def _run_ordered(executor, jobs, depth: int, write):
+    """jobs の (fn, *args) を順に投入し、結果を投入順に write する（同時実行は最大 depth 件）"""
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append(executor.submit(*job))
+            if len(pending) >= depth:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    except BaseException:
+        for f in pending: f.cancel()
+        raise
+
+def _execute(jobs, write, workers: int|None, executor):
+    workers = workers or os.cpu_count() or 1
+    depth = 2 * workers  # 先読みチャンク数（メモリ上限 ≒ depth * chunk_size）
+    if executor is not None:
+        _run_ordered(executor, jobs, depth, write)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        _run_ordered(ex, jobs, depth, write)
+
+def encrypt_parallel(src, dst, K_master: bytes, ctx: bytes, aad: bytes=b"",
+                     chunk_size: int=DEFAULT_CHUNK_SIZE, workers: int|None=None,
+                     *, executor=None, nonce: bytes|None=None, kid: str|None=None,
+                     compress: str|None=None) -> int:
+    """
+    src → dst に bmsc6 v3 を並列に書く。返り値: 平文バイト数
+    executor に ProcessPoolExecutor 等を渡すとそれを使う（workers は先読み数の目安）。
+    compress は Bmsc6Writer と同じ（"auto" は最初のチャンクで決める）。
+    """
+    K_master, ext = seal_key(K_master, kid)
+    _comp_algo(compress)
+    if not isinstance(ctx, (bytes, bytearray)): raise TypeError("ctx must be bytes")
+    if not isinstance(aad, (bytes, bytearray)): raise TypeError("aad must be bytes")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE: raise ValueError("invalid chunk_size")
+    if nonce is None:
+        nonce = os.urandom(NPUBBYTES)
+    elif len(nonce) != NPUBBYTES:
+        raise ValueError("nonce must be 24 bytes")
+    ctx = bytes(ctx); aad = bytes(aad); nonce = bytes(nonce)
+    first = _read_exact(src, chunk_size)
+    ext, algo = _stream_comp(ext, compress, first)
+    key, ad = stream_keys(K_master, nonce, ctx, aad, ext)
+    total = 0
+
+    def jobs():
+        nonlocal total
+        cur = first; index = 0
+        while True:
+            # chunk_size ちょうどで EOF の場合もそのチャンクが最終
+            nxt = _read_exact(src, chunk_size) if len(cur) == chunk_size else b""
+            final = not nxt
+            total += len(cur)
+            yield (_seal_record, key, nonce, ad, index, final, cur, algo)
+            if final: return
+            cur = nxt; index += 1
+
+    dst.write(pack_v3_header(ctx, aad, nonce, chunk_size, ext))
+    _execute(jobs(), dst.write, workers, executor)
+    return total
+
+def decrypt_parallel(src, dst, K_master: bytes, aad: bytes|None=None,
+                     workers: int|None=None, *, executor=None) -> int:
+    """src の bmsc6 v3 を並列に復号し、チャンク順に dst へ書く。返り値: 平文バイト数"""
+    K_master = _check_master(K_master)
+    _, flags, ctx, embedded_aad, nonce, chunk_size, ext = read_header(src)
+    key, ad = stream_keys(resolve_key(K_master, ext), nonce, ctx, embedded_aad if aad is None else bytes(aad), ext)
+    algo = comp_info(ext)[0]
+    rec_len = chunk_size + TAG_LEN
+    total = 0
+
+    def jobs():
+        if algo:
+            # 圧縮付き: 長さ前置のレコード。次が EOF なら最終
+            cur = _read_record(src, chunk_size); index = 0
+            if cur is None: raise ValueError("bmsc6 v3 truncated")
+            while True:
+                nxt = _read_record(src, chunk_size)
+                yield (_open_record, key, nonce, ad, index, nxt is None, cur, algo, chunk_size)
+                if nxt is None: return
+                cur = nxt; index += 1
+        cur = _read_exact(src, rec_len); index = 0
+        while True:
+            nxt = _read_exact(src, rec_len) if len(cur) == rec_len else b""
+            final = not nxt
+            yield (_open_record, key, nonce, ad, index, final, cur, 0, chunk_size)
+            if final: return
+            cur = nxt; index += 1
+
+    def write(pt):
+        nonlocal total
+        dst.write(pt); total += len(pt)
+
+    _execute(jobs(), write, workers, executor)
+    return total
@@ -1,4 +1,9 @@
-import os, hmac, hashlib
+import os, sys, hmac
+from array import array
+from bisect import bisect_left
+from itertools import repeat
+from hashlib import sha256 as _sha256
+from time import perf_counter as _now
 try:
     from nacl.bindings import (
         crypto_aead_xchacha20poly1305_ietf_encrypt as aead_encrypt,
@@ -7,44 +12,442 @@ try:
         crypto_aead_xchacha20poly1305_ietf_ABYTES as ABYTES,
         crypto_aead_xchacha20poly1305_ietf_KEYBYTES as KEYBYTES,
     )
+    from nacl._sodium import ffi as _ffi, lib as _lib  # libsodium 直呼び（ラッパの検査/コピーを省く）
 except Exception as e:
     raise ImportError("PyNaCl が必要です。'pip install pynacl' を実行してください。") from e
 
 def hkdf_sha256(ikm: bytes, salt: bytes, info: bytes, length: int) -> bytes:
-    prk = hmac.new(salt, ikm, hashlib.sha256).digest()
+    # hmac.digest は OpenSSL のワンショット経路（hmac.new より軽い）
+    prk = hmac.digest(salt, ikm, "sha256")
+    if length <= 32:
+        return hmac.digest(prk, info + b"\x01", "sha256")[:length]
     t = b''; okm = b''; c = 1
     while len(okm) < length:
-        t = hmac.new(prk, t + info + bytes([c]), hashlib.sha256).digest()
+        t = hmac.digest(prk, t + info + bytes([c]), "sha256")
         okm += t; c += 1
     return okm[:length]
 
+class AuthFailed(ValueError):
+    """AEAD の認証失敗（鍵/ctx/AAD/nonce の違い・改ざん・切り詰め）。ValueError の派生で、メッセージは auth failed"""
+
+# ゼロ初期化しないアロケータ（出力は libsodium が全域を書く）
+_alloc = _ffi.new_allocator(should_clear_after_alloc=False)
+
+def _seal(m: bytes, ad: bytes, nonce: bytes, key: bytes):
+    """AEAD 暗号化（libsodium 直呼び）。返り値: ct||tag を保持する cffi バッファ"""
+    mlen = len(m)
+    c = _alloc("unsigned char[]", mlen + ABYTES)
+    _lib.crypto_aead_xchacha20poly1305_ietf_encrypt(c, _ffi.NULL, m, mlen, ad, len(ad), _ffi.NULL, nonce, key)
+    return _ffi.buffer(c, mlen + ABYTES)
+
+def _open(c: bytes, ad: bytes, nonce: bytes, key: bytes) -> bytes:
+    """AEAD 復号（libsodium 直呼び）。c = ct||tag。認証失敗は AuthFailed"""
+    clen = len(c)
+    if clen < ABYTES:
+        raise AuthFailed("auth failed")
+    m = _alloc("unsigned char[]", clen - ABYTES)
+    if _lib.crypto_aead_xchacha20poly1305_ietf_decrypt(m, _ffi.NULL, _ffi.NULL, c, clen, ad, len(ad), nonce, key) != 0:
+        raise AuthFailed("auth failed")
+    return _ffi.buffer(m, clen - ABYTES)[:]
+
+_DETACHED_CDEF = """
+int crypto_aead_xchacha20poly1305_ietf_encrypt_detached(
+    unsigned char *c, unsigned char *mac, unsigned long long *maclen_p,
+    const unsigned char *m, unsigned long long mlen,
+    const unsigned char *ad, unsigned long long adlen,
+    const unsigned char *nsec, const unsigned char *npub, const unsigned char *k);
+int crypto_aead_xchacha20poly1305_ietf_decrypt_detached(
+    unsigned char *m, unsigned char *nsec,
+    const unsigned char *c, unsigned long long clen, const unsigned char *mac,
+    const unsigned char *ad, unsigned long long adlen,
+    const unsigned char *npub, const unsigned char *k);
+"""
+
+def _load_detached():
+    """
+    detached 版 AEAD（タグ分離・出力先指定）を取得する。PyNaCl の bindings には無いので、
+    PyNaCl 同梱の libsodium（シンボルが公開されていれば）かシステムの libsodium を cffi ABI モードで開く。
+    見つからなければ (None, None)（combined 版 + 作業領域で代替）。
+    """
+    try:
+        import cffi, nacl._sodium
+        ffi = cffi.FFI(); ffi.cdef(_DETACHED_CDEF)
+    except Exception:
+        return None, None
+    for name in (nacl._sodium.__file__, "sodium", "libsodium"):
+        try:
+            lib = ffi.dlopen(name)
+            lib.crypto_aead_xchacha20poly1305_ietf_decrypt_detached  # シンボル存在確認
+            lib.crypto_aead_xchacha20poly1305_ietf_encrypt_detached
+            return ffi, lib
+        except (OSError, AttributeError):
+            continue
+    return None, None
+
+_dffi, _dlib = _load_detached()
+
+# *_into の出力バッファに推奨する追加領域（detached 非対応環境ではタグ用に 16B。不足時は内部で作業領域を確保）
+OUT_EXTRA = 0 if _dlib is not None else ABYTES
+
+def _same_buffer(a, b) -> bool:
+    """a と b が同じアドレスから始まるか（in-place 判定）"""
+    return _ffi.cast("size_t", _ffi.from_buffer("unsigned char[]", a)) == _ffi.cast("size_t", _ffi.from_buffer("unsigned char[]", b))
+
+def _seal_into(out, pt, ad: bytes, nonce: bytes, key: bytes) -> bytes:
+    """
+    pt（任意のバッファ）を暗号化して ct を out の先頭に書く。返り値: tag（16B）
+    detached 版なら out 以外の確保なし。in-place（out と pt が同一領域）も可。
+    """
+    n = len(pt)
+    if len(out) < n: raise ValueError("output buffer too small")
+    if _dlib is not None:
+        c = _dffi.from_buffer("unsigned char[]", out, require_writable=True)
+        m = _dffi.from_buffer("unsigned char[]", pt)
+        mac = _dffi.new("unsigned char[]", ABYTES)
+        _dlib.crypto_aead_xchacha20poly1305_ietf_encrypt_detached(c, mac, _dffi.NULL, m, n, ad, len(ad), _dffi.NULL, nonce, key)
+        return _dffi.buffer(mac)[:]
+    # combined 版: out[:n+16] に ct||tag を書いてから tag を取り出す
+    if len(out) < n + ABYTES:
+        tmp = _ffi.buffer(_alloc("unsigned char[]", n + ABYTES))
+        tag = _seal_into(tmp, pt, ad, nonce, key)
+        memoryview(out)[:n] = tmp[:n]
+        return tag
+    if n and not _same_buffer(out, pt):
+        memoryview(out)[:n] = pt
+    c = _ffi.from_buffer("unsigned char[]", out, require_writable=True)
+    _lib.crypto_aead_xchacha20poly1305_ietf_encrypt(c, _ffi.NULL, c, n, ad, len(ad), _ffi.NULL, nonce, key)
+    return bytes(memoryview(out)[n:n+ABYTES])
+
+def _open_into(out, ct, tag: bytes, ad: bytes, nonce: bytes, key: bytes) -> int:
+    """
+    ct（任意のバッファ）を復号して out（書き込み可能バッファ）の先頭に書く。返り値: 平文長
+    detached 版なら out 以外の確保なし。in-place（out と ct が同一領域）も可。
+    """
+    n = len(ct)
+    if len(tag) != ABYTES: raise AuthFailed("auth failed")
+    if len(out) < n: raise ValueError("output buffer too small")
+    if _dlib is not None:
+        m = _dffi.from_buffer("unsigned char[]", out, require_writable=True)
+        c = _dffi.from_buffer("unsigned char[]", ct)
+        if _dlib.crypto_aead_xchacha20poly1305_ietf_decrypt_detached(m, _dffi.NULL, c, n, tag, ad, len(ad), nonce, key) != 0:
+            raise AuthFailed("auth failed")
+        return n
+    # combined 版: out[:n] に ct、out[n:n+16] に tag を並べて in-place 復号
+    if len(out) < n + ABYTES:
+        tmp = _ffi.buffer(_alloc("unsigned char[]", n + ABYTES))
+        n = _open_into(tmp, ct, tag, ad, nonce, key)
+        memoryview(out)[:n] = tmp[:n]
+        return n
+    if n and not _same_buffer(out, ct):
+        memoryview(out)[:n] = ct
+    memoryview(out)[n:n+ABYTES] = tag
+    m = _ffi.from_buffer("unsigned char[]", out, require_writable=True)
+    if _lib.crypto_aead_xchacha20poly1305_ietf_decrypt(m, _ffi.NULL, _ffi.NULL, m, n + ABYTES, ad, len(ad), nonce, key) != 0:
+        raise AuthFailed("auth failed")
+    return n
+
+# ---- 計測フック -----------------------------------------------------------
+# set_probe(sink) で有効化すると、各フェーズの終了時に sink(phase, seconds, nbytes, alloc_blocks) が呼ばれる。
+# seconds/alloc_blocks は入れ子のフェーズを除いた自分だけの分（合計すると全体に一致する）。
+# alloc_blocks は sys.getallocatedblocks() の増減（Python ヒープの正味ブロック数。cffi/libsodium 側は含まない）。
+# 無効時（既定）は API の入口で `_probe is None` を 1 回見るだけ。
+_probe = None
+_open_phases = []  # 実行中の _Phase（入れ子の時間を親から差し引くため）
+
+def set_probe(sink):
+    """計測シンク（callable）を設定し、以前のシンクを返す。None で無効化"""
+    global _probe
+    old, _probe = _probe, sink
+    return old
+
+class PhaseStats:
+    """in-process のカウンタシンク。フェーズごとに calls/seconds/bytes/alloc_blocks を合算する"""
+    def __init__(self):
+        self.phases = {}
+
+    def __call__(self, phase: str, seconds: float, nbytes: int, alloc_blocks: int):
+        p = self.phases.get(phase)
+        if p is None:
+            p = self.phases[phase] = {"calls": 0, "seconds": 0.0, "bytes": 0, "alloc_blocks": 0}
+        p["calls"] += 1; p["seconds"] += seconds; p["bytes"] += nbytes; p["alloc_blocks"] += alloc_blocks
+
+    def as_dict(self) -> dict:
+        return {"phases": self.phases, "seconds": sum(p["seconds"] for p in self.phases.values())}
+
+class _Phase:
+    __slots__ = ("name", "nbytes", "_sink", "_t0", "_a0", "_child_t", "_child_a")
+
+    def __init__(self, sink, name: str, nbytes: int):
+        self._sink = sink; self.name = name; self.nbytes = nbytes
+
+    def add(self, nbytes: int):
+        self.nbytes += nbytes
+
+    def __enter__(self):
+        self._child_t = 0.0; self._child_a = 0
+        _open_phases.append(self)
+        self._a0 = sys.getallocatedblocks(); self._t0 = _now()
+        return self
+
+    def __exit__(self, *exc):
+        dt = _now() - self._t0; da = sys.getallocatedblocks() - self._a0
+        _open_phases.pop()
+        if _open_phases:
+            parent = _open_phases[-1]; parent._child_t += dt; parent._child_a += da
+        self._sink(self.name, dt - self._child_t, self.nbytes, da - self._child_a)
+        return False
+
+class _NoPhase:
+    __slots__ = ()
+    def add(self, nbytes: int): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NO_PHASE = _NoPhase()
+
+def phase(name: str, nbytes: int=0):
+    """`with phase("io.read") as p: ...; p.add(n)` でフェーズを記録する（計測無効時は何もしない）"""
+    return _NO_PHASE if _probe is None else _Phase(_probe, name, nbytes)
+
+def _derive_key(K_master: bytes, nonce: bytes, IV: bytes, label: bytes=b"BMSCv6-prod:") -> bytes:
+    # nonce をソルトに用途ラベル＋コンテキストで AEAD 鍵を導出
+    return hkdf_sha256(K_master, nonce, label+IV, KEYBYTES)
+
 def _aad_pack(iv: bytes, aad: bytes) -> bytes:
     # AAD = len(iv)||iv||aad  （IVと文脈をタグにバインド）
     return len(iv).to_bytes(2, "big") + iv + aad
 
-def bmsc_v6_encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b""):
-    if not isinstance(plaintext, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
+def _check_key_iv(K_master, IV):
     if not isinstance(K_master, (bytes, bytearray)) or len(K_master) != 32: raise ValueError("K_master must be 32 bytes")
     if not isinstance(IV, (bytes, bytearray)): raise TypeError("IV must be bytes")
 
+def bmsc_v6_encrypt_into(out, plaintext, K_master: bytes, IV: bytes, aad: bytes=b""):
+    """
+    コピーなし版の暗号化（タグ分離）。plaintext は bytes/bytearray/memoryview/mmap 等、
+    ct は out（書き込み可能バッファ）の先頭 len(plaintext) バイトに書く。out に plaintext 自身を渡せば in-place。
+    返り値: (nonce, tag)
+    """
+    _check_key_iv(K_master, IV)
     nonce = os.urandom(NPUBBYTES)  # 24 bytes
-    K_enc = hkdf_sha256(K_master, nonce, b"BMSCv6-prod:"+IV, KEYBYTES)
-    ad = _aad_pack(IV, aad)
+    if _probe is not None:
+        return (nonce, _seal_probed(out, plaintext, K_master, IV, aad, nonce))
+    K_enc = _derive_key(K_master, nonce, IV)
+    tag = _seal_into(out, plaintext, _aad_pack(IV, aad), nonce, K_enc)
+    return (nonce, tag)
+
+def bmsc_v6_decrypt_into(out, nonce: bytes, ciphertext, tag: bytes, K_master: bytes, IV: bytes, aad: bytes=b"") -> int:
+    """
+    コピーなし版の復号（タグ分離）。ciphertext は bytes/bytearray/memoryview/mmap 等、
+    平文は out（書き込み可能バッファ、len(ciphertext)+OUT_EXTRA 以上推奨）の先頭に書く。
+    out に ciphertext 自身を渡せば in-place。返り値: 平文長。認証失敗時は out の内容を使わないこと。
+    """
+    if not isinstance(nonce, (bytes, bytearray, memoryview)) or len(nonce) != 24: raise ValueError("nonce must be 24 bytes")
+    _check_key_iv(K_master, IV)
+
+    nonce = bytes(nonce)
+    if _probe is not None:
+        return _open_probed(out, ciphertext, bytes(tag), K_master, IV, aad, nonce)
+    K_enc = _derive_key(K_master, nonce, IV)
+    return _open_into(out, ciphertext, bytes(tag), _aad_pack(IV, aad), nonce, K_enc)
+
+# 計測有効時の経路（処理内容は上と同じ。フェーズ: kdf / aad / aead）
+def _seal_probed(out, plaintext, K_master, IV, aad, nonce) -> bytes:
+    with phase("kdf", KEYBYTES): K_enc = _derive_key(K_master, nonce, IV)
+    with phase("aad", len(IV) + len(aad)): ad = _aad_pack(IV, aad)
+    with phase("aead", len(plaintext)): return _seal_into(out, plaintext, ad, nonce, K_enc)
 
-    ct_full = aead_encrypt(bytes(plaintext), ad, nonce, K_enc)  # ct||tag
-    ciphertext, tag = ct_full[:-ABYTES], ct_full[-ABYTES:]
-    return (nonce, ciphertext, tag)
+def _open_probed(out, ciphertext, tag, K_master, IV, aad, nonce) -> int:
+    with phase("kdf", KEYBYTES): K_enc = _derive_key(K_master, nonce, IV)
+    with phase("aad", len(IV) + len(aad)): ad = _aad_pack(IV, aad)
+    with phase("aead", len(ciphertext)): return _open_into(out, ciphertext, tag, ad, nonce, K_enc)
+
+def bmsc_v6_encrypt(plaintext: bytes, K_master: bytes, IV: bytes, aad: bytes=b""):
+    if not isinstance(plaintext, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
+    n = len(plaintext)
+    buf = _ffi.buffer(_alloc("unsigned char[]", n + OUT_EXTRA))
+    nonce, tag = bmsc_v6_encrypt_into(buf, plaintext, K_master, IV, aad)
+    if _probe is None:
+        return (nonce, buf[:n], tag)
+    with phase("copy", n): return (nonce, buf[:n], tag)
 
 def bmsc_v6_decrypt(nonce: bytes, ciphertext: bytes, tag: bytes, K_master: bytes, IV: bytes, aad: bytes=b"") -> bytes:
     if not isinstance(nonce, (bytes, bytearray)) or len(nonce) != 24: raise ValueError("nonce must be 24 bytes")
-    if not isinstance(K_master, (bytes, bytearray)) or len(K_master) != 32: raise ValueError("K_master must be 32 bytes")
-    if not isinstance(IV, (bytes, bytearray)): raise TypeError("IV must be bytes")
+    n = len(ciphertext)
+    buf = _ffi.buffer(_alloc("unsigned char[]", n + OUT_EXTRA))
+    bmsc_v6_decrypt_into(buf, nonce, ciphertext, tag, K_master, IV, aad)
+    if _probe is None:
+        return buf[:n]
+    with phase("copy", n): return buf[:n]
 
-    K_enc = hkdf_sha256(K_master, nonce, b"BMSCv6-prod:"+IV, KEYBYTES)
-    ad = _aad_pack(IV, aad)
-    ct_full = bytes(ciphertext) + bytes(tag)
-    try:
-        pt = aead_decrypt(ct_full, ad, nonce, K_enc)
-    except Exception:
-        raise ValueError("auth failed")
-    return pt
+_IPAD = bytes(x ^ 0x36 for x in range(256))  # HMAC 用 translate テーブル
+_OPAD = bytes(x ^ 0x5C for x in range(256))
+
+class BmscCipher:
+    """
+    同じ (K_master, IV) で多数のメッセージを暗号化/復号するためのコンテキスト。
+    鍵/IV の検査、AAD 接頭辞 len(iv)||iv、HKDF info を生成時に 1 回だけ行う。
+    出力は bmsc_v6_encrypt / bmsc_v6_decrypt とビット互換。
+    """
+    __slots__ = ("_K", "_IV", "_info1", "_ad_prefix")
+
+    def __init__(self, K_master: bytes, IV: bytes):
+        _check_key_iv(K_master, IV)
+        self._K = bytes(K_master)
+        self._IV = bytes(IV)
+        # HKDF-Expand の 1 ブロック目（KEYBYTES=32 = SHA-256 出力長）の入力を事前構築
+        self._info1 = b"BMSCv6-prod:" + self._IV + b"\x01"
+        self._ad_prefix = _aad_pack(self._IV, b"")
+
+    @property
+    def IV(self) -> bytes:
+        return self._IV
+
+    def _key(self, nonce: bytes) -> bytes:
+        # HKDF-SHA256（1 ブロック）を HMAC(k,m) = H((k^opad) || H((k^ipad) || m)) で直接展開。
+        # 鍵長が固定（nonce 24B / PRK 32B。どちらも 64B 以下なのでパディングだけで済む）なので hmac.digest より約 1.5 倍速い
+        prk = _sha256(nonce.translate(_OPAD) + b"\x5c"*40 + _sha256(nonce.translate(_IPAD) + b"\x36"*40 + self._K).digest()).digest()
+        return _sha256(prk.translate(_OPAD) + b"\x5c"*32 + _sha256(prk.translate(_IPAD) + b"\x36"*32 + self._info1).digest()).digest()
+
+    def encrypt_many(self, plaintexts, aads=None) -> "EncryptedBatch":
+        """
+        多数の平文をまとめて暗号化する（イテレータ可）。
+        aads: None（全件 b""）/ bytes（全件共通）/ 平文と同じ長さのシーケンス
+        nonce 用の乱数は _BATCH_RANDOM 件分ずつまとめて取得する。
+        """
+        out = EncryptedBatch()
+        nonces, data, tags, offsets = out.nonces, out.data, out.tags, out.offsets
+        prefix, key = self._ad_prefix, self._key
+        rnd = b""; rpos = 0
+        for pt, aad in _with_aads(plaintexts, aads):
+            if not isinstance(pt, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
+            if rpos == len(rnd):
+                rnd = os.urandom(NPUBBYTES * _BATCH_RANDOM); rpos = 0
+            nonce = rnd[rpos:rpos+NPUBBYTES]; rpos += NPUBBYTES
+            mlen = len(pt)
+            mv = memoryview(_seal(bytes(pt), prefix + aad, nonce, key(nonce)))
+            nonces += nonce
+            data += mv[:mlen]
+            tags += mv[mlen:]
+            offsets.append(len(data))
+        return out
+
+    def decrypt_many(self, items, aads=None) -> "DecryptedBatch":
+        """
+        items: EncryptedBatch または (nonce, ct, tag) のイテラブル。
+        認証失敗は例外にせず、DecryptedBatch.failed にインデックスを記録する。
+        """
+        out = DecryptedBatch()
+        data, offsets, failed = out.data, out.offsets, out.failed
+        prefix, key = self._ad_prefix, self._key
+        if isinstance(items, EncryptedBatch):
+            items = items._views()
+        for i, ((nonce, ct, tag), aad) in enumerate(_with_aads(items, aads)):
+            try:
+                if len(nonce) != NPUBBYTES: raise ValueError("nonce must be 24 bytes")
+                nonce = bytes(nonce)
+                data += _open(b"".join((ct, tag)), prefix + aad, nonce, key(nonce))
+            except ValueError:
+                failed.append(i)
+            offsets.append(len(data))
+        return out
+
+    def encrypt_into(self, out, plaintext, aad: bytes=b""):
+        """bmsc_v6_encrypt_into と同じ（返り値: (nonce, tag)）"""
+        nonce = os.urandom(NPUBBYTES)
+        return (nonce, _seal_into(out, plaintext, self._ad_prefix + aad, nonce, self._key(nonce)))
+
+    def decrypt_into(self, out, nonce: bytes, ciphertext, tag: bytes, aad: bytes=b"") -> int:
+        """bmsc_v6_decrypt_into と同じ（返り値: 平文長）"""
+        if not isinstance(nonce, (bytes, bytearray, memoryview)) or len(nonce) != NPUBBYTES: raise ValueError("nonce must be 24 bytes")
+        nonce = bytes(nonce)
+        return _open_into(out, ciphertext, bytes(tag), self._ad_prefix + aad, nonce, self._key(nonce))
+
+    def encrypt(self, plaintext: bytes, aad: bytes=b""):
+        """返り値: (nonce, ciphertext, tag)"""
+        if not isinstance(plaintext, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
+        nonce = os.urandom(NPUBBYTES)
+        buf = _seal(bytes(plaintext), self._ad_prefix + aad, nonce, self._key(nonce))
+        return (nonce, buf[:-ABYTES], buf[-ABYTES:])
+
+    def decrypt(self, nonce: bytes, ciphertext: bytes, tag: bytes, aad: bytes=b"") -> bytes:
+        if not isinstance(nonce, (bytes, bytearray)) or len(nonce) != 24: raise ValueError("nonce must be 24 bytes")
+        nonce = bytes(nonce)
+        return _open(bytes(ciphertext) + bytes(tag), self._ad_prefix + aad, nonce, self._key(nonce))
+
+_BATCH_RANDOM = 1024  # encrypt_many が 1 回の os.urandom で確保する nonce 数
+
+def _with_aads(items, aads):
+    if aads is None: return zip(items, repeat(b""))
+    if isinstance(aads, (bytes, bytearray)): return zip(items, repeat(bytes(aads)))
+    return zip(items, aads, strict=True)
+
+class EncryptedBatch:
+    """
+    encrypt_many の結果（3-タプルのリストではなく連結バッファ）。
+      nonces : 24B × n の連結
+      tags   : 16B × n の連結
+      data   : 全 ct の連結、i 件目は data[offsets[i]:offsets[i+1]]
+    batch[i] は (nonce, ct, tag) を返す。
+    """
+    __slots__ = ("nonces", "tags", "data", "offsets")
+
+    def __init__(self):
+        self.nonces = bytearray()
+        self.tags = bytearray()
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self): raise IndexError("batch index out of range")
+        return (bytes(self.nonces[i*NPUBBYTES:(i+1)*NPUBBYTES]),
+                bytes(self.data[self.offsets[i]:self.offsets[i+1]]),
+                bytes(self.tags[i*ABYTES:(i+1)*ABYTES]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _views(self):
+        # decrypt_many 用: memoryview で切り出す（件ごとの bytes コピーを避ける）
+        nv, dv, tv, offs = memoryview(self.nonces), memoryview(self.data), memoryview(self.tags), self.offsets
+        for i in range(len(self)):
+            yield (nv[i*NPUBBYTES:(i+1)*NPUBBYTES], dv[offs[i]:offs[i+1]], tv[i*ABYTES:(i+1)*ABYTES])
+
+class DecryptedBatch:
+    """
+    decrypt_many の結果。i 件目の平文は data[offsets[i]:offsets[i+1]]。
+    failed は認証に失敗したインデックス（その件の batch[i] は None）。
+    """
+    __slots__ = ("data", "offsets", "failed")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+        self.failed = []
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self): raise IndexError("batch index out of range")
+        j = bisect_left(self.failed, i)
+        if j < len(self.failed) and self.failed[j] == i: return None
+        return bytes(self.data[self.offsets[i]:self.offsets[i+1]])
+
+    def __iter__(self):
+        failed = set(self.failed)
+        for i in range(len(self)):
+            yield None if i in failed else bytes(self.data[self.offsets[i]:self.offsets[i+1]])
+
+def encrypt_many(plaintexts, K_master: bytes, IV: bytes, aads=None) -> EncryptedBatch:
+    """同一の鍵/コンテキストで多数の平文を暗号化（BmscCipher.encrypt_many の簡易版）"""
+    return BmscCipher(K_master, IV).encrypt_many(plaintexts, aads)
+
+def decrypt_many(items, K_master: bytes, IV: bytes, aads=None) -> DecryptedBatch:
+    """同一の鍵/コンテキストで多数のレコードを復号。失敗は DecryptedBatch.failed に記録"""
+    return BmscCipher(K_master, IV).decrypt_many(items, aads)
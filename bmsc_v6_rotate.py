@@ -0,0 +1,181 @@
+# bmsc_v6_rotate.py
+"""
+鍵のローテーション（rewrap）: 封筒（FLAG_RCPT）の受信者表だけを新しい鍵で包み直し、ct には触れない
+
+1 ファイルの処理:
+- ヘッダの受信者表を読み、旧鍵で開ける項目のデータ鍵を新しい鍵で包み直す（env_nonce と他の項目はそのまま）
+- 表の長さが変わらなければ（KID の長さが同じ / KID 無し）表の範囲だけをその場で書き換える（pwrite + fsync）
+- 長さが変わるときはヘッダを作り直し、本文はバイト列のままコピーして置き換える（再暗号化はしない）
+受信者表は本文の AD に含まれないので、本文の認証はそのまま通る（SPEC.md §3.4）。
+
+進捗ログ（JSON Lines）: その場書き換えの前に旧/新の表を "begin" として fsync 付きで書き、終わったら "done" を書く。
+中断後に同じログで再実行すると、"done" のファイルは飛ばし、"begin" だけのファイルは新しい表を書き直して完了させる
+（書き換え途中で止まっても表が半端なまま残らない）。
+"""
+import os, json, shutil, struct, threading, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+import bmsc_v6_envelope as env
+from bmsc_v6_container import MAGIC, VER_V2, VER_V3, HEAD_LEN, FLAG_RCPT, parse_ext, _read_exact
+
+class NotEnvelope(ValueError):
+    """受信者表の無いコンテナ（rewrap できない。鍵を替えるには再暗号化が必要）"""
+
+def _locate(fp) -> tuple:
+    """
+    ヘッダ固定部と ext を読み、受信者表の位置を返す。
+    返り値: (head(16), ext, 表の TLV の ext 内の開始位置, 表のファイル位置, 表の長さ)
+    """
+    head = _read_exact(fp, HEAD_LEN + 2)
+    if len(head) < HEAD_LEN or head[:6] != MAGIC or head[6] not in (VER_V2, VER_V3):
+        raise ValueError("not a bmsc6 v2/v3 container")
+    flags = head[7]
+    if not flags & FLAG_RCPT:
+        raise NotEnvelope("no recipient table")
+    if len(head) < HEAD_LEN + 2:
+        raise ValueError("bmsc6 header truncated")
+    ext_len = struct.unpack(">H", head[HEAD_LEN:HEAD_LEN+2])[0]
+    ext = _read_exact(fp, ext_len)
+    if len(ext) < ext_len:
+        raise ValueError("bmsc6 header truncated")
+    parse_ext(flags, ext)  # 形式の検査
+    off = 0
+    while True:
+        t = ext[off]; m = struct.unpack(">H", ext[off+1:off+3])[0]
+        if t == FLAG_RCPT:
+            return head, ext, off, len(head) + off + 3, m
+        off += 3 + m
+
+def rotate_file(path, K_old, K_new: bytes, *, new_kid=env.KEEP, journal=None) -> tuple:
+    """
+    1 ファイルの受信者表を包み直す。journal(state, **fields) はその場書き換えの直前に "begin" で呼ばれる。
+    返り値: (mode, 置き換えた項目数)  mode は "in-place"（表の範囲だけ）か "copied"（ヘッダを作り直してコピー）
+    """
+    path = Path(path)
+    with open(path, "r+b", buffering=0) as f:
+        head, ext, tlv, off, n = _locate(f)
+        f.seek(off)
+        table = _read_exact(f, n)
+        new, count = env.rewrap(table, K_old, K_new, new_kid)
+        if len(new) == n:
+            if journal is not None:
+                journal("begin", path=str(path), offset=off, old=table.hex(), new=new.hex())
+            os.pwrite(f.fileno(), new, off)
+            os.fsync(f.fileno())
+            return "in-place", count
+        # 長さが変わる: ext を作り直し、ヘッダの残りと本文はそのままコピーする
+        new_ext = ext[:tlv] + bytes([FLAG_RCPT]) + struct.pack(">H", len(new)) + new + ext[tlv+3+n:]
+        if len(new) > 0xFFFF or len(new_ext) > 0xFFFF:
+            raise ValueError("bmsc6 header extension too long")
+        tmp = path.with_name(path.name + ".part")
+        try:
+            with open(tmp, "wb") as out:
+                out.write(head[:HEAD_LEN] + struct.pack(">H", len(new_ext)) + new_ext)
+                f.seek(len(head) + len(ext))
+                shutil.copyfileobj(f, out, 1 << 20)
+                out.flush(); os.fsync(out.fileno())
+            shutil.copymode(path, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return "copied", count
+
+def _finish(rec: dict):
+    """"begin" だけが記録されたファイルに新しい表を書く（中断からの再開）"""
+    path = Path(rec["path"]); new = bytes.fromhex(rec["new"]); old = bytes.fromhex(rec["old"])
+    with open(path, "r+b", buffering=0) as f:
+        _, _, _, off, n = _locate(f)
+        if off != rec["offset"] or n != len(new):
+            raise ValueError("header changed since the interrupted rewrap")
+        cur = os.pread(f.fileno(), n, off)
+        if cur != new:
+            if len(cur) != n or not all(c in (a, b) for a, b, c in zip(old, new, cur)):
+                raise ValueError("recipient table changed since the interrupted rewrap")
+            os.pwrite(f.fileno(), new, off)
+            os.fsync(f.fileno())
+
+def load_log(path) -> tuple:
+    """進捗ログ → (完了・対象外のパスの集合, "begin" のまま終わっていない記録 {path: rec})"""
+    done, begun = set(), {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line); p = e["path"]; state = e["state"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # 中断時の書きかけ
+                if state == "begin":
+                    begun[p] = e
+                elif state in ("done", "skip"):
+                    done.add(p); begun.pop(p, None)
+    except FileNotFoundError:
+        pass
+    return done, begun
+
+def rotate_paths(paths, K_old, K_new: bytes, *, new_kid=env.KEEP, log, workers: int|None=None, progress=None) -> dict:
+    """
+    paths（ファイルの列。遅延評価可）の受信者表を並行に包み直す。log は進捗ログ（JSON Lines）のパス。
+    progress(done_files, failed_files) は 1 件ごとに呼ばれる（呼び出し元スレッド）。
+    返り値: {"files", "in_place", "copied", "entries", "resumed", "skipped", "not_envelope", "seconds", "files_per_s",
+             "log", "failures": [{"path", "error"}]}
+    """
+    if not isinstance(K_new, (bytes, bytearray)) or len(K_new) != 32: raise ValueError("K_master must be 32 bytes")
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    done_before, begun = load_log(log)
+    res = {"files": 0, "in_place": 0, "copied": 0, "entries": 0, "resumed": 0, "skipped": 0, "not_envelope": 0}
+    failures = []
+    lock = threading.Lock()
+
+    with open(log, "a", encoding="utf-8") as lf:
+        def journal(state, **fields):
+            with lock:
+                lf.write(json.dumps(dict(fields, state=state), ensure_ascii=False) + "\n")
+                lf.flush()
+                if state == "begin":
+                    os.fsync(lf.fileno())  # 書き換えより先にログを確定させる
+
+        for p, rec in begun.items():
+            try:
+                _finish(rec); journal("done", path=p, mode="in-place"); res["resumed"] += 1
+            except (ValueError, OSError) as e:
+                failures.append({"path": p, "error": str(e) or type(e).__name__})
+            done_before.add(p)
+
+        def one(p):
+            try:
+                mode, count = rotate_file(p, K_old, K_new, new_kid=new_kid, journal=journal)
+                journal("done", path=p, mode=mode, entries=count)
+                return mode, count, None
+            except NotEnvelope:
+                journal("skip", path=p, reason="no recipient table")
+                return "not_envelope", 0, None
+            except (ValueError, OSError) as e:
+                return None, 0, str(e) or type(e).__name__
+
+        def collect(p, fut):
+            mode, count, err = fut.result()
+            res["files"] += 1
+            if err is not None:
+                failures.append({"path": p, "error": err})
+            else:
+                res[mode.replace("-", "_")] += 1; res["entries"] += count
+            if progress is not None:
+                progress(res["files"], len(failures))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bmsc6-rotate") as ex:
+            pending = {}
+            for p in paths:
+                p = os.path.abspath(p)
+                if p in done_before:
+                    res["skipped"] += 1; continue
+                pending[ex.submit(one, p)] = p
+                if len(pending) >= 4 * workers:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in finished: collect(pending.pop(f), f)
+            for f in list(pending): collect(pending.pop(f), f)
+
+    dt = max(time.perf_counter() - t0, 1e-9)
+    return dict(res, seconds=round(dt, 3), files_per_s=round(res["files"] / dt, 1), log=str(log), failures=failures)
@@ -0,0 +1,179 @@
+# bmsc_v6_session.py
+"""
+チャット等の E2EE 向けセッション（bmsc_v6_prod の上に重ねる）
+
+bmsc_v6_encrypt は 1 メッセージごとに os.urandom（24B）と HKDF を行うが、セッションでは
+- 鍵と nonce 接頭辞を方向（送信者 → 受信者）ごとに 1 回だけ導出し、
+- nonce = 接頭辞(16B) || カウンタ(8B BE) とし、カウンタを AAD にも入れ、
+- 受信側はカウンタの窓（ビットマップ）で再送（リプレイ）を O(1) で拒否する。
+送信メッセージ: counter(8 BE) || ct || tag(16)（オーバーヘッド 24B。nonce を送らない）
+
+方向ごとの鍵: HKDF-SHA256(ikm=K_master, salt=session_id,
+                        info="BMSCv6-session:" || len(ctx)(2) || ctx || len(src)(1) || src || dst) → 鍵(32) + 接頭辞(16)
+AD: len(ctx)(2) || ctx || counter(8 BE) || aad
+
+状態（state_path）: 送信カウンタと受信窓を固定長のバイナリで保存する。
+送信カウンタは RESERVE 件ごとに先の値を予約して書く（fsync 付き）ので、異常終了しても同じカウンタ（= nonce）を再び使わない
+（予約した残りは飛ばす）。受信窓は予約時と save()/close() で書くため、異常終了すると最後の保存以降に受け取った
+メッセージは再送を検出できない。厳密に必要なら受信ごとに save() するか、再起動時に session_id を新しくする。
+"""
+import os, struct, hashlib, threading
+from pathlib import Path
+
+from bmsc_v6_prod import hkdf_sha256, _seal, _open, _aad_pack, _check_key_iv, ABYTES, KEYBYTES, AuthFailed
+
+SESSION_LABEL = b"BMSCv6-session:"
+SESSION_ID_MIN = 16
+PREFIX_LEN = 16
+COUNTER_LEN = 8
+MAX_COUNTER = (1 << 64) - 1
+DEFAULT_WINDOW = 1024   # 受信窓のビット数（これより古いカウンタは拒否）
+DEFAULT_RESERVE = 1024  # 状態ファイルに先行して予約する送信カウンタ数
+
+# 状態ファイル: MAGIC(4) + ver(1) + window(2 BE) + 照合値(8) + 送信カウンタ(8 BE) + 受信の最大カウンタ+1(8 BE) + ビットマップ
+STATE_MAGIC = b"BMSS"
+STATE_VERSION = 1
+_STATE_HEAD = struct.Struct(">4sBH8sQQ")
+
+class ReplayError(ValueError):
+    """再送（受信済みのカウンタ）または窓より古いカウンタ"""
+
+def new_session_id() -> bytes:
+    return os.urandom(SESSION_ID_MIN)
+
+def _direction(K: bytes, session_id: bytes, ctx: bytes, src: bytes, dst: bytes) -> tuple:
+    """方向 src → dst の (鍵, nonce 接頭辞)"""
+    if not 0 < len(src) <= 255: raise ValueError("party name must be 1..255 bytes")
+    info = SESSION_LABEL + _aad_pack(ctx, bytes([len(src)]) + src + dst)
+    okm = hkdf_sha256(K, session_id, info, KEYBYTES + PREFIX_LEN)
+    return okm[:KEYBYTES], okm[KEYBYTES:]
+
+class Bmsc6Session:
+    """
+    1 つの会話における自分（local）と相手（peer）の間の双方向セッション。
+        s = Bmsc6Session(K, b"BMSCv6-IV00", session_id, b"alice", b"bob", state_path="alice.state")
+        msg = s.seal(b"hello")          # → 相手の Bmsc6Session(K, ..., b"bob", b"alice").open(msg)
+    送信と受信は方向ごとに別の鍵なので、両者が同じカウンタを使っても nonce は衝突しない。
+    seal / open はスレッドセーフ。
+    """
+    def __init__(self, K_master: bytes, ctx: bytes, session_id: bytes, local: bytes, peer: bytes, *,
+                 window: int=DEFAULT_WINDOW, state_path=None, reserve: int=DEFAULT_RESERVE):
+        _check_key_iv(K_master, ctx)
+        if not isinstance(session_id, (bytes, bytearray)) or len(session_id) < SESSION_ID_MIN:
+            raise ValueError("session_id must be at least 16 bytes")
+        if local == peer: raise ValueError("local and peer must differ")
+        if not 0 < window <= 0xFFFF or window % 8: raise ValueError("window must be a multiple of 8 in 8..65528")
+        if reserve < 1: raise ValueError("reserve must be positive")
+        K, ctx, session_id = bytes(K_master), bytes(ctx), bytes(session_id)
+        self._send_key, self._send_prefix = _direction(K, session_id, ctx, bytes(local), bytes(peer))
+        self._recv_key, self._recv_prefix = _direction(K, session_id, ctx, bytes(peer), bytes(local))
+        self._ad_prefix = _aad_pack(ctx, b"")
+        self._check = hashlib.sha256(b"BMSCv6-session-state:" + self._send_key + self._recv_key).digest()[:8]
+        self.window = window
+        self._mask = (1 << window) - 1
+        self._lock = threading.Lock()
+        self._send = 0        # 次に使う送信カウンタ
+        self._reserved = 0    # 状態ファイルに書いた送信カウンタ（これ未満は使ってよい）
+        self._top = 0         # 受信した最大カウンタ + 1（0 は未受信）
+        self._bits = 0        # bit i: カウンタ top-1-i を受信済み
+        self._path = None if state_path is None else Path(state_path)
+        self._reserve = reserve
+        if self._path is not None and self._path.exists():
+            self._load(self._path.read_bytes())
+
+    # ---- 状態 -----------------------------------------------------------------
+    def export_state(self) -> bytes:
+        """現在の状態（送信カウンタは予約済みの値）。固定長: 31 + window/8 バイト"""
+        with self._lock:
+            return self._state(max(self._send, self._reserved))
+
+    def _state(self, send: int) -> bytes:
+        return (_STATE_HEAD.pack(STATE_MAGIC, STATE_VERSION, self.window, self._check, send, self._top)
+                + self._bits.to_bytes(self.window // 8, "big"))
+
+    def _load(self, buf: bytes):
+        if len(buf) < _STATE_HEAD.size:
+            raise ValueError("not a bmsc6 session state")
+        magic, ver, window, check, send, top = _STATE_HEAD.unpack_from(buf)
+        if magic != STATE_MAGIC or ver != STATE_VERSION or len(buf) != _STATE_HEAD.size + window // 8:
+            raise ValueError("not a bmsc6 session state")
+        if check != self._check:
+            raise ValueError("session state does not match this session")
+        if window != self.window:
+            raise ValueError(f"session state window is {window}")
+        self._send = self._reserved = send
+        self._top = top
+        self._bits = int.from_bytes(buf[_STATE_HEAD.size:], "big")
+
+    def _write(self, send: int):
+        """状態ファイルを置き換える（fsync してから rename。0600）"""
+        tmp = self._path.with_name(self._path.name + ".part")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, self._state(send))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, self._path)
+
+    def save(self):
+        """受信窓を含む状態を書く（state_path 指定時のみ）"""
+        if self._path is None:
+            return
+        with self._lock:
+            self._write(max(self._send, self._reserved))
+
+    def close(self):
+        self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def sent(self) -> int:
+        """次に使う送信カウンタ"""
+        return self._send
+
+    # ---- 送受信 ---------------------------------------------------------------
+    def seal(self, plaintext: bytes, aad: bytes=b"") -> bytes:
+        """返り値: counter(8 BE) || ct || tag"""
+        if not isinstance(plaintext, (bytes, bytearray)): raise TypeError("plaintext must be bytes")
+        with self._lock:
+            c = self._send
+            if c > MAX_COUNTER: raise ValueError("session counter exhausted")
+            if self._path is not None and c >= self._reserved:
+                self._reserved = min(c + self._reserve, MAX_COUNTER + 1)
+                self._write(self._reserved)
+            self._send = c + 1
+        cb = c.to_bytes(COUNTER_LEN, "big")
+        return cb + _seal(bytes(plaintext), self._ad_prefix + cb + aad, self._send_prefix + cb, self._send_key)[:]
+
+    def open(self, message, aad: bytes=b"") -> bytes:
+        """seal の逆。認証失敗は AuthFailed、再送・古すぎるカウンタは ReplayError"""
+        if len(message) < COUNTER_LEN + ABYTES:
+            raise AuthFailed("auth failed")
+        cb = bytes(message[:COUNTER_LEN])
+        c = int.from_bytes(cb, "big")
+        with self._lock:
+            self._check_fresh(c)  # 認証前にも見て、明らかな再送は AEAD を回さずに捨てる
+        pt = _open(bytes(message[COUNTER_LEN:]), self._ad_prefix + cb + aad, self._recv_prefix + cb, self._recv_key)
+        with self._lock:
+            self._check_fresh(c)  # 並行に同じメッセージを受けた場合
+            if c >= self._top:
+                self._bits = ((self._bits << (c + 1 - self._top)) | 1) & self._mask
+                self._top = c + 1
+            else:
+                self._bits |= 1 << (self._top - 1 - c)
+        return pt
+
+    def _check_fresh(self, c: int):
+        if c >= self._top:
+            return
+        age = self._top - 1 - c
+        if age >= self.window:
+            raise ReplayError("message too old")
+        if self._bits >> age & 1:
+            raise ReplayError("replayed message")
@@ -0,0 +1,286 @@
+# bmsc_v6_tree.py
+"""
+ディレクトリ単位の bmsc6 v2 暗号化/復号（encrypt-dir / decrypt-dir の本体）
+
+1 ファイル = 1 つの bmsc6 v2。AAD は drive_encrypt.py と同じ {"name","size","sha256"}（name は相対パス）。
+読み込み（1 スレッド）→ ハッシュ + AEAD（ワーカープール。hashlib/libsodium は GIL を解放する）→ 書き出し（呼び出し元スレッド）
+のパイプラインで、未書き出しのバイト数を max_inflight で制限する。
+完了したファイルはマニフェスト（JSON Lines）に追記し、再実行時は size/mtime が同じものを飛ばす。
+"""
+import os, json, hashlib, queue, secrets, threading, time
+from pathlib import Path
+
+from bmsc_v6_prod import OUT_EXTRA
+from bmsc_v6_container import seal_v2_into, open_v2, unpack_v2, _check_master
+
+SUFFIX = ".bmsc6"
+MANIFEST_NAME = ".bmsc6-manifest.jsonl"
+DEFAULT_MAX_INFLIGHT = 256 << 20  # 読み込み済み・未書き出しの上限（1 ファイルがこれを超える場合は単独で流す）
+
+def file_aad(name: str, size: int, sha256_hex: str) -> bytes:
+    """drive_encrypt.py と同じ AAD（コンパクト JSON・バイト固定）"""
+    return json.dumps({"name": name, "size": size, "sha256": sha256_hex},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# ---- マニフェスト ---------------------------------------------------------
+
+def load_manifest(path) -> dict:
+    """src（相対パス）→ 最後のエントリ。壊れた行（中断時の書きかけ）は無視する"""
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                    done[e["src"]] = e
+                except (ValueError, KeyError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return done
+
+# ---- パイプライン ---------------------------------------------------------
+
+class _Budget:
+    """未書き出しバイト数の上限。何も抱えていなければ上限超えの 1 件も通す"""
+    def __init__(self, limit: int):
+        self.limit = limit; self.used = 0
+        self._cv = threading.Condition()
+
+    def acquire(self, n: int, stop: threading.Event):
+        with self._cv:
+            while self.used and self.used + n > self.limit and not stop.is_set():
+                self._cv.wait(0.1)
+            self.used += n
+
+    def release(self, n: int):
+        with self._cv:
+            self.used -= n; self._cv.notify_all()
+
+_DONE = object()
+
+def _read_file(path: Path, extra: int):
+    """ファイル全体を bytearray(size + extra) に読む。返り値: (buf, size)"""
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        buf = bytearray(size + extra)
+        mv = memoryview(buf); got = 0
+        while got < size:
+            n = f.readinto(mv[got:size])
+            if not n: break
+            got += n
+    return buf, got
+
+def _run_pipeline(items, extra: int, work, write, workers: int, max_inflight: int, progress, read=_read_file):
+    """
+    items: (src_path, rel, size, mtime_ns) の列。work(rel, buf, size) をワーカーで、write(item, result) を呼び出し元で実行。
+    read(path, extra) → (buf, size) は読み込みスレッドで実行する（buf はそのまま work に渡る）。
+    返り値: (done, done_bytes, failed)  failed は [(rel, message)]
+    """
+    stop = threading.Event()
+    budget = _Budget(max_inflight)
+    q_in = queue.Queue(maxsize=2 * workers)
+    q_out = queue.Queue()
+
+    def reader():
+        try:
+            for item in items:
+                if stop.is_set(): break
+                budget.acquire(item[2], stop)
+                try:
+                    buf, size = read(item[0], extra)
+                except OSError as e:
+                    q_out.put((item, None, e)); continue
+                q_in.put((item, buf, size))
+        finally:
+            for _ in range(workers):
+                q_in.put(_DONE)
+
+    def worker():
+        while True:
+            job = q_in.get()
+            if job is _DONE or stop.is_set():
+                q_out.put(_DONE); return
+            item, buf, size = job
+            try:
+                q_out.put((item, work(item[1], buf, size), None))
+            except Exception as e:
+                q_out.put((item, None, e))
+
+    threads = [threading.Thread(target=reader, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in threads: t.start()
+
+    done = 0; failed = []; finished = 0; done_bytes = 0
+    try:
+        while finished < workers:
+            msg = q_out.get()
+            if msg is _DONE:
+                finished += 1; continue
+            item, result, err = msg
+            try:
+                if err is None:
+                    write(item, result)
+                    done += 1; done_bytes += item[2]
+            except OSError as e:
+                err = e
+            finally:
+                budget.release(item[2])
+            if err is not None:
+                failed.append((item[1], str(err) or type(err).__name__))
+            if progress is not None:
+                progress(done + len(failed), done_bytes)
+    except BaseException:
+        # 中断: 読み込みを止める（書き出し済みのファイルはマニフェストに残っている）
+        stop.set()
+        raise
+    return done, done_bytes, failed
+
+def _writev_all(fd: int, parts):
+    """parts を連結せずに 1 回の writev で書く（短い書き込みは続きから。os.writev の無い環境では順に write）"""
+    views = [memoryview(p).cast("B") for p in parts if len(p)]
+    while views:
+        n = os.writev(fd, views) if hasattr(os, "writev") else os.write(fd, views[0])
+        while views and n >= len(views[0]):
+            n -= len(views[0]); views.pop(0)
+        if views and n:
+            views[0] = views[0][n:]
+
+def _tmp_path(path: Path) -> Path:
+    """path の一時ファイル名。出力ごとに一意にする（"x" の一時ファイルが別の出力 "x.part" を上書きしないように）"""
+    return path.with_name(f".{path.name}.{secrets.token_hex(4)}.part")
+
+def _write_atomic(path: Path, parts):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(path)
+    try:
+        with open(tmp, "xb", buffering=0) as f:
+            _writev_all(f.fileno(), parts)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def _walk(root: Path, exclude: Path, accept, *, own: bool=False):
+    """
+    root 以下のファイルを (path, rel, size, mtime_ns) で列挙（exclude 配下は除く）。
+    own=True（このモジュールが書いたツリーを読むとき）はマニフェストと書きかけの *.part も除く。
+    利用者の入力（encrypt_tree / backup_tree の src）では同じ名前のファイルも対象にする。
+    """
+    out = []
+    root_s = str(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if Path(dirpath, d).resolve() != exclude)
+        for name in sorted(filenames):
+            if own and (name == MANIFEST_NAME or name.endswith(".part")) or not accept(name):
+                continue
+            p = Path(dirpath, name)
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            rel = os.path.relpath(p, root_s).replace(os.sep, "/")
+            out.append((p, rel, st.st_size, st.st_mtime_ns))
+    return out
+
+def _process_tree(src_dir, dst_dir, accept, out_rel, extra, work, workers, manifest, max_inflight, progress, own):
+    src = Path(src_dir).resolve(); dst = Path(dst_dir).resolve()
+    if not src.is_dir():
+        raise ValueError(f"not a directory: {src_dir}")
+    if src == dst:
+        raise ValueError("in-dir and out-dir must differ")
+    dst.mkdir(parents=True, exist_ok=True)
+    manifest = Path(manifest).resolve() if manifest else dst / MANIFEST_NAME
+    t0 = time.perf_counter()
+
+    done_before = load_manifest(manifest)
+    todo = []; skipped = 0; collided = []
+    for p, rel, size, mtime in _walk(src, dst, accept, own=own):
+        if p == manifest:
+            continue  # --manifest に src 内のパスを指定した場合
+        if dst / out_rel(rel) == manifest:
+            # 出力がマニフェストと同じパスになる（decrypt-dir の入力に <out-dir>/.bmsc6-manifest.jsonl.bmsc6 がある等）
+            collided.append((rel, "output path collides with the manifest (use --manifest)")); continue
+        e = done_before.get(rel)
+        if e and e.get("size") == size and e.get("mtime_ns") == mtime and (dst / e["out"]).exists():
+            skipped += 1; continue
+        todo.append((p, rel, size, mtime))
+    total_bytes = sum(i[2] for i in todo)
+
+    with open(manifest, "a", encoding="utf-8") as mf:
+        def write(item, result):
+            parts, meta = result
+            rel_out = out_rel(item[1])
+            _write_atomic(dst / rel_out, parts)
+            # ファイルを置いてから記録する（逆順だと中断時に未完成ファイルを飛ばしてしまう）
+            mf.write(json.dumps(dict(src=item[1], out=rel_out, size=item[2], mtime_ns=item[3], **meta),
+                                ensure_ascii=False) + "\n")
+            mf.flush()
+
+        report = None
+        if progress is not None:
+            report = lambda n, b: progress(n, len(todo), b, total_bytes)
+        done, done_bytes, failed = _run_pipeline(todo, extra, work, write, workers or os.cpu_count() or 1,
+                                                 max_inflight, report)
+
+    return {"files": done, "skipped": skipped, "failed": collided + failed,
+            "bytes": done_bytes, "seconds": time.perf_counter() - t0, "manifest": str(manifest)}
+
+# ---- 公開 API -------------------------------------------------------------
+
+def encrypt_tree(src_dir, dst_dir, K_master: bytes, ctx: bytes, *, workers: int|None=None,
+                 manifest=None, max_inflight: int=DEFAULT_MAX_INFLIGHT, progress=None, kid: str|None=None,
+                 compress: str|None=None) -> dict:
+    """
+    src_dir 以下の全ファイルを dst_dir/<相対パス>.bmsc6（v2）に暗号化する。
+    鍵束を渡すか kid を指定すると各ファイルのヘッダに KID を入れる。
+    compress（"auto" / "zlib" / "lzma"）を指定すると、縮むファイルだけ圧縮してから暗号化する（AAD の size/sha256 は元の平文）。
+    progress(done_files, total_files, done_bytes, total_bytes) は書き出しごとに呼ばれる。
+    返り値: {"files", "skipped", "failed": [(rel, msg)], "bytes", "seconds", "manifest"}
+    """
+    K = _check_master(K_master)
+    if not isinstance(ctx, (bytes, bytearray)): raise TypeError("ctx must be bytes")
+    ctx = bytes(ctx)
+
+    def work(rel, buf, size):
+        # 読み込んだバッファ上で in-place 暗号化（ファイルごとの確保は 1 回）
+        mv = memoryview(buf)
+        digest = hashlib.sha256(mv[:size]).hexdigest()
+        aad = file_aad(rel, size, digest)
+        header, nonce, tag, n = seal_v2_into(mv, mv[:size], K, ctx, aad, kid=kid, compress=compress)
+        return (header + nonce + tag, mv[:n]), {"sha256": digest}
+
+    return _process_tree(src_dir, dst_dir, lambda name: True, lambda rel: rel + SUFFIX,
+                         OUT_EXTRA, work, workers, manifest, max_inflight, progress, own=False)
+
+def decrypt_tree(src_dir, dst_dir, K_master: bytes, *, workers: int|None=None, manifest=None,
+                 max_inflight: int=DEFAULT_MAX_INFLIGHT, check_names: bool=True, progress=None) -> dict:
+    """
+    src_dir 以下の *.bmsc6（v2）を dst_dir/<相対パス から .bmsc6 を除いたもの> に復号する。
+    ctx/aad はファイル内包のものを使い、AAD の size と（check_names なら）name が相対パスと一致することも確認する。
+    鍵束を渡すと各ファイルのヘッダの KID で鍵を選ぶ。返り値は encrypt_tree と同じ形。
+    """
+    K = _check_master(K_master)
+
+    def work(rel, buf, size):
+        mv = memoryview(buf)
+        ctx, aad, nonce, tag, ct, ext = unpack_v2(mv[:size])
+        off = size - len(ct)
+        # ct の位置にそのまま平文を書く（OUT_EXTRA 分の余白は buf の末尾にある）。
+        # 圧縮付きは認証してから別バッファに展開される（認証前のヘッダの平文長では確保しない）
+        pt = open_v2(K, bytes(ctx), bytes(aad), bytes(nonce), ct, tag, ext, mv[off:])
+        n = len(pt)
+        try:
+            meta = json.loads(bytes(aad))
+        except ValueError:
+            meta = {}
+        if not isinstance(meta, dict): meta = {}
+        if "size" in meta and meta["size"] != n:
+            raise ValueError("AAD size mismatch")
+        name = rel[:-len(SUFFIX)]
+        if check_names and "name" in meta and meta["name"] != name:
+            raise ValueError(f"AAD name mismatch: {meta['name']}")
+        return (pt,), {"sha256": meta.get("sha256")}
+
+    return _process_tree(src_dir, dst_dir, lambda name: name.endswith(SUFFIX), lambda rel: rel[:-len(SUFFIX)],
+                         OUT_EXTRA, work, workers, manifest, max_inflight, progress, own=True)
@@ -0,0 +1,141 @@
+# bmsc_v6_upload.py
+"""
+アップロード向けの 1 パス暗号化（demos/google/drive_encrypt.py の処理をライブラリにしたもの）
+
+- 入力は 1 回だけ読む。1 MiB ずつ読み込み、キャッシュに載っているうちに SHA-256 を更新する
+- AAD {"name","size","sha256"} を作り、読み込んだバッファ上でそのまま暗号化（ファイルごとの確保は 1 回）
+- 出力は os.writev でヘッダ（ctx・aad 込み）・nonce・tag・ct を連結せずに書く（v2 と旧 raw は同じ ct バッファを共有）
+- 旧 raw（nonce|tag|ct）とサイドカー（.aad.json / .meta.json）は指定したときだけ書く
+- encrypt_uploads は多数のファイルを bmsc_v6_tree と同じパイプライン（読み込み → ワーカー → 書き出し）で流す
+- 鍵束（bmsc_v6_keyring.Keyring）を渡すか kid を指定すると KID をヘッダに入れる（bytes 鍵で kid 省略時はヘッダは従来どおり）
+- compress を指定すると縮むファイルだけ圧縮してから暗号化する（旧 raw は圧縮を表せないので併用不可）
+"""
+import os, json, hashlib, base64, time
+from pathlib import Path
+
+from bmsc_v6_prod import OUT_EXTRA
+from bmsc_v6_container import seal_v2_into, _check_master
+from bmsc_v6_tree import SUFFIX, DEFAULT_MAX_INFLIGHT, file_aad, _run_pipeline, _write_atomic, _writev_all
+
+READ_BLOCK = 1 << 20
+DEFAULT_KID = "local:drive"
+
+def _read_hashed(path, extra: int):
+    """ファイル全体を bytearray(size + extra) に読みながら SHA-256 を計算する。返り値: (buf, size, sha256_hex)"""
+    h = hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        buf = bytearray(size + extra)
+        mv = memoryview(buf); got = 0
+        while got < size:
+            n = f.readinto(mv[got:min(size, got + READ_BLOCK)])
+            if not n: break
+            h.update(mv[got:got+n]); got += n
+    return buf, got, h.hexdigest()
+
+def _seal(buf, size: int, digest: str, name: str, K, ctx: bytes, kid: str|None, compress: str|None):
+    """buf[:size] を in-place 暗号化する。返り値: (header, aad, nonce, tag, ct の memoryview)"""
+    mv = memoryview(buf)
+    aad = file_aad(name, size, digest)
+    header, nonce, tag, n = seal_v2_into(mv, mv[:size], K, ctx, aad, kid=kid, compress=compress)
+    return header, aad, nonce, tag, mv[:n]
+
+def _write_plain(path, parts):
+    """副出力（旧 raw・サイドカー）用。.part + rename は本体（.bmsc6）だけにして、小さなファイルの書き出しを軽くする"""
+    with open(path, "wb", buffering=0) as f:
+        _writev_all(f.fileno(), parts)
+
+def meta_json(ctx: bytes, nonce: bytes, tag: bytes, kid: str=DEFAULT_KID) -> bytes:
+    """drive_encrypt.py と同じメタ情報サイドカー（参考用途。復号には不要）"""
+    meta = {
+        "ver":  "bmsc6",
+        "kid":  kid,
+        "ctx":  ctx.decode("utf-8", errors="replace"),
+        "nonce_b64": base64.b64encode(nonce).decode("ascii"),
+        "tag_b64":   base64.b64encode(tag).decode("ascii"),
+        "created_at": int(time.time()),
+        "bmsc6_version": 2
+    }
+    return json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _check(K_master, ctx, kid, raw, compress):
+    """返り値: (鍵, ctx, メタ JSON に書く KID)"""
+    K = _check_master(K_master)
+    if not isinstance(ctx, (bytes, bytearray)): raise TypeError("ctx must be bytes")
+    if raw and compress: raise ValueError("raw output cannot be compressed")
+    if kid is None and hasattr(K, "key_for"):
+        kid = K.default_kid
+    return K, bytes(ctx), DEFAULT_KID if kid is None else kid
+
+def encrypt_upload(src, out, K_master: bytes, ctx: bytes, *, name: str|None=None,
+                   raw_out=None, aad_out=None, meta_out=None, kid: str|None=None, compress: str|None=None) -> dict:
+    """
+    src を 1 回読んで bmsc6 v2（AAD: name/size/sha256。name の既定は src のファイル名）として out に書く。
+    raw_out（旧形式 nonce|tag|ct）・aad_out（AAD JSON）・meta_out（メタ JSON）は指定したものだけ書く。
+    返り値: {"name", "size", "sha256", "aad", "nonce", "tag", "ct"}（ct は暗号文の memoryview）
+    """
+    K, ctx, meta_kid = _check(K_master, ctx, kid, raw_out is not None, compress)
+    src = Path(src)
+    name = src.name if name is None else name
+    buf, size, digest = _read_hashed(src, OUT_EXTRA)
+    header, aad, nonce, tag, ct = _seal(buf, size, digest, name, K, ctx, kid, compress)
+    _write_atomic(Path(out), (header, nonce, tag, ct))
+    if raw_out is not None:
+        _write_plain(raw_out, (nonce, tag, ct))
+    if aad_out is not None:
+        _write_plain(aad_out, (aad,))
+    if meta_out is not None:
+        _write_plain(meta_out, (meta_json(ctx, nonce, tag, meta_kid),))
+    return {"name": name, "size": size, "sha256": digest, "aad": aad, "nonce": nonce, "tag": tag, "ct": ct}
+
+def encrypt_uploads(paths, out_dir, K_master: bytes, ctx: bytes, *, raw: bool=False, sidecars: bool=False,
+                    kid: str|None=None, compress: str|None=None, workers: int|None=None,
+                    max_inflight: int=DEFAULT_MAX_INFLIGHT, progress=None) -> dict:
+    """
+    多数のファイルを out_dir/<ファイル名>.bmsc6 に暗号化する（raw=True で <ファイル名>.bin、
+    sidecars=True で <ファイル名>.aad.json / .meta.json も書く）。ファイル名の重複はエラー。
+    progress(done_files, total_files, done_bytes, total_bytes) は書き出しごとに呼ばれる。
+    返り値: {"files", "failed": [(name, msg)], "bytes", "seconds", "results": [{"name", "size", "sha256", "out"}]}
+    """
+    K, ctx, meta_kid = _check(K_master, ctx, kid, raw, compress)
+    out_dir = Path(out_dir)
+    items = []; seen = set()
+    for p in map(Path, paths):
+        if p.name in seen:
+            raise ValueError(f"duplicate file name: {p.name}")
+        seen.add(p.name)
+        st = p.stat()
+        items.append((p, p.name, st.st_size, st.st_mtime_ns))
+    total_bytes = sum(i[2] for i in items)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+
+    def read(path, extra):
+        # 読み込みスレッドでハッシュまで済ませる（buf として (buf, sha256) を work に渡す）
+        buf, size, digest = _read_hashed(path, extra)
+        return (buf, digest), size
+
+    def work(name, payload, size):
+        buf, digest = payload
+        return digest, _seal(buf, size, digest, name, K, ctx, kid, compress)
+
+    results = []
+    def write(item, result):
+        digest, (header, aad, nonce, tag, ct) = result
+        name = item[1]
+        out = out_dir / (name + SUFFIX)
+        _write_atomic(out, (header, nonce, tag, ct))
+        if raw:
+            _write_plain(out_dir / (name + ".bin"), (nonce, tag, ct))
+        if sidecars:
+            _write_plain(out_dir / (name + ".aad.json"), (aad,))
+            _write_plain(out_dir / (name + ".meta.json"), (meta_json(ctx, nonce, tag, meta_kid),))
+        results.append({"name": name, "size": item[2], "sha256": digest, "out": str(out)})
+
+    report = None
+    if progress is not None:
+        report = lambda n, b: progress(n, len(items), b, total_bytes)
+    done, done_bytes, failed = _run_pipeline(items, OUT_EXTRA, work, write, workers or os.cpu_count() or 1,
+                                             max_inflight, report, read=read)
+    return {"files": done, "failed": failed, "bytes": done_bytes,
+            "seconds": time.perf_counter() - t0, "results": results}
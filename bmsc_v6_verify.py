@@ -0,0 +1,145 @@
+# bmsc_v6_verify.py
+"""
+bmsc6 の一括検証（`bmsc_prod verify` の本体）
+
+平文は出力しない: 各ファイルを mmap し、MAGIC/バージョン/長さを検査して AEAD のタグを確認する。
+復号結果はワーカーごとに使い回す作業バッファに書かれるだけで、ディスクにも呼び出し元にも渡らない
+（XChaCha20-Poly1305 は復号しないとタグを確認できないため）。
+ファイルはスレッドプールで並行に処理する（libsodium 呼び出し中は GIL が解放される）。
+パスの列は遅延評価し、同時に抱えるファイル数は workers の数倍までに抑えるので、数百万件でもメモリは増えない。
+"""
+import os, time, struct, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from bmsc_v6_prod import OUT_EXTRA, _open_into
+from bmsc_v6_container import (
+    MAGIC, HEAD_LEN, TAG_LEN, VER_V3, map_file, unpack_blob, open_v2,
+    resolve_key, stream_keys, comp_info, _check_master, _head_len, _parse_head, _parse_rest,
+    _chunk_ad, _chunk_nonce, _open_record,
+)
+from bmsc_v6_tree import SUFFIX
+
+_local = threading.local()
+
+def _scratch(n: int) -> memoryview:
+    """スレッドごとの作業バッファ（平文の捨て場）。足りなければ作り直す"""
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) < n:
+        buf = _local.buf = bytearray(max(n, 1 << 20))
+    return memoryview(buf)[:n]
+
+def _verify_v3(mv, K, aad: bytes|None) -> int:
+    """v3 の全レコードを順に認証する。返り値: 平文長"""
+    head = bytes(mv[:HEAD_LEN + 2])
+    hl = _head_len(head)
+    _, flags, rest_len, lens = _parse_head(head[:hl])
+    ctx, emb_aad, nonce, cs, ext = _parse_rest(bytes(mv[hl:hl + rest_len]), flags, lens)
+    key, ad = stream_keys(resolve_key(K, ext), nonce, ctx, emb_aad if aad is None else aad, ext)
+    algo = comp_info(ext)[0]
+    pos = hl + rest_len; end = len(mv); index = 0; total = 0
+    out = _scratch(min(cs, len(mv)) + OUT_EXTRA)
+    while True:
+        if algo:
+            if end - pos < 4:
+                raise ValueError("bmsc6 v3 truncated")
+            n = struct.unpack(">I", mv[pos:pos+4])[0]; pos += 4
+            if n > cs + 1:
+                raise ValueError("bmsc6 v3 malformed chunk")
+        else:
+            n = min(cs, end - pos - TAG_LEN)
+        if n < 0 or pos + n + TAG_LEN > end:
+            raise ValueError("bmsc6 v3 truncated")
+        final = pos + n + TAG_LEN == end
+        if algo:
+            # 圧縮付きは展開まで確かめる（長さの規則も含めて読み手と同じ判定）
+            total += len(_open_record(key, nonce, ad, index, final, bytes(mv[pos:pos+n+TAG_LEN]), algo, cs))
+        else:
+            total += _open_into(out, mv[pos:pos+n], bytes(mv[pos+n:pos+n+TAG_LEN]),
+                                _chunk_ad(ad, final), _chunk_nonce(nonce, index), key)
+        pos += n + TAG_LEN; index += 1
+        if final:
+            return total
+
+def verify_file(path, K_master, ctx: bytes=b"", aad: bytes|None=None) -> tuple:
+    """
+    1 ファイルを検証する。返り値: (ver, 平文長)。失敗は ValueError（auth failed / 形式エラー）か OSError。
+    ctx は ctx を内包しない v1 用。aad を指定すると内包 AAD の代わりに使う（decrypt-file と同じ）。
+    """
+    mv = map_file(path)
+    if len(mv) < 8 or mv[:6] != MAGIC:
+        raise ValueError("not a bmsc6 container")
+    if mv[6] == VER_V3:
+        return VER_V3, _verify_v3(mv, K_master, aad)
+    n, t, c, ctx_b, aad_b, ver, ext = unpack_blob(mv)
+    if len(n) != 24 or len(t) != TAG_LEN:
+        raise ValueError(f"bmsc6 v{ver} too short")
+    ctx = bytes(ctx_b) if ctx_b is not None else ctx
+    if aad is None:
+        aad = bytes(aad_b) if aad_b is not None else b""
+    # 作業バッファは ct から決める（圧縮付きのヘッダの平文長は認証前には信用しない）
+    out = _scratch(len(c) + OUT_EXTRA)
+    return ver, len(open_v2(K_master, ctx, aad, bytes(n), c, bytes(t), ext, out))
+
+def iter_paths(paths, suffix: str=SUFFIX):
+    """パス列を展開する（ディレクトリは再帰的に suffix のファイル、ファイルはそのまま）"""
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            for dirpath, dirnames, filenames in os.walk(p):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(suffix):
+                        yield Path(dirpath, name)
+        else:
+            yield p
+
+def verify_paths(paths, K_master, *, ctx: bytes=b"", aad: bytes|None=None, workers: int|None=None,
+                 progress=None) -> dict:
+    """
+    paths（ファイルの列。遅延評価可）を並行に検証する。
+    progress(done_files, failed_files, done_bytes) は 1 件ごとに呼ばれる（呼び出し元スレッド）。
+    返り値: {"files", "ok", "failed", "bytes", "seconds", "files_per_s", "mib_per_s",
+             "versions": {ver: count}, "failures": [{"path", "error"}]}
+    """
+    K = _check_master(K_master)
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    done = ok = nbytes = 0; failures = []; versions = {}
+
+    def one(path):
+        size = 0
+        try:
+            size = os.stat(path).st_size
+            ver, _ = verify_file(path, K, ctx, aad)
+            return path, size, ver, None
+        except (ValueError, OSError) as e:
+            return path, size, None, str(e) or type(e).__name__
+        except Exception as e:
+            # 想定外の例外もそのファイルの失敗として記録し、全体の検証は続ける
+            return path, size, None, f"{type(e).__name__}: {e}"
+
+    def collect(fut):
+        nonlocal done, ok, nbytes
+        path, size, ver, err = fut.result()
+        done += 1; nbytes += size
+        if err is None:
+            ok += 1; versions[ver] = versions.get(ver, 0) + 1
+        else:
+            failures.append({"path": str(path), "error": err})
+        if progress is not None:
+            progress(done, len(failures), nbytes)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bmsc6-verify") as ex:
+        pending = set()
+        for path in paths:
+            pending.add(ex.submit(one, path))
+            if len(pending) >= 4 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in finished: collect(f)
+        for f in pending: collect(f)
+
+    dt = max(time.perf_counter() - t0, 1e-9)
+    return {"files": done, "ok": ok, "failed": len(failures), "bytes": nbytes, "seconds": round(dt, 3),
+            "files_per_s": round(done / dt, 1), "mib_per_s": round(nbytes / (1 << 20) / dt, 1),
+            "versions": {str(k): v for k, v in sorted(versions.items())}, "failures": failures}
@@ -2,7 +2,7 @@ import sys, pathlib, os, base64
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
-from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt
+from bmsc_v6_session import Bmsc6Session, ReplayError, new_session_id
 
 HERE = pathlib.Path(__file__).resolve().parent
 key_path = HERE / "key_chat.bin"
@@ -14,7 +14,17 @@ else:
 IV  = b"BMSCv6-IV00"
 msg = "こんにちは！ 全角です"
 
-nonce, ct, tag = bmsc_v6_encrypt(msg.encode("utf-8"), K, IV)
-print("送信（CT先頭）:", base64.b64encode(ct[:24]).decode(), "...")
-pt = bmsc_v6_decrypt(nonce, ct, tag, K, IV)
-print("受信:", pt.decode("utf-8"))
+# 会話ごとのセッション（鍵導出は 1 回、nonce はカウンタ、受信側で再送を拒否）。
+# session_id は会話の開始時に共有する。再起動をまたぐなら state_path= でカウンタと受信窓を保存する
+sid = new_session_id()
+alice = Bmsc6Session(K, IV, sid, b"alice", b"bob")
+bob   = Bmsc6Session(K, IV, sid, b"bob", b"alice")
+
+wire = alice.seal(msg.encode("utf-8"))
+print("送信（CT先頭）:", base64.b64encode(wire[8:32]).decode(), "...")
+print("受信:", bob.open(wire).decode("utf-8"))
+print("返信:", alice.open(bob.seal("受け取りました".encode("utf-8"))).decode("utf-8"))
+try:
+    bob.open(wire)
+except ReplayError as e:
+    print("再送は拒否:", e)
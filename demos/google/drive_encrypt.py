@@ -2,7 +2,6 @@
 import sys
 import os
 import base64
-import hashlib, json, time, struct
 from pathlib import Path
 
 # ルート（BMSC-v6）を import パスに追加
@@ -10,7 +9,7 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from bmsc_v6_prod import bmsc_v6_encrypt  # AEAD本体
+from bmsc_v6_upload import encrypt_upload  # 1 パス（読み込み + SHA-256 + in-place AEAD + writev）
 
 HERE = Path(__file__).resolve().parent
 
@@ -38,14 +37,8 @@ META_JSON  = HERE / "住民票_encrypted.meta.json"   # メタ情報（人間/
 CTX = "BMSCv6-IV00"
 CTX_BYTES = CTX.encode("utf-8")
 
-# bmsc6 v1: MAGIC(6) + ver(1)=1 + flags(1) + nonce(24) + tag(16) + ct
-# bmsc6 v2: MAGIC(6) + ver(1)=2 + flags(1)
-#           + ctx_len(2 BE) + aad_len(4 BE) + ctx + aad + nonce(24) + tag(16) + ct
-MAGIC = b"BMSC6\x00"
-VER_V2 = 2
-FLAGS  = 0
-NONCE_LEN = 24
-TAG_LEN   = 16
+# 旧 raw とサイドカーは互換・参考用（False にすると bmsc6 v2 だけを書く）
+WRITE_LEGACY_OUTPUTS = True
 
 def main() -> int:
     # 鍵の用意
@@ -56,54 +49,33 @@ def main() -> int:
         print("key_drive.bin は 32 バイトである必要があります。")
         return 2
 
-    # 平文PDFの読込
+    # 読込・SHA-256・AAD(JSON)・暗号化・書き出しを 1 パスで
+    #   新形式: bmsc6 v2（ctx/aad 内包）
+    #   旧形式（互換用）: raw nonce|tag|ct、サイドカー: AAD / メタ情報（参考用途。なくても復号可能）
+    legacy = WRITE_LEGACY_OUTPUTS
     try:
-        data = SRC_PDF.read_bytes()
-    except Exception as e:
-        print(f"PDF 読込に失敗: {SRC_PDF} ({e})")
+        r = encrypt_upload(SRC_PDF, OUT_BMSC6, K, CTX_BYTES,
+                           raw_out=OUT_BIN if legacy else None,
+                           aad_out=AAD_JSON if legacy else None,
+                           meta_out=META_JSON if legacy else None)  # メタの kid は既定の "local:drive"
+    except OSError as e:
+        print(f"PDF 読込/書き出しに失敗: {SRC_PDF} ({e})")
         return 3
-
-    # AAD(JSON) を作成（コンパクト・バイト固定）
-    sha = hashlib.sha256(data).hexdigest()
-    aad_obj   = {"name": SRC_PDF.name, "size": len(data), "sha256": sha}
-    aad_bytes = json.dumps(aad_obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-
-    # 暗号化（nonce|tag|ct）
-    nonce, ct, tag = bmsc_v6_encrypt(data, K, CTX_BYTES, aad=aad_bytes)
-
-    # 旧形式（互換用）
-    OUT_BIN.write_bytes(nonce + tag + ct)
-
-    # 新形式（bmsc6 v2 = ctx/aad 内包）
-    ctx_len = len(CTX_BYTES)
-    aad_len = len(aad_bytes)
-    header  = MAGIC + bytes([VER_V2, FLAGS]) + struct.pack(">HI", ctx_len, aad_len)
-    OUT_BMSC6.write_bytes(header + CTX_BYTES + aad_bytes + nonce + tag + ct)
-
-    # サイドカー出力（参考用途。なくても復号可能）
-    AAD_JSON.write_bytes(aad_bytes)
-    meta = {
-        "ver":  "bmsc6",
-        "kid":  "local:drive",
-        "ctx":  CTX,
-        "nonce_b64": base64.b64encode(nonce).decode("ascii"),
-        "tag_b64":   base64.b64encode(tag).decode("ascii"),
-        "created_at": int(time.time()),
-        "bmsc6_version": 2
-    }
-    META_JSON.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    sha, nonce, ct, tag = r["sha256"], r["nonce"], r["ct"], r["tag"]
 
     # 情報表示
     print("入力PDF:", SRC_PDF)
     print("元PDF SHA-256:", sha)
     print("鍵ファイル:", KEY_FILE)
-    print("暗号化完了(raw):", OUT_BIN.name)
+    if legacy:
+        print("暗号化完了(raw):", OUT_BIN.name)
     print("暗号化完了(bmsc6 v2):", OUT_BMSC6.name)
     print("CT(Base64):", base64.b64encode(ct).decode("ascii"))
     print("NONCE(Base64):", base64.b64encode(nonce).decode("ascii"))
     print("TAG(Base64):",   base64.b64encode(tag).decode("ascii"))
-    print("AAD file:", AAD_JSON)
-    print("META file:", META_JSON)
+    if legacy:
+        print("AAD file:", AAD_JSON)
+        print("META file:", META_JSON)
     print("CT size:", len(ct), "bytes")
     return 0
 
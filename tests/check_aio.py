@@ -0,0 +1,133 @@
+import asyncio, io, socket
+
+from checklib import VECTORS, b64d, fail, load_vector, run
+import bmsc_v6_aio as aio
+from bmsc_v6_prod import bmsc_v6_decrypt
+from bmsc_v6_container import Bmsc6Writer, Bmsc6Reader, TAG_LEN
+
+# asyncio API: encrypt/decrypt と AsyncBmsc6Writer/AsyncBmsc6Reader の往復、改ざん・切り詰め・中断の検出、
+# 同期版とのバイト互換（bmsc6 v3 の固定ベクタを非同期で書いて一致させる・圧縮付きは Bmsc6Writer と一致させる）。
+#   py tests/check_aio.py
+
+VECTOR = VECTORS / "bmsc6_v3_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"v3.txt"}'
+CS = 64
+
+async def seal(pt: bytes, *, nonce: bytes|None=None, chunk_size: int=CS, inline_max: int=aio.INLINE_MAX,
+               abort: bool=False, compress: str|None=None) -> bytes:
+    """AsyncBmsc6Writer で socketpair に書き、反対側で受け取ったバイト列を返す（abort=True は途中で例外）"""
+    a, b = socket.socketpair()
+    rb, wb = await asyncio.open_connection(sock=b)
+    _, wa = await asyncio.open_connection(sock=a)
+    received = asyncio.ensure_future(rb.read())
+    try:
+        async with aio.AsyncBmsc6Writer(wa, K, CTX, AAD, chunk_size, nonce=nonce, inline_max=inline_max,
+                                        compress=compress) as w:
+            for i in range(0, len(pt), 37):
+                await w.write(pt[i:i+37])
+            if abort:
+                raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    wa.close(); await wa.wait_closed()
+    blob = await received
+    wb.close()
+    return blob
+
+async def open_all(blob: bytes, key: bytes=K, inline_max: int=aio.INLINE_MAX) -> bytes:
+    sr = asyncio.StreamReader()
+    sr.feed_data(blob); sr.feed_eof()
+    r = await aio.AsyncBmsc6Reader.open(sr, key, inline_max=inline_max)
+    return b"".join([pt async for pt in r])
+
+async def opens(blob: bytes, key: bytes=K) -> bool:
+    try:
+        await open_all(blob, key)
+    except ValueError:
+        return False
+    return True
+
+async def checks():
+    # encrypt/decrypt（その場で処理する経路と executor の経路）
+    for n, inline_max in ((100, aio.INLINE_MAX), (100, 0), (200_000, aio.INLINE_MAX)):
+        pt = bytes(i % 253 for i in range(n))
+        nonce, ct, tag = await aio.encrypt(pt, K, CTX, AAD, inline_max=inline_max)
+        if bmsc_v6_decrypt(nonce, ct, tag, K, CTX, AAD) != pt:
+            fail(f"aio.encrypt is not compatible with bmsc_v6_decrypt ({n} bytes)")
+        if await aio.decrypt(nonce, ct, tag, K, CTX, AAD, inline_max=inline_max) != pt:
+            fail(f"aio.decrypt round trip ({n} bytes)")
+        try:
+            await aio.decrypt(nonce, ct, bytes(16), K, CTX, AAD, inline_max=inline_max)
+            fail("aio.decrypt accepted a bad tag")
+        except ValueError:
+            pass
+
+    # v3 ストリームの往復（同期版の Bmsc6Reader でも読める）
+    for n in (0, 1, CS, CS + 1, 5 * CS + 3):
+        pt = bytes(i % 251 for i in range(n))
+        for inline_max in (aio.INLINE_MAX, 0):
+            blob = await seal(pt, inline_max=inline_max)
+            if await open_all(blob, inline_max=inline_max) != pt:
+                fail(f"async v3 round trip ({n} bytes)")
+            if b"".join(Bmsc6Reader(io.BytesIO(blob), K)) != pt:
+                fail(f"async v3 output is not readable by Bmsc6Reader ({n} bytes)")
+
+    pt = bytes(range(256)) + b"tail"
+    blob = await seal(pt)
+    body = len(blob) - (len(pt) + 5 * TAG_LEN)
+    # 改ざん・鍵違い
+    for i in range(0, len(blob), 3):
+        bad = bytearray(blob); bad[i] ^= 0x80
+        if await opens(bytes(bad)):
+            fail(f"tampered byte {i} accepted")
+    if await opens(blob, bytes(32)):
+        fail("wrong key accepted")
+    # 切り詰め・追記
+    for cut in list(range(body, len(blob), CS + TAG_LEN)) + [len(blob) - 1, body - 1, 5]:
+        if await opens(blob[:cut]):
+            fail(f"truncation at {cut} accepted")
+    if await opens(blob + b"\x00"):
+        fail("appended data accepted")
+    # 途中で例外が起きた writer は最終チャンクを書かない → 読み手は切り詰めとして弾く
+    if await opens(await seal(pt, abort=True)):
+        fail("aborted writer output accepted")
+
+    # 圧縮付き: nonce を固定すれば Bmsc6Writer と同じバイト列（auto は乱数のデータを圧縮しない）
+    nonce = bytes(range(24))
+    text = b"async compress " * 40
+    for data in (b"", text, bytes(i % 251 for i in range(5 * CS + 3)), bytes(range(256)) * 3):
+        for compress in ("zlib", "auto"):
+            sync = io.BytesIO()
+            with Bmsc6Writer(sync, K, CTX, AAD, CS, nonce=nonce, compress=compress) as w:
+                w.write(data)
+            for inline_max in (aio.INLINE_MAX, 0):
+                blob = await seal(data, nonce=nonce, inline_max=inline_max, compress=compress)
+                if blob != sync.getvalue() or await open_all(blob, inline_max=inline_max) != data:
+                    fail(f"async compress={compress} differs from Bmsc6Writer ({len(data)} bytes)")
+    if len(await seal(text, compress="zlib")) >= len(text) or await seal(text, nonce=nonce, compress="auto") == \
+            await seal(text, nonce=nonce):
+        fail("async compress did not compress")
+    if await opens(await seal(text, compress="zlib", abort=True)):
+        fail("aborted compressed writer output accepted")
+    try:
+        aio.AsyncBmsc6Writer(None, K, CTX, compress="gzip")
+        fail("unknown compression accepted")
+    except ValueError:
+        pass
+
+    # 固定ベクタ: nonce を固定した非同期書き出しが同期版と同じバイト列になる
+    vec = load_vector(VECTOR)
+    vpt, vblob = b64d(vec["pt_b64"]), b64d(vec["file_b64"])
+    if await seal(vpt, nonce=b64d(vec["nonce_b64"]), chunk_size=vec["chunk_size"]) != vblob:
+        fail("vector: async output differs from bmsc6_v3_vector_1.json")
+    if await open_all(vblob) != vpt:
+        fail("vector: plaintext mismatch")
+
+def main():
+    asyncio.run(checks())
+    print("✅ bmsc6 asyncio OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,63 @@
+import os
+
+from checklib import fail, rejected, run
+from bmsc_v6_prod import encrypt_many, decrypt_many, bmsc_v6_encrypt, bmsc_v6_decrypt, NPUBBYTES, ABYTES
+
+# まとめて暗号化/復号する API（encrypt_many / decrypt_many）: 空と大小の混じった平文の往復、
+# 各件が bmsc_v6_decrypt で 1 件ずつ開けること（と bmsc_v6_encrypt の出力をまとめて開けること）、
+# AAD の指定（全件共通・件ごと・件数の不一致）、改ざん・別の AAD の件だけが failed に入ること、nonce の重複が無いこと。
+#   py tests/check_batch.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+
+def main():
+    pts = [b"", b"a", os.urandom(15), os.urandom(16), b"", os.urandom(4096), os.urandom(70_000), b"z" * 3]
+    aads = [b"", b'{"i":1}', b"", b"x" * 100, b"e", b"", b'{"i":6}', b""]
+
+    # 往復（イテレータも可）と 1 件ずつの復号
+    for a in (None, b"shared", aads):
+        per = [b""] * len(pts) if a is None else [a] * len(pts) if isinstance(a, bytes) else a
+        batch = encrypt_many(iter(pts), K, CTX, a)
+        if len(batch) != len(pts) or len(batch.nonces) != NPUBBYTES * len(pts) or len(batch.tags) != ABYTES * len(pts):
+            fail("encrypted batch layout")
+        if [len(ct) for _, ct, _ in batch] != [len(pt) for pt in pts] or batch.offsets[-1] != sum(map(len, pts)):
+            fail("ciphertext lengths")
+        for (nonce, ct, tag), pt, aad in zip(batch, pts, per):
+            if bmsc_v6_decrypt(nonce, ct, tag, K, CTX, aad) != pt:
+                fail("item does not open with bmsc_v6_decrypt")
+        out = decrypt_many(batch, K, CTX, a)
+        if out.failed or list(out) != pts or [out[i] for i in range(-len(pts), 0)] != pts:
+            fail("decrypt_many round trip")
+    if len({batch[i][0] for i in range(len(batch))}) != len(pts):
+        fail("nonce reused within a batch")
+    # bmsc_v6_encrypt の出力（タプルの列）もまとめて開ける
+    items = [bmsc_v6_encrypt(pt, K, CTX, aad) for pt, aad in zip(pts, aads)]
+    if list(decrypt_many(items, K, CTX, aads)) != pts:
+        fail("decrypt_many of bmsc_v6_encrypt output")
+    if len(encrypt_many([], K, CTX)) != 0 or len(decrypt_many([], K, CTX)) != 0:
+        fail("empty batch")
+
+    # 改ざん・別の AAD: その件だけが None で failed に入る
+    bad = list(items)
+    n, ct, tag = bad[3]; bad[3] = (n, bytes([ct[0] ^ 1]) + ct[1:], tag)
+    n, ct, tag = bad[0]; bad[0] = (n, ct, bytes([tag[0] ^ 1]) + tag[1:])
+    n, ct, tag = bad[6]; bad[6] = (n[:23], ct, tag)
+    wrong = list(aads); wrong[5] = b"other"
+    out = decrypt_many(bad, K, CTX, wrong)
+    if out.failed != [0, 3, 5, 6] or [out[i] for i in out.failed] != [None] * 4:
+        fail(f"failed indices: {out.failed}")
+    if [pt for i, pt in enumerate(out) if i not in out.failed] != [pt for i, pt in enumerate(pts) if i not in out.failed]:
+        fail("intact items after failures")
+    if decrypt_many(items, bytes(32), CTX, aads).failed != list(range(len(pts))):
+        fail("wrong key accepted")
+
+    # 引数の検査
+    if not rejected(encrypt_many, pts, K, CTX, aads[:-1]) or not rejected(decrypt_many, items, K, CTX, aads + [b""]):
+        fail("aads length mismatch accepted")
+    if not rejected(encrypt_many, ["text"], K, CTX, exc=TypeError) or not rejected(lambda: batch[len(pts)], exc=IndexError):
+        fail("bad plaintext type / index accepted")
+    print("✅ bmsc6 batch OK")
+
+if __name__ == "__main__":
+    run(main)
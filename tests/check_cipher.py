@@ -0,0 +1,45 @@
+import os
+
+from checklib import fail, rejected, run
+from bmsc_v6_prod import BmscCipher, AuthFailed, OUT_EXTRA, _derive_key, bmsc_v6_encrypt, bmsc_v6_decrypt
+
+# 小さなメッセージ向けのコンテキスト（BmscCipher）: 手で展開した HKDF（_key）が _derive_key と一致すること
+# （ctx の長さ 0〜200 バイト・SHA-256 のブロック長 64 をまたぐもの）、bmsc_v6_encrypt/decrypt と相互に開けること、
+# encrypt_into/decrypt_into の往復、改ざん・別の ctx/AAD の拒否。
+#   py tests/check_cipher.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX_LENGTHS = (0, 1, 11, 51, 52, 64, 65, 200)  # 51/52: HKDF info（ラベル 12B + ctx + 1B）が 64B の前後
+
+def main():
+    for n in CTX_LENGTHS:
+        ctx = bytes(range(n))
+        c = BmscCipher(K, ctx)
+        for nonce in (bytes(24), bytes(range(24)), os.urandom(24)):
+            if c._key(nonce) != _derive_key(K, nonce, ctx):
+                fail(f"_key differs from _derive_key (ctx {n} bytes)")
+        for pt, aad in ((b"", b""), (b"hello", b'{"k":1}'), (os.urandom(1000), b"")):
+            nonce, ct, tag = c.encrypt(pt, aad)
+            if bmsc_v6_decrypt(nonce, ct, tag, K, ctx, aad) != pt:
+                fail(f"BmscCipher.encrypt → bmsc_v6_decrypt (ctx {n} bytes)")
+            if c.decrypt(*bmsc_v6_encrypt(pt, K, ctx, aad), aad) != pt:
+                fail(f"bmsc_v6_encrypt → BmscCipher.decrypt (ctx {n} bytes)")
+            buf = bytearray(len(pt) + OUT_EXTRA)
+            nonce, tag = c.encrypt_into(buf, pt, aad)
+            out = bytearray(len(pt) + OUT_EXTRA)
+            if c.decrypt_into(out, nonce, buf[:len(pt)], tag, aad) != len(pt) or out[:len(pt)] != pt:
+                fail(f"encrypt_into/decrypt_into (ctx {n} bytes)")
+
+    c = BmscCipher(K, b"BMSCv6-IV00")
+    nonce, ct, tag = c.encrypt(b"payload", b"aad")
+    bad = bytes([tag[0] ^ 1]) + tag[1:]
+    if not rejected(c.decrypt, nonce, ct, bad, b"aad", exc=AuthFailed) or not rejected(c.decrypt, nonce, ct, tag, b"", exc=AuthFailed):
+        fail("tampered tag / wrong AAD accepted")
+    if not rejected(BmscCipher(K, b"BMSCv6-IV01").decrypt, nonce, ct, tag, b"aad", exc=AuthFailed):
+        fail("another ctx accepted")
+    if not rejected(c.decrypt, nonce[:23], ct, tag) or not rejected(BmscCipher, K[:31], b"") or not rejected(BmscCipher, K, "ctx", exc=TypeError):
+        fail("bad nonce/key/ctx accepted")
+    print("✅ bmsc6 BmscCipher OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,144 @@
+from pathlib import Path
+import io, os, struct, subprocess, sys, tempfile
+
+from checklib import ROOT, VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+import bmsc_v6_compress as comp
+from bmsc_v6_container import (
+    HEAD_LEN, FLAG_COMP, Bmsc6Writer, Bmsc6Reader, Bmsc6Header, seal_v2_into, unpack_v2, open_v2, comp_info,
+)
+
+# 暗号化前の圧縮（FLAG_COMP=0x02、SPEC.md §3.4）: v2/v3 の往復、縮まない入力は圧縮しないこと、
+# ヘッダの平文長・アルゴリズム・ext の書き換えや ct の改ざん・切り詰めの検出（平文長を 1<<62 にしても
+# 認証前に確保しない）、展開爆弾の上限、decrypt-file の失敗経路、固定ベクタ（ヘッダ配置）の確認。
+# 圧縮結果は zlib/lzma の実装によって変わり得るので、ベクタは復号だけを確かめる。
+#   py tests/check_compress.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_comp_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"comp.txt"}'
+TEXT = "圧縮のテスト: the quick brown fox jumps over the lazy dog. ".encode("utf-8") * 200
+
+def seal_v2(pt: bytes, compress: str|None) -> bytes:
+    out = bytearray(len(pt))
+    header, nonce, tag, n = seal_v2_into(out, pt, K, CTX, AAD, compress=compress)
+    return bytes(header + nonce + tag + out[:n])
+
+def open_v2_blob(blob: bytes) -> bytes:
+    ctx, aad, nonce, tag, ct, ext = unpack_v2(memoryview(blob))
+    return bytes(open_v2(K, bytes(ctx), bytes(aad), bytes(nonce), ct, tag, ext))
+
+def seal_v3(pt: bytes, compress: str|None) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, AAD, 1024, compress=compress) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def open_v3(blob: bytes) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), K))
+
+def len_field(blob: bytes) -> int:
+    """v2 の FLAG_COMP の平文長（8B）のファイル位置"""
+    i = blob.index(bytes([FLAG_COMP, 0, 9]), HEAD_LEN + 2)
+    return i + 4
+
+def write_vector():
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 v2/v3 + compression extension)",
+        "ctx": CTX.decode("ascii"),
+        "key_hex": K.hex(),  # ←テスト用
+        "pt_b64": b64e(TEXT),
+        "v2_zlib_b64": b64e(seal_v2(TEXT, "zlib")),  # nonce は乱数（作り直すと変わる）
+        "v2_lzma_b64": b64e(seal_v2(TEXT, "lzma")),
+        "v3_zlib_b64": b64e(seal_v3(TEXT, "zlib")),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    pt = b64d(vec["pt_b64"])
+    for name, algo in (("zlib", comp.ALG_ZLIB), ("lzma", comp.ALG_LZMA)):
+        blob = b64d(vec[f"v2_{name}_b64"])
+        # 固定部 14B（flags=0x02）の直後に ext_len(2)=12 + TLV(type=0x02, len(2)=9, algo(1), 平文長(8 BE))
+        ext = bytes([FLAG_COMP, 0, 9, algo]) + struct.pack(">Q", len(pt))
+        if blob[6:8] != b"\x02\x02" or blob[HEAD_LEN:HEAD_LEN+14] != struct.pack(">H", 12) + ext:
+            fail(f"vector: v2 {name} header layout differs")
+        if open_v2_blob(blob) != pt:
+            fail(f"vector: v2 {name} plaintext mismatch")
+    v3 = b64d(vec["v3_zlib_b64"])
+    # v3 の FLAG_COMP は algo(1) だけ（レコードは ct_len(4 BE) の長さ前置）
+    if v3[6:8] != b"\x03\x02" or v3[HEAD_LEN:HEAD_LEN+6] != struct.pack(">H", 4) + bytes([FLAG_COMP, 0, 1, comp.ALG_ZLIB]):
+        fail("vector: v3 header layout differs")
+    if open_v3(v3) != pt:
+        fail("vector: v3 plaintext mismatch")
+
+def main():
+    noise = os.urandom(5000)
+    # 往復（v2/v3 × zlib/lzma/auto）。縮まない入力は FLAG_COMP を付けない
+    for compress in ("zlib", "lzma", "auto"):
+        for pt in (TEXT, noise, b""):
+            v2, v3 = seal_v2(pt, compress), seal_v3(pt, compress)
+            if open_v2_blob(v2) != pt or open_v3(v3) != pt:
+                fail(f"round trip ({compress}, {len(pt)} bytes)")
+        if Bmsc6Header.read(io.BytesIO(seal_v2(TEXT, compress))).compression is None:
+            fail(f"{compress}: text was not compressed")
+        if Bmsc6Header.read(io.BytesIO(seal_v2(noise, compress))).compression is not None:
+            fail(f"{compress}: random data was compressed")
+
+    # v2 の改ざん: ヘッダの平文長（巨大な値を含む）・アルゴリズム・ext の除去・各バイトの反転
+    v2 = seal_v2(TEXT, "zlib")
+    at = len_field(v2)
+    for n in (1 << 62, 2**64 - 1, len(TEXT) + 1, len(TEXT) - 1, 0):
+        bad = v2[:at] + struct.pack(">Q", n) + v2[at+8:]
+        if not rejected(open_v2_blob, bad):
+            fail(f"plaintext length {n} accepted")
+    bad = bytearray(v2); bad[at - 1] = comp.ALG_LZMA
+    if not rejected(open_v2_blob, bytes(bad)):
+        fail("rewritten algorithm accepted")
+    stripped = v2[:7] + b"\x00" + v2[8:HEAD_LEN] + v2[HEAD_LEN+14:]
+    if not rejected(open_v2_blob, stripped):
+        fail("stripped compression extension accepted")
+    for i in range(0, len(v2), 3):
+        bad = bytearray(v2); bad[i] ^= 0x01
+        if not rejected(open_v2_blob, bytes(bad)):
+            fail(f"v2 tampered byte {i} accepted")
+    for cut in (len(v2) - 1, len(v2) // 2, at + 3):
+        if not rejected(open_v2_blob, v2[:cut]):
+            fail(f"v2 truncation at {cut} accepted")
+    # v3（可変長レコード）の改ざん・切り詰め・追記
+    v3 = seal_v3(TEXT, "zlib")
+    for i in range(0, len(v3), 5):
+        bad = bytearray(v3); bad[i] ^= 0x01
+        if not rejected(open_v3, bytes(bad)):
+            fail(f"v3 tampered byte {i} accepted")
+    for bad in (v3[:-1], v3[:-30], v3 + b"\x00"):
+        if not rejected(open_v3, bad):
+            fail("v3 truncation/appended data accepted")
+
+    # 展開の上限: max_len を超える入力は展開途中で止まる
+    bomb = comp.compress(comp.ALG_ZLIB, bytes(1 << 24))
+    if not rejected(comp.decompress, comp.ALG_ZLIB, bomb, 1 << 20):
+        fail("decompression past max_len accepted")
+
+    # decrypt-file: 平文長を書き換えたファイルは復号失敗（終了コード 1）で、--out を残さない
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "key.bin").write_bytes(K)
+        (d / "bad.bmsc6").write_bytes(v2[:at] + struct.pack(">Q", 1 << 62) + v2[at+8:])
+        (d / "ok.bmsc6").write_bytes(v2)
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "decrypt-file", "--key-file", str(d / "key.bin")]
+        for out in ("-", str(d / "bad.out"), None):
+            r = subprocess.run(cli + ["--in", str(d / "bad.bmsc6")] + (["--out", out] if out else []),
+                               capture_output=True, cwd=ROOT)
+            if r.returncode != 1 or b"Traceback" in r.stderr or (d / "bad.out").exists():
+                print(r.stderr.decode("utf-8", errors="replace"))
+                fail(f"decrypt-file on a tampered length (--out {out})")
+        r = subprocess.run(cli + ["--in", str(d / "ok.bmsc6"), "--out", str(d / "ok.out")], capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or (d / "ok.out").read_bytes() != TEXT:
+            fail("decrypt-file on a compressed v2 file")
+
+    check_vector()
+    print("✅ bmsc6 compression OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
@@ -0,0 +1,176 @@
+from pathlib import Path
+import asyncio, io, os, socket, stat, struct, tempfile, threading
+
+from checklib import fail, rejected, run
+import bmsc_v6_aio as aio
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_envelope import Recipients
+from bmsc_v6_container import Bmsc6Writer, seal_v2_into
+from bmsc_v6_daemon import Bmsc6Daemon
+from bmsc_v6_client import Bmsc6Client, DaemonError, OP_PING, OP_ENCRYPT, OP_DECRYPT, ST_OK, ST_AUTH, ST_ERROR, unpack_fields
+
+# ローカルデーモン（bmsc_v6_daemon / bmsc_v6_client）: 一時ディレクトリのソケットで起動し、ソケットが 0600 で umask を変えないこと、
+# encrypt/decrypt の往復（bmsc_v6_encrypt/decrypt と相互に開ける・key_id の選択・スレッドプール経路）、
+# 認証失敗は ST_AUTH・未知の key_id と不正な要求は ST_ERROR（同じ接続で続けて使える）、長さ 0 のフレームでの切断、
+# フィールドの型違いは送る前に TypeError、decrypt_file（v2/v3・ヘッダの KID で鍵を選ぶ・out への書き出し・改ざん・受信者でない鍵）。
+#   py tests/check_daemon.py
+
+# ★テスト専用の固定キー（実運用では使用厳禁）
+KA, KB = bytes(range(32)), bytes(range(32, 64))
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"daemon.txt"}'
+
+class Server:
+    """Bmsc6Daemon を別スレッドのイベントループで動かす"""
+    def __init__(self, path: Path, keys):
+        self.path = path
+        self.daemon = Bmsc6Daemon(keys)
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        try:
+            await self.daemon.serve(self.path, ready=self._ready.set)
+        except asyncio.CancelledError:
+            pass
+
+    def __enter__(self):
+        self._thread.start()
+        if not self._ready.wait(10):
+            fail("daemon did not start")
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join(10)
+        return False
+
+def raw(sock: socket.socket, body: bytes) -> tuple:
+    """フレーム（len + body）を送り、応答の (status, fields)。接続が閉じられたら (None, [])"""
+    sock.sendall(struct.pack(">I", len(body)) + body)
+    head = sock.recv(4, socket.MSG_WAITALL)
+    if len(head) < 4:
+        return None, []
+    resp = sock.recv(struct.unpack(">I", head)[0], socket.MSG_WAITALL)
+    return resp[0], [bytes(f) for f in unpack_fields(resp[1:])]
+
+def fields(*fs) -> bytes:
+    return b"".join(struct.pack(">I", len(f)) + f for f in fs)
+
+def seal_v3(pt: bytes, K, **kw) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, AAD, 64, **kw) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        path = d / "bmsc6.sock"
+        umask = os.umask(0o022); os.umask(umask)
+        with Server(path, Keyring({"a": KA, "b": KB})) as srv, Bmsc6Client(path, timeout=10) as c:
+            # ソケットは 0600、プロセスの umask は変えない
+            if stat.S_IMODE(os.stat(path).st_mode) != 0o600:
+                fail(f"socket mode {oct(os.stat(path).st_mode)}")
+            probe = os.umask(0o022); os.umask(probe)
+            if probe != umask:
+                fail("serve changed the process umask")
+
+            # encrypt/decrypt の往復（小さいものはその場で、INLINE_MAX を超えるものはスレッドプールで）
+            c.ping()
+            for pt in (b"", b"hello daemon", os.urandom(aio.INLINE_MAX + 1)):
+                n, ct, t = c.encrypt(pt, CTX, AAD)
+                if bmsc_v6_decrypt(n, ct, t, KA, CTX, AAD) != pt or c.decrypt(n, ct, t, CTX, AAD) != pt:
+                    fail(f"round trip ({len(pt)} bytes)")
+            n, ct, t = bmsc_v6_encrypt(b"from the library", KB, CTX, AAD)
+            if c.decrypt(n, ct, t, CTX, AAD, key_id="b") != b"from the library":
+                fail("decrypt with key_id")
+            n, ct, t = c.encrypt(b"with key b", CTX, key_id="b")
+            if bmsc_v6_decrypt(n, ct, t, KB, CTX) != b"with key b":
+                fail("encrypt with key_id")
+
+            # 認証失敗: クライアントは ValueError("auth failed")（DaemonError ではない）
+            n, ct, t = c.encrypt(b"secret", CTX, AAD)
+            for args, kw in (((n, ct[:-1] + bytes([ct[-1] ^ 1]), t, CTX, AAD), {}), ((n, ct, t, CTX, b""), {}),
+                             ((n, ct, t[:15], CTX, AAD), {}), ((n, ct, t, CTX, AAD), {"key_id": "b"})):
+                try:
+                    c.decrypt(*args, **kw)
+                    fail("tampered request accepted")
+                except DaemonError as e:
+                    fail(f"auth failure reported as an error: {e}")
+                except ValueError as e:
+                    if str(e) != "auth failed":
+                        fail(f"auth failure message: {e}")
+            # 未知の key_id は DaemonError
+            try:
+                c.encrypt(b"x", CTX, key_id="zz")
+                fail("unknown key_id accepted")
+            except DaemonError as e:
+                if "unknown key_id" not in str(e):
+                    fail(f"unknown key_id message: {e}")
+            # フィールドの型違いは送る前に TypeError（接続はそのまま使える）
+            if not rejected(c.encrypt, "text", CTX, exc=TypeError) or not rejected(c.decrypt, n, ct, t, "ctx", exc=TypeError):
+                fail("str field accepted")
+            c.ping()
+
+            # 生のフレーム: 状態コードと、エラーの後も同じ接続で続けられること
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(10); s.connect(str(path))
+                st, f = raw(s, bytes([OP_DECRYPT]) + fields(b"", CTX, AAD, n, ct, bytes(16)))
+                if st != ST_AUTH or f:
+                    fail(f"raw auth failure: {st} {f}")
+                st, f = raw(s, bytes([OP_ENCRYPT]) + fields(b"zz", CTX, AAD, b"x"))
+                if st != ST_ERROR or b"unknown key_id" not in f[0]:
+                    fail(f"raw unknown key_id: {st} {f}")
+                for body in (bytes([OP_ENCRYPT]) + fields(b"", CTX, AAD, b"x")[:-2],  # フィールドの途中で切れている
+                             bytes([OP_ENCRYPT]) + fields(b"", CTX, AAD),               # フィールドが足りない
+                             bytes([OP_PING]) + fields(b"x"),
+                             bytes([9])):
+                    st, f = raw(s, body)
+                    if st != ST_ERROR or not f[0]:
+                        fail(f"malformed request {body[:8].hex()}: {st} {f}")
+                if raw(s, bytes([OP_PING]))[0] != ST_OK:
+                    fail("connection unusable after errors")
+                if raw(s, b"") != (None, []):
+                    fail("zero-length frame did not close the connection")
+
+            # decrypt_file: v3（ヘッダの KID で鍵を選ぶ）・v2・out への書き出し
+            pt = b"daemon decrypt_file " * 500
+            (d / "v3.bmsc6").write_bytes(seal_v3(pt, KB, kid="b"))
+            buf = bytearray(len(pt))
+            header, nonce, tag, k = seal_v2_into(buf, pt, KA, CTX, AAD)
+            (d / "v2.bmsc6").write_bytes(header + nonce + tag + buf[:k])
+            for name in ("v3.bmsc6", "v2.bmsc6"):
+                r = c.decrypt_file(d / name)
+                if (r["ctx"], r["aad"], r["plaintext"], r["size"]) != (CTX, AAD, pt, len(pt)):
+                    fail(f"decrypt_file {name}")
+                r = c.decrypt_file(d / name, d / (name + ".out"))
+                if r["plaintext"] is not None or r["size"] != len(pt) or (d / (name + ".out")).read_bytes() != pt:
+                    fail(f"decrypt_file {name} to out")
+            # 改ざん・受信者でない鍵は認証失敗で、out を作らない。存在しないファイルは DaemonError
+            blob = bytearray((d / "v3.bmsc6").read_bytes()); blob[-5] ^= 0x01
+            (d / "bad.bmsc6").write_bytes(bytes(blob))
+            (d / "rcpt.bmsc6").write_bytes(seal_v3(pt, Recipients({"other": bytes(32)})))
+            for name in ("bad.bmsc6", "rcpt.bmsc6"):
+                try:
+                    c.decrypt_file(d / name, d / "never.out")
+                    fail(f"decrypt_file {name} accepted")
+                except DaemonError as e:
+                    fail(f"decrypt_file {name} reported as an error: {e}")
+                except ValueError:
+                    pass
+                if (d / "never.out").exists():
+                    fail(f"decrypt_file {name} left its output")
+            if not rejected(c.decrypt_file, d / "missing.bmsc6", exc=DaemonError):
+                fail("missing file")
+            if srv.daemon.requests < 20 or srv.daemon.connections < 2:
+                fail(f"daemon counters: {srv.daemon.requests} {srv.daemon.connections}")
+        if path.exists():
+            fail("socket not removed after stop")
+    print("✅ bmsc6 daemon OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,79 @@
+from pathlib import Path
+import argparse, os, struct, subprocess, sys, tempfile, hashlib
+
+from checklib import ROOT, fail
+from bmsc_v6_prod import bmsc_v6_encrypt
+
+# decrypt-file のヒープ確保量を tracemalloc で測る（RSS は参考表示）。
+# 入力は mmap、平文は --out の mmap に直接書くので、ヒープのピークはファイルサイズに比例しないはず。
+# ピークには CLI の import 分（数 MiB）も入るので、BASE_MIB のファイルでのピークとの差で判定する。
+
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"big.bin"}'
+BASE_MIB = 1
+SLACK = 1 << 20  # 差の許容（固定分）。これに加えてサイズ差の 1% まで
+
+def child(enc: str, key: str, out: str):
+    import tracemalloc
+    tracemalloc.start()
+    from apps.cli import bmsc_prod
+    bmsc_prod.main(["decrypt-file", "--key-file", key, "--in-enc-file", enc, "--out", out])
+    _, peak = tracemalloc.get_traced_memory()
+    rss = 0
+    try:
+        # VmHWM はこのプロセス自身のピーク（ru_maxrss は fork 元のピークを引き継ぐので使わない）
+        for line in open("/proc/self/status", encoding="ascii"):
+            if line.startswith("VmHWM:"):
+                rss = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    print(f"PEAK {peak} {rss}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mib", type=int, default=256)
+    ap.add_argument("--child", nargs=3, metavar=("ENC", "KEY", "OUT"))
+    args = ap.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    size = args.size_mib * 1024 * 1024
+    base_size = BASE_MIB * 1024 * 1024
+    with tempfile.TemporaryDirectory() as d:
+        base_peak, _ = measure(Path(d), base_size)
+        peak, rss = measure(Path(d), size)
+
+    mib = lambda b: b / (1024 * 1024)
+    growth = peak - base_peak
+    print(f"file: {mib(size):.0f} MiB, heap peak: {mib(peak):.1f} MiB ({BASE_MIB} MiB のとき {mib(base_peak):.1f} MiB、"
+          f"差 {mib(growth):+.1f} MiB)"
+          + (f", max RSS: {mib(rss):.0f} MiB ({rss / size:.2f}x, mmap のページキャッシュを含む)" if rss else ""))
+    if growth > SLACK + (size - base_size) // 100:
+        fail("heap peak grows with file size")
+    print("✅ decrypt-file memory OK")
+
+def measure(d: Path, size: int) -> tuple:
+    """size バイトの v2 ファイルを別プロセスの decrypt-file で復号する。返り値: (ヒープのピーク, 最大 RSS)"""
+    key, enc, out = d / "key.bin", d / "big.bmsc6", d / "big.out"
+    K = os.urandom(32); key.write_bytes(K)
+    pt = os.urandom(size)
+    digest = hashlib.sha256(pt).digest()
+    n, c, t = bmsc_v6_encrypt(pt, K, CTX, aad=AAD)
+    with open(enc, "wb") as f:
+        f.write(b"BMSC6\x00\x02\x00" + struct.pack(">HI", len(CTX), len(AAD)) + CTX + AAD + n + t)
+        f.write(c)
+    del pt, c
+
+    r = subprocess.run([sys.executable, __file__, "--child", str(enc), str(key), str(out)],
+                       capture_output=True, text=True, cwd=ROOT)
+    line = [l for l in r.stdout.splitlines() if l.startswith("PEAK ")]
+    if r.returncode != 0 or not line:
+        print(r.stdout, r.stderr)
+        fail("decrypt-file failed")
+    if hashlib.sha256(out.read_bytes()).digest() != digest:
+        fail("plaintext mismatch")
+    out.unlink()
+    return tuple(map(int, line[0].split()[1:]))
+
+if __name__ == "__main__":
+    main()
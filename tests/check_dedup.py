@@ -0,0 +1,164 @@
+from pathlib import Path
+import hashlib, io, shutil, tempfile
+
+from checklib import VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+from bmsc_v6_dedup import ChunkStore, ENTRY, ID_LEN, MANIFEST_SUFFIX, backup_tree, restore_tree
+from bmsc_v6_prod import NPUBBYTES, ABYTES
+from bmsc_v6_container import MAGIC, VER_V2, HEAD_LEN
+
+# 重複排除付きバックアップ（bmsc_v6_dedup）: backup_tree/restore_tree の往復、2 回目は新しいチャンクを書かないこと、
+# 途中に挿入したファイルは周辺のチャンクだけが増えること、パックのレコード・マニフェストの改ざん/切り詰め/取り違えの検出、
+# 入力の *.part も対象にすること、別の鍵/ctx でストアを開けないこと、固定ベクタ（チャンク境界と ID は鍵とデータで決まる）の確認。
+#   py tests/check_dedup.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_dedup_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+
+def stream(seed: bytes, n: int) -> bytes:
+    """SHA-256 を数珠つなぎにした決まった擬似乱数列（どの環境でも同じ）"""
+    out = bytearray()
+    while len(out) < n:
+        out += hashlib.sha256(seed + len(out).to_bytes(8, "big")).digest()
+    return bytes(out[:n])
+
+def tree_bytes(d: Path) -> dict:
+    return {p.relative_to(d).as_posix(): p.read_bytes() for p in sorted(d.rglob("*")) if p.is_file()}
+
+def failed(res: dict) -> list:
+    return sorted(f["path"] for f in res["failures"])
+
+def write_vector():
+    data = stream(b"dedup-vector", 200_000)
+    with tempfile.TemporaryDirectory() as d:
+        with ChunkStore(Path(d) / "store", K, CTX) as store:
+            manifest, _ = store.backup_file(io.BytesIO(data), "vector.bin")  # nonce は乱数（作り直すと変わる）
+            entries = store.read_manifest(manifest)[1]
+    vec = {
+        "algorithm": "content-defined chunking + HMAC-SHA256 ids (bmsc6 dedup)",
+        "ctx": CTX.decode("ascii"),
+        "key_hex": K.hex(),  # ←テスト用
+        "data": "sha256 stream, seed 'dedup-vector', 200000 bytes",
+        "chunks": [{"length": n, "id_hex": cid.hex()} for cid, n in entries],
+        "manifest_b64": b64e(manifest),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector(d: Path):
+    vec = load_vector(VECTOR)
+    data = stream(b"dedup-vector", 200_000)
+    want = [(bytes.fromhex(c["id_hex"]), c["length"]) for c in vec["chunks"]]
+    with ChunkStore(d / "vector-store", bytes.fromhex(vec["key_hex"]), vec["ctx"].encode("ascii")) as store:
+        # チャンク境界（鍵付き Gear 表）と ID = HMAC-SHA256(id_key, チャンク)
+        got, off = [], 0
+        for chunk in store.chunker.split(io.BytesIO(data)):
+            got.append((store.chunk_id(chunk), len(chunk))); off += len(chunk)
+        if got != want or off != len(data):
+            fail("vector: chunk boundaries/ids differ")
+        # マニフェスト: bmsc6 v2（flags=0）、平文は {id(32) || 長さ(4 BE)} の列
+        manifest = b64d(vec["manifest_b64"])
+        if manifest[:8] != MAGIC + bytes([VER_V2, 0]):
+            fail("vector: manifest header layout differs")
+        meta, entries = store.read_manifest(manifest)
+        if entries != want or meta != {"name": "vector.bin", "size": len(data), "mtime_ns": None, "chunks": len(want)}:
+            fail("vector: manifest contents differ")
+        # マニフェストが指すチャンクを入れれば復元できる
+        store.backup_file(io.BytesIO(data), "vector.bin")
+        store.flush()
+        out = io.BytesIO()
+        if store.restore_file(manifest, out) != len(data) or out.getvalue() != data:
+            fail("vector: restore from the stored manifest")
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        src, store_dir = d / "src", d / "store"
+        (src / "sub").mkdir(parents=True)
+        big = stream(b"big", 400_000)
+        (src / "big.bin").write_bytes(big)
+        (src / "sub" / "copy.bin").write_bytes(big[100_000:300_000])  # 同じ内容の一部
+        (src / "sub" / "note.txt").write_bytes("重複排除のテスト\n".encode("utf-8") * 50)
+        (src / "empty").write_bytes(b"")
+
+        # 往復と 2 回目（前回のマニフェストを使う / rehash でも新しいチャンクは無い）
+        with ChunkStore(store_dir, K, CTX) as store:
+            r1 = backup_tree(src, store, snapshot="s1")
+            if r1["failures"] or r1["files"] != 4 or r1["new_chunks"] >= r1["chunks"]:
+                fail(f"first backup: {r1}")
+            r2 = backup_tree(src, store, snapshot="s2")
+            r3 = backup_tree(src, store, snapshot="s3", rehash=True)
+            if r2["reused"] != 4 or r2["written"] or r3["reused"] or r3["new_chunks"] or r3["written"]:
+                fail(f"second backup wrote chunks: {r2} {r3}")
+            # 途中に 100 バイト挿入: 境界はすぐ元に戻るので新しいチャンクは数個だけ
+            (src / "big.bin").write_bytes(big[:200_000] + b"x" * 100 + big[200_000:])
+            r4 = backup_tree(src, store, snapshot="s4")
+            if r4["reused"] != 3 or not 1 <= r4["new_chunks"] <= 3:
+                fail(f"insertion: {r4}")
+            stats = store.stats()
+            for snap, want in (("s1", big), ("s4", (src / "big.bin").read_bytes())):
+                res = restore_tree(store, snap, d / snap)
+                if res["failures"] or tree_bytes(d / snap) != dict(tree_bytes(src), **{"big.bin": want}):
+                    fail(f"restore {snap}: {res}")
+            # パックのレコード: id(32) || nonce(24) || ct || tag(16) の列
+            pack = sorted((store_dir / "packs").glob("*.pack"))[0].read_bytes()
+            first = store.read_manifest((store_dir / "snapshots" / "s1" / ("big.bin" + MANIFEST_SUFFIX)).read_bytes())[1][0]
+            if pack[:ID_LEN] != first[0] or stats["stored_bytes"] != stats["bytes"] + stats["chunks"] * (ID_LEN + NPUBBYTES + ABYTES):
+                fail("pack record layout")
+
+        # 別の鍵/ctx では開けない
+        if not rejected(ChunkStore, store_dir, bytes(32), CTX) or not rejected(ChunkStore, store_dir, K, b"BMSCv6-IV01"):
+            fail("store opened with another key/ctx")
+
+        snaps = store_dir / "snapshots"
+        man = snaps / "s1" / ("sub/note.txt" + MANIFEST_SUFFIX)
+        blob = man.read_bytes()
+        with ChunkStore(store_dir, K, CTX) as store:
+            # マニフェストの改ざん・切り詰め・別のパスへの取り違え（AAD の name）
+            for i in range(0, len(blob), 5):
+                bad = bytearray(blob); bad[i] ^= 0x01
+                if not rejected(store.restore_file, bytes(bad), io.BytesIO()):
+                    fail(f"tampered manifest byte {i} accepted")
+            for cut in (len(blob) - 1, len(blob) - ENTRY.size, HEAD_LEN + 3):
+                if not rejected(store.restore_file, blob[:cut], io.BytesIO()):
+                    fail(f"truncated manifest ({cut}) accepted")
+            shutil.copytree(snaps / "s1", snaps / "t1")
+            (snaps / "t1" / ("sub/copy.bin" + MANIFEST_SUFFIX)).write_bytes(blob)
+            (snaps / "t1" / ("big.bin" + MANIFEST_SUFFIX)).write_bytes(blob[:-1])
+            res = restore_tree(store, "t1", d / "t1")
+            if failed(res) != ["big.bin", "sub/copy.bin"] or res["files"] != 2:
+                fail(f"restore with bad manifests: {res}")
+
+        # パックのレコードの改ざん: そのチャンクを使うファイルだけが失敗する
+        pack_path = sorted((store_dir / "packs").glob("*.pack"))[0]
+        orig = pack_path.read_bytes()
+        bad = bytearray(orig); bad[ID_LEN + NPUBBYTES + 10] ^= 0x01
+        pack_path.write_bytes(bytes(bad))
+        with ChunkStore(store_dir, K, CTX) as store:
+            res = restore_tree(store, "s1", d / "r-tampered")
+            if failed(res) != ["big.bin"] or res["files"] != 3:
+                fail(f"tampered pack record: {res}")
+        for bad in (orig[:len(orig) // 2], bytes(ID_LEN) + orig[ID_LEN:]):
+            pack_path.write_bytes(bad)  # 切り詰め / レコードの ID の書き換え
+            with ChunkStore(store_dir, K, CTX) as store:
+                res = restore_tree(store, "s1", d / "r-bad")
+                if "big.bin" not in failed(res) or (d / "r-bad" / "big.bin").exists():
+                    fail(f"damaged pack: {res}")
+            shutil.rmtree(d / "r-bad", ignore_errors=True)
+        pack_path.write_bytes(orig)
+
+        # 入力の *.part も対象にする（復元先で "x" の一時ファイルが "x.part" を上書きしないこと）
+        src2 = d / "src2"; src2.mkdir()
+        (src2 / "x").write_bytes(stream(b"x", 50_000))
+        (src2 / "x.part").write_bytes(stream(b"x.part", 30_000))
+        (src2 / "movie.part").write_bytes(b"")
+        with ChunkStore(store_dir, K, CTX) as store:
+            r = backup_tree(src2, store, snapshot="parts")
+            res = restore_tree(store, "parts", d / "parts")
+            if r["files"] != 3 or res["failures"] or tree_bytes(d / "parts") != tree_bytes(src2):
+                fail(f"*.part source files: {r} {res}")
+
+        check_vector(d)
+    print("✅ bmsc6 dedup OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
@@ -0,0 +1,149 @@
+from pathlib import Path
+import io, struct, subprocess, sys, tempfile
+
+from checklib import ROOT, VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+import bmsc_v6_envelope as env
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_envelope import Recipients, NoRecipientEntry
+from bmsc_v6_container import (
+    HEAD_LEN, FLAG_RCPT, Bmsc6Writer, Bmsc6Reader, Bmsc6Header, seal_v2_into, unpack_v2, open_v2,
+)
+
+# 複数受信者の封筒（FLAG_RCPT=0x04、SPEC.md §3.4）: 各受信者の鍵（KID 付き・KID 無し・鍵束）で開けること、
+# 受信者でない鍵の拒否（decrypt-file では --offset/--length 付きでも復号失敗 = 終了コード 1）、受信者表の項目・env_nonce の改ざんは
+# その項目だけを壊すこと、表の差し替え・flags の除去・本文の改ざん・切り詰めの検出、
+# 固定ベクタ（受信者表のバイト列とヘッダ配置）の確認。
+#   py tests/check_envelope.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_envelope_vector_1.json"
+# ★テスト専用の固定キー（実運用では使用厳禁）
+KA, KB, KC = bytes(range(32)), bytes(range(32, 64)), bytes(range(64, 96))
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"envelope.txt"}'
+
+def recipients() -> Recipients:
+    return Recipients([("team-a", KA), ("team-b", KB), KC])  # KC は KID 無し
+
+def seal_v2(pt: bytes, R) -> bytes:
+    out = bytearray(len(pt))
+    header, nonce, tag, n = seal_v2_into(out, pt, R, CTX, AAD)
+    return bytes(header + nonce + tag + out[:n])
+
+def open_v2_blob(blob: bytes, K) -> bytes:
+    ctx, aad, nonce, tag, ct, ext = unpack_v2(memoryview(blob))
+    return bytes(open_v2(K, bytes(ctx), bytes(aad), bytes(nonce), ct, tag, ext))
+
+def seal_v3(pt: bytes, R) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, R, CTX, AAD, 64) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def open_v3(blob: bytes, K) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), K))
+
+def table_span(blob: bytes) -> tuple:
+    """受信者表（TLV の値）のファイル上の (開始, 終了)。ext は受信者表だけの前提"""
+    t, n = blob[HEAD_LEN + 2], struct.unpack(">H", blob[HEAD_LEN+3:HEAD_LEN+5])[0]
+    if t != FLAG_RCPT: fail("unexpected extension layout")
+    return HEAD_LEN + 5, HEAD_LEN + 5 + n
+
+def write_vector():
+    pt = "封筒のテスト: one payload, three recipients.".encode("utf-8") * 4
+    v2 = seal_v2(pt, recipients())  # DEK・env_nonce・nonce は乱数（作り直すと変わる）
+    s, e = table_span(v2)
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 v2 + recipient table)",
+        "ctx": CTX.decode("ascii"),
+        "recipients": [{"kid": "team-a", "key_hex": KA.hex()}, {"kid": "team-b", "key_hex": KB.hex()},
+                       {"kid": None, "key_hex": KC.hex()}],  # ←テスト用
+        "dek_hex": env.unwrap(v2[s:e], KA).hex(),
+        "pt_b64": b64e(pt),
+        "v2_b64": b64e(v2),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    pt, v2, dek = b64d(vec["pt_b64"]), b64d(vec["v2_b64"]), bytes.fromhex(vec["dek_hex"])
+    items = [(r["kid"], bytes.fromhex(r["key_hex"])) for r in vec["recipients"]]
+    # 固定部 14B（flags=0x04）+ ext_len(2) + TLV(type=0x04, len(2), 受信者表)
+    s, e = table_span(v2)
+    if v2[6:8] != b"\x02\x04" or struct.unpack(">H", v2[HEAD_LEN:HEAD_LEN+2])[0] != e - s + 3:
+        fail("vector: v2 envelope header layout differs")
+    # 受信者表: env_nonce(24) + { kid_len(1) + kid + wrapped(48) } × N は (DEK, 鍵, KID, env_nonce) で決まる
+    table = v2[s:e]
+    if env.pack_table(dek, items, table[:24]) != table:
+        fail("vector: recipient table bytes differ")
+    if env.table_kids(table) != [kid for kid, _ in items]:
+        fail("vector: recipient KIDs differ")
+    for _, K in items:
+        if env.unwrap(table, K) != dek or open_v2_blob(v2, K) != pt:
+            fail("vector: recipient cannot open the envelope")
+
+def main():
+    pt = b"envelope payload " * 30
+    ring = Keyring({"team-b": KB})
+    v2, v3 = seal_v2(pt, recipients()), seal_v3(pt, recipients())
+    # 往復: 各受信者の鍵、鍵束（KID で項目を選ぶ）
+    for K in (KA, KB, KC, ring):
+        if open_v2_blob(v2, K) != pt or open_v3(v3, K) != pt:
+            fail("recipient round trip")
+    if Bmsc6Header.read(io.BytesIO(v3)).recipients != ["team-a", "team-b", None]:
+        fail("recipient KIDs in the header")
+    for K in (bytes(32), Keyring({"team-z": bytes(32)})):
+        if not rejected(open_v2_blob, v2, K, exc=NoRecipientEntry) or not rejected(open_v3, v3, K, exc=NoRecipientEntry):
+            fail("non-recipient key accepted")
+
+    # 受信者表の改ざん: team-a の項目を壊すと team-a だけが開けない・env_nonce を壊すと誰も開けない
+    s, e = table_span(v2)
+    a_wrapped = s + 24 + 1 + len(b"team-a") + 5
+    bad = bytearray(v2); bad[a_wrapped] ^= 0x01
+    if not rejected(open_v2_blob, bytes(bad), KA) or open_v2_blob(bytes(bad), KB) != pt:
+        fail("tampered team-a entry")
+    bad = bytearray(v2); bad[s] ^= 0x01
+    if not all(rejected(open_v2_blob, bytes(bad), K) for K in (KA, KB, KC)):
+        fail("tampered env_nonce accepted")
+    # 別ファイルの受信者表への差し替え（DEK が違うので本文の認証で失敗）・flags の除去・本文の改ざん
+    other = seal_v2(pt, recipients())
+    os_, oe = table_span(other)
+    if not rejected(open_v2_blob, v2[:s] + other[os_:oe] + v2[e:], KA):
+        fail("swapped recipient table accepted")
+    stripped = v2[:7] + b"\x00" + v2[8:HEAD_LEN] + v2[e:]
+    if not rejected(open_v2_blob, stripped, KA):
+        fail("stripped recipient extension accepted")
+    for i in list(range(0, s)) + list(range(e, len(v2))):
+        bad = bytearray(v2); bad[i] ^= 0x01
+        if not rejected(open_v2_blob, bytes(bad), KA):
+            fail(f"v2 tampered byte {i} accepted")
+    s3, e3 = table_span(v3)
+    for i in list(range(0, s3)) + list(range(e3, len(v3), 11)):  # 受信者表の項目は上で確かめた
+        bad = bytearray(v3); bad[i] ^= 0x01
+        if not rejected(open_v3, bytes(bad), KA):
+            fail(f"v3 tampered byte {i} accepted")
+    # 切り詰め
+    for cut in (len(v2) - 1, e + 3, s + 30, HEAD_LEN + 1):
+        if not rejected(open_v2_blob, v2[:cut], KA):
+            fail(f"v2 truncation at {cut} accepted")
+    for cut in (len(v3) - 1, len(v3) - 40, e3 - 1):
+        if not rejected(open_v3, v3[:cut], KA):
+            fail(f"v3 truncation at {cut} accepted")
+
+    # decrypt-file（v3）: 受信者でない鍵は復号失敗（終了コード 1）
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "e.bmsc6").write_bytes(v3); (d / "ka.bin").write_bytes(KA); (d / "other.bin").write_bytes(bytes(32))
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "decrypt-file", "--in", str(d / "e.bmsc6"), "--out", "-"]
+        for extra in ([], ["--offset", "10", "--length", "50"]):
+            r = subprocess.run(cli + extra + ["--key-file", str(d / "other.bin")], capture_output=True, cwd=ROOT)
+            if r.returncode != 1 or "復号失敗".encode("utf-8") not in r.stderr:
+                fail(f"decrypt-file {' '.join(extra)} with a non-recipient key")
+        r = subprocess.run(cli + ["--key-file", str(d / "ka.bin")], capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or r.stdout != pt:
+            fail("decrypt-file with a recipient key")
+
+    check_vector()
+    print("✅ bmsc6 envelope OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
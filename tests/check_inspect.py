@@ -0,0 +1,170 @@
+from pathlib import Path
+import hashlib, io, json, os, subprocess, sys, tempfile
+
+from checklib import ROOT, fail, rejected, run
+import bmsc_v6_index
+from bmsc_v6_prod import bmsc_v6_encrypt
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_envelope import Recipients
+from bmsc_v6_container import Bmsc6Header, Bmsc6Writer, seal_v2_into, pack_v3_header, MAGIC
+from bmsc_v6_tree import file_aad
+from bmsc_v6_verify import iter_paths
+from bmsc_v6_index import HeaderIndex
+
+# ヘッダだけの読み出し（Bmsc6Header）と SQLite 索引（HeaderIndex / `bmsc_prod inspect`）:
+# v1/v2/v3（KID・封筒・圧縮を含む）でヘッダの長さちょうどしか読まないこと、メタデータ（name/size/sha256・平文長）、
+# 壊れたヘッダの拒否、索引の update/find（sha256 は大文字小文字を問わない）・変更のないファイルを読まないこと・
+# 変更/削除の反映（prune）、CLI の inspect と --index。
+#   py tests/check_inspect.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+NONCE = bytes(range(100, 124))
+
+class Counting(io.BytesIO):
+    """read したバイト数を数える（fileno が無いので file_size は None になる）"""
+    nread = 0
+    def read(self, n=-1):
+        b = super().read(n); self.nread += len(b)
+        return b
+
+def aad_of(name: str, pt: bytes, upper: bool=False) -> bytes:
+    digest = hashlib.sha256(pt).hexdigest()
+    return file_aad(name, len(pt), digest.upper() if upper else digest)
+
+def v1(pt: bytes) -> bytes:
+    nonce, ct, tag = bmsc_v6_encrypt(pt, K, CTX)
+    return MAGIC + bytes([1, 0]) + nonce + tag + ct
+
+def v2(pt: bytes, aad: bytes, K_=K, **kw) -> bytes:
+    buf = bytearray(len(pt) + 64)
+    header, nonce, tag, k = seal_v2_into(buf, pt, K_, CTX, aad, **kw)
+    return header + nonce + tag + buf[:k]
+
+def v3(pt: bytes, aad: bytes, K_=K, **kw) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K_, CTX, aad, 4096, nonce=NONCE, **kw) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def main():
+    pt = os.urandom(50_000)
+    text = "索引のテスト inspect ".encode("utf-8") * 2000
+    ring = Keyring({"k1": K}, default="k1")
+    files = {
+        "a/v1.bmsc6": (v1(pt), 1, None),
+        "a/v2.bmsc6": (v2(pt, aad_of("v2.pdf", pt)), 2, "v2.pdf"),
+        "a/v2kid.bmsc6": (v2(pt, aad_of("v2kid.pdf", pt), ring), 2, "v2kid.pdf"),
+        "a/v2z.bmsc6": (v2(text, aad_of("v2z.txt", text), compress="zlib"), 2, "v2z.txt"),
+        "b/v3.bmsc6": (v3(pt, aad_of("v3.bin", pt)), 3, "v3.bin"),
+        "b/v3rcpt.bmsc6": (v3(pt, aad_of("v3rcpt.bin", pt), Recipients({"alice": K, "bob": bytes(32)})), 3, "v3rcpt.bin"),
+        "b/upper.bmsc6": (v3(text, aad_of("upper.txt", text, upper=True)), 3, "upper.txt"),
+        "b/raw-aad.bmsc6": (v3(b"", b"\x00\xffnot json"), 3, None),
+    }
+    plain = {"a/v1.bmsc6": pt, "a/v2.bmsc6": pt, "a/v2kid.bmsc6": pt, "a/v2z.bmsc6": text, "b/v3.bmsc6": pt,
+             "b/v3rcpt.bmsc6": pt, "b/upper.bmsc6": text, "b/raw-aad.bmsc6": b""}
+
+    # ヘッダの長さちょうどだけ読む（ct・レコードは読まない）
+    for rel, (blob, ver, name) in files.items():
+        f = Counting(blob)
+        h = Bmsc6Header.read(f)
+        if f.nread != h.header_len or h.ver != ver or h.file_size is not None:
+            fail(f"{rel}: read {f.nread} bytes for a {h.header_len}-byte header")
+    h = Bmsc6Header.read(io.BytesIO(files["b/v3.bmsc6"][0]))
+    if h.header_len != len(pack_v3_header(CTX, aad_of("v3.bin", pt), NONCE, 4096)) or h.nonce != NONCE or h.chunk_size != 4096:
+        fail("v3 header length")
+    if Bmsc6Header.read(io.BytesIO(files["a/v1.bmsc6"][0])).header_len != 48:
+        fail("v1 header length")
+
+    # 壊れたヘッダ
+    blob = files["b/v3rcpt.bmsc6"][0]
+    for bad in (b"", b"BMSC", b"not a bmsc6 file", MAGIC + bytes([9, 0]) + bytes(20), blob[:12], blob[:40],
+                files["a/v2.bmsc6"][0][:60], files["a/v1.bmsc6"][0][:30]):
+        if not rejected(Bmsc6Header.read, io.BytesIO(bad)):
+            fail(f"broken header accepted: {bad[:16]!r}")
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        root = d / "archive"
+        for rel, (blob, _, _) in files.items():
+            (root / rel).parent.mkdir(parents=True, exist_ok=True)
+            (root / rel).write_bytes(blob)
+        (root / "b" / "junk.bmsc6").write_bytes(b"junk")
+
+        # パスから: ファイルサイズ・平文長・メタデータ・KID・受信者・圧縮
+        for rel, (blob, ver, name) in files.items():
+            h = Bmsc6Header.read(root / rel)
+            if h.file_size != len(blob) or h.plain_len != len(plain[rel]) or str(h.path) != str(root / rel):
+                fail(f"{rel}: file_size/plain_len {h.file_size} {h.plain_len}")
+            if (h.meta or {}).get("name") != name:
+                fail(f"{rel}: meta {h.meta}")
+        h = Bmsc6Header.read(root / "b/v3rcpt.bmsc6")
+        if h.recipients != ["alice", "bob"] or Bmsc6Header.read(root / "a/v2kid.bmsc6").kid != "k1" or \
+           Bmsc6Header.read(root / "a/v2z.bmsc6").compression != "zlib":
+            fail("kid / recipients / compression")
+        if Bmsc6Header.read(root / "b/raw-aad.bmsc6").as_dict().get("aad_hex") != b"\x00\xffnot json".hex():
+            fail("non-JSON AAD")
+
+        # 索引: update/find。sha256 は記録も検索も小文字
+        db = d / "index.sqlite"
+        with HeaderIndex(db) as idx:
+            res = idx.update(iter_paths([root]))
+            if (res["files"], res["indexed"], res["unchanged"], len(res["failures"])) != (len(files) + 1, len(files), 0, 1):
+                fail(f"index update: {res}")
+            if len(idx) != len(files) or [r["meta"]["name"] for r in idx.find(name="v3.bin")] != ["v3.bin"]:
+                fail("find by name")
+            for q in (hashlib.sha256(text).hexdigest(), hashlib.sha256(text).hexdigest().upper()):
+                if sorted(r["meta"]["name"] for r in idx.find(sha256=q)) != ["upper.txt", "v2z.txt"]:
+                    fail(f"find by sha256 {q[:8]}")
+            stored = idx._db.execute("SELECT sha256 FROM files WHERE name = 'upper.txt'").fetchone()[0]
+            if stored != hashlib.sha256(text).hexdigest():
+                fail(f"sha256 stored as {stored}")
+            if [r["path"] for r in idx.find(kid="k1")] != [str(root / "a/v2kid.bmsc6")] or \
+               idx.find(name="v2.pdf", kid="k1") or len(idx.find()) != len(files):
+                fail("find by kid / AND / all")
+
+        # 変更のないファイルは読まない（開き直した索引でも）
+        reads = []
+        class Spy(Bmsc6Header):
+            @classmethod
+            def read(cls, src):
+                reads.append(Path(src).name)
+                return Bmsc6Header.read(src)
+        bmsc_v6_index.Bmsc6Header = Spy
+        try:
+            with HeaderIndex(db) as idx:
+                res = idx.update(iter_paths([root]))
+                if reads != ["junk.bmsc6"] or (res["indexed"], res["unchanged"]) != (0, len(files)):
+                    fail(f"unchanged files re-read: {reads} {res}")
+                # 書き換え（サイズが変わる）・削除
+                reads.clear()
+                (root / "a/v2.bmsc6").write_bytes(v2(text, aad_of("v2.pdf", text)))
+                (root / "b/v3.bmsc6").unlink()
+                res = idx.update(iter_paths([root]))
+                if sorted(reads) != ["junk.bmsc6", "v2.bmsc6"] or res["indexed"] != 1:
+                    fail(f"changed file: {reads} {res}")
+                if [r["meta"]["size"] for r in idx.find(name="v2.pdf")] != [len(text)]:
+                    fail("changed file not re-indexed")
+                if idx.prune() != 1 or idx.find(name="v3.bin") or len(idx) != len(files) - 1:
+                    fail("prune")
+        finally:
+            bmsc_v6_index.Bmsc6Header = Bmsc6Header
+
+        # CLI: inspect（1 行 1 ファイルの JSON、壊れたファイルがあれば終了コード 1）と --index の検索
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "inspect"]
+        r = subprocess.run(cli + [str(root / "a")], capture_output=True, cwd=ROOT)
+        rows = [json.loads(line) for line in r.stdout.decode("utf-8").splitlines()]
+        if r.returncode != 0 or sorted(Path(x["path"]).name for x in rows) != ["v1.bmsc6", "v2.bmsc6", "v2kid.bmsc6", "v2z.bmsc6"]:
+            fail(f"inspect CLI: {r.returncode} {rows}")
+        if subprocess.run(cli + [str(root / "b" / "junk.bmsc6")], capture_output=True, cwd=ROOT).returncode != 1:
+            fail("inspect CLI with a broken file")
+        r = subprocess.run(cli + ["--index", str(db), "--sha256", hashlib.sha256(text).hexdigest().upper()], capture_output=True, cwd=ROOT)
+        rows = [json.loads(line) for line in r.stdout.decode("utf-8").splitlines()]
+        if r.returncode != 0 or sorted(x["meta"]["name"] for x in rows) != ["upper.txt", "v2.pdf", "v2z.txt"]:
+            fail(f"inspect --index --sha256: {r.returncode} {rows}")
+        if subprocess.run(cli + ["--index", str(db), "--name", "nothing"], capture_output=True, cwd=ROOT).returncode != 1:
+            fail("inspect --index with no match")
+    print("✅ bmsc6 inspect/index OK")
+
+if __name__ == "__main__":
+    run(main)
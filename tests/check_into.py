@@ -0,0 +1,83 @@
+import mmap, os, tempfile
+
+from checklib import fail, rejected, run
+import bmsc_v6_prod as prod
+from bmsc_v6_prod import bmsc_v6_encrypt_into, bmsc_v6_decrypt_into, bmsc_v6_encrypt, bmsc_v6_decrypt, AuthFailed, ABYTES
+
+# コピーなし API（bmsc_v6_encrypt_into / bmsc_v6_decrypt_into）: in-place・別バッファ・memoryview の一部・mmap の入力で
+# タプル API（bmsc_v6_encrypt / bmsc_v6_decrypt）と相互に開けること、出力バッファが平文長ちょうどでもよいこと、
+# detached 版の無い環境の経路（combined 版 + 作業領域）でも同じ結果になること、改ざん・短いタグ・小さすぎる出力の拒否。
+#   py tests/check_into.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"into.bin"}'
+SIZES = (0, 1, 15, 16, 17, 1000, 100_000)
+
+def check_buffers(label: str):
+    for size in SIZES:
+        pt = os.urandom(size)
+        # in-place: buf が ct に置き換わり、また平文に戻る
+        buf = bytearray(pt)
+        nonce, tag = bmsc_v6_encrypt_into(buf, buf, K, CTX, AAD)
+        if bmsc_v6_decrypt(nonce, bytes(buf), tag, K, CTX, AAD) != pt:
+            fail(f"{label}: in-place encrypt ({size} bytes)")
+        if bmsc_v6_decrypt_into(buf, nonce, buf, tag, K, CTX, AAD) != size or buf != pt:
+            fail(f"{label}: in-place decrypt ({size} bytes)")
+        # 別バッファ（平文長ちょうど・余白付き）、memoryview の一部への書き込み
+        for room in (0, ABYTES, 100):
+            out = bytearray(size + room)
+            nonce, tag = bmsc_v6_encrypt_into(out, memoryview(pt), K, CTX, AAD)
+            if out[size:] != bytes(room) and prod._dlib is not None:  # combined 版は余白にタグを置く
+                fail(f"{label}: wrote past the ciphertext ({size} bytes)")
+            back = bytearray(size + room)
+            if bmsc_v6_decrypt_into(back, nonce, out[:size], tag, K, CTX, AAD) != size or back[:size] != pt:
+                fail(f"{label}: separate buffers ({size} bytes, room {room})")
+        big = bytearray(size + 64)
+        nonce, tag = bmsc_v6_encrypt_into(memoryview(big)[32:], pt, K, CTX, AAD)
+        if bmsc_v6_decrypt(nonce, bytes(big[32:32 + size]), tag, K, CTX, AAD) != pt:
+            fail(f"{label}: memoryview slice ({size} bytes)")
+        # タプル API の出力をコピーなし API で開く
+        nonce, ct, tag = bmsc_v6_encrypt(pt, K, CTX, AAD)
+        out = bytearray(size)
+        if bmsc_v6_decrypt_into(out, nonce, memoryview(ct), tag, K, CTX, AAD) != size or out != pt:
+            fail(f"{label}: tuple API interop ({size} bytes)")
+
+    # mmap の入力
+    pt = os.urandom(50_000)
+    with tempfile.TemporaryFile() as f:
+        f.write(pt); f.flush()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            out = bytearray(len(pt))
+            nonce, tag = bmsc_v6_encrypt_into(out, mm, K, CTX, AAD)
+    if bmsc_v6_decrypt(nonce, bytes(out), tag, K, CTX, AAD) != pt:
+        fail(f"{label}: mmap input")
+
+    # 改ざん・短いタグ・別の AAD・小さすぎる出力
+    nonce, tag = bmsc_v6_encrypt_into(out, pt, K, CTX, AAD)
+    bad = bytearray(out); bad[123] ^= 0x01
+    if not rejected(bmsc_v6_decrypt_into, bytearray(len(pt)), nonce, bad, tag, K, CTX, AAD, exc=AuthFailed):
+        fail(f"{label}: tampered ciphertext accepted")
+    if not rejected(bmsc_v6_decrypt_into, bytearray(len(pt)), nonce, out, tag[:15], K, CTX, AAD, exc=AuthFailed):
+        fail(f"{label}: short tag accepted")
+    if not rejected(bmsc_v6_decrypt_into, bytearray(len(pt)), nonce, out, tag, K, CTX, b"", exc=AuthFailed):
+        fail(f"{label}: wrong AAD accepted")
+    if not rejected(bmsc_v6_encrypt_into, bytearray(len(pt) - 1), pt, K, CTX) or not rejected(bmsc_v6_decrypt_into, bytearray(10), nonce, out, tag, K, CTX, AAD):
+        fail(f"{label}: output buffer too small accepted")
+    if not rejected(bmsc_v6_encrypt_into, bytes(len(pt)), pt, K, CTX, exc=(BufferError, TypeError)):
+        fail(f"{label}: read-only output accepted")
+
+def main():
+    check_buffers("detached" if prod._dlib is not None else "combined")
+    if prod._dlib is not None:
+        # detached 版のシンボルが無い環境の経路（combined 版 + 作業領域）も同じ結果になること
+        saved = prod._dlib
+        prod._dlib = None
+        try:
+            check_buffers("combined")
+        finally:
+            prod._dlib = saved
+    print("✅ bmsc6 copy-free API OK")
+
+if __name__ == "__main__":
+    run(main)
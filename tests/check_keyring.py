@@ -0,0 +1,150 @@
+from pathlib import Path
+import io, struct, subprocess, sys, tempfile
+
+from checklib import ROOT, VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+from bmsc_v6_keyring import Keyring, UnknownKid
+from bmsc_v6_container import (
+    HEAD_LEN, FLAG_KID, Bmsc6Writer, Bmsc6Reader, Bmsc6Header, seal_v2_into, unpack_v2, open_v2,
+)
+
+# 鍵束と KID ヘッダ拡張（flags=0x01、SPEC.md §3.4）: v2/v3 の往復と KID による鍵の選択、
+# KID・flags・ext の書き換えや除去、切り詰めの検出、鍵束ファイルの保存/読み込み、固定ベクタ（ヘッダ配置）の確認。
+#   py tests/check_keyring.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_kid_vector_1.json"
+# ★テスト専用の固定キー（実運用では使用厳禁）
+KEYS = {"2025-q4": bytes(range(32)), "2026-q1": bytes(range(32, 64))}
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"kid.txt"}'
+
+def ring() -> Keyring:
+    return Keyring(KEYS, default="2026-q1")
+
+def seal_v2(pt: bytes, K, kid: str|None=None) -> bytes:
+    out = bytearray(len(pt))
+    header, nonce, tag, n = seal_v2_into(out, pt, K, CTX, AAD, kid=kid)
+    return bytes(header + nonce + tag + out[:n])
+
+def open_v2_blob(blob: bytes, K) -> bytes:
+    ctx, aad, nonce, tag, ct, ext = unpack_v2(memoryview(blob))
+    return bytes(open_v2(K, bytes(ctx), bytes(aad), bytes(nonce), ct, tag, ext))
+
+def seal_v3(pt: bytes, K, nonce: bytes|None=None) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, AAD, 64, nonce=nonce) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def open_v3(blob: bytes, K) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), K))
+
+def write_vector():
+    pt = "KID vector: 鍵束のテスト".encode("utf-8") * 5
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 v2/v3 + KID extension)",
+        "ctx": CTX.decode("ascii"),
+        "keys_hex": {kid: K.hex() for kid, K in KEYS.items()},  # ←テスト用
+        "default_kid": "2026-q1",
+        "pt_b64": b64e(pt),
+        "v2_kid": "2025-q4",
+        "v2_b64": b64e(seal_v2(pt, ring(), "2025-q4")),  # nonce は乱数（作り直すと変わる）
+        "v3_nonce_b64": b64e(bytes(range(24))),
+        "v3_b64": b64e(seal_v3(pt, ring(), bytes(range(24)))),  # 既定の KID（2026-q1）
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    r = Keyring({kid: bytes.fromhex(h) for kid, h in vec["keys_hex"].items()}, vec["default_kid"])
+    pt, v2, v3 = b64d(vec["pt_b64"]), b64d(vec["v2_b64"]), b64d(vec["v3_b64"])
+    # v2: 固定部 14B（flags=0x01）の直後に ext_len(2) + TLV(type=0x01, len(2), kid)
+    kid = vec["v2_kid"].encode("utf-8")
+    ext = bytes([FLAG_KID]) + struct.pack(">H", len(kid)) + kid
+    if v2[6:8] != b"\x02\x01" or v2[HEAD_LEN:HEAD_LEN+2+len(ext)] != struct.pack(">H", len(ext)) + ext:
+        fail("vector: v2 KID header layout differs")
+    if open_v2_blob(v2, r) != pt or open_v2_blob(v2, r.key_for(vec["v2_kid"])) != pt:
+        fail("vector: v2 plaintext mismatch")
+    if Bmsc6Header.read(io.BytesIO(v3)).kid != vec["default_kid"] or open_v3(v3, r) != pt:
+        fail("vector: v3 KID/plaintext mismatch")
+    if seal_v3(pt, r, b64d(vec["v3_nonce_b64"])) != v3:
+        fail("vector: v3 encryption output differs")
+
+def main():
+    pt = b"keyring test payload " * 20
+    # 往復: 既定の KID / 指定した KID、鍵束でも KID の鍵そのものでも開ける
+    for kid in (None, "2025-q4", "2026-q1"):
+        v2 = seal_v2(pt, ring(), kid)
+        want = kid or "2026-q1"
+        if Bmsc6Header.read(io.BytesIO(v2)).kid != want:
+            fail(f"v2 header KID != {want}")
+        if open_v2_blob(v2, ring()) != pt or open_v2_blob(v2, KEYS[want]) != pt:
+            fail(f"v2 round trip (kid={kid})")
+        other = KEYS["2025-q4" if want == "2026-q1" else "2026-q1"]
+        if not rejected(open_v2_blob, v2, other):
+            fail("v2 opened with another key")
+    v3 = seal_v3(pt, ring())
+    if Bmsc6Header.read(io.BytesIO(v3)).kid != "2026-q1" or open_v3(v3, ring()) != pt:
+        fail("v3 round trip")
+    # KID の無い v2 には既定の鍵を使う
+    if open_v2_blob(seal_v2(pt, KEYS["2026-q1"]), ring()) != pt:
+        fail("v2 without KID is not opened with the default key")
+    if not rejected(open_v2_blob, seal_v2(pt, ring(), "2025-q4"), Keyring({"2026-q1": KEYS["2026-q1"]}), exc=UnknownKid):
+        fail("unknown KID accepted")
+
+    # 改ざん: KID を同じ長さの別の KID に書き換える・flags と ext を外して flags=0 に見せかける・各バイトの反転
+    v2 = seal_v2(pt, ring(), "2025-q4")
+    swapped = v2.replace(b"2025-q4", b"2026-q1", 1)
+    if not rejected(open_v2_blob, swapped, ring()):
+        fail("rewritten KID accepted")
+    ext_len = struct.unpack(">H", v2[HEAD_LEN:HEAD_LEN+2])[0]
+    stripped = v2[:7] + b"\x00" + v2[8:HEAD_LEN] + v2[HEAD_LEN+2+ext_len:]
+    if not rejected(open_v2_blob, stripped, KEYS["2025-q4"]):
+        fail("stripped KID extension accepted")
+    for i in range(len(v2)):
+        bad = bytearray(v2); bad[i] ^= 0x01
+        if not rejected(open_v2_blob, bytes(bad), ring()):
+            fail(f"v2 tampered byte {i} accepted")
+    v3 = seal_v3(pt, ring())
+    for i in range(0, len(v3), 7):
+        bad = bytearray(v3); bad[i] ^= 0x01
+        if not rejected(open_v3, bytes(bad), ring()):
+            fail(f"v3 tampered byte {i} accepted")
+    # 切り詰め
+    for cut in (len(v2) - 1, HEAD_LEN + 3, 10):
+        if not rejected(open_v2_blob, v2[:cut], ring()):
+            fail(f"v2 truncation at {cut} accepted")
+    for cut in (len(v3) - 1, len(v3) - 80, HEAD_LEN + 3):
+        if not rejected(open_v3, v3[:cut], ring()):
+            fail(f"v3 truncation at {cut} accepted")
+
+    # 鍵束ファイル: 保存して読み直すと同じ鍵と既定の KID、壊れたファイルは ValueError
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "keys.json"
+        ring().save(path)
+        r = Keyring.load(path)
+        if r.default_kid != "2026-q1" or {kid: r.key_for(kid) for kid in r} != KEYS:
+            fail("keyring save/load")
+        path.write_text('{"version": 1, "keys": {"x": "zz"}}', encoding="utf-8")
+        if not rejected(Keyring.load, path):
+            fail("invalid keyring file accepted")
+
+        # decrypt-file --offset/--length: 鍵束に無い KID は終了コード 2、KID は同じで鍵が違えば復号失敗（終了コード 1）
+        d = Path(d)
+        (d / "v3.bmsc6").write_bytes(seal_v3(pt, ring()))
+        ring().save(d / "ok.json")
+        Keyring({"2025-q4": KEYS["2025-q4"]}).save(d / "nokid.json")
+        Keyring({"2026-q1": KEYS["2025-q4"]}).save(d / "wrong.json")
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "decrypt-file", "--in", str(d / "v3.bmsc6"),
+               "--offset", "5", "--length", "20", "--out", "-", "--keyring"]
+        for name, code, want in (("ok.json", 0, pt[5:25]), ("nokid.json", 2, "鍵束".encode("utf-8")),
+                                 ("wrong.json", 1, "復号失敗".encode("utf-8"))):
+            r = subprocess.run(cli + [str(d / name)], capture_output=True, cwd=ROOT)
+            if r.returncode != code or want not in (r.stdout if code == 0 else r.stderr):
+                print(r.stderr.decode("utf-8", errors="replace"))
+                fail(f"decrypt-file --offset with {name}")
+
+    check_vector()
+    print("✅ bmsc6 keyring/KID OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
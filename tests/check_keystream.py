@@ -0,0 +1,73 @@
+import hashlib, hmac, os
+from concurrent.futures import ProcessPoolExecutor
+
+from checklib import fail, rejected, run
+import bmsc_v6
+from bmsc_v6 import bmsc_v6_encrypt, bmsc_v6_decrypt, hkdf_sha256, PARALLEL_MIN_BYTES
+
+# デモ暗号（bmsc_v6）のキーストリーム: SHA-256 状態を使い回す _keystream が定義どおりの HMAC と一致すること
+# （64 バイトを超える鍵を含む）、プロセス並列（workers / executor 指定）の生成が直列とバイト単位で一致すること
+# （PARALLEL_MIN_BYTES の前後・分割の端数）、並列と直列で相互に開けること、改ざんの拒否。
+#   py tests/check_keystream.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+IV = b"BMSCv6-IV00"
+AAD = b'{"name":"keystream.bin"}'
+NONCE = bytes(range(16))
+
+def reference(K_stream: bytes, IV: bytes, nonce: bytes, n: int) -> bytes:
+    """定義どおりのキーストリーム: ks[i] = HMAC(K_stream, IV||nonce||str(n)||str(i)||str(c_i))[0]"""
+    return bytes(hmac.new(K_stream, IV + nonce + b"%d%d%d" % (n, i, (i+1)*(n-i)), hashlib.sha256).digest()[0]
+                 for i in range(n))
+
+def parallel(K_stream: bytes, n: int, **kw) -> bytes:
+    return bmsc_v6._with_keystream(K_stream, IV, NONCE, n, bytes, kw.get("workers"), kw.get("executor"))
+
+def stream_of(nonce: bytes, ct: bytes, pt: bytes) -> bytes:
+    """暗号文と平文の XOR（= 使われたキーストリーム）と、同じ nonce の直列キーストリーム"""
+    K_stream = hkdf_sha256(K, nonce, b"stream", 32)
+    return bmsc_v6._xor(ct, pt), bmsc_v6._keystream(K_stream, IV, nonce, len(pt))
+
+def main():
+    # 直列の _keystream / _keystream_range が定義どおり
+    for key in (hkdf_sha256(K, NONCE, b"stream", 32), bytes(64), os.urandom(100)):
+        for n in (0, 1, 2, 33, 500):
+            ks = bmsc_v6._keystream(key, IV, NONCE, n)
+            if ks != reference(key, IV, NONCE, n):
+                fail(f"_keystream differs from the HMAC definition (key {len(key)} bytes, n={n})")
+            if n and bmsc_v6._keystream_range(key, IV, NONCE, n, n // 3, n) != ks[n // 3:]:
+                fail(f"_keystream_range (n={n})")
+
+    # 並列生成は直列と同じ（下限の前後・workers の 4 倍で割り切れない長さ・渡された executor）
+    key = hkdf_sha256(K, NONCE, b"stream", 32)
+    for n in (PARALLEL_MIN_BYTES - 1, PARALLEL_MIN_BYTES, PARALLEL_MIN_BYTES + 4 * 3 + 1):
+        want = bmsc_v6._keystream(key, IV, NONCE, n)
+        for workers in (2, 3):
+            if parallel(key, n, workers=workers) != want:
+                fail(f"parallel keystream differs from serial (n={n}, workers={workers})")
+    with ProcessPoolExecutor(2) as ex:
+        n = PARALLEL_MIN_BYTES + 7
+        if parallel(key, n, executor=ex) != bmsc_v6._keystream(key, IV, NONCE, n):
+            fail("parallel keystream with executor differs from serial")
+
+        # 並列と直列で相互に開ける（暗号文は同じ nonce の直列キーストリームで XOR したもの）
+        pt = os.urandom(PARALLEL_MIN_BYTES + 1000)
+        for kw in ({"workers": 3}, {"executor": ex}):
+            nonce, ct, tag = bmsc_v6_encrypt(pt, K, IV, AAD, **kw)
+            used, want = stream_of(nonce, ct, pt)
+            if used != want:
+                fail(f"parallel encrypt keystream differs from serial ({kw})")
+            if bmsc_v6_decrypt(nonce, ct, tag, K, IV, AAD) != pt:
+                fail(f"parallel encrypt → serial decrypt ({kw})")
+            if bmsc_v6_decrypt(*bmsc_v6_encrypt(pt, K, IV, AAD), K, IV, AAD, **kw) != pt:
+                fail(f"serial encrypt → parallel decrypt ({kw})")
+
+        # 改ざん・別の AAD は並列でも復号前に拒否
+        bad = bytearray(ct); bad[PARALLEL_MIN_BYTES] ^= 0x01
+        if not rejected(bmsc_v6_decrypt, nonce, bytes(bad), tag, K, IV, AAD, executor=ex) or \
+           not rejected(bmsc_v6_decrypt, nonce, ct, tag, K, IV, b"", workers=2):
+            fail("tampered ciphertext / wrong AAD accepted")
+    print("✅ bmsc_v6 parallel keystream OK")
+
+if __name__ == "__main__":
+    run(main)
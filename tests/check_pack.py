@@ -0,0 +1,171 @@
+from pathlib import Path
+import struct, tempfile
+
+from checklib import VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+from bmsc_v6_pack import Bmsc6PackReader, Bmsc6PackWriter, PACK_MAGIC, PACK_ID_LEN, FOOTER_MAGIC
+
+# 小さなレコードを詰める pack 形式（bmsc_v6_pack）: 追記・開き直しての追記・ランダムアクセス・decrypt_range の往復、
+# レコード（ct/aad/tag）・pack_id の改ざんや索引の入れ替え・別の pack のレコードの持ち込みの検出、
+# フッタの無いファイル（追記中の異常終了）の復元で末尾の書きかけを捨てること、別の鍵/ctx の拒否、
+# 固定ベクタ（ヘッダ・レコード・索引・フッタの配置と復号）の確認。
+#   py tests/check_pack.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_pack_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+HEAD = 6 + 1 + 1 + 2 + PACK_ID_LEN + len(CTX)
+REC = 4 + 4 + 24
+FOOTER = 8 + 8 + 8
+
+def msg(k: int) -> tuple:
+    return ("メッセージ %d " % k).encode("utf-8") * (k % 7), b'{"seq":%d}' % k if k % 3 else b""
+
+def layout(blob: bytes) -> list:
+    """フッタと索引を読んで各レコードの開始位置を返す（ヘッダの ctx 長も確かめる）"""
+    if blob[:8] != PACK_MAGIC + b"\x01\x00" or struct.unpack(">H", blob[8:10])[0] != len(CTX) or blob[26:HEAD] != CTX:
+        fail("pack header layout differs")
+    index_off, n, magic = struct.unpack(">QQ8s", blob[-FOOTER:])
+    if magic != FOOTER_MAGIC or index_off + 8 * n + FOOTER != len(blob):
+        fail("pack footer layout differs")
+    return list(struct.unpack(">%dQ" % n, blob[index_off:index_off + 8 * n]))
+
+def write_vector():
+    with tempfile.TemporaryDirectory() as d:
+        p = Path(d) / "v.bmsc6p"
+        with Bmsc6PackWriter(p, K, CTX) as w:  # pack_id・nonce は乱数（作り直すと変わる）
+            for k in range(3):
+                w.append(*msg(k))
+            w.append_many(*zip(*[msg(k) for k in range(3, 6)]))
+        blob = p.read_bytes()
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 pack v1)",
+        "ctx": CTX.decode("ascii"),
+        "key_hex": K.hex(),  # ←テスト用
+        "records": [{"pt_b64": b64e(pt), "aad_b64": b64e(aad)} for pt, aad in (msg(k) for k in range(6))],
+        "pack_b64": b64e(blob),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector(d: Path):
+    vec = load_vector(VECTOR)
+    blob = b64d(vec["pack_b64"])
+    want = [(b64d(r["pt_b64"]), b64d(r["aad_b64"])) for r in vec["records"]]
+    # header: "BMSC6P" || ver=1 || flags=0 || ctx_len || pack_id(16) || ctx
+    # record: aad_len(4) || ct_len(4) || nonce(24) || aad || ct || tag(16)、index: 開始位置(8) × n、footer: index_off || n || "BMSC6PIX"
+    offsets = layout(blob)
+    if len(offsets) != len(want) or offsets[0] != HEAD:
+        fail("vector: index differs")
+    for off, nxt, (pt, aad) in zip(offsets, offsets[1:] + [struct.unpack(">Q", blob[-FOOTER:-16])[0]], want):
+        aad_len, ct_len = struct.unpack(">II", blob[off:off+8])
+        if (aad_len, ct_len) != (len(aad), len(pt)) or nxt != off + REC + aad_len + ct_len + 16 or blob[off+REC:off+REC+aad_len] != aad:
+            fail("vector: record layout differs")
+    p = d / "vector.bmsc6p"
+    p.write_bytes(blob)
+    with Bmsc6PackReader(p, bytes.fromhex(vec["key_hex"]), vec["ctx"].encode("ascii")) as r:
+        if r.recovered or list(r) != want:
+            fail("vector: records differ")
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        p = d / "chat.bmsc6p"
+        # 往復: 追記 → 閉じる → 開き直して追記（索引は外して書き直す）
+        with Bmsc6PackWriter(p, K, CTX) as w:
+            if [w.append(*msg(k)) for k in range(5)] != list(range(5)):
+                fail("append record numbers")
+            if w.append_many(*zip(*[msg(k) for k in range(5, 100)])) != range(5, 100):
+                fail("append_many record numbers")
+        with Bmsc6PackWriter(p, K, CTX) as w:
+            if len(w) != 100 or w.append(*msg(100)) != 100 or w.append_many([msg(101)[0]], msg(101)[1]) != range(101, 102):
+                fail("append after reopening")
+        want = [msg(k) for k in range(102)]
+        blob = p.read_bytes()
+        if len(layout(blob)) != 102:
+            fail("index after reopening")
+        with Bmsc6PackReader(p, K, CTX) as r:
+            if len(r) != 102 or r.recovered or list(r) != want:
+                fail("round trip")
+            for k in (0, 1, 57, 101, -1, -102):
+                if r.record(k) != want[k] or r[k] != want[k][0] or r.aad(k) != want[k][1]:
+                    fail(f"random access {k}")
+            batch = r.decrypt_range(10, 60)
+            if batch.failed or list(batch) != [pt for pt, _ in want[10:60]]:
+                fail("decrypt_range")
+            if not rejected(r.record, 102, exc=IndexError) or not rejected(r.record, -103, exc=IndexError):
+                fail("out-of-range index accepted")
+
+        def reader(data: bytes, K_=K, ctx=CTX) -> Bmsc6PackReader:
+            q = d / "t.bmsc6p"; q.write_bytes(data)
+            return Bmsc6PackReader(q, K_, ctx)
+
+        offsets = layout(blob)
+        index_off = struct.unpack(">Q", blob[-FOOTER:-16])[0]
+        # レコードの改ざん（ct / aad / tag）: そのレコードだけが失敗し、decrypt_range は .failed に記録する
+        for k, at in ((3, offsets[4] - 20), (4, offsets[4] + REC), (8, offsets[9] - 1)):
+            bad = bytearray(blob); bad[at] ^= 0x01
+            with reader(bytes(bad)) as r:
+                if not rejected(r.record, k) or r[k + 1] != want[k + 1][0] or r.decrypt_range(0, 10).failed != [k]:
+                    fail(f"tampered record {k}")
+        # pack_id の改ざん: 全レコードが失敗する
+        bad = bytearray(blob); bad[12] ^= 0x01
+        with reader(bytes(bad)) as r:
+            if len(r.decrypt_range().failed) != 102:
+                fail("tampered pack_id accepted")
+        # 索引の入れ替え: 境界が合わなくなった前後のレコードだけが失敗する
+        bad = bytearray(blob)
+        i, j = index_off + 8 * 10, index_off + 8 * 31
+        bad[i:i+8], bad[j:j+8] = blob[j:j+8], blob[i:i+8]
+        with reader(bytes(bad)) as r:
+            if not all(rejected(r.record, k) for k in (9, 10, 30, 31)) or any(r[k] != want[k][0] for k in (8, 11, 29, 32)):
+                fail("swapped index entries accepted")
+        # 同じ長さのレコード 10 と 31 の中身を入れ替える（境界は合うが、レコード番号が AAD に入っているので失敗する）
+        a, b = offsets[10], offsets[31]
+        n = offsets[11] - a
+        if offsets[32] - b != n:
+            fail("test setup: record sizes differ")
+        with reader(blob[:a] + blob[b:b+n] + blob[a+n:b] + blob[a:a+n] + blob[b+n:]) as r:
+            if r.aad(10) != want[31][1] or r.decrypt_range().failed != [10, 31]:
+                fail("swapped records accepted")
+        # 別の pack（同じ鍵・ctx）のレコード 0 を持ち込む
+        other = d / "other.bmsc6p"
+        with Bmsc6PackWriter(other, K, CTX) as w:
+            w.append(*msg(0))
+        ob = other.read_bytes()
+        layout(ob)
+        rec0 = ob[HEAD:struct.unpack(">Q", ob[-FOOTER:-16])[0]]
+        if len(rec0) != offsets[1] - offsets[0]:
+            fail("test setup: record sizes differ")
+        with reader(blob[:HEAD] + rec0 + blob[offsets[1]:]) as r:
+            if not rejected(r.record, 0) or r[1] != want[1][0]:
+                fail("record from another pack accepted")
+        # 別の鍵/ctx
+        with reader(blob, bytes(32)) as r:
+            if not rejected(r.record, 0):
+                fail("wrong key accepted")
+        if not rejected(reader, blob, K, b"BMSCv6-IV01") or not rejected(Bmsc6PackWriter, p, bytes(32), CTX):
+            fail("wrong key/ctx accepted")
+        if not rejected(Bmsc6PackWriter, p, K, b"BMSCv6-IV01"):
+            fail("writer opened with another ctx")
+
+        # 切り詰め: フッタ/索引が欠けたファイルは先頭から辿り直し、末尾の書きかけのレコードは捨てる
+        for cut, n in ((len(blob) - 1, 102), (index_off + 13, 102), (index_off, 102), (offsets[50] + 40, 50), (offsets[1], 1)):
+            with reader(blob[:cut]) as r:
+                if not r.recovered or len(r) != n or list(r) != want[:n]:
+                    fail(f"recovery after truncation at {cut}")
+        for cut in (HEAD - 1, 9, 0):
+            if not rejected(reader, blob[:cut]):
+                fail(f"truncated header ({cut}) accepted")
+        # 復元したファイルへの追記
+        p.write_bytes(blob[:offsets[50] + 40])
+        with Bmsc6PackWriter(p, K, CTX) as w:
+            if len(w) != 50 or w.append(b"after crash") != 50:
+                fail("append after recovery")
+        with Bmsc6PackReader(p, K, CTX) as r:
+            if r.recovered or len(r) != 51 or r[50] != b"after crash" or list(r)[:50] != want[:50]:
+                fail("pack after recovery and append")
+
+        check_vector(d)
+    print("✅ bmsc6 pack OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
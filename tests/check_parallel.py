@@ -0,0 +1,85 @@
+import io, os
+from concurrent.futures import ProcessPoolExecutor
+
+from checklib import fail, rejected, run
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_container import Bmsc6Writer, Bmsc6Reader, Bmsc6Header, TAG_LEN
+from bmsc_v6_parallel import encrypt_parallel, decrypt_parallel
+
+# チャンク並列の v3 暗号化/復号（bmsc_v6_parallel）: 同じ nonce なら workers 数・プロセスプールによらず
+# Bmsc6Writer とバイト単位で同じ出力になること（圧縮なし / zlib / auto、チャンク境界ちょうど・空の入力を含む）、
+# decrypt_parallel が Bmsc6Reader と同じ平文を返すこと、チャンクの改ざん・入れ替え・切り詰めの拒否。
+#   py tests/check_parallel.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"parallel.bin"}'
+NONCE = bytes(range(100, 124))
+CHUNK = 4096
+
+def serial(pt: bytes, K_=K, **kw) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K_, CTX, AAD, CHUNK, nonce=NONCE, **kw) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def parallel(pt: bytes, K_=K, **kw) -> bytes:
+    out = io.BytesIO()
+    if encrypt_parallel(io.BytesIO(pt), out, K_, CTX, AAD, CHUNK, nonce=NONCE, **kw) != len(pt):
+        fail("encrypt_parallel byte count")
+    return out.getvalue()
+
+def opened(blob: bytes, K_=K, **kw) -> bytes:
+    out = io.BytesIO()
+    n = decrypt_parallel(io.BytesIO(blob), out, K_, **kw)
+    if n != len(out.getvalue()):
+        fail("decrypt_parallel byte count")
+    return out.getvalue()
+
+def main():
+    text = "並列暗号化のテスト parallel chunk ".encode("utf-8")
+    inputs = [b"", b"x", os.urandom(CHUNK), os.urandom(3 * CHUNK), os.urandom(3 * CHUNK + 17),
+              (text * (5 * CHUNK // len(text) + 1))[:5 * CHUNK + 100]]
+    for compress in (None, "zlib", "auto"):
+        for pt in inputs:
+            want = serial(pt, compress=compress)
+            for workers in (1, 4):
+                if parallel(pt, workers=workers, compress=compress) != want:
+                    fail(f"encrypt_parallel differs from Bmsc6Writer (compress={compress}, {len(pt)} bytes, workers={workers})")
+            if opened(want, workers=3) != pt or b"".join(Bmsc6Reader(io.BytesIO(want), K)) != pt:
+                fail(f"decrypt_parallel (compress={compress}, {len(pt)} bytes)")
+    # 圧縮付きは実際に縮み、auto は乱数のデータを圧縮しない
+    big = inputs[-1]
+    if len(serial(big, compress="zlib")) >= len(big) or serial(inputs[3], compress="auto") != serial(inputs[3]):
+        fail("compression decision")
+    # KID・プロセスプール
+    ring = Keyring({"k1": bytes(32), "k2": K}, default="k2")
+    blob = parallel(big, ring, workers=2)
+    if blob != serial(big, ring) or Bmsc6Header.read(io.BytesIO(blob)).kid != "k2" or opened(blob, ring) != big:
+        fail("keyring")
+    with ProcessPoolExecutor(2) as ex:
+        if parallel(big, workers=2, executor=ex) != serial(big) or opened(serial(big), executor=ex) != big:
+            fail("process pool")
+
+    # 改ざん・チャンクの入れ替え・切り詰め・別の鍵/AAD
+    blob = serial(inputs[4])
+    rec = CHUNK + TAG_LEN
+    head = len(blob) - 3 * rec - (17 + TAG_LEN)
+    for i in (head + 5, head + rec + 100, len(blob) - 1):
+        bad = bytearray(blob); bad[i] ^= 0x01
+        if not rejected(opened, bytes(bad)):
+            fail(f"tampered byte {i} accepted")
+    swapped = blob[:head] + blob[head+rec:head+2*rec] + blob[head:head+rec] + blob[head+2*rec:]
+    if not rejected(opened, swapped):
+        fail("swapped chunks accepted")
+    for cut in (len(blob) - 17 - TAG_LEN, len(blob) - 1, head + rec):
+        if not rejected(opened, blob[:cut]):
+            fail(f"truncation at {cut} accepted")
+    if not rejected(opened, blob, bytes(32)) or not rejected(opened, blob, aad=b"other"):
+        fail("wrong key / AAD accepted")
+    if not rejected(encrypt_parallel, io.BytesIO(b""), io.BytesIO(), K, CTX, nonce=b"short"):
+        fail("short nonce accepted")
+    print("✅ bmsc6 parallel OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,166 @@
+from pathlib import Path
+import io, json, struct, subprocess, sys, tempfile
+
+from checklib import ROOT, VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+import bmsc_v6_envelope as env
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_envelope import Recipients, NoRecipientEntry
+from bmsc_v6_rotate import rotate_file, rotate_paths, NotEnvelope
+from bmsc_v6_container import HEAD_LEN, MAGIC, VER_V3, FLAG_RCPT, Bmsc6Writer, Bmsc6Reader, Bmsc6Header
+
+# 鍵のローテーション（rewrap、bmsc_v6_rotate）: 包み直した後は新しい鍵で開けて旧鍵では開けないこと、
+# 他の受信者の項目と本文はそのまま・KID の引き継ぎ（その場書き換え）と KID の変更（ヘッダを作り直してコピー）、
+# 受信者表の改ざん・ヘッダの切り詰め（FLAG_RCPT で 14/15 バイト）の拒否と rotate_paths の失敗記録、
+# 進捗ログでの再実行・中断からの再開、固定ベクタ（包み直しの結果はバイト単位で決まる）の確認。
+#   py tests/check_rotate.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_rotate_vector_1.json"
+# ★テスト専用の固定キー（実運用では使用厳禁）
+KA, KB, KN = bytes(range(32)), bytes(range(32, 64)), bytes(range(96, 128))
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"rotate.txt"}'
+
+def seal_v3(pt: bytes, R) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, R, CTX, AAD, 64) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def open_v3(blob: bytes, K) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), K))
+
+def table_span(blob: bytes) -> tuple:
+    """受信者表（TLV の値）のファイル上の (開始, 終了)。ext は受信者表だけの前提"""
+    n = struct.unpack(">H", blob[HEAD_LEN+3:HEAD_LEN+5])[0]
+    return HEAD_LEN + 5, HEAD_LEN + 5 + n
+
+def rotated(blob: bytes, *args, **kw) -> tuple:
+    """一時ファイルで rotate_file を実行 → (mode, count, 新しいファイルの中身)"""
+    with tempfile.TemporaryDirectory() as d:
+        p = Path(d) / "f.bmsc6"
+        p.write_bytes(blob)
+        mode, count = rotate_file(p, *args, **kw)
+        return mode, count, p.read_bytes()
+
+def write_vector():
+    pt = "鍵のローテーション: rewrap only the recipient table.".encode("utf-8") * 3
+    before = seal_v3(pt, Recipients({"team-a": KA, "team-b": KB}))  # DEK・env_nonce・nonce は乱数（作り直すと変わる）
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 v3 + recipient table, rewrap)",
+        "ctx": CTX.decode("ascii"),
+        "old_key_hex": KA.hex(), "other_key_hex": KB.hex(), "new_key_hex": KN.hex(),  # ←テスト用
+        "pt_b64": b64e(pt),
+        "before_b64": b64e(before),
+        "after_b64": b64e(rotated(before, KA, KN)[2]),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    K_old, K_other, K_new = (bytes.fromhex(vec[k]) for k in ("old_key_hex", "other_key_hex", "new_key_hex"))
+    pt, before, after = b64d(vec["pt_b64"]), b64d(vec["before_b64"]), b64d(vec["after_b64"])
+    if before[:8] != MAGIC + bytes([VER_V3, FLAG_RCPT]):
+        fail("vector: header layout differs")
+    # 包み直しは (DEK, 新しい鍵, KID, env_nonce) で決まる: 表の team-a の項目だけが変わり、他のバイトは同じ
+    mode, count, out = rotated(before, K_old, K_new)
+    if (mode, count) != ("in-place", 1) or out != after:
+        fail("vector: rewrapped file differs")
+    s, e = table_span(before)
+    a_end = s + 24 + 1 + len(b"team-a") + env.WRAPPED_LEN
+    if before[:s + 24] != after[:s + 24] or before[a_end:] != after[a_end:] or before[s+24:a_end] == after[s+24:a_end]:
+        fail("vector: rewrap touched bytes outside the team-a entry")
+    if open_v3(after, K_new) != pt or open_v3(after, K_other) != pt or not rejected(open_v3, after, K_old, exc=NoRecipientEntry):
+        fail("vector: keys after rewrap")
+
+def main():
+    pt = b"rotate payload " * 40
+    blob = seal_v3(pt, Recipients({"team-a": KA, "team-b": KB}))
+    s, e = table_span(blob)
+    # KID を引き継ぐ: 表の長さが変わらないのでその場書き換え、本文はそのまま
+    mode, count, out = rotated(blob, KA, KN)
+    if (mode, count) != ("in-place", 1) or len(out) != len(blob) or out[e:] != blob[e:]:
+        fail("in-place rewrap")
+    if Bmsc6Header.read(io.BytesIO(out)).recipients != ["team-a", "team-b"]:
+        fail("KID not kept")
+    if open_v3(out, KN) != pt or open_v3(out, KB) != pt or open_v3(out, Keyring({"team-a": KN})) != pt:
+        fail("new key after rewrap")
+    if not rejected(open_v3, out, KA, exc=NoRecipientEntry):
+        fail("old key still opens after rewrap")
+    # KID を変える: 表の長さが変わるのでヘッダを作り直してコピー（本文のバイト列は同じ）
+    mode, count, out = rotated(blob, KA, KN, new_kid="team-a-2026")
+    if (mode, count) != ("copied", 1) or out[-(len(blob) - e):] != blob[e:]:
+        fail("copied rewrap")
+    if Bmsc6Header.read(io.BytesIO(out)).recipients != ["team-a-2026", "team-b"]:
+        fail("new KID not written")
+    if open_v3(out, Keyring({"team-a-2026": KN})) != pt or not rejected(open_v3, out, Keyring({"team-a": KA})):
+        fail("keys after copied rewrap")
+    # 鍵束の旧鍵（KID で項目を選ぶ）
+    if rotated(blob, Keyring({"team-b": KB}), KN)[:2] != ("in-place", 1):
+        fail("rewrap with a keyring")
+
+    # 受信者表の改ざん: 項目を壊すとその鍵では包み直せない・env_nonce を壊すと誰も包み直せない
+    a_wrapped = s + 24 + 1 + len(b"team-a") + 5
+    bad = bytearray(blob); bad[a_wrapped] ^= 0x01
+    if not rejected(rotated, bytes(bad), KA, KN, exc=NoRecipientEntry) or rotated(bytes(bad), KB, KN)[:2] != ("in-place", 1):
+        fail("tampered team-a entry")
+    bad = bytearray(blob); bad[s] ^= 0x01
+    if not rejected(rotated, bytes(bad), KA, KN) or not rejected(rotated, bytes(bad), KB, KN):
+        fail("tampered env_nonce accepted")
+    if not rejected(rotated, blob, bytes(32), KN, exc=NoRecipientEntry):
+        fail("non-recipient old key accepted")
+    # 受信者表の無いファイル・切り詰めたヘッダ
+    plain = seal_v3(pt, KA)
+    if not rejected(rotated, plain, KA, KN, exc=NotEnvelope):
+        fail("container without a recipient table accepted")
+    for cut in (HEAD_LEN, HEAD_LEN + 1, HEAD_LEN + 4, s + 10, e - 1):
+        if not rejected(rotated, blob[:cut], KA, KN):
+            fail(f"truncation at {cut} accepted")
+
+    # rotate_paths: 失敗の記録・対象外・同じログでの再実行
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        files = {"ok1": blob, "ok2": seal_v3(pt, Recipients([KA, KB])), "plain": plain,
+                 "trunc14": blob[:HEAD_LEN], "trunc15": blob[:HEAD_LEN + 1], "tampered": blob[:s] + b"\x00" * 24 + blob[s+24:]}
+        for name, data in files.items():
+            (d / f"{name}.bmsc6").write_bytes(data)
+        paths = [d / f"{name}.bmsc6" for name in files]
+        log = d / "rotate.log"
+        res = rotate_paths(paths, KA, KN, log=log, workers=2)
+        failed = sorted(Path(f["path"]).stem for f in res["failures"])
+        if failed != ["tampered", "trunc14", "trunc15"] or (res["in_place"], res["not_envelope"]) != (2, 1):
+            fail(f"rotate_paths result: {res}")
+        for name in ("ok1", "ok2"):
+            if open_v3((d / f"{name}.bmsc6").read_bytes(), KN) != pt:
+                fail(f"rotate_paths: {name} not rewrapped")
+        res = rotate_paths(paths, KA, KN, log=log)
+        if res["skipped"] != 3 or res["in_place"] != 0 or len(res["failures"]) != 3:
+            fail(f"rotate_paths rerun: {res}")
+
+        # 中断からの再開: "begin" だけが記録され、表が半分だけ書き換わった状態
+        p = d / "resume.bmsc6"
+        p.write_bytes(blob)
+        _, _, new = rotated(blob, KA, KN)
+        half = blob[:s] + new[s:(s + e) // 2] + blob[(s + e) // 2:]
+        p.write_bytes(half)
+        log2 = d / "resume.log"
+        rec = {"path": str(p.resolve()), "offset": s, "old": blob[s:e].hex(), "new": new[s:e].hex(), "state": "begin"}
+        log2.write_text(json.dumps(rec) + "\n" + '{"path": "tr', encoding="utf-8")
+        res = rotate_paths([p], KA, KN, log=log2)
+        if res["resumed"] != 1 or res["skipped"] != 1 or p.read_bytes() != new:
+            fail(f"resume after an interrupted rewrap: {res}")
+
+        # CLI: 失敗があれば終了コード 1
+        (d / "ka.bin").write_bytes(KA); (d / "kn.bin").write_bytes(KN)
+        (d / "cli.bmsc6").write_bytes(blob)
+        r = subprocess.run([sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "rotate", "--no-progress",
+                            "--key-file", str(d / "ka.bin"), "--new-key-file", str(d / "kn.bin"), "--log", str(d / "cli.log"),
+                            str(d / "cli.bmsc6"), str(d / "trunc15.bmsc6")], capture_output=True, cwd=ROOT)
+        if r.returncode != 1 or json.loads(r.stdout)["in_place"] != 1 or open_v3((d / "cli.bmsc6").read_bytes(), KN) != pt:
+            print(r.stderr.decode("utf-8", errors="replace"))
+            fail("rotate CLI")
+
+    check_vector()
+    print("✅ bmsc6 rotate OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
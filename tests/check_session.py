@@ -0,0 +1,118 @@
+from pathlib import Path
+import tempfile
+
+from checklib import VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+from bmsc_v6_session import Bmsc6Session, ReplayError, COUNTER_LEN
+
+# チャット向けセッション（bmsc_v6_session）: 双方向の往復、再送・窓より古いカウンタの拒否、順不同の受信、
+# カウンタ/ct/tag/AAD の改ざん・切り詰め・方向やセッションの取り違えの検出、状態ファイル（予約による nonce 非再利用、
+# 再起動後の再送検出）、固定ベクタ（nonce = 接頭辞 || カウンタなので送信メッセージはバイト単位で決まる）の確認。
+#   py tests/check_session.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_session_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+SID = bytes(range(200, 216))
+
+def pair(**kw) -> tuple:
+    return (Bmsc6Session(K, CTX, SID, b"alice", b"bob", **kw.get("a", {})),
+            Bmsc6Session(K, CTX, SID, b"bob", b"alice", **kw.get("b", {})))
+
+MESSAGES = [("こんにちは", ""), ("second message", '{"room":"r1"}'), ("", "")]
+
+def write_vector():
+    alice, _ = pair()
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 session)",
+        "ctx": CTX.decode("ascii"),
+        "key_hex": K.hex(),  # ←テスト用
+        "session_id_hex": SID.hex(),
+        "local": "alice", "peer": "bob",
+        "messages": [{"pt_utf8": pt, "aad_utf8": aad, "wire_b64": b64e(alice.seal(pt.encode("utf-8"), aad.encode("utf-8")))}
+                     for pt, aad in MESSAGES],
+        "state_b64": b64e(alice.export_state()),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    key, sid = bytes.fromhex(vec["key_hex"]), bytes.fromhex(vec["session_id_hex"])
+    local, peer = vec["local"].encode(), vec["peer"].encode()
+    sender = Bmsc6Session(key, vec["ctx"].encode(), sid, local, peer)
+    receiver = Bmsc6Session(key, vec["ctx"].encode(), sid, peer, local)
+    for i, m in enumerate(vec["messages"]):
+        pt, aad, wire = m["pt_utf8"].encode("utf-8"), m["aad_utf8"].encode("utf-8"), b64d(m["wire_b64"])
+        if wire[:COUNTER_LEN] != i.to_bytes(COUNTER_LEN, "big"):
+            fail(f"vector: message {i} counter prefix differs")
+        if sender.seal(pt, aad) != wire:
+            fail(f"vector: message {i} encryption output differs")
+        if receiver.open(wire, aad) != pt:
+            fail(f"vector: message {i} plaintext mismatch")
+    # 状態: MAGIC "BMSS" + ver(1) + window(2) + 照合値(8) + 送信カウンタ(8) + 受信 top(8) + ビットマップ(window/8)
+    state = b64d(vec["state_b64"])
+    if sender.export_state() != state or state[:7] != b"BMSS\x01\x04\x00" or len(state) != 31 + 1024 // 8:
+        fail("vector: state layout differs")
+
+def main():
+    alice, bob = pair(b={"window": 64})
+    # 往復（両方向・AAD 付き）
+    for i in range(5):
+        if bob.open(alice.seal(b"a%d" % i, b"aad"), b"aad") != b"a%d" % i or alice.open(bob.seal(b"b%d" % i)) != b"b%d" % i:
+            fail(f"round trip {i}")
+    # 再送・順不同・窓より古いカウンタ
+    m = alice.seal(b"once")
+    bob.open(m)
+    if not rejected(bob.open, m, exc=ReplayError):
+        fail("replayed message accepted")
+    late = [alice.seal(b"late%d" % i) for i in range(3)]
+    for w in (late[2], late[0], late[1]):
+        bob.open(w)
+    old = alice.seal(b"old")
+    for _ in range(70):
+        bob.open(alice.seal(b"x"))
+    if not rejected(bob.open, old, exc=ReplayError):
+        fail("message older than the window accepted")
+
+    # 改ざん・切り詰め・取り違え（認証に失敗したメッセージは窓を進めない）
+    m = alice.seal(b"tamper me", b"aad")
+    for i in range(len(m)):
+        bad = bytearray(m); bad[i] ^= 0x01
+        if not rejected(bob.open, bytes(bad), b"aad"):
+            fail(f"tampered byte {i} accepted")
+    for bad in (m[:-1], m[:COUNTER_LEN + 15], m[:3], b""):
+        if not rejected(bob.open, bad, b"aad"):
+            fail(f"truncated message ({len(bad)} bytes) accepted")
+    if not rejected(bob.open, m, b"other aad") or not rejected(alice.open, m, b"aad"):
+        fail("wrong AAD / own message accepted")
+    other = Bmsc6Session(K, CTX, bytes(16), b"bob", b"alice")
+    if not rejected(other.open, m, b"aad"):
+        fail("message from another session accepted")
+    if bob.open(m, b"aad") != b"tamper me":
+        fail("genuine message rejected after failed attempts")
+
+    # 状態ファイル
+    with tempfile.TemporaryDirectory() as d:
+        a_path, b_path = Path(d) / "alice.state", Path(d) / "bob.state"
+        alice, bob = pair(a={"state_path": a_path, "reserve": 8}, b={"state_path": b_path})
+        sent = [alice.seal(b"m%d" % i) for i in range(3)]
+        for w in sent:
+            bob.open(w)
+        bob.close()
+        # alice は save せずに終了した想定: 再起動後は予約済みの先から送る（同じカウンタ = nonce を使わない）
+        alice2 = Bmsc6Session(K, CTX, SID, b"alice", b"bob", state_path=a_path, reserve=8)
+        if int.from_bytes(alice2.seal(b"after restart")[:COUNTER_LEN], "big") < 8:
+            fail("counter reused after restart")
+        bob2 = Bmsc6Session(K, CTX, SID, b"bob", b"alice", state_path=b_path)
+        if not rejected(bob2.open, sent[1], exc=ReplayError):
+            fail("replay accepted after restart")
+        if not rejected(Bmsc6Session, K, CTX, bytes(16), b"bob", b"alice", state_path=b_path):
+            fail("state file of another session accepted")
+        b_path.write_bytes(b_path.read_bytes()[:-1])
+        if not rejected(Bmsc6Session, K, CTX, SID, b"bob", b"alice", state_path=b_path):
+            fail("truncated state file accepted")
+
+    check_vector()
+    print("✅ bmsc6 session OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
@@ -0,0 +1,131 @@
+from pathlib import Path
+import io, json, os, subprocess, sys, tempfile, time
+
+from checklib import ROOT, b64d, fail, rejected, run
+import bmsc_v6_prod as prod
+from bmsc_v6_prod import bmsc_v6_encrypt, bmsc_v6_decrypt, PhaseStats, set_probe, phase, AuthFailed
+from bmsc_v6_container import Bmsc6Writer, Bmsc6Reader, TAG_LEN
+from bmsc_v6_parallel import encrypt_parallel
+
+# 計測フック（set_probe / PhaseStats / phase）: 無効時は何も記録しないこと、入れ子のフェーズの時間が親から差し引かれること、
+# bmsc_v6_encrypt/decrypt と v3 の読み出しのフェーズとバイト数、計測の有無で出力が変わらないこと
+# （Bmsc6Writer と encrypt_parallel が圧縮なし / zlib / auto で同じバイト列）、失敗時も計測の状態が戻ること、
+# CLI の --stats（stderr の JSON・失敗の終了でも出力）。
+#   py tests/check_stats.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"stats.bin"}'
+NONCE = bytes(range(100, 124))
+CHUNK = 4096
+
+def probed(fn, *args, **kw):
+    """PhaseStats を設定して fn を呼び、(結果, フェーズ) を返す"""
+    stats = PhaseStats()
+    old = set_probe(stats)
+    try:
+        return fn(*args, **kw), stats.phases
+    finally:
+        if set_probe(old) is not stats:
+            fail("set_probe did not return the current sink")
+
+def serial(pt: bytes, **kw) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, AAD, CHUNK, nonce=NONCE, **kw) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def parallel(pt: bytes, **kw) -> bytes:
+    out = io.BytesIO()
+    encrypt_parallel(io.BytesIO(pt), out, K, CTX, AAD, CHUNK, nonce=NONCE, workers=3, **kw)
+    return out.getvalue()
+
+def main():
+    # 無効時（既定）は何も記録しない
+    if prod._probe is not None or phase("x") is not prod._NO_PHASE:
+        fail("probe enabled by default")
+
+    # 入れ子: 親の時間から子の分を差し引き、合計は全体に一致する
+    calls = []
+    old = set_probe(lambda *a: calls.append(a))
+    try:
+        t0 = time.perf_counter()
+        with phase("outer", 1):
+            with phase("inner") as p:
+                time.sleep(0.05); p.add(7)
+            time.sleep(0.01)
+        total = time.perf_counter() - t0
+    finally:
+        set_probe(old)
+    (n1, s1, b1, _), (n2, s2, b2, _) = calls
+    if (n1, b1, n2, b2) != ("inner", 7, "outer", 1) or s1 < 0.05 or not 0.01 <= s2 < s1 or s1 + s2 > total:
+        fail(f"nested phases: {calls}")
+
+    # bmsc_v6_encrypt/decrypt のフェーズとバイト数、計測の有無で相互に開ける
+    pt = os.urandom(10_000)
+    (nonce, ct, tag), ph = probed(bmsc_v6_encrypt, pt, K, CTX, AAD)
+    if {k: (v["calls"], v["bytes"]) for k, v in ph.items()} != \
+            {"kdf": (1, 32), "aad": (1, len(CTX) + len(AAD)), "aead": (1, len(pt)), "copy": (1, len(pt))}:
+        fail(f"encrypt phases: {ph}")
+    if bmsc_v6_decrypt(nonce, ct, tag, K, CTX, AAD) != pt:
+        fail("probed encrypt → unprobed decrypt")
+    back, ph = probed(bmsc_v6_decrypt, *bmsc_v6_encrypt(pt, K, CTX, AAD), K, CTX, AAD)
+    if back != pt or set(ph) != {"kdf", "aad", "aead", "copy"}:
+        fail(f"unprobed encrypt → probed decrypt: {ph}")
+
+    # 失敗しても例外はそのまま、実行中のフェーズは残らない
+    bad = bytes([tag[0] ^ 1]) + tag[1:]
+    if not rejected(probed, bmsc_v6_decrypt, nonce, ct, bad, K, CTX, AAD, exc=AuthFailed) or prod._open_phases or prod._probe is not None:
+        fail("probe state after an auth failure")
+
+    # v3: 計測の有無で同じバイト列（Bmsc6Writer / encrypt_parallel、圧縮なし / zlib / auto）
+    text = "計測フックのテスト phase stats ".encode("utf-8")
+    for data in (b"", os.urandom(3 * CHUNK + 17), (text * (5 * CHUNK // len(text) + 1))[:5 * CHUNK + 100]):
+        for compress in (None, "zlib", "auto"):
+            want = serial(data, compress=compress)
+            if probed(serial, data, compress=compress)[0] != want:
+                fail(f"Bmsc6Writer output changed by the probe (compress={compress}, {len(data)} bytes)")
+            if probed(parallel, data, compress=compress)[0] != want or parallel(data, compress=compress) != want:
+                fail(f"encrypt_parallel differs from Bmsc6Writer with the probe (compress={compress}, {len(data)} bytes)")
+    blob = serial(data)
+    out, ph = probed(lambda: b"".join(Bmsc6Reader(io.BytesIO(blob), K)))
+    chunks = -(-len(data) // CHUNK)
+    if out != data or not {"container.parse", "kdf", "io.read", "aead"} <= set(ph) or \
+       (ph["aead"]["calls"], ph["aead"]["bytes"]) != (chunks, len(data) + chunks * TAG_LEN):
+        fail(f"v3 reader phases: {ph}")
+
+    # CLI --stats: stderr の最後の行が JSON、失敗の終了（復号失敗は 1）でも出力
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "k.bin").write_bytes(K)
+        (d / "p.bmsc6").write_bytes(blob)
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py")]
+        for args, code, cmd, need in (
+                (["encrypt", "--text", "hello stats", "--key-file", str(d / "k.bin")], 0, "encrypt", {"key", "kdf", "aead", "format"}),
+                (["decrypt-file", "--in", str(d / "p.bmsc6"), "--out", str(d / "p.out"), "--key-file", str(d / "k.bin")], 0,
+                 "decrypt-file", {"key", "container.parse", "io.read", "aead", "io.write"}),
+                (["decrypt-file", "--in", str(d / "p.bmsc6"), "--out", "-", "--key-hex", "00" * 32], 1,
+                 "decrypt-file", {"container.parse", "aead"})):
+            r = subprocess.run(cli + args + ["--stats"], capture_output=True, cwd=ROOT)
+            try:
+                st = json.loads(r.stderr.decode("utf-8").splitlines()[-1])
+            except (ValueError, IndexError):
+                print(r.stderr.decode("utf-8", errors="replace"))
+                fail(f"{cmd} --stats printed no JSON")
+            if r.returncode != code or st["command"] != cmd or not need <= set(st["phases"]) or \
+               abs(st["wall_seconds"] - st["other_seconds"] - sum(p["seconds"] for p in st["phases"].values())) > 1e-4:
+                fail(f"{cmd} --stats (exit {r.returncode}): {st}")
+            if args[0] == "encrypt":
+                out = dict(line.split(": ", 1) for line in r.stdout.decode("utf-8").splitlines() if ": " in line)
+                n, c, t = (b64d(out[k]) for k in ("NONCE(Base64)", "CT(Base64)", "TAG(Base64)"))
+                if bmsc_v6_decrypt(n, c, t, K, CTX) != b"hello stats" or b"{" in r.stdout:
+                    fail("encrypt --stats output")
+        if (d / "p.out").read_bytes() != data:
+            fail("decrypt-file --stats output")
+        r = subprocess.run(cli + ["encrypt", "--text", "x", "--key-file", str(d / "k.bin")], capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or b"phases" in r.stderr:
+            fail("stats printed without --stats")
+    print("✅ bmsc6 phase stats OK")
+
+if __name__ == "__main__":
+    run(main)
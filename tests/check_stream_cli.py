@@ -0,0 +1,106 @@
+from pathlib import Path
+import io, os, subprocess, sys, tempfile
+
+from checklib import ROOT, fail, run
+from bmsc_v6_container import Bmsc6Reader, seal_v2_into, MAGIC, VER_V3
+
+# CLI のストリーム暗号化/復号: encrypt-file が stdin → stdout（と ファイル → ファイル）で bmsc6 v3 を書くこと
+# （空・チャンク境界ちょうど・端数、--compress、stdout には暗号文だけ）、decrypt-file が stdin → stdout で
+# v3 をチャンク単位に・v2 を一括で復号すること、encrypt-file | decrypt-file のパイプ、
+# 切り詰め・改ざんは終了コード 1 で書きかけの出力ファイルを残さないこと、開けない入力は終了コード 2。
+#   py tests/check_stream_cli.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"stream.bin"}'
+CHUNK = 1000
+CLI = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py")]
+
+def cli(args, stdin: bytes=b"", code: int=0) -> subprocess.CompletedProcess:
+    r = subprocess.run(CLI + args, input=stdin, capture_output=True, cwd=ROOT)
+    if r.returncode != code:
+        print(r.stderr.decode("utf-8", errors="replace"))
+        fail(f"{args[0]} exited {r.returncode} (expected {code}): {args[1:]}")
+    return r
+
+def opened(blob: bytes) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), K))
+
+def main():
+    text = "ストリーム暗号化のテスト stream ".encode("utf-8")
+    inputs = [b"", b"x", os.urandom(CHUNK), os.urandom(3 * CHUNK + 1), (text * 400)[:7 * CHUNK + 5]]
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        key = ["--key-file", str(d / "k.bin")]
+        (d / "k.bin").write_bytes(K)
+        enc = ["encrypt-file", "--chunk-size", str(CHUNK), "--aad", AAD.decode("utf-8")] + key
+
+        for pt in inputs:
+            # encrypt-file: stdin → stdout（状態表示は stderr）、ファイル → ファイル
+            r = cli(enc + ["--in", "-", "--out", "-"], pt)
+            blob = r.stdout
+            if blob[:7] != MAGIC + bytes([VER_V3]) or opened(blob) != pt or "CONTEXT".encode("utf-8") not in r.stderr:
+                fail(f"encrypt-file stdin → stdout ({len(pt)} bytes)")
+            rd = Bmsc6Reader(io.BytesIO(blob), K)
+            if (rd.ctx, rd.aad) != (CTX, AAD):
+                fail("encrypt-file header")
+            (d / "p.bin").write_bytes(pt)
+            r = cli(enc + ["--in", str(d / "p.bin"), "--out", str(d / "p.bmsc6")])
+            if opened((d / "p.bmsc6").read_bytes()) != pt or b"Wrote:" not in r.stdout:
+                fail(f"encrypt-file file → file ({len(pt)} bytes)")
+
+            # decrypt-file: stdin → stdout（v3 はチャンク単位）、ファイル → stdout
+            r = cli(["decrypt-file", "--in", "-", "--out", "-"] + key, blob)
+            if r.stdout != pt or b"AAD: embedded" not in r.stderr:
+                fail(f"decrypt-file stdin → stdout ({len(pt)} bytes)")
+            if cli(["decrypt-file", "--in", str(d / "p.bmsc6"), "--out", "-"] + key).stdout != pt:
+                fail(f"decrypt-file file → stdout ({len(pt)} bytes)")
+
+        # --compress: 縮んで、そのまま開ける
+        big = inputs[-1]
+        blob = cli(enc + ["--in", "-", "--out", "-", "--compress", "zlib"], big).stdout
+        if len(blob) >= len(big) or Bmsc6Reader(io.BytesIO(blob), K).compression == 0 or opened(blob) != big:
+            fail("encrypt-file --compress")
+        if cli(["decrypt-file", "--in", "-", "--out", "-"] + key, blob).stdout != big:
+            fail("decrypt-file of a compressed stream")
+
+        # v2（1 タグの一括形式）も stdin から。--out 無しなら hex 表示
+        buf = bytearray(len(big))
+        header, nonce, tag, k = seal_v2_into(buf, big, K, CTX, AAD)
+        v2 = header + nonce + tag + buf[:k]
+        if cli(["decrypt-file", "--in", "-", "--out", "-"] + key, v2).stdout != big:
+            fail("decrypt-file v2 from stdin")
+        if big.hex().encode("ascii") not in cli(["decrypt-file", "--in", "-"] + key, v2).stdout:
+            fail("decrypt-file v2 from stdin to hex")
+
+        # encrypt-file | decrypt-file のパイプ
+        with subprocess.Popen(CLI + enc + ["--in", "-", "--out", "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, cwd=ROOT) as p1, \
+             subprocess.Popen(CLI + ["decrypt-file", "--in", "-", "--out", "-"] + key, stdin=p1.stdout,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=ROOT) as p2:
+            p1.stdout.close()
+            p1.stdin.write(big); p1.stdin.close()
+            out = p2.stdout.read()
+        if p1.returncode != 0 or p2.returncode != 0 or out != big:
+            fail("encrypt-file | decrypt-file")
+
+        # 切り詰め・改ざん・別の鍵: 終了コード 1、出力ファイルは残さない
+        blob = cli(enc + ["--in", "-", "--out", "-"], big).stdout
+        bad = bytearray(blob); bad[-CHUNK] ^= 0x01
+        for name, data, k in (("truncated", blob[:-1], key), ("cut at a chunk", blob[:len(blob) - 5 - 16], key),
+                              ("tampered", bytes(bad), key), ("wrong key", blob, ["--key-hex", "00" * 32])):
+            r = cli(["decrypt-file", "--in", "-", "--out", "-"] + k, data, code=1)
+            if len(r.stdout) >= len(big):
+                fail(f"decrypt-file {name}: whole plaintext written")
+            cli(["decrypt-file", "--in", "-", "--out", str(d / "never.out")] + k, data, code=1)
+            if (d / "never.out").exists():
+                fail(f"decrypt-file {name} left its output file")
+        # 開けない入力・壊れたヘッダは終了コード 2
+        cli(enc + ["--in", str(d / "missing.bin"), "--out", str(d / "never.bmsc6")], code=2)
+        if (d / "never.bmsc6").exists():
+            fail("encrypt-file created an output for a missing input")
+        cli(["decrypt-file", "--in", "-", "--out", "-"] + key, MAGIC + bytes([VER_V3, 0]) + b"\xff" * 10, code=2)
+    print("✅ bmsc6 streaming CLI OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,131 @@
+from pathlib import Path
+import os, subprocess, sys, tempfile
+
+from checklib import ROOT, fail, rejected, run
+from bmsc_v6_tree import encrypt_tree, decrypt_tree, load_manifest, MANIFEST_NAME, SUFFIX
+
+# ディレクトリ一括（bmsc_v6_tree / encrypt-dir / decrypt-dir）: 往復（サブディレクトリ・空ファイル・圧縮）、
+# 入力にある *.part やマニフェストと同じ名前のファイルも対象になること（"x" と "x.part" の両方があっても壊れない）、
+# マニフェストによる再開（変わっていないファイルは飛ばす・変えたファイルと消えた出力はやり直す・書きかけの行は無視）、
+# 改ざん・切り詰め・名前の取り違えはそのファイルだけが失敗して平文を書かないこと、出力に一時ファイルが残らないこと。
+#   py tests/check_tree.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+
+def tree_bytes(d: Path) -> dict:
+    return {p.relative_to(d).as_posix(): p.read_bytes() for p in sorted(d.rglob("*")) if p.is_file()}
+
+def outputs(d: Path) -> list:
+    """出力ディレクトリのファイル（直下のマニフェストを除く）"""
+    return sorted(p.relative_to(d).as_posix() for p in d.rglob("*") if p.is_file() and p != d / MANIFEST_NAME)
+
+def failed(res: dict) -> list:
+    return sorted(rel for rel, _ in res["failed"])
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        src, enc, dec = d / "src", d / "enc", d / "dec"
+        (src / "sub" / "deep").mkdir(parents=True)
+        files = {
+            "a.txt": "ディレクトリ一括のテスト\n".encode("utf-8") * 200,
+            "empty": b"",
+            "movie.part": os.urandom(300_000),  # 利用者のファイル（書きかけの一時ファイルではない）
+            "movie": b"movie " * 5000,          # 一時ファイル名 movie.part と出力 movie.part がぶつからないこと
+            "sub/" + MANIFEST_NAME: b'{"src": "not ours"}\n',
+            "sub/deep/z.bin": os.urandom(70_000),
+        }
+        for rel, data in files.items():
+            (src / rel).write_bytes(data)
+
+        # 往復
+        res = encrypt_tree(src, enc, K, CTX, workers=3)
+        if res["failed"] or res["files"] != len(files) or res["bytes"] != sum(map(len, files.values())):
+            fail(f"encrypt_tree: {res}")
+        if outputs(enc) != sorted(rel + SUFFIX for rel in files):
+            fail(f"encrypted outputs: {outputs(enc)}")
+        res = decrypt_tree(enc, dec, K, workers=3)
+        if res["failed"] or res["files"] != len(files) or tree_bytes(dec) != dict(files, **{MANIFEST_NAME: (dec / MANIFEST_NAME).read_bytes()}):
+            fail(f"decrypt_tree: {res}")
+        if set(load_manifest(dec / MANIFEST_NAME)) != {rel + SUFFIX for rel in files}:
+            fail("decrypt manifest entries")
+
+        # 再開: 全部飛ばす → 1 つ変更・1 つの出力を削除・書きかけの行 → その 2 つだけやり直す
+        res = encrypt_tree(src, enc, K, CTX)
+        if res["files"] or res["skipped"] != len(files):
+            fail(f"rerun did not skip: {res}")
+        (src / "a.txt").write_bytes(b"changed\n" * 10)
+        files["a.txt"] = b"changed\n" * 10
+        os.utime(src / "a.txt", ns=(1, 1))
+        (enc / "sub" / "deep" / ("z.bin" + SUFFIX)).unlink()
+        with open(enc / MANIFEST_NAME, "a", encoding="utf-8") as f:
+            f.write('{"src": "movie", "out": "mo')
+        res = encrypt_tree(src, enc, K, CTX)
+        if res["failed"] or res["files"] != 2 or res["skipped"] != len(files) - 2:
+            fail(f"resume: {res}")
+        res = decrypt_tree(enc, d / "dec2", K)
+        if res["failed"] or tree_bytes(d / "dec2") != dict(files, **{MANIFEST_NAME: (d / "dec2" / MANIFEST_NAME).read_bytes()}):
+            fail(f"round trip after resume: {res}")
+
+        # 改ざん・切り詰め・名前の取り違え: そのファイルだけが失敗し、平文は書かない
+        bad = d / "bad"
+        os.replace(enc, bad)
+        (bad / MANIFEST_NAME).unlink()
+        p = bad / ("a.txt" + SUFFIX); blob = bytearray(p.read_bytes()); blob[-1] ^= 0x01; p.write_bytes(bytes(blob))
+        p = bad / ("movie.part" + SUFFIX); p.write_bytes(p.read_bytes()[:-100])
+        os.replace(bad / "sub" / "deep" / ("z.bin" + SUFFIX), bad / "sub" / "deep" / ("y.bin" + SUFFIX))
+        res = decrypt_tree(bad, d / "dec3", K)
+        want = sorted(["a.txt" + SUFFIX, "movie.part" + SUFFIX, "sub/deep/y.bin" + SUFFIX])
+        if failed(res) != want or res["files"] != len(files) - 3:
+            fail(f"tampered files: {res}")
+        if outputs(d / "dec3") != sorted(["empty", "movie", "sub/" + MANIFEST_NAME]):
+            fail(f"plaintext written for a failed file: {outputs(d / 'dec3')}")
+        res = decrypt_tree(bad, d / "dec4", K, check_names=False)
+        if failed(res) != want[:2] or (d / "dec4" / "sub" / "deep" / "y.bin").read_bytes() != files["sub/deep/z.bin"]:
+            fail(f"check_names=False: {res}")
+        if not rejected(decrypt_tree, bad, d / "dec5", bytes(31)) or not rejected(encrypt_tree, src, src, K, CTX):
+            fail("bad key / same in-dir and out-dir accepted")
+
+        # 出力がマニフェストと同じパスになる入力（<in-dir>/.bmsc6-manifest.jsonl.bmsc6）: そのファイルだけを失敗にする
+        top = d / "top"; top.mkdir()
+        (top / MANIFEST_NAME).write_bytes(b"user data\n"); (top / "b.txt").write_bytes(b"b")
+        encrypt_tree(top, d / "top-enc", K, CTX)
+        (d / "top-enc" / MANIFEST_NAME).unlink()
+        res = decrypt_tree(d / "top-enc", d / "top-dec", K)
+        if failed(res) != [MANIFEST_NAME + SUFFIX] or res["files"] != 1 or set(load_manifest(d / "top-dec" / MANIFEST_NAME)) != {"b.txt" + SUFFIX}:
+            fail(f"manifest collision: {res}")
+        res = decrypt_tree(d / "top-enc", d / "top-dec2", K, manifest=d / "top.jsonl")
+        if res["failed"] or (d / "top-dec2" / MANIFEST_NAME).read_bytes() != b"user data\n":
+            fail(f"manifest collision with --manifest elsewhere: {res}")
+
+        # 圧縮付き
+        res = encrypt_tree(src, d / "zenc", K, CTX, compress="auto")
+        if res["failed"] or (d / "zenc" / ("movie" + SUFFIX)).stat().st_size >= len(files["movie"]):
+            fail(f"compressed encrypt_tree: {res}")
+        res = decrypt_tree(d / "zenc", d / "zdec", K)
+        if res["failed"] or tree_bytes(d / "zdec") != dict(files, **{MANIFEST_NAME: (d / "zdec" / MANIFEST_NAME).read_bytes()}):
+            fail(f"compressed round trip: {res}")
+
+        # 一時ファイル（*.part の書きかけ）が出力に残っていない
+        for out in (dec, d / "dec2", d / "dec3", d / "zenc", d / "zdec"):
+            leftovers = [p.name for p in out.rglob(".*.part")]
+            if leftovers:
+                fail(f"temporary files left in {out.name}: {leftovers}")
+
+        # CLI: 失敗があれば終了コード 1
+        (d / "k.bin").write_bytes(K)
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py")]
+        r = subprocess.run(cli + ["encrypt-dir", "--no-progress", "--key-file", str(d / "k.bin"), "--in-dir", str(src),
+                                  "--out-dir", str(d / "cli-enc")], capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or outputs(d / "cli-enc") != sorted(rel + SUFFIX for rel in files):
+            print(r.stderr.decode("utf-8", errors="replace"))
+            fail("encrypt-dir CLI")
+        r = subprocess.run(cli + ["decrypt-dir", "--no-progress", "--key-file", str(d / "k.bin"), "--in-dir", str(bad),
+                                  "--out-dir", str(d / "cli-dec")], capture_output=True, cwd=ROOT)
+        if r.returncode != 1 or "失敗".encode("utf-8") not in r.stderr:
+            fail("decrypt-dir CLI with a tampered file")
+    print("✅ bmsc6 tree OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,113 @@
+from pathlib import Path
+import base64, hashlib, json, os, struct, subprocess, sys, tempfile
+
+from checklib import ROOT, fail, rejected, run
+from bmsc_v6_prod import bmsc_v6_decrypt, AuthFailed
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_container import unpack_v2, open_v2, ext_kid, MAGIC, VER_V2
+from bmsc_v6_tree import file_aad, SUFFIX
+from bmsc_v6_upload import encrypt_upload, encrypt_uploads, DEFAULT_KID
+
+# アップロード向けの 1 パス暗号化（bmsc_v6_upload）: encrypt_upload の bmsc6 v2 が往復し、AAD が name/size/sha256 であること、
+# 旧形式（demos/google/drive_encrypt.py の元の書き方）と同じレイアウト: v2 のヘッダ・旧 raw（nonce|tag|ct）が v2 の末尾と同じ・
+# サイドカー（.aad.json が AAD そのもの・.meta.json の項目）、旧 raw を CLI の decrypt-file で開けること、
+# 鍵束の KID・圧縮・旧 raw と圧縮の併用の拒否、encrypt_uploads（複数ファイル・raw/sidecars・ファイル名の重複）。
+#   py tests/check_upload.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+
+def legacy_v2(aad: bytes, nonce: bytes, tag: bytes, ct: bytes) -> bytes:
+    """drive_encrypt.py の元の書き方（flags=0 の v2）"""
+    return MAGIC + bytes([VER_V2, 0]) + struct.pack(">HI", len(CTX), len(aad)) + CTX + aad + nonce + tag + ct
+
+def opened(blob: bytes, K_=K) -> bytes:
+    ctx, aad, nonce, tag, ct, ext = unpack_v2(blob)
+    return bytes(open_v2(K_, bytes(ctx), bytes(aad), nonce, ct, tag, ext))
+
+def check_legacy(d: Path, stem: str, pt: bytes, name: str, kid: str=DEFAULT_KID):
+    """stem.bmsc6 / .bin / .aad.json / .meta.json が旧形式と同じであること"""
+    v2 = (d / (stem + SUFFIX)).read_bytes()
+    aad = file_aad(name, len(pt), hashlib.sha256(pt).hexdigest())
+    nonce, tag, ct = unpack_v2(v2)[2:5]
+    if v2 != legacy_v2(aad, nonce, tag, ct) or opened(v2) != pt:
+        fail(f"{stem}: v2 layout differs from drive_encrypt.py")
+    raw = (d / (stem + ".bin")).read_bytes()
+    if raw != nonce + tag + ct or bmsc_v6_decrypt(raw[:24], raw[40:], raw[24:40], K, CTX, aad) != pt:
+        fail(f"{stem}: raw output")
+    if (d / (stem + ".aad.json")).read_bytes() != aad:
+        fail(f"{stem}: AAD sidecar")
+    meta = json.loads((d / (stem + ".meta.json")).read_text(encoding="utf-8"))
+    if (meta["ver"], meta["kid"], meta["ctx"], meta["bmsc6_version"]) != ("bmsc6", kid, CTX.decode(), 2) or \
+       (base64.b64decode(meta["nonce_b64"]), base64.b64decode(meta["tag_b64"])) != (nonce, tag) or not isinstance(meta["created_at"], int):
+        fail(f"{stem}: meta sidecar {meta}")
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        pt = "住民票 upload テスト ".encode("utf-8") * 3000
+        (d / "住民票.pdf").write_bytes(pt)
+
+        # encrypt_upload: v2 だけ（既定）と、旧 raw・サイドカー付き
+        r = encrypt_upload(d / "住民票.pdf", d / "only.bmsc6", K, CTX)
+        if opened((d / "only.bmsc6").read_bytes()) != pt or any(p.suffix in (".bin", ".json") for p in d.iterdir()):
+            fail("encrypt_upload without legacy outputs")
+        if (r["name"], r["size"], r["sha256"], r["aad"]) != ("住民票.pdf", len(pt), hashlib.sha256(pt).hexdigest(),
+                                                             file_aad("住民票.pdf", len(pt), hashlib.sha256(pt).hexdigest())):
+            fail(f"encrypt_upload result: {r}")
+        if bmsc_v6_decrypt(r["nonce"], bytes(r["ct"]), r["tag"], K, CTX, r["aad"]) != pt:
+            fail("encrypt_upload result does not open")
+        encrypt_upload(d / "住民票.pdf", d / "up.bmsc6", K, CTX, raw_out=d / "up.bin",
+                       aad_out=d / "up.aad.json", meta_out=d / "up.meta.json")
+        check_legacy(d, "up", pt, "住民票.pdf")
+        (d / "empty.txt").write_bytes(b"")
+        encrypt_upload(d / "empty.txt", d / "e.bmsc6", K, CTX, name="別名.txt", raw_out=d / "e.bin",
+                       aad_out=d / "e.aad.json", meta_out=d / "e.meta.json")
+        check_legacy(d, "e", b"", "別名.txt")
+
+        # 旧 raw は CLI の decrypt-file で開ける（AAD はサイドカーから）。改ざんは拒否
+        (d / "k.bin").write_bytes(K)
+        r = subprocess.run([sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "decrypt-file", "--in", str(d / "up.bin"),
+                            "--aad-file", str(d / "up.aad.json"), "--key-file", str(d / "k.bin"), "--out", "-"],
+                           capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or r.stdout != pt:
+            print(r.stderr.decode("utf-8", errors="replace"))
+            fail("decrypt-file of the raw output")
+        raw = bytearray((d / "up.bin").read_bytes()); raw[-1] ^= 0x01
+        aad = (d / "up.aad.json").read_bytes()
+        if not rejected(bmsc_v6_decrypt, bytes(raw[:24]), bytes(raw[40:]), bytes(raw[24:40]), K, CTX, aad, exc=AuthFailed):
+            fail("tampered raw output accepted")
+
+        # 鍵束（KID がヘッダとメタに入る）・圧縮・旧 raw と圧縮の併用
+        ring = Keyring({"old": bytes(32), "drive": K}, default="drive")
+        encrypt_upload(d / "住民票.pdf", d / "kid.bmsc6", ring, CTX, meta_out=d / "kid.meta.json")
+        blob = (d / "kid.bmsc6").read_bytes()
+        if ext_kid(unpack_v2(blob)[5]) != "drive" or opened(blob) != pt or \
+           json.loads((d / "kid.meta.json").read_text(encoding="utf-8"))["kid"] != "drive":
+            fail("encrypt_upload with a keyring")
+        encrypt_upload(d / "住民票.pdf", d / "z.bmsc6", K, CTX, compress="zlib")
+        if (d / "z.bmsc6").stat().st_size >= len(pt) or opened((d / "z.bmsc6").read_bytes()) != pt:
+            fail("encrypt_upload with compress")
+        if not rejected(encrypt_upload, d / "住民票.pdf", d / "x.bmsc6", K, CTX, raw_out=d / "x.bin", compress="zlib") or \
+           (d / "x.bmsc6").exists():
+            fail("raw output with compress accepted")
+
+        # encrypt_uploads: 複数ファイルを raw・サイドカー付きで
+        files = {"a.txt": b"alpha" * 1000, "b.bin": os.urandom(70_000), "c.txt": b""}
+        (d / "src").mkdir()
+        for name, data in files.items():
+            (d / "src" / name).write_bytes(data)
+        calls = []
+        res = encrypt_uploads(sorted((d / "src").iterdir()), d / "out", K, CTX, raw=True, sidecars=True, workers=2,
+                              progress=lambda *a: calls.append(a))
+        if res["failed"] or res["files"] != 3 or res["bytes"] != sum(map(len, files.values())) or \
+           sorted(x["name"] for x in res["results"]) != sorted(files) or calls[-1] != (3, 3, res["bytes"], res["bytes"]):
+            fail(f"encrypt_uploads: {res} {calls}")
+        for name, data in files.items():
+            check_legacy(d / "out", name, data, name)
+        if not rejected(encrypt_uploads, [d / "src" / "a.txt", d / "up.aad.json", d / "src" / "a.txt"], d / "out2", K, CTX):
+            fail("duplicate file name accepted")
+    print("✅ bmsc6 upload OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,97 @@
+import io
+
+from checklib import VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+from bmsc_v6_container import Bmsc6Writer, Bmsc6Reader, HEAD_LEN, TAG_LEN, encrypt_stream, decrypt_stream
+
+# bmsc6 v3（チャンク化ストリーム）: 往復・改ざん・切り詰め・チャンクの入れ替えの検出と、固定ベクタ（ヘッダ配置）の確認。
+# 固定ベクタは nonce を固定して書くので、暗号化結果がバイト単位で一致することも確かめる。
+#   py tests/check_v3_container.py                 （--write-vector でベクタを作り直す）
+
+VECTOR = VECTORS / "bmsc6_v3_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"v3.txt"}'
+CS = 64
+
+def seal(pt: bytes, nonce: bytes|None=None, chunk_size: int=CS) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, AAD, chunk_size, nonce=nonce) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def open_all(blob: bytes, key: bytes=K) -> bytes:
+    return b"".join(Bmsc6Reader(io.BytesIO(blob), key))
+
+def opens(blob: bytes) -> bool:
+    return not rejected(open_all, blob)
+
+def write_vector():
+    nonce = bytes(range(100, 124))
+    pt = "bmsc6 v3 vector: 複数チャンク + 端数のテスト用平文です。".encode("utf-8") * 4
+    vec = {
+        "algorithm": "XChaCha20-Poly1305 (bmsc6 v3)",
+        "ctx": CTX.decode("ascii"),
+        "aad_b64": b64e(AAD),
+        "key_hex": K.hex(),  # ←テスト用
+        "nonce_b64": b64e(nonce),
+        "chunk_size": CS,
+        "pt_b64": b64e(pt),
+        "file_b64": b64e(seal(pt, nonce)),
+    }
+    save_vector(VECTOR, vec)
+
+def check_vector():
+    vec = load_vector(VECTOR)
+    pt, blob, nonce = b64d(vec["pt_b64"]), b64d(vec["file_b64"]), b64d(vec["nonce_b64"])
+    if seal(pt, nonce, vec["chunk_size"]) != blob:
+        fail("vector: encryption output differs")
+    r = Bmsc6Reader(io.BytesIO(blob), bytes.fromhex(vec["key_hex"]))
+    if (r.ctx, r.embedded_aad, r.nonce, r.chunk_size) != (CTX, b64d(vec["aad_b64"]), nonce, vec["chunk_size"]):
+        fail("vector: header fields differ")
+    if b"".join(r) != pt:
+        fail("vector: plaintext mismatch")
+    # MAGIC(6) + ver(1)=3 + flags(1)=0 + ctx_len(2) + aad_len(4) + ctx + aad + nonce(24) + chunk_size(4)
+    if blob[:8] != b"BMSC6\x00\x03\x00" or blob[8:HEAD_LEN] != len(CTX).to_bytes(2, "big") + len(AAD).to_bytes(4, "big"):
+        fail("vector: fixed header layout differs")
+
+def main():
+    # 往復（空・端数・チャンク長ちょうど・複数チャンク）、Bmsc6Writer と encrypt_stream は同じ形式
+    for n in (0, 1, CS - 1, CS, CS + 1, 3 * CS, 3 * CS + 5):
+        pt = bytes(i % 251 for i in range(n))
+        if open_all(seal(pt)) != pt:
+            fail(f"round trip ({n} bytes)")
+        src, dst = io.BytesIO(pt), io.BytesIO()
+        encrypt_stream(src, dst, K, CTX, AAD, CS)
+        out = io.BytesIO()
+        if decrypt_stream(io.BytesIO(dst.getvalue()), out, K) != n or out.getvalue() != pt:
+            fail(f"encrypt_stream/decrypt_stream ({n} bytes)")
+
+    pt = bytes(range(256)) * 2 + b"tail"  # 8 チャンク + 端数
+    blob = seal(pt)
+    body = len(blob) - (len(pt) + 9 * TAG_LEN)
+    rec = CS + TAG_LEN
+
+    # 改ざん: ヘッダ（ctx/aad/nonce/chunk_size を含む）と各レコードのどのバイトを反転しても失敗する
+    for i in range(len(blob)):
+        bad = bytearray(blob); bad[i] ^= 0x01
+        if opens(bytes(bad)):
+            fail(f"tampered byte {i} accepted")
+    if not rejected(open_all, blob, bytes(32)):
+        fail("wrong key accepted")
+
+    # 切り詰め: 末尾のチャンクをまとめて落とす・レコードの途中で切る・ヘッダの途中で切る
+    for cut in list(range(body, len(blob), rec)) + [len(blob) - 1, len(blob) - TAG_LEN, body + 5, HEAD_LEN, 3, 0]:
+        if opens(blob[:cut]):
+            fail(f"truncation at {cut} accepted")
+    # 後ろへの追記・チャンクの入れ替え・重複
+    r0, r1 = blob[body:body + rec], blob[body + rec:body + 2 * rec]
+    for bad in (blob + b"\x00", blob + blob[body:body + rec],
+                blob[:body] + r1 + r0 + blob[body + 2 * rec:], blob[:body] + r0 + r0 + blob[body + 2 * rec:]):
+        if opens(bad):
+            fail("appended/reordered chunks accepted")
+
+    check_vector()
+    print("✅ bmsc6 v3 OK")
+
+if __name__ == "__main__":
+    run(main, write_vector)
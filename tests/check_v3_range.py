@@ -0,0 +1,88 @@
+from pathlib import Path
+import io, os, random, subprocess, sys, tempfile
+
+from checklib import ROOT, VECTORS, b64d, fail, rejected, load_vector, run
+from bmsc_v6_container import Bmsc6Writer, Bmsc6File, open_bmsc6
+
+# bmsc6 v3 の範囲読み出し（open_bmsc6 / Bmsc6File.pread/seek/read と decrypt-file --offset/--length）:
+# 任意の範囲が平文と一致すること、改ざんしたチャンクはそこにかかる読み出しだけが失敗すること、
+# 末尾のチャンクを落とした・途中で切れたファイルは開く時点で弾かれること、固定ベクタの範囲読み出し。
+#   py tests/check_v3_range.py
+
+VECTOR = VECTORS / "bmsc6_v3_vector_1.json"
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+CS = 64
+
+def seal(pt: bytes, compress: str|None=None) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K, CTX, b"", CS, compress=compress) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def opens(blob: bytes, key: bytes=K) -> bool:
+    return not rejected(Bmsc6File, io.BytesIO(blob), key)
+
+def check_ranges(f: Bmsc6File, pt: bytes, rnd: random.Random, label: str):
+    if f.size != len(pt):
+        fail(f"{label}: size {f.size} != {len(pt)}")
+    spans = [(0, len(pt)), (0, 0), (len(pt), 5), (len(pt) + 10, 5), (CS - 1, 2), (CS, CS), (len(pt) - 1, 10)]
+    spans += [(rnd.randrange(len(pt) + 1), rnd.randrange(3 * CS)) for _ in range(200)]
+    for off, n in spans:
+        if f.pread(off, n) != pt[off:off+n]:
+            fail(f"{label}: pread({off}, {n})")
+    f.seek(CS + 3)
+    if f.read(10) != pt[CS+3:CS+13] or f.tell() != CS + 13:
+        fail(f"{label}: seek/read/tell")
+    f.seek(-5, os.SEEK_END)
+    if f.read() != pt[-5:]:
+        fail(f"{label}: SEEK_END")
+
+def main():
+    rnd = random.Random(14)
+    pt = bytes(rnd.randrange(256) for _ in range(20 * CS + 7))
+    text = b"range read test line\n" * 80
+
+    for data, compress in ((pt, None), (text, "zlib")):
+        blob = seal(data, compress)
+        label = compress or "plain"
+        check_ranges(Bmsc6File(io.BytesIO(blob), K), data, rnd, label)
+        # 末尾のチャンク落ち・途中切れ・追記は開く時点で失敗する
+        for cut in (len(blob) - 1, len(blob) - 20, len(blob) // 2):
+            if opens(blob[:cut]):
+                fail(f"{label}: truncated file at {cut} opened")
+        if opens(blob + b"\x00" * 20):
+            fail(f"{label}: appended data accepted")
+        if opens(blob, bytes(32)):
+            fail(f"{label}: wrong key accepted")
+
+    # 3 番目のチャンクを改ざん: そのチャンクにかかる読み出しだけが失敗する
+    blob = bytearray(seal(pt))
+    first = len(blob) - (len(pt) + 21 * 16)
+    blob[first + 2 * (CS + 16) + 5] ^= 1
+    f = Bmsc6File(io.BytesIO(bytes(blob)), K)
+    if f.pread(0, 2 * CS) != pt[:2 * CS] or f.pread(3 * CS, CS) != pt[3*CS:4*CS]:
+        fail("reads outside the tampered chunk failed")
+    for off, n in ((2 * CS, 1), (2 * CS - 1, 2), (0, len(pt))):
+        if not rejected(f.pread, off, n):
+            fail(f"tampered chunk served by pread({off}, {n})")
+
+    # 固定ベクタと CLI（decrypt-file --offset/--length）
+    vec = load_vector(VECTOR)
+    vpt, vblob = b64d(vec["pt_b64"]), b64d(vec["file_b64"])
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "v.bmsc6").write_bytes(vblob); (d / "key.bin").write_bytes(bytes.fromhex(vec["key_hex"]))
+        with open_bmsc6(d / "v.bmsc6", bytes.fromhex(vec["key_hex"])) as f:
+            check_ranges(f, vpt, rnd, "vector")
+        r = subprocess.run([sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "decrypt-file",
+                            "--key-file", str(d / "key.bin"), "--in", str(d / "v.bmsc6"),
+                            "--offset", "70", "--length", "100", "--out", "-"], capture_output=True, cwd=ROOT)
+        if r.returncode != 0 or r.stdout != vpt[70:170]:
+            print(r.stderr.decode("utf-8", errors="replace"))
+            fail("vector: decrypt-file --offset/--length")
+
+    print("✅ bmsc6 v3 range read OK")
+
+if __name__ == "__main__":
+    run(main)
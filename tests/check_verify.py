@@ -0,0 +1,108 @@
+from pathlib import Path
+import io, json, os, subprocess, sys, tempfile
+
+from checklib import ROOT, fail, rejected, run
+from bmsc_v6_prod import bmsc_v6_encrypt
+from bmsc_v6_keyring import Keyring
+from bmsc_v6_container import Bmsc6Writer, seal_v2_into, MAGIC, TAG_LEN
+from bmsc_v6_verify import verify_file, verify_paths, iter_paths
+
+# 一括検証（bmsc_v6_verify / `bmsc_prod verify`）: v1/v2/v3（圧縮・KID・空を含む）が通り、タグの改ざん・
+# 切り詰め（末尾・チャンク境界・ヘッダの途中）・bmsc6 でないファイル・存在しないファイル・別の鍵が
+# そのファイルだけの失敗になること、平文をどこにも書かないこと（ディレクトリの内容が変わらない）、
+# CLI の JSON と終了コード（失敗があれば 1）、--from-file。
+#   py tests/check_verify.py
+
+K = bytes(range(32))  # ★テスト専用の固定キー（実運用では使用厳禁）
+CTX = b"BMSCv6-IV00"
+AAD = b'{"name":"verify.bin"}'
+PT = "検証用の平文 verify plaintext ".encode("utf-8") * 700
+
+def v1(pt: bytes) -> bytes:
+    """v1 は ctx/aad を内包しない（検証は ctx 引数・AAD 空）"""
+    nonce, ct, tag = bmsc_v6_encrypt(pt, K, CTX)
+    return MAGIC + bytes([1, 0]) + nonce + tag + ct
+
+def v2(pt: bytes, K_=K, **kw) -> bytes:
+    buf = bytearray(len(pt) + 64)
+    header, nonce, tag, k = seal_v2_into(buf, pt, K_, CTX, AAD, **kw)
+    return header + nonce + tag + buf[:k]
+
+def v3(pt: bytes, K_=K, **kw) -> bytes:
+    out = io.BytesIO()
+    with Bmsc6Writer(out, K_, CTX, AAD, 1000, **kw) as w:
+        w.write(pt)
+    return out.getvalue()
+
+def snapshot(d: Path) -> dict:
+    return {str(p.relative_to(d)): (p.stat().st_size, p.stat().st_mtime_ns) for p in sorted(d.rglob("*"))}
+
+def main():
+    ring = Keyring({"old": bytes(32), "k": K}, default="k")
+    good = {"v1.bmsc6": v1(PT), "v2.bmsc6": v2(PT), "v2z.bmsc6": v2(PT, compress="zlib"), "v2kid.bmsc6": v2(PT, ring),
+            "v3.bmsc6": v3(PT), "v3z.bmsc6": v3(PT, compress="zlib"), "v3kid.bmsc6": v3(PT, ring),
+            "sub/empty.bmsc6": v3(b""), "sub/one.bmsc6": v2(b"x")}
+    blob3, blob2 = good["v3.bmsc6"], good["v2.bmsc6"]
+    tag2 = bytearray(blob2); tag2[len(blob2) - len(PT) - 1] ^= 0x01   # v2 のタグの末尾
+    tag3 = bytearray(blob3); tag3[-1] ^= 0x01                          # v3 の最終チャンクのタグ
+    mid3 = bytearray(blob3); mid3[len(blob3) // 2] ^= 0x01
+    last = len(PT) % 1000 + TAG_LEN
+    bad = {"tag2.bmsc6": bytes(tag2), "tag3.bmsc6": bytes(tag3), "mid3.bmsc6": bytes(mid3),
+           "cut2.bmsc6": blob2[:-1], "cut3.bmsc6": blob3[:-1], "chunk3.bmsc6": blob3[:-last],
+           "head3.bmsc6": blob3[:20], "sub/plain.bmsc6": b"not a container at all"}
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        root = d / "tree"
+        for name, data in {**good, **bad}.items():
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_bytes(data)
+        (root / "notes.txt").write_bytes(PT)  # .bmsc6 以外はディレクトリ指定では対象外
+        (d / "k.bin").write_bytes(K)
+        before = snapshot(d)
+
+        # verify_file: (ver, 平文長)
+        for name, ver in (("v1.bmsc6", 1), ("v2z.bmsc6", 2), ("v3kid.bmsc6", 3)):
+            if verify_file(root / name, ring, CTX) != (ver, len(PT)):
+                fail(f"verify_file {name}")
+        if not rejected(verify_file, root / "tag3.bmsc6", K) or not rejected(verify_file, root / "v2.bmsc6", bytes(32)):
+            fail("verify_file accepted a tampered file / wrong key")
+
+        # verify_paths: 壊れたファイルだけが失敗（パスは遅延評価の列でもよい）
+        calls = []
+        res = verify_paths(iter_paths([root]), ring, ctx=CTX, workers=3, progress=lambda *a: calls.append(a))
+        failed = sorted(Path(f["path"]).relative_to(root).as_posix() for f in res["failures"])
+        if failed != sorted(bad) or res["ok"] != len(good) or res["files"] != len(good) + len(bad):
+            fail(f"verify_paths failures: {failed}")
+        if res["versions"] != {"1": 1, "2": 4, "3": 4} or len(calls) != res["files"] or calls[-1][:2] != (res["files"], len(bad)):
+            fail(f"verify_paths counters: {res['versions']} {calls[-1:]}")
+        if any(not f["error"] for f in res["failures"]):
+            fail("failure without a message")
+        res = verify_paths([root / "v2.bmsc6", root / "missing.bmsc6"], K, ctx=CTX, workers=1)
+        if (res["ok"], res["failed"]) != (1, 1) or not res["failures"][0]["path"].endswith("missing.bmsc6"):
+            fail(f"missing file: {res}")
+        res = verify_paths((root / n for n in good), bytes(32), ctx=CTX)
+        if res["ok"] != 0 or res["failed"] != len(good):
+            fail("wrong key accepted")
+
+        # CLI: 1 行の JSON、失敗があれば終了コード 1、--from-file -（stdin）
+        cli = [sys.executable, str(ROOT / "apps" / "cli" / "bmsc_prod.py"), "verify", "--no-progress", "--key-file", str(d / "k.bin")]
+        r = subprocess.run(cli + [str(root)], capture_output=True, cwd=ROOT)
+        res = json.loads(r.stdout)
+        if r.returncode != 1 or (res["ok"], res["failed"]) != (len(good), len(bad)):
+            fail(f"verify CLI with failures (exit {r.returncode}): {res['failures']}")
+        names = "\n".join(str(root / n) for n in ("v1.bmsc6", "v2.bmsc6", "v3z.bmsc6", "sub/empty.bmsc6"))
+        r = subprocess.run(cli + ["--from-file", "-"], input=names.encode("utf-8"), capture_output=True, cwd=ROOT)
+        res = json.loads(r.stdout)
+        if r.returncode != 0 or (res["files"], res["ok"]) != (4, 4):
+            fail(f"verify CLI --from-file (exit {r.returncode}): {r.stdout}")
+        if subprocess.run(cli, capture_output=True, cwd=ROOT).returncode != 2:
+            fail("verify CLI without paths")
+
+        # 平文はどこにも書かれていない（ファイルの追加・変更なし）
+        if snapshot(d) != before:
+            fail("verify changed the directory")
+    print("✅ bmsc6 verify OK")
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,45 @@
+# tests/checklib.py
+"""
+tests/check_*.py の共通部分: リポジトリのルートを import パスに入れる、Base64、失敗の報告（❌ と終了コード 1）、
+例外で弾かれることの確認、固定ベクタ（tests/vectors/*.json）の読み書きと --write-vector の処理。
+    from checklib import ROOT, VECTORS, b64e, b64d, fail, rejected, load_vector, save_vector, run
+"""
+from pathlib import Path
+import argparse, base64, json, sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+VECTORS = ROOT / "tests" / "vectors"
+
+def b64e(b: bytes) -> str: return base64.b64encode(b).decode("ascii")
+def b64d(s: str) -> bytes: return base64.b64decode(s.encode("ascii"))
+
+def fail(msg: str):
+    print("❌", msg)
+    sys.exit(1)
+
+def rejected(fn, *args, exc=ValueError, **kw) -> bool:
+    """fn(*args, **kw) が exc で失敗すれば True"""
+    try:
+        fn(*args, **kw)
+    except exc:
+        return True
+    return False
+
+def load_vector(path) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def save_vector(path, vec: dict):
+    Path(path).write_text(json.dumps(vec, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print("Wrote:", path)
+
+def run(check, write_vector=None):
+    """スクリプトの入口。--write-vector なら write_vector() だけ、それ以外は check() を実行する"""
+    ap = argparse.ArgumentParser()
+    if write_vector is not None:
+        ap.add_argument("--write-vector", action="store_true", help="固定ベクタを作り直す")
+    if getattr(ap.parse_args(), "write_vector", False):
+        write_vector()
+    else:
+        check()
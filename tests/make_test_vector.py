@@ -37,7 +37,7 @@ def main():
     outdir = ROOT / "tests" / "vectors"
     outdir.mkdir(parents=True, exist_ok=True)
     outfile = outdir / "bmsc6_vector_1.json"
-    outfile.write_text(json.dumps(vec, ensure_ascii=False, indent=2), encoding="utf-8")
+    outfile.write_text(json.dumps(vec, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
     print("Wrote:", outfile)
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from bmsc_v6_prod import bmsc_v6_decrypt
+import bmsc_v6  # demo (HMAC-stream)
 
 def b64d(s: str) -> bytes:
     return base64.b64decode(s.encode("ascii"))
@@ -26,7 +27,10 @@ def main():
     tag = b64d(vec["tag_b64"])
     pt_expected = vec["pt_utf8"].encode("utf-8")
 
-    pt = bmsc_v6_decrypt(nonce, ct, tag, K, ctx, aad=aad)
+    if vec.get("algorithm", "").startswith("HMAC-stream"):
+        pt = bmsc_v6.bmsc_v6_decrypt(nonce, ct, tag, K, ctx, aad=aad)
+    else:
+        pt = bmsc_v6_decrypt(nonce, ct, tag, K, ctx, aad=aad)
     if pt == pt_expected:
         print("✅ verify OK")
     else: